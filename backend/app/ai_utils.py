@@ -1,223 +1,638 @@
-import openai
-import json
-from typing import Dict, List, Any
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
+from pydantic import ValidationError
 from .config import settings
+from .llm_fake import fake_openai
+from .llm_resilience import LLMUnavailableError, build_resilient_caller
+from .llm_usage import usage_ledger
+from .metrics import metrics
 from .models import LearningStyle
+from .prompts import (
+    CURRICULUM_SYSTEM_PROMPT, PRACTICE_BATCH_SYSTEM_PROMPT, PRACTICE_QUESTION_SYSTEM_PROMPT, PromptBuilder,
+    chat_system_prompt, compact_json, compact_student_context, count_message_tokens, count_tokens,
+    question_fingerprint, squeeze
+)
+from .schemas import WeeklyPlanBase, PracticeQuestion
+from .semantic_cache import semantic_cache
+from .singleflight import coalesce
+from .utils.llm_json import IncrementalJSONParser, LLMJSONError, loads_lenient
 
-openai.api_key = settings.OPENAI_API_KEY
+LLM_MODEL = "gpt-4"
+CURRICULUM_WEEKS = 8
+CHAT_FALLBACK_MESSAGE = (
+    "I'm having trouble responding right now. Please try again in a moment - "
+    "in the meantime, try breaking the problem into smaller steps."
+)
+PRACTICE_QUESTION_CACHE_SIZE = 256
+# Characters of each earlier turn included in a chat prompt
+CHAT_HISTORY_CHARS = 200
+# Completion tokens budgeted per question in a batch
+PRACTICE_QUESTION_TOKENS = 220
+
+LEARNING_STYLE_PREFERENCES = {
+    LearningStyle.VISUAL: "visual aids, diagrams, videos",
+    LearningStyle.AUDITORY: "explanations, discussions, audio materials",
+    LearningStyle.KINESTHETIC: "hands-on activities, experiments, physical examples",
+    LearningStyle.READ_WRITE: "reading materials, writing exercises, notes"
+}
+
+class AIServiceError(Exception):
+    """AI content could not be produced and no fallback was available"""
 
 class AITutor:
     def __init__(self):
-        self.client = openai
+        self._client = None
+        self.resilience = build_resilient_caller()
+        # Last good practice question per (topic, difficulty), served while upstream is down
+        self._question_cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+
+    @property
+    def client(self):
+        """The LLM client module; the openai SDK is imported on the first call
+        (it is the heaviest import in the app, ~0.3 s)"""
+        if self._client is None:
+            if settings.LLM_BACKEND == "fake":
+                self._client = fake_openai
+            else:
+                import openai
+                openai.api_key = settings.OPENAI_API_KEY
+                self._client = openai
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
 
-    async def generate_curriculum(self, student_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _complete(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                        method: str, hedge_after: Optional[float] = None) -> str:
+        """Single chat completion call (with deadline/retries/breaker) returning the message text"""
+        prompt_tokens = count_message_tokens(messages)
+        metrics.observe("llm_prompt_tokens", prompt_tokens, method=method)
+        
+        async def call():
+            return await self.client.ChatCompletion.acreate(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+        
+        started = time.perf_counter()
+        try:
+            response = await self.resilience.call(method, call, hedge_after=hedge_after)
+        except Exception as e:
+            usage_ledger.record(method, LLM_MODEL, prompt_tokens, latency_ms=(time.perf_counter() - started) * 1000,
+                                error=e)
+            raise
+        content = response.choices[0].message.content
+        # Upstream token counts when the response carries them, our estimate otherwise
+        usage = getattr(response, "usage", None)
+        usage_ledger.record(
+            method, LLM_MODEL,
+            prompt_tokens=getattr(usage, "prompt_tokens", None) or prompt_tokens,
+            completion_tokens=getattr(usage, "completion_tokens", None) or count_tokens(content or ""),
+            latency_ms=(time.perf_counter() - started) * 1000,
+        )
+        return content
+
+    async def _stream_completion(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                                 method: str) -> AsyncIterator[str]:
+        """Streamed chat completion yielding content deltas as they arrive"""
+        prompt_tokens = count_message_tokens(messages)
+        metrics.observe("llm_prompt_tokens", prompt_tokens, method=method)
+        
+        async def call():
+            return await self.client.ChatCompletion.acreate(
+                model=LLM_MODEL,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+        
+        started = time.perf_counter()
+        pieces: List[str] = []
+        error = None
+        try:
+            response = await self.resilience.call(method, call)
+            chunks = response.__aiter__()
+            while True:
+                try:
+                    # An upstream that stops sending mid-stream is as bad as one that never answers
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=settings.LLM_ATTEMPT_TIMEOUT_SECONDS)
+                except StopAsyncIteration:
+                    return
+                delta = chunk.choices[0].delta.get("content")
+                if delta:
+                    pieces.append(delta)
+                    yield delta
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Streams carry no usage; completion tokens are counted from what arrived
+            usage_ledger.record(method, LLM_MODEL, prompt_tokens, count_tokens("".join(pieces)),
+                                (time.perf_counter() - started) * 1000, error=error)
+
+    @coalesce("generate_curriculum")
+    async def generate_curriculum(self, student_data: Dict[str, Any], mode: Optional[str] = None) -> Dict[str, Any]:
         """Generate personalized 8-week curriculum using GPT"""
         
-        prompt = self._build_curriculum_prompt(student_data)
+        if (mode or settings.CURRICULUM_GENERATION_MODE) == "parallel":
+            return await self._generate_curriculum_parallel(student_data)
+        
+        messages = PromptBuilder(CURRICULUM_SYSTEM_PROMPT, settings.PROMPT_BUDGET_CURRICULUM).add(
+            self._build_curriculum_prompt(student_data), required=True
+        ).build()
+        parser = IncrementalJSONParser(item_key="weekly_plans")
+        weeks: Dict[int, Dict[str, Any]] = {}
         
         try:
-            response = await self.client.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert educational curriculum designer for grades 4-9."},
-                    {"role": "user", "content": prompt}
-                ],
+            # Validate each week as soon as the model finishes emitting it
+            async for chunk in self._stream_completion(
+                messages,
                 temperature=0.7,
-                max_tokens=2000
-            )
-            
-            curriculum_text = response.choices[0].message.content
-            return self._parse_curriculum_response(curriculum_text, student_data)
-            
+                max_tokens=2000,
+                method="generate_curriculum"
+            ):
+                for item in parser.feed(chunk):
+                    self._collect_week(item, weeks)
+        except LLMUnavailableError:
+            if not parser.items:
+                # Upstream is degraded: fail fast to the template curriculum
+                metrics.increment("llm_fallbacks_total", method="generate_curriculum")
+                return self._create_fallback_curriculum(student_data)
+        except Exception as e:
+            if not parser.items:
+                raise Exception(f"AI curriculum generation failed: {str(e)}")
+            # Keep whatever weeks arrived before the stream broke
+        
+        return await self._complete_curriculum(parser, weeks, student_data)
+
+    async def _generate_curriculum_parallel(self, student_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate a short outline, then every week as its own concurrent call.
+        
+        Wall-clock time is roughly one outline plus one week's generation, and
+        no single response is long enough to hit max_tokens.
+        """
+        try:
+            outline = await self._generate_outline(student_data)
+        except LLMUnavailableError:
+            metrics.increment("llm_fallbacks_total", method="generate_curriculum")
+            return self._create_fallback_curriculum(student_data)
         except Exception as e:
             raise Exception(f"AI curriculum generation failed: {str(e)}")
+        
+        semaphore = asyncio.Semaphore(max(1, settings.CURRICULUM_MAX_CONCURRENCY))
+        
+        async def generate_week(entry: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+            async with semaphore:
+                return await self._generate_week(student_data, outline, entry)
+        
+        results = await asyncio.gather(
+            *(generate_week(entry) for entry in outline['weeks']),
+            return_exceptions=True
+        )
+        weeks: Dict[int, Dict[str, Any]] = {}
+        for result in results:
+            if isinstance(result, dict):
+                weeks.update(result)
+        if not weeks:
+            return self._create_fallback_curriculum(student_data)
+        
+        return {
+            'title': outline['title'],
+            'description': outline['description'],
+            'weekly_plans': [
+                weeks.get(number) or self._create_fallback_week(number, student_data)
+                for number in range(1, CURRICULUM_WEEKS + 1)
+            ],
+            'student_metadata': self._student_metadata(student_data)
+        }
 
-    def _build_curriculum_prompt(self, student_data: Dict[str, Any]) -> str:
-        """Build detailed prompt for curriculum generation"""
+    async def _generate_outline(self, student_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Ask for titles and per-week themes only (a few hundred tokens)"""
+        prompt = squeeze(f"""
+            {self._student_profile(student_data)}
+            Outline an 8-week study plan with progressive difficulty, focused on {', '.join(student_data['weak_subjects'])}.
+            No daily schedules yet.
+            Format: {{"title":"text","description":"text","weeks":[{{"week_number":1,"theme":"short theme","focus_areas":["subject"]}}]}}
+        """)
+        text = await self._complete(
+            PromptBuilder(CURRICULUM_SYSTEM_PROMPT, settings.PROMPT_BUDGET_CURRICULUM).add(prompt, required=True).build(),
+            temperature=0.7,
+            max_tokens=500,
+            method="generate_curriculum"
+        )
+        fallback = self._create_fallback_curriculum(student_data)
+        try:
+            document = loads_lenient(text)
+        except LLMJSONError:
+            document = {}
+        if not isinstance(document, dict):
+            document = {}
         
-        learning_style_map = {
-            LearningStyle.VISUAL: "visual aids, diagrams, videos",
-            LearningStyle.AUDITORY: "explanations, discussions, audio materials",
-            LearningStyle.KINESTHETIC: "hands-on activities, experiments, physical examples",
-            LearningStyle.READ_WRITE: "reading materials, writing exercises, notes"
+        entries = {}
+        for entry in document.get('weeks') or []:
+            if isinstance(entry, dict) and isinstance(entry.get('week_number'), int):
+                entries.setdefault(entry['week_number'], entry)
+        weeks = []
+        for number in range(1, CURRICULUM_WEEKS + 1):
+            entry = entries.get(number, {})
+            focus_areas = entry.get('focus_areas')
+            weeks.append({
+                'week_number': number,
+                'theme': str(entry.get('theme') or f"Week {number} of {', '.join(student_data['weak_subjects'])}"),
+                'focus_areas': focus_areas if isinstance(focus_areas, list) else student_data['weak_subjects']
+            })
+        return {
+            'title': document.get('title') or fallback['title'],
+            'description': document.get('description') or fallback['description'],
+            'weeks': weeks
         }
+
+    async def _generate_week(self, student_data: Dict[str, Any], outline: Dict[str, Any],
+                             entry: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+        """Generate the detailed plan for one outlined week"""
+        plan = "; ".join(
+            f"{week['week_number']}. {week['theme']} ({', '.join(week['focus_areas'])})"
+            for week in outline['weeks']
+        )
+        builder = PromptBuilder(CURRICULUM_SYSTEM_PROMPT, settings.PROMPT_BUDGET_CURRICULUM)
+        builder.add(self._student_profile(student_data), required=True)
+        builder.add(f"Outline ({outline['title']}): {plan}", priority=1)
+        builder.add(
+            f"Write the detailed plan for week {entry['week_number']} only: \"{entry['theme']}\", "
+            f"focus_areas {compact_json(entry['focus_areas'])}.",
+            required=True
+        )
+        text = await self._complete(
+            builder.build(),
+            temperature=0.7,
+            max_tokens=600,
+            method="generate_curriculum"
+        )
+        weeks: Dict[int, Dict[str, Any]] = {}
+        self._collect_week(loads_lenient(text), weeks)
+        return {number: week for number, week in weeks.items() if number == entry['week_number']}
+
+    async def _complete_curriculum(self, parser: IncrementalJSONParser, weeks: Dict[int, Dict[str, Any]],
+                                   student_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Assemble a curriculum from parsed weeks, re-requesting only missing weeks"""
+        try:
+            document = parser.close()
+        except LLMJSONError:
+            document = {}
+        if not isinstance(document, dict):
+            document = {}
+        for item in document.get('weekly_plans') or []:
+            self._collect_week(item, weeks)
+        
+        if not weeks:
+            return self._create_fallback_curriculum(student_data)
+        
+        missing = [number for number in range(1, CURRICULUM_WEEKS + 1) if number not in weeks]
+        if missing:
+            weeks.update(await self._generate_missing_weeks(student_data, missing, weeks))
+        for number in range(1, CURRICULUM_WEEKS + 1):
+            if number not in weeks:
+                weeks[number] = self._create_fallback_week(number, student_data)
         
-        learning_preferences = learning_style_map.get(
+        fallback = self._create_fallback_curriculum(student_data)
+        curriculum_data = {
+            'title': document.get('title') or fallback['title'],
+            'description': document.get('description') or fallback['description'],
+            'weekly_plans': [weeks[number] for number in sorted(weeks)]
+        }
+        curriculum_data['student_metadata'] = self._student_metadata(student_data)
+        return curriculum_data
+
+    def _collect_week(self, item: Any, weeks: Dict[int, Dict[str, Any]]) -> None:
+        """Validate a parsed week against WeeklyPlan and keep it if usable"""
+        if not isinstance(item, dict):
+            return
+        try:
+            week = WeeklyPlanBase.model_validate(item)
+        except ValidationError:
+            return
+        if 1 <= week.week_number <= CURRICULUM_WEEKS and week.week_number not in weeks:
+            weeks[week.week_number] = week.model_dump(exclude={'completed'})
+
+    async def _generate_missing_weeks(self, student_data: Dict[str, Any], missing: List[int],
+                                      weeks: Dict[int, Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Ask the model for just the weeks that failed to parse or validate"""
+        planned = "; ".join(
+            f"week {number}: {', '.join(week['focus_areas'])}" for number, week in sorted(weeks.items())
+        )
+        builder = PromptBuilder(CURRICULUM_SYSTEM_PROMPT, settings.PROMPT_BUDGET_CURRICULUM)
+        builder.add(self._build_curriculum_prompt(student_data), required=True)
+        builder.add(f"Already planned: {planned}", priority=1)
+        builder.add(
+            f"Respond with ONLY the weekly_plans entries for weeks {', '.join(map(str, missing))}, "
+            f"as {{\"weekly_plans\":[...]}}.",
+            required=True
+        )
+        recovered: Dict[int, Dict[str, Any]] = {}
+        try:
+            text = await self._complete(
+                builder.build(),
+                temperature=0.7,
+                max_tokens=300 * len(missing) + 100,
+                method="generate_curriculum"
+            )
+            document = loads_lenient(text)
+        except Exception:
+            return recovered
+        items = document.get('weekly_plans', []) if isinstance(document, dict) else document
+        for item in items if isinstance(items, list) else []:
+            self._collect_week(item, recovered)
+        return {number: week for number, week in recovered.items() if number in missing}
+
+    def _learning_preferences(self, student_data: Dict[str, Any]) -> str:
+        return LEARNING_STYLE_PREFERENCES.get(
             student_data.get('learning_style', LearningStyle.VISUAL),
             "varied teaching methods"
         )
 
-        prompt = f"""
-        Create a comprehensive 8-week personalized study plan for a grade {student_data['grade_level']} student.
-
-        STUDENT PROFILE:
-        - Grade Level: {student_data['grade_level']}
-        - Learning Style: {student_data['learning_style'].value}
-        - Weak Subjects: {', '.join(student_data['weak_subjects'])}
-        - Learning Goals: {student_data.get('learning_goals', 'Improve overall academic performance')}
-        - Preferred Methods: {learning_preferences}
-
-        CURRICULUM REQUIREMENTS:
-        - 8-week duration with weekly focus areas
-        - Daily breakdown (Monday-Friday, 60-90 minutes daily)
-        - Include {', '.join(student_data['weak_subjects'])} as primary focus
-        - Balance with reinforcement of strong subjects
-        - Progressive difficulty (simple to complex)
-        - Include practice exercises and assessments
-        - Incorporate {learning_preferences} for engagement
-
-        RESPONSE FORMAT (JSON):
-        {{
-            "title": "Personalized Learning Curriculum",
-            "description": "Overview of the curriculum",
-            "weekly_plans": [
-                {{
-                    "week_number": 1,
-                    "focus_areas": ["subject1", "subject2"],
-                    "learning_objectives": ["objective1", "objective2"],
-                    "daily_breakdown": {{
-                        "monday": {{"subject": "Math", "topic": "Basic Arithmetic", "activities": [...]}},
-                        "tuesday": {{"subject": "Science", "topic": "Introduction to Biology", "activities": [...]}},
-                        // ... rest of the week
-                    }},
-                    "resources_needed": ["textbook1", "online_resource2"]
-                }}
-            ]
-        }}
+    def _student_profile(self, student_data: Dict[str, Any]) -> str:
+        """Student profile line shared by all curriculum prompts"""
+        return (
+            f"Student: grade {student_data['grade_level']}; "
+            f"learning style {student_data['learning_style'].value} ({self._learning_preferences(student_data)}); "
+            f"weak subjects: {', '.join(student_data['weak_subjects'])}; "
+            f"goals: {student_data.get('learning_goals') or 'Improve overall academic performance'}"
+        )
 
-        Make it engaging, age-appropriate, and effective for knowledge retention.
-        """
-        return prompt
+    def _build_curriculum_prompt(self, student_data: Dict[str, Any]) -> str:
+        """Build the (compact) user prompt for full curriculum generation"""
+        return squeeze(f"""
+            Create an 8-week personalized study plan.
+            {self._student_profile(student_data)}
+            Make {', '.join(student_data['weak_subjects'])} the primary focus and use {self._learning_preferences(student_data)}
+            for engagement. Make it engaging, age-appropriate and effective for knowledge retention.
+            Format: {{"title":"text","description":"text","weekly_plans":[one week object per week, 1-8]}}
+        """)
 
     def _parse_curriculum_response(self, response_text: str, student_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Parse AI response into structured curriculum data"""
+        """Parse a complete AI response into structured curriculum data (no re-requests)"""
+        parser = IncrementalJSONParser(item_key="weekly_plans")
+        weeks: Dict[int, Dict[str, Any]] = {}
+        for item in parser.feed(response_text):
+            self._collect_week(item, weeks)
         try:
-            # Extract JSON from response
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            json_str = response_text[start_idx:end_idx]
-            curriculum_data = json.loads(json_str)
-            
-            # Add metadata
-            curriculum_data['student_metadata'] = {
-                'grade_level': student_data['grade_level'],
-                'learning_style': student_data['learning_style'].value,
-                'weak_subjects': student_data['weak_subjects']
-            }
-            
-            return curriculum_data
-            
-        except json.JSONDecodeError:
-            # Fallback: create basic structure
+            document = parser.close()
+        except LLMJSONError:
+            return self._create_fallback_curriculum(student_data)
+        if not isinstance(document, dict):
             return self._create_fallback_curriculum(student_data)
+        for item in document.get('weekly_plans') or []:
+            self._collect_week(item, weeks)
+        if not weeks:
+            return self._create_fallback_curriculum(student_data)
+        
+        document['weekly_plans'] = [
+            weeks.get(number) or self._create_fallback_week(number, student_data)
+            for number in range(1, CURRICULUM_WEEKS + 1)
+        ]
+        document['student_metadata'] = self._student_metadata(student_data)
+        return document
+
+    def _student_metadata(self, student_data: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'grade_level': student_data['grade_level'],
+            'learning_style': student_data['learning_style'].value,
+            'weak_subjects': student_data['weak_subjects']
+        }
+
+    def _create_fallback_week(self, week_number: int, student_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a basic weekly plan if AI fails for that week"""
+        return {
+            "week_number": week_number,
+            "focus_areas": student_data['weak_subjects'],
+            "learning_objectives": [f"Master basic concepts in {subject}" for subject in student_data['weak_subjects']],
+            "daily_breakdown": {
+                day: {
+                    "subject": subject,
+                    "topic": f"Introduction to {subject}",
+                    "activities": ["Reading", "Practice problems", "Review"]
+                } for day, subject in zip(
+                    ["monday", "tuesday", "wednesday", "thursday", "friday"],
+                    student_data['weak_subjects'] * 2
+                )
+            },
+            "resources_needed": ["Textbooks", "Online resources", "Practice worksheets"]
+        }
 
     def _create_fallback_curriculum(self, student_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a basic curriculum if AI fails"""
         return {
             "title": f"Grade {student_data['grade_level']} Personalized Curriculum",
             "description": f"Focus on improving {', '.join(student_data['weak_subjects'])}",
-            "weekly_plans": [
-                {
-                    "week_number": i + 1,
-                    "focus_areas": student_data['weak_subjects'],
-                    "learning_objectives": [f"Master basic concepts in {subject}" for subject in student_data['weak_subjects']],
-                    "daily_breakdown": {
-                        day: {
-                            "subject": subject,
-                            "topic": f"Introduction to {subject}",
-                            "activities": ["Reading", "Practice problems", "Review"]
-                        } for day, subject in zip(
-                            ["monday", "tuesday", "wednesday", "thursday", "friday"],
-                            student_data['weak_subjects'] * 2
-                        )
-                    },
-                    "resources_needed": ["Textbooks", "Online resources", "Practice worksheets"]
-                } for i in range(8)
-            ]
+            "weekly_plans": [self._create_fallback_week(i + 1, student_data) for i in range(CURRICULUM_WEEKS)]
         }
 
+    @coalesce("generate_practice_question")
     async def generate_practice_question(self, topic: str, difficulty: str = "medium") -> Dict[str, Any]:
         """Generate practice questions using AI"""
         
-        prompt = f"""
-        Create a {difficulty} difficulty practice question about {topic} for middle school students.
-        
-        Include:
-        - A clear question
-        - Multiple choice options (A, B, C, D)
-        - Detailed explanation of the correct answer
-        - Hint for struggling students
-        
-        Format as JSON:
-        {{
-            "question": "question text",
-            "options": {{
-                "A": "option A",
-                "B": "option B", 
-                "C": "option C",
-                "D": "option D"
-            }},
-            "correct_answer": "A",
-            "explanation": "detailed explanation",
-            "hint": "helpful hint"
-        }}
-        """
+        messages = PromptBuilder(PRACTICE_QUESTION_SYSTEM_PROMPT, settings.PROMPT_BUDGET_PRACTICE_QUESTION).add(
+            f"Create a {difficulty} difficulty multiple-choice practice question about {topic} for middle school "
+            f"students, with a detailed explanation of the correct answer and a hint for struggling students.",
+            required=True
+        ).build()
         
+        cache_key = (topic.strip().lower(), difficulty.strip().lower())
         try:
-            response = await self.client.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a helpful tutor creating educational content."},
-                    {"role": "user", "content": prompt}
-                ],
+            question_text = await self._complete(
+                messages,
                 temperature=0.5,
-                max_tokens=500
+                max_tokens=500,
+                method="generate_practice_question"
             )
+            question = PracticeQuestion.model_validate(loads_lenient(question_text)).model_dump()
             
-            question_text = response.choices[0].message.content
-            return json.loads(question_text[question_text.find('{'):question_text.rfind('}')+1])
-            
+        except LLMUnavailableError as e:
+            cached = self._question_cache.get(cache_key)
+            if cached is None:
+                raise AIServiceError(f"Failed to generate practice question: {str(e)}")
+            metrics.increment("llm_fallbacks_total", method="generate_practice_question")
+            return dict(cached)
         except Exception as e:
-            raise Exception(f"Failed to generate practice question: {str(e)}")
-
-    async def chat_assistance(self, message: str, context: Dict[str, Any]) -> str:
-        """Provide AI tutoring assistance"""
+            raise AIServiceError(f"Failed to generate practice question: {str(e)}")
         
-        context_str = json.dumps(context, indent=2)
-        
-        prompt = f"""
-        You are a friendly, patient tutor for grade {context.get('grade_level', 6)} students.
+        self._question_cache[cache_key] = question
+        self._question_cache.move_to_end(cache_key)
+        if len(self._question_cache) > PRACTICE_QUESTION_CACHE_SIZE:
+            self._question_cache.popitem(last=False)
+        return question
+
+    @coalesce("generate_practice_questions")
+    async def generate_practice_questions(self, topic: str, difficulty: str = "medium", count: int = 10,
+                                          grade_level: Optional[int] = None,
+                                          avoid: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Generate up to ``count`` distinct practice questions in as few calls as possible.
+
+        Each call asks for up to ``PRACTICE_BATCH_SIZE`` questions and the
+        calls run concurrently; invalid entries are dropped and near-identical
+        ones removed. If duplicates leave the set short, one follow-up round
+        asks for the remainder, so fewer than ``count`` may still come back.
+        ``avoid`` lists questions that already exist.
+        """
+        audience = f"grade {grade_level}" if grade_level else "middle school"
         
-        Student Context:
-        {context_str}
+        async def one_batch(size: int, existing: List[str]) -> List[Dict[str, Any]]:
+            builder = PromptBuilder(PRACTICE_BATCH_SYSTEM_PROMPT, settings.PROMPT_BUDGET_PRACTICE_BATCH)
+            builder.add(
+                f"Create {size} different {difficulty} difficulty multiple-choice practice questions about "
+                f"{topic} for {audience} students, each with a detailed explanation of the correct answer "
+                f"and a hint for struggling students.",
+                required=True
+            )
+            if existing:
+                builder.add("Do not repeat these existing questions:\n" + "\n".join(f"- {q}" for q in existing))
+            text = await self._complete(
+                builder.build(),
+                temperature=0.8,
+                max_tokens=PRACTICE_QUESTION_TOKENS * size,
+                method="generate_practice_questions"
+            )
+            data = loads_lenient(text)
+            items = data.get("questions", []) if isinstance(data, dict) else data
+            questions = []
+            for item in items if isinstance(items, list) else []:
+                try:
+                    questions.append(PracticeQuestion.model_validate(item).model_dump())
+                except ValidationError:
+                    metrics.increment("practice_questions_invalid_total")
+            return questions
         
-        Current Question: {message}
+        existing = list(avoid or [])
+        seen = {question_fingerprint(q) for q in existing}
+        unique: List[Dict[str, Any]] = []
+        for _ in range(2):
+            needed = count - len(unique)
+            sizes = [
+                min(settings.PRACTICE_BATCH_SIZE, needed - start)
+                for start in range(0, needed, settings.PRACTICE_BATCH_SIZE)
+            ]
+            # Keep whatever the successful batches produced
+            results = await asyncio.gather(*(one_batch(size, existing) for size in sizes), return_exceptions=True)
+            errors = [r for r in results if isinstance(r, BaseException)]
+            if len(errors) == len(results):
+                if unique:
+                    break
+                raise AIServiceError(f"Failed to generate practice questions: {str(errors[0])}")
+            
+            for question in (q for batch in results if not isinstance(batch, BaseException) for q in batch):
+                fingerprint = question_fingerprint(question["question"])
+                if fingerprint in seen:
+                    metrics.increment("practice_questions_duplicate_total")
+                    continue
+                seen.add(fingerprint)
+                unique.append(question)
+                existing.append(question["question"])
+            if len(unique) >= count:
+                break
+        return unique[:count]
+
+    def _chat_prompt(self, message: str, context: Dict[str, Any], references: Optional[List[str]],
+                     history: Optional[List[Tuple[bool, str]]],
+                     grade_level: Optional[int]) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """Chat messages to send plus the semantic cache partition (None when
+        the answer is tailored to this student and must not be shared).
+        ``grade_level`` is the student's stored grade; only it selects a
+        partition, never the client-supplied context. A shared answer is
+        written for the grade, so the client context is left out of its prompt"""
+        shared = grade_level is not None and not references and not history
+        context = {} if shared else compact_student_context(context)
+        if grade_level is not None:
+            context['grade_level'] = grade_level
+        builder = PromptBuilder(chat_system_prompt(str(context.get('grade_level', 6))[:8]),
+                                settings.PROMPT_BUDGET_CHAT)
+        if references:
+            builder.add("From the student's plan and past chats:\n" + "\n".join(f"- {r}" for r in references))
+        if history:
+            builder.add("Conversation so far:\n" + "\n".join(
+                f"{'Student' if is_user else 'Tutor'}: {squeeze(text)[:CHAT_HISTORY_CHARS]}" for is_user, text in history
+            ), priority=1)
+        builder.add(f"Student: {compact_json(context)}" if context else "", priority=2)
+        builder.add(f"Question: {message}", required=True)
+        return builder.build(), f"grade:{grade_level}" if shared else None
+
+    @coalesce("chat_assistance")
+    async def chat_assistance(self, message: str, context: Dict[str, Any],
+                              references: Optional[List[str]] = None,
+                              history: Optional[List[Tuple[bool, str]]] = None,
+                              grade_level: Optional[int] = None) -> str:
+        """Provide AI tutoring assistance, grounded in ``references`` (snippets
+        of the student's own curriculum and chat history) and the recent
+        ``history`` of (is_user, text) turns when given. ``grade_level`` (the
+        authenticated student's) lets the answer be shared with that grade"""
         
-        Provide:
-        - Clear, age-appropriate explanation
-        - Step-by-step guidance if it's a problem
-        - Encouraging tone
-        - Related examples if helpful
-        - Ask follow-up questions to check understanding
+        messages, partition = self._chat_prompt(message, context, references, history, grade_level)
         
-        Keep responses under 300 words.
-        """
+        # Near-duplicate questions from the same grade get the same explanation,
+        # unless the answer is tailored to this student's own material
+        started = time.perf_counter()
+        cached = semantic_cache.lookup(partition, message) if partition else None
+        if cached is not None:
+            usage_ledger.record("chat_assistance", LLM_MODEL, latency_ms=(time.perf_counter() - started) * 1000,
+                                cache_hit=True)
+            return cached
         
         try:
-            response = await self.client.ChatCompletion.acreate(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are an expert tutor who explains concepts clearly and patiently."},
-                    {"role": "user", "content": prompt}
-                ],
+            started = time.perf_counter()
+            answer = await self._complete(
+                messages,
                 temperature=0.7,
-                max_tokens=500
+                max_tokens=500,
+                method="chat_assistance",
+                hedge_after=settings.LLM_HEDGE_AFTER_SECONDS or None
             )
+            if partition:
+                semantic_cache.store(partition, message, answer, (time.perf_counter() - started) * 1000)
+            return answer
             
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            return f"I'm having trouble responding right now. Please try again later. Error: {str(e)}"
+        except Exception:
+            # Never surface upstream error text as if it were the tutor's answer
+            metrics.increment("llm_fallbacks_total", method="chat_assistance")
+            return CHAT_FALLBACK_MESSAGE
+
+    async def chat_assistance_stream(self, message: str, context: Dict[str, Any],
+                                     references: Optional[List[str]] = None,
+                                     history: Optional[List[Tuple[bool, str]]] = None,
+                                     grade_level: Optional[int] = None) -> AsyncIterator[str]:
+        """Streaming ``chat_assistance``: yields the answer as it is generated"""
+        
+        messages, partition = self._chat_prompt(message, context, references, history, grade_level)
+        started = time.perf_counter()
+        cached = semantic_cache.lookup(partition, message) if partition else None
+        if cached is not None:
+            usage_ledger.record("chat_assistance_stream", LLM_MODEL,
+                                latency_ms=(time.perf_counter() - started) * 1000, cache_hit=True)
+            yield cached
+            return
+        
+        pieces: List[str] = []
+        try:
+            started = time.perf_counter()
+            async for delta in self._stream_completion(
+                messages,
+                temperature=0.7,
+                max_tokens=500,
+                method="chat_assistance_stream"
+            ):
+                pieces.append(delta)
+                yield delta
+        except Exception:
+            metrics.increment("llm_fallbacks_total", method="chat_assistance_stream")
+            # Mid-stream failures keep what was sent and say the answer was cut short
+            yield CHAT_FALLBACK_MESSAGE if not pieces else "\n\n" + CHAT_FALLBACK_MESSAGE
+            return
+        if partition and pieces:
+            semantic_cache.store(partition, message, "".join(pieces), (time.perf_counter() - started) * 1000)
 
 # Global AI tutor instance
 ai_tutor = AITutor()
\ No newline at end of file
@@ -1,7 +1,6 @@
+import functools
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
@@ -9,18 +8,25 @@ from sqlalchemy.orm import Session
 from .config import settings
 from .database import get_db
 from . import models, schemas
+from .sharding import shards
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# passlib and jose are imported on first use, keeping them out of app startup
+@functools.lru_cache(maxsize=None)
+def password_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(models.Student).filter(models.Student.email == email).first()
+    from .crud import get_student_by_email
+    user = get_student_by_email(db, email)
     if not user or not verify_password(password, user.hashed_password):
         return False
     return user
@@ -32,27 +38,54 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(
+def get_student_db(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
+):
+    """Session for the authenticated student's data: on their shard when
+    sharding is on (see app/sharding.py), else the request's own session"""
+    email = token_subject(token) if shards else None
+    if email is None:
+        yield db
+        return
+    student_db = shards.session_for_email(email)
+    try:
+        yield student_db
+    finally:
+        student_db.close()
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_student_db)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    user = get_user_from_token(db, token)
+    if user is None:
+        raise credentials_exception
+    # Lets commits on this session route the student's reads to the primary
+    db.info["student_id"] = user.id
+    return user
+
+def token_subject(token: str) -> Optional[str]:
+    """Email a valid access token was issued to, or None"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.Student).filter(models.Student.email == email).first()
-    if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        return None
+    return payload.get("sub")
+
+def get_user_from_token(db: Session, token: str) -> Optional[models.Student]:
+    """Student named by a valid access token, or None"""
+    email = token_subject(token)
+    if email is None:
+        return None
+    return db.query(models.Student).filter(models.Student.email == email).first()
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Flusher loop shared by the in-memory write buffers.
+
+A ``BatchFlusher`` keeps ``pending`` entries (tuples whose last item is the
+monotonic enqueue time) and runs one flusher task per worker. A batch is due
+as soon as ``max_batch`` entries are pending, or ``max_delay`` seconds after
+the oldest one. Failed flushes are retried with exponential backoff, capped
+at ``max_retry_delay``. ``stop()`` drains the buffer; entries still pending
+when a flush fails during shutdown are handed to ``_abandon``.
+
+Subclasses implement ``flush`` (write one batch) and ``_abandon``, and queue
+entries with ``_enqueue``. Used by app/write_behind.py and app/llm_usage.py.
+"""
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Iterable, List, Optional, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BatchFlusher(ABC):
+    metric_prefix = "batch"  # <prefix>_errors_total counts failed flushes
+    label = "Batch"  # Names the buffer in log messages
+
+    def __init__(self, max_batch: int, max_delay: float, max_retry_delay: float = 30.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_retry_delay = max_retry_delay
+        self.pending: List[Tuple] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._failures = 0
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _enqueue(self, entries: Iterable[Tuple]) -> None:
+        self._ensure_running()
+        was_empty = not self.pending
+        self.pending.extend(entries)
+        # The first entry starts the max_delay clock; a full batch is due now
+        if was_empty or len(self.pending) >= self.max_batch:
+            self._wakeup.set()
+
+    @abstractmethod
+    async def flush(self) -> int:
+        """Write one batch now; returns the number of entries written"""
+
+    @abstractmethod
+    def _abandon(self) -> None:
+        """Dispose of ``pending`` after a flush failed during shutdown"""
+
+    async def _wait_for_batch(self) -> None:
+        """Return once a batch is due: full, old enough, or stopping"""
+        while not self._stopping:
+            self._wakeup.clear()
+            if len(self.pending) >= self.max_batch:
+                return
+            if self.pending:
+                remaining = self.max_delay - (time.monotonic() - self.pending[0][-1])
+                if remaining <= 0:
+                    return
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return
+            else:
+                await self._wakeup.wait()
+
+    async def _run(self) -> None:
+        while not (self._stopping and not self.pending):
+            await self._wait_for_batch()
+            try:
+                await self.flush()
+                self._failures = 0
+            except Exception:
+                self._failures += 1
+                metrics.increment(f"{self.metric_prefix}_errors_total")
+                logger.exception("%s flush failed (%d pending)", self.label, len(self.pending))
+                if self._stopping:
+                    self._abandon()
+                    return
+                delay = min(self.max_retry_delay, self.max_delay * 2 ** self._failures)
+                try:
+                    await asyncio.wait_for(self._stop_requested(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _stop_requested(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def stop(self) -> None:
+        """Drain the buffer and stop the flusher"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
@@ -0,0 +1,168 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Optional, Set, Union
+
+from fastapi import Request, Response
+
+from .config import settings
+
+
+def make_etag(*parts) -> str:
+    """Build a weak ETag from cheap version markers (ids, row versions, counts)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def student_tag(student_id: int) -> str:
+    return f"student:{student_id}"
+
+
+def curricula_tag(student_id: int) -> str:
+    return f"curricula:{student_id}"
+
+
+class ResponseCache:
+    """Small thread-safe LRU of serialized response bodies.
+
+    Entries are keyed by resource key + ETag, so a stale body can never be
+    served for a newer row version; tags let writers drop a student's entries
+    eagerly instead of waiting for LRU/TTL eviction.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: int = 300, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, body: bytes, tags: Iterable[str] = ()) -> None:
+        if not self.enabled:
+            return
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, time.monotonic() + self.ttl_seconds, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tag: str) -> int:
+        """Drop every entry carrying ``tag``; returns the number removed"""
+        with self._lock:
+            keys = self._tags.pop(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # MySQL TIMESTAMP and SQLite hand back naive datetimes stored in UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since (RFC 9110 precedence)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag.removeprefix("W/") in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since is None:
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+
+def cached_json_response(
+    request: Request,
+    *,
+    key: str,
+    etag: str,
+    render: Callable[[], Union[str, bytes]],
+    last_modified: Optional[datetime] = None,
+    tags: Iterable[str] = (),
+) -> Response:
+    """Answer a conditional GET, serving the body from cache when possible.
+
+    ``render`` is only called on a cache miss and must return the JSON body.
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    cache_key = f"{key}|{etag}"
+    body = response_cache.get(cache_key)
+    if body is None:
+        body = render()
+        if isinstance(body, str):
+            body = body.encode()
+        response_cache.set(cache_key, body, tags)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    enabled=settings.RESPONSE_CACHE_ENABLED,
+)
@@ -0,0 +1,196 @@
+"""Connection-scoped state for the WebSocket chat channel.
+
+A ``ChatChannel`` authenticates once when the socket opens, loads the
+student profile and the chat session, then keeps the recent history window
+in memory for the lifetime of the connection. Each turn streams the tutor's
+answer as ``delta`` frames. No DB session is held between turns or while
+the LLM is generating: messages go through the shared write-behind buffer
+(``app.write_behind.chat_writer``), which inserts them in batches.
+
+Protocol (JSON frames)::
+
+    -> {"type": "auth", "token": "..."}            unless ?token= was given
+    <- {"type": "ready", "session_id": 1}
+    -> {"type": "message", "content": "...", "student_context": {...}}
+    <- {"type": "delta", "content": "..."}          repeated
+    <- {"type": "done", "content": "<full answer>"}
+    <- {"type": "error", "status": 429, "detail": "..."}
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+
+from . import models
+from .ai_utils import CHAT_FALLBACK_MESSAGE, ai_tutor
+from .auth import get_user_from_token, token_subject
+from .config import settings
+from .llm_usage import usage_ledger
+from .metrics import metrics
+from .rate_limit import ai_concurrency, student_rate_limiter
+from .retrieval import retrieval
+from .semantic_cache import semantic_cache
+from .sharding import shards
+from .write_behind import chat_message, chat_writer
+
+# Application close codes (4000-4999 are reserved for applications)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_SESSION_NOT_FOUND = 4404
+CLOSE_IDLE = 4408
+
+MAX_MESSAGE_CHARS = 4000
+
+
+class ChatChannel:
+    open_connections = 0
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.student_id: Optional[int] = None
+        self.session_id: Optional[int] = None
+        self.profile: Dict[str, Any] = {}
+        self.history: Deque[Tuple[bool, str]] = deque(maxlen=settings.CHAT_WS_HISTORY_MESSAGES)
+
+    async def _send_error(self, status: int, detail: str) -> None:
+        await self.websocket.send_json({"type": "error", "status": status, "detail": detail})
+
+    def _load(self, token: str, session_id: Optional[int]) -> Optional[int]:
+        """Authenticate and load connection state; returns a close code on failure"""
+        db = shards.session_for_email(token_subject(token) if token else None)
+        try:
+            student = get_user_from_token(db, token) if token else None
+            if student is None or not student.is_active:
+                return CLOSE_UNAUTHORIZED
+            if session_id is not None:
+                session = db.query(models.ChatSession).filter(
+                    models.ChatSession.id == session_id,
+                    models.ChatSession.student_id == student.id
+                ).first()
+                if session is None:
+                    return CLOSE_SESSION_NOT_FOUND
+            else:
+                session = models.ChatSession(student_id=student.id, session_title="Learning Session")
+                db.add(session)
+                db.commit()
+            recent = db.query(models.ChatMessage).filter(
+                models.ChatMessage.session_id == session.id
+            ).order_by(models.ChatMessage.id.desc()).limit(self.history.maxlen).all()
+            self.history.extend((message.is_user, message.content) for message in reversed(recent))
+            self.student_id, self.session_id = student.id, session.id
+            self.profile = {
+                "grade_level": student.grade_level,
+                "learning_style": student.learning_style.value if student.learning_style else None,
+                "weak_subjects": student.weak_subjects,
+                "learning_goals": student.learning_goals,
+            }
+            retrieval.warm(db, student.id)
+            return None
+        finally:
+            db.close()
+
+    def _refresh_retrieval(self) -> None:
+        """Rebuild the student's expired retrieval index (long-lived sockets
+        outlast its TTL)"""
+        db = shards.session_for(self.student_id)
+        try:
+            retrieval.warm(db, self.student_id)
+        finally:
+            db.close()
+
+    async def open(self) -> bool:
+        """Accept the socket and authenticate it once; False if it was closed"""
+        await self.websocket.accept()
+        params = self.websocket.query_params
+        token = params.get("token")
+        try:
+            if not token:
+                frame = await asyncio.wait_for(
+                    self.websocket.receive_json(), timeout=settings.CHAT_WS_AUTH_TIMEOUT_SECONDS
+                )
+                token = frame.get("token") if isinstance(frame, dict) and frame.get("type") == "auth" else None
+            session_id = int(params["session_id"]) if params.get("session_id") else None
+        except (asyncio.TimeoutError, ValueError):
+            token, session_id = None, None
+
+        close_code = await run_in_threadpool(self._load, token, session_id)
+        if close_code is not None:
+            await self.websocket.close(code=close_code)
+            return False
+        await self.websocket.send_json({"type": "ready", "session_id": self.session_id})
+        return True
+
+    async def run(self) -> None:
+        metrics.increment("chat_ws_connections_total")
+        ChatChannel.open_connections += 1
+        metrics.set_gauge("chat_ws_connections_open", ChatChannel.open_connections)
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(
+                        self.websocket.receive_json(), timeout=settings.CHAT_WS_IDLE_TIMEOUT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    await self.websocket.close(code=CLOSE_IDLE)
+                    return
+                except ValueError:
+                    await self._send_error(400, "Frames must be JSON")
+                    continue
+                if not isinstance(frame, dict) or frame.get("type") != "message":
+                    await self._send_error(400, "Unsupported frame type")
+                    continue
+                await self.handle_message(frame)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            ChatChannel.open_connections -= 1
+            metrics.set_gauge("chat_ws_connections_open", ChatChannel.open_connections)
+
+    async def handle_message(self, frame: Dict[str, Any]) -> None:
+        content = frame.get("content")
+        if not isinstance(content, str) or not content.strip() or len(content) > MAX_MESSAGE_CHARS:
+            await self._send_error(400, f"content must be 1-{MAX_MESSAGE_CHARS} characters")
+            return
+        context = dict(self.profile)
+        if isinstance(frame.get("student_context"), dict):
+            context.update(frame["student_context"])
+
+        started = time.perf_counter()
+        pieces: List[str] = []
+        try:
+            await student_rate_limiter.check(str(self.student_id))
+            async with ai_concurrency.slot():
+                if retrieval.needs_refresh(self.student_id):
+                    await run_in_threadpool(self._refresh_retrieval)
+                references = retrieval.search(None, self.student_id, content,
+                                              include_chat=not semantic_cache.cacheable(content))
+                with usage_ledger.student(self.student_id):
+                    async for delta in ai_tutor.chat_assistance_stream(
+                        content, context, references=references, history=list(self.history),
+                        grade_level=self.profile["grade_level"]
+                    ):
+                        if not pieces:
+                            metrics.observe("chat_ws_first_token_ms", (time.perf_counter() - started) * 1000)
+                        pieces.append(delta)
+                        await self.websocket.send_json({"type": "delta", "content": delta})
+        except HTTPException as e:
+            await self._send_error(e.status_code, e.detail)
+            return
+
+        response = "".join(pieces)
+        await self.websocket.send_json({"type": "done", "content": response})
+        metrics.increment("chat_ws_messages_total")
+        metrics.observe("chat_ws_turn_ms", (time.perf_counter() - started) * 1000)
+
+        self.history.append((True, content))
+        self.history.append((False, response))
+        await chat_writer.add(
+            self.student_id,
+            chat_message(self.session_id, content, True, 'question'),
+            chat_message(
+                self.session_id, response, False,
+                'fallback' if CHAT_FALLBACK_MESSAGE in response else 'explanation'
+            ),
+        )
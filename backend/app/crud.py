@@ -1,26 +1,50 @@
+import hashlib
+import itertools
+from datetime import date, datetime
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from . import models, schemas
+from typing import List, Optional, Sequence
+from . import mastery, models, retention, reviews, schemas
+from .cache import response_cache, curricula_tag
+from .prompts import question_fingerprint
+from .retrieval import retrieval
+from .sharding import shards
 
 # Student CRUD
 def get_student(db: Session, student_id: int):
     return db.query(models.Student).filter(models.Student.id == student_id).first()
 
 def get_student_by_email(db: Session, email: str):
-    return db.query(models.Student).filter(models.Student.email == email).first()
+    """Student registered with ``email``; read from their shard when sharding is on"""
+    if not shards:
+        return db.query(models.Student).filter(models.Student.email == email).first()
+    student_db = shards.session_for_email(email)
+    try:
+        return student_db.query(models.Student).filter(models.Student.email == email).first()
+    finally:
+        student_db.close()
 
 def create_student(db: Session, student: schemas.StudentCreate):
     from .auth import get_password_hash
-    hashed_password = get_password_hash(student.password)
-    db_student = models.Student(
+    values = dict(
         email=student.email,
-        hashed_password=hashed_password,
+        hashed_password=get_password_hash(student.password),
         full_name=student.full_name,
         grade_level=student.grade_level,
         learning_style=student.learning_style,
         weak_subjects=student.weak_subjects,
         learning_goals=student.learning_goals
     )
+    if shards:
+        # The id comes from the shard directory on ``db``; the row goes to the student's shard
+        [student_id] = shards.insert_students(db, [values])
+        student_db = shards.session_for(student_id)
+        try:
+            return student_db.get(models.Student, student_id)
+        finally:
+            student_db.close()
+    db_student = models.Student(**values)
     db.add(db_student)
     db.commit()
     db.refresh(db_student)
@@ -36,13 +60,12 @@ def create_curriculum(db: Session, curriculum_data: dict, student_id: int):
         duration_weeks=len(curriculum_data.get('weekly_plans', []))
     )
     db.add(db_curriculum)
-    db.commit()
-    db.refresh(db_curriculum)
     
-    # Create weekly plans
+    # Create weekly plans in the same transaction so readers never see a
+    # curriculum version without its weeks
     for week_data in curriculum_data.get('weekly_plans', []):
         db_weekly_plan = models.WeeklyPlan(
-            curriculum_id=db_curriculum.id,
+            curriculum=db_curriculum,
             week_number=week_data['week_number'],
             focus_areas=week_data['focus_areas'],
             daily_breakdown=week_data['daily_breakdown'],
@@ -52,6 +75,9 @@ def create_curriculum(db: Session, curriculum_data: dict, student_id: int):
         db.add(db_weekly_plan)
     
     db.commit()
+    db.refresh(db_curriculum)
+    response_cache.invalidate(curricula_tag(student_id))
+    retrieval.add_curriculum(student_id, db_curriculum)
     return db_curriculum
 
 def get_student_curricula(db: Session, student_id: int):
@@ -66,6 +92,29 @@ def get_curriculum_with_weeks(db: Session, curriculum_id: int, student_id: int):
         models.Curriculum.student_id == student_id
     ).first()
 
+def get_student_curricula_version(db: Session, student_id: int):
+    """Cheap aggregate used as the ETag source for the curriculum list"""
+    return db.query(
+        func.count(models.Curriculum.id),
+        func.coalesce(func.sum(models.Curriculum.version), 0),
+        func.coalesce(func.max(models.Curriculum.id), 0),
+        func.max(models.Curriculum.updated_at)
+    ).filter(
+        models.Curriculum.student_id == student_id,
+        models.Curriculum.is_active == True
+    ).one()
+
+def get_curriculum_version(db: Session, curriculum_id: int, student_id: int):
+    """Fetch only the version columns of a curriculum (None if not owned)"""
+    return db.query(
+        models.Curriculum.id,
+        models.Curriculum.version,
+        models.Curriculum.updated_at
+    ).filter(
+        models.Curriculum.id == curriculum_id,
+        models.Curriculum.student_id == student_id
+    ).first()
+
 # Progress CRUD
 def create_progress_log(db: Session, progress_log: schemas.ProgressLogCreate, student_id: int):
     db_progress = models.ProgressLog(
@@ -79,58 +128,418 @@ def create_progress_log(db: Session, progress_log: schemas.ProgressLogCreate, st
         feedback=progress_log.feedback
     )
     db.add(db_progress)
+    review = None
+    if progress_log.proficiency_score is not None:
+        update_mastery(db, student_id, progress_log.subject, progress_log.topic, progress_log.proficiency_score)
+        review = reviews.DueItem.from_row(update_review(
+            db, student_id, progress_log.subject, progress_log.topic, progress_log.proficiency_score
+        ))
     db.commit()
+    if review is not None:
+        reviews.review_queue.update(student_id, review)
     db.refresh(db_progress)
     return db_progress
 
-def get_student_progress(db: Session, student_id: int):
-    return db.query(models.ProgressLog).filter(
+def get_student_progress(db: Session, student_id: int, include_archived: bool = True):
+    """Full progress history, reading archived logs back in (oldest first)"""
+    live = db.query(models.ProgressLog).filter(
         models.ProgressLog.student_id == student_id
-    ).all()
+    ).order_by(models.ProgressLog.id).all()
+    if not include_archived:
+        return live
+    return retention.archived_progress_logs(db, student_id) + live
 
-# Analytics
-def get_student_analytics(db: Session, student_id: int):
-    progress_logs = get_student_progress(db, student_id)
+# Chat history
+def get_chat_messages(db: Session, session_id: int):
+    """All messages of a chat session, reading archived ones back in (oldest first)"""
+    live = db.query(models.ChatMessage).filter(
+        models.ChatMessage.session_id == session_id
+    ).order_by(models.ChatMessage.id).all()
+    return retention.archived_chat_messages(db, session_id) + live
+
+# Practice question bank
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())[:255]
+
+def practice_question_hash(topic: str, difficulty: str, grade_level: int, question: str) -> str:
+    slot = f"{normalize_topic(topic)}|{difficulty}|{grade_level}|{question_fingerprint(question)}"
+    return hashlib.sha1(slot.encode()).hexdigest()
+
+def _bank_filter(query, topic: str, difficulty: str, grade_level: int):
+    return query.filter(
+        models.PracticeQuestion.topic_key == normalize_topic(topic),
+        models.PracticeQuestion.difficulty == difficulty,
+        models.PracticeQuestion.grade_level == grade_level
+    )
+
+def count_practice_questions(db: Session, topic: str, difficulty: str, grade_level: int) -> int:
+    return _bank_filter(db.query(func.count(models.PracticeQuestion.id)), topic, difficulty, grade_level).scalar()
+
+def get_practice_question_texts(db: Session, topic: str, difficulty: str, grade_level: int, limit: int = 50):
+    rows = _bank_filter(db.query(models.PracticeQuestion.question), topic, difficulty, grade_level).order_by(
+        models.PracticeQuestion.id.desc()
+    ).limit(limit).all()
+    return [row.question for row in rows]
+
+def serve_practice_questions(db: Session, topic: str, difficulty: str, grade_level: int, limit: int):
+    """Least-served questions for the slot; bumps their serve count so
+    consecutive quizzes rotate through the bank"""
+    questions = _bank_filter(db.query(models.PracticeQuestion), topic, difficulty, grade_level).order_by(
+        models.PracticeQuestion.times_served, models.PracticeQuestion.id
+    ).limit(limit).all()
+    for question in questions:
+        question.times_served += 1
+    db.commit()
+    return questions
+
+def add_practice_questions(db: Session, topic: str, difficulty: str, grade_level: int, questions: List[dict],
+                           served: bool = False):
+    """Insert generated questions, skipping ones already in the bank; returns the new rows.
+    ``served`` marks them as handed out once already (generated for a live request)"""
+    rows = {}
+    for question in questions:
+        content_hash = practice_question_hash(topic, difficulty, grade_level, question['question'])
+        rows.setdefault(content_hash, models.PracticeQuestion(
+            topic=topic[:255],
+            topic_key=normalize_topic(topic),
+            difficulty=difficulty,
+            grade_level=grade_level,
+            question=question['question'],
+            options=question['options'],
+            correct_answer=question['correct_answer'],
+            explanation=question.get('explanation'),
+            hint=question.get('hint'),
+            content_hash=content_hash,
+            times_served=1 if served else 0
+        ))
+    if not rows:
+        return []
     
-    if not progress_logs:
+    existing = {
+        content_hash for (content_hash,) in db.query(models.PracticeQuestion.content_hash).filter(
+            models.PracticeQuestion.content_hash.in_(list(rows))
+        )
+    }
+    new_rows = [row for content_hash, row in rows.items() if content_hash not in existing]
+    db.add_all(new_rows)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent writer (e.g. the pre-warmer) stored some of them first
+        db.rollback()
+        added = []
+        for row in new_rows:
+            db.add(row)
+            try:
+                db.commit()
+                added.append(row)
+            except IntegrityError:
+                db.rollback()
+        new_rows = added
+    return new_rows
+
+def _lock_or_create(db: Session, model, defaults: dict, **key):
+    """The ``model`` row matching ``key``, locked until the caller commits;
+    inserted with ``defaults`` when missing. FOR UPDATE locks nothing while
+    the row does not exist, so a concurrent first insert of the same key
+    fails on the unique constraint instead: its savepoint is rolled back and
+    the winner's row is read (and locked) instead"""
+    query = db.query(model).filter_by(**key).with_for_update()
+    row = query.first()
+    if row is not None:
+        return row
+    try:
+        with db.begin_nested():
+            row = model(**key, **defaults)
+            db.add(row)
+    except IntegrityError:
+        row = query.first()
+        if row is None:  # Not a duplicate key after all
+            raise
+    return row
+
+# Mastery
+def _mastery_key(subject: str, topic: str):
+    return normalize_topic(subject)[:100], normalize_topic(topic)
+
+def update_mastery(db: Session, student_id: int, subject: str, topic: str, score: float):
+    """Fold one scored progress log into the student's topic rating (caller commits)"""
+    subject_key, topic_key = _mastery_key(subject, topic)
+    state = _lock_or_create(
+        db, models.MasteryState, {'topic': topic[:255], 'rating': mastery.INITIAL_RATING, 'attempts': 0},
+        student_id=student_id, subject=subject_key, topic_key=topic_key
+    )
+    state.topic = topic[:255]
+    state.rating, state.attempts = mastery.update_rating(state.rating, state.attempts, score)
+    return state
+
+def get_mastery_states(db: Session, student_id: int):
+    return db.query(models.MasteryState).filter(
+        models.MasteryState.student_id == student_id
+    ).order_by(models.MasteryState.subject, models.MasteryState.topic_key).all()
+
+def get_topic_rating(db: Session, student_id: int, topic: str) -> Optional[float]:
+    """Rating for ``topic`` in whichever subject it has been practised most"""
+    state = db.query(models.MasteryState.rating).filter(
+        models.MasteryState.student_id == student_id,
+        models.MasteryState.topic_key == normalize_topic(topic)
+    ).order_by(models.MasteryState.attempts.desc()).first()
+    return state.rating if state else None
+
+def get_next_topic(db: Session, student_id: int):
+    """Next topic to study from the latest active curriculum's incomplete
+    weeks, skipping mastered ones; None without a curriculum"""
+    curriculum = db.query(models.Curriculum.id).filter(
+        models.Curriculum.student_id == student_id,
+        models.Curriculum.is_active == True
+    ).order_by(models.Curriculum.id.desc()).first()
+    if curriculum is None:
         return None
+    plans = db.query(models.WeeklyPlan.week_number, models.WeeklyPlan.daily_breakdown).filter(
+        models.WeeklyPlan.curriculum_id == curriculum.id,
+        models.WeeklyPlan.completed == False
+    ).order_by(models.WeeklyPlan.week_number).all()
     
-    total_study_time = sum(log.time_spent_minutes for log in progress_logs)
-    completed_topics = sum(1 for log in progress_logs if log.completed)
-    total_topics = len(progress_logs)
+    candidates, weeks, display = [], {}, {}
+    for week_number, daily_breakdown in plans:
+        for entry in (daily_breakdown or {}).values():
+            if not isinstance(entry, dict) or not entry.get('topic'):
+                continue
+            key = _mastery_key(str(entry.get('subject', '')), str(entry['topic']))
+            if key not in weeks:
+                candidates.append(key)
+                weeks[key] = week_number
+                display[key] = (entry.get('subject', ''), entry['topic'])
+    ratings = {
+        (state.subject, state.topic_key): state.rating
+        for state in db.query(models.MasteryState.subject, models.MasteryState.topic_key, models.MasteryState.rating).filter(
+            models.MasteryState.student_id == student_id
+        )
+    }
+    choice = mastery.choose_next_topic(candidates, ratings)
+    if choice is None:
+        return None
+    key = choice[:2]
+    return {
+        'subject': display[key][0],
+        'topic': display[key][1],
+        'week_number': weeks[key],
+        'mastery': mastery.mastery_probability(choice[2]),
+        'difficulty': mastery.recommend_difficulty(choice[2])
+    }
+
+def recompute_mastery(db: Session, vectorized: Optional[bool] = None) -> int:
+    """Rebuild every mastery state from the full progress history; returns the state count"""
+    rows = db.query(
+        models.ProgressLog.student_id,
+        models.ProgressLog.subject,
+        models.ProgressLog.topic,
+        models.ProgressLog.proficiency_score
+    ).filter(models.ProgressLog.proficiency_score != None).order_by(models.ProgressLog.id).yield_per(10000)
+    # Archived logs all predate the live ones
+    archived = (
+        (row["student_id"], row["subject"], row["topic"], row["proficiency_score"])
+        for row in retention.archived_rows(db, retention.PROGRESS_LOGS)
+        if row["proficiency_score"] is not None
+    )
     
-    # Calculate average proficiency for completed topics
-    completed_scores = [log.proficiency_score for log in progress_logs 
-                       if log.completed and log.proficiency_score is not None]
-    average_proficiency = sum(completed_scores) / len(completed_scores) if completed_scores else 0
+    display = {}
+    def keyed_logs():
+        for student_id, subject, topic, score in itertools.chain(archived, rows):
+            key = (student_id, *_mastery_key(subject, topic))
+            display[key] = topic[:255]
+            yield (*key, score)
     
-    # Subject breakdown
-    subject_breakdown = {}
-    for log in progress_logs:
-        if log.subject not in subject_breakdown:
-            subject_breakdown[log.subject] = {
-                'total_time': 0,
-                'completed': 0,
-                'total': 0,
-                'average_score': 0
+    keys, groups, scores = mastery.group_logs(keyed_logs())
+    ratings, attempts = mastery.replay(groups, scores, len(keys), vectorized)
+    
+    db.query(models.MasteryState).delete()
+    for start in range(0, len(keys), 5000):
+        db.execute(insert(models.MasteryState), [
+            {
+                'student_id': key[0],
+                'subject': key[1],
+                'topic_key': key[2],
+                'topic': display[key],
+                'rating': ratings[index],
+                'attempts': attempts[index]
+            }
+            for index, key in enumerate(keys[start:start + 5000], start)
+        ])
+    db.commit()
+    return len(keys)
+
+# Spaced-repetition reviews
+def update_review(db: Session, student_id: int, subject: str, topic: str, score: float,
+                  reviewed_at: Optional[datetime] = None):
+    """Reschedule the topic's next review after one scored log (caller commits)"""
+    reviewed_at = reviewed_at or datetime.utcnow()
+    subject_key, topic_key = _mastery_key(subject, topic)
+    item = _lock_or_create(
+        db, models.ReviewItem,
+        {'topic': topic[:255], 'ease': reviews.INITIAL_EASE, 'interval_days': 0.0, 'repetitions': 0,
+         'last_reviewed_at': reviewed_at, 'due_at': reviewed_at},
+        student_id=student_id, subject=subject_key, topic_key=topic_key
+    )
+    item.topic = topic[:255]
+    item.ease, item.interval_days, item.repetitions = reviews.schedule(
+        item.ease, item.interval_days, item.repetitions, reviews.quality(score)
+    )
+    item.last_score = score
+    item.last_reviewed_at = reviewed_at
+    item.due_at = reviews.due_at(reviewed_at, item.interval_days)
+    return item
+
+def get_due_reviews(db: Session, student_id: int, limit: int = 20, now: Optional[datetime] = None):
+    """Topics due for review, most overdue first (from the cached due-queue)"""
+    return reviews.review_queue.due(db, student_id, now, limit)
+
+def recompute_reviews(db: Session, vectorized: Optional[bool] = None) -> int:
+    """Rebuild every review item from the full progress history; returns the item count"""
+    rows = db.query(
+        models.ProgressLog.student_id,
+        models.ProgressLog.subject,
+        models.ProgressLog.topic,
+        models.ProgressLog.proficiency_score,
+        models.ProgressLog.created_at
+    ).filter(models.ProgressLog.proficiency_score != None).order_by(models.ProgressLog.id).yield_per(10000)
+    # Archived logs all predate the live ones
+    archived = (
+        (row["student_id"], row["subject"], row["topic"], row["proficiency_score"], row["created_at"])
+        for row in retention.archived_rows(db, retention.PROGRESS_LOGS)
+        if row["proficiency_score"] is not None
+    )
+    
+    index, groups, qualities, last = {}, [], [], []
+    for student_id, subject, topic, score, created_at in itertools.chain(archived, rows):
+        key = (student_id, *_mastery_key(subject, topic))
+        group = index.setdefault(key, len(index))
+        if group == len(last):
+            last.append(None)
+        last[group] = (topic[:255], score, created_at)
+        groups.append(group)
+        qualities.append(reviews.quality(score))
+    eases, intervals, repetitions = reviews.replay(groups, qualities, len(index), vectorized)
+    
+    keys = list(index)
+    db.query(models.ReviewItem).delete()
+    for start in range(0, len(keys), 5000):
+        db.execute(insert(models.ReviewItem), [
+            {
+                'student_id': key[0],
+                'subject': key[1],
+                'topic_key': key[2],
+                'topic': last[group][0],
+                'ease': eases[group],
+                'interval_days': intervals[group],
+                'repetitions': repetitions[group],
+                'last_score': last[group][1],
+                'last_reviewed_at': last[group][2],
+                'due_at': reviews.due_at(last[group][2], intervals[group])
             }
-        subject_breakdown[log.subject]['total_time'] += log.time_spent_minutes
-        subject_breakdown[log.subject]['total'] += 1
+            for group, key in enumerate(keys[start:start + 5000], start)
+        ])
+    db.commit()
+    reviews.review_queue.clear()
+    return len(keys)
+
+# Analytics
+def get_student_analytics(db: Session, student_id: int):
+    """Totals over the live progress logs plus the summaries of archived ones"""
+    progress_logs = get_student_progress(db, student_id, include_archived=False)
+    summaries = db.query(models.ProgressSummary).filter(
+        models.ProgressSummary.student_id == student_id
+    ).all()
+    
+    if not progress_logs and not summaries:
+        return None
+    
+    # Fold live logs into the same aggregates the archive keeps per subject
+    totals = {
+        summary.subject: {
+            'total_time': summary.total_minutes,
+            'completed': summary.completed_count,
+            'total': summary.log_count,
+            'score_sum': summary.score_sum,
+            'score_count': summary.score_count,
+            'completed_score_sum': summary.completed_score_sum,
+            'completed_score_count': summary.completed_score_count,
+        }
+        for summary in summaries
+    }
+    for log in progress_logs:
+        subject = totals.setdefault(log.subject, {
+            'total_time': 0, 'completed': 0, 'total': 0, 'score_sum': 0.0, 'score_count': 0,
+            'completed_score_sum': 0.0, 'completed_score_count': 0
+        })
+        subject['total_time'] += log.time_spent_minutes or 0
+        subject['total'] += 1
         if log.completed:
-            subject_breakdown[log.subject]['completed'] += 1
+            subject['completed'] += 1
+        if log.proficiency_score is not None:
+            subject['score_sum'] += log.proficiency_score
+            subject['score_count'] += 1
+            if log.completed:
+                subject['completed_score_sum'] += log.proficiency_score
+                subject['completed_score_count'] += 1
     
-    # Calculate average scores per subject
-    for subject in subject_breakdown:
-        subject_scores = [log.proficiency_score for log in progress_logs 
-                         if log.subject == subject and log.proficiency_score is not None]
-        subject_breakdown[subject]['average_score'] = (
-            sum(subject_scores) / len(subject_scores) if subject_scores else 0
-        )
+    # Average proficiency over completed topics
+    completed_score_count = sum(t['completed_score_count'] for t in totals.values())
+    average_proficiency = (
+        sum(t['completed_score_sum'] for t in totals.values()) / completed_score_count
+        if completed_score_count else 0
+    )
+    
+    subject_breakdown = {
+        subject: {
+            'total_time': t['total_time'],
+            'completed': t['completed'],
+            'total': t['total'],
+            'average_score': t['score_sum'] / t['score_count'] if t['score_count'] else 0
+        }
+        for subject, t in totals.items()
+    }
     
     return {
-        'total_study_time': total_study_time,
+        'total_study_time': sum(t['total_time'] for t in totals.values()),
         'average_proficiency': average_proficiency,
-        'completed_topics': completed_topics,
-        'total_topics': total_topics,
+        'completed_topics': sum(t['completed'] for t in totals.values()),
+        'total_topics': sum(t['total'] for t in totals.values()),
         'subject_breakdown': subject_breakdown
-    }
\ No newline at end of file
+    }
+
+# LLM usage (rollups written by app/llm_usage.py)
+LLM_USAGE_GROUPS = {
+    'day': models.LLMUsageDaily.day,
+    'student': models.LLMUsageDaily.student_id,
+    'method': models.LLMUsageDaily.method,
+    'model': models.LLMUsageDaily.model,
+}
+
+def get_llm_usage(db: Session, start: date, end: date, group_by: Sequence[str] = ('day',),
+                  student_id: Optional[int] = None, limit: int = 1000):
+    """LLM usage totals between ``start`` and ``end`` (inclusive), one row per
+    combination of the ``group_by`` keys (see ``LLM_USAGE_GROUPS``)"""
+    keys = [LLM_USAGE_GROUPS[name] for name in group_by]
+    rollup = models.LLMUsageDaily
+    query = db.query(
+        *keys,
+        func.sum(rollup.calls), func.sum(rollup.cache_hits), func.sum(rollup.errors),
+        func.sum(rollup.prompt_tokens), func.sum(rollup.completion_tokens),
+        func.sum(rollup.latency_ms_sum), func.max(rollup.latency_ms_max),
+    ).filter(rollup.day >= start, rollup.day <= end)
+    if student_id is not None:
+        query = query.filter(rollup.student_id == student_id)
+    rows = query.group_by(*keys).order_by(*keys).limit(limit).all()
+    
+    result = []
+    for row in rows:
+        calls, cache_hits, errors, prompt_tokens, completion_tokens, latency_sum, latency_max = row[len(keys):]
+        entry = {('student_id' if name == 'student' else name): value for name, value in zip(group_by, row)}
+        entry.update(
+            calls=calls, cache_hits=cache_hits, errors=errors,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+            avg_latency_ms=latency_sum / calls if calls else 0.0, max_latency_ms=latency_max
+        )
+        result.append(entry)
+    return result
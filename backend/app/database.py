@@ -1,15 +1,62 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .metrics import metrics
+
+def pool_options(url: str) -> dict:
+    # In-memory SQLite uses a per-thread pool that takes no sizing options
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+    }
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **pool_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Pool utilization: connections currently checked out and how long each is held
+_checked_out = {"count": 0}
+_checked_out_lock = threading.Lock()
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.perf_counter()
+    with _checked_out_lock:
+        _checked_out["count"] += 1
+        metrics.set_gauge("db_pool_checked_out", _checked_out["count"])
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    started = connection_record.info.pop("checked_out_at", None)
+    if started is None:
+        return
+    with _checked_out_lock:
+        _checked_out["count"] -= 1
+        metrics.set_gauge("db_pool_checked_out", _checked_out["count"])
+    metrics.observe("db_connection_hold_ms", (time.perf_counter() - started) * 1000)
+
+def create_tables():
+    """Apply the alembic migrations (see app/schema.py) to the primary and
+    every shard; run at app startup, not import"""
+    from .schema import migrate
+    from .sharding import shards
+    migrate(engine)
+    for shard_engine in shards.engines():
+        if shard_engine is not engine:
+            migrate(shard_engine)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,8 +1,11 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from .database import get_db
+from .config import settings
 from . import models
-from .auth import get_current_user
+from .auth import get_current_user, get_student_db
+from .rate_limit import ai_concurrency, ip_rate_limiter, student_rate_limiter
+from .replicas import replicas
+from .sharding import shards
 
 async def get_current_active_user(
     current_user: models.Student = Depends(get_current_user)
@@ -11,9 +14,16 @@ async def get_current_active_user(
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_admin_user(
+    current_user: models.Student = Depends(get_current_active_user)
+):
+    if current_user.email.lower() not in settings.admin_emails_list:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 async def verify_curriculum_access(
     curriculum_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_active_user)
 ):
     curriculum = db.query(models.Curriculum).filter(
@@ -25,4 +35,44 @@ async def verify_curriculum_access(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Curriculum not found"
         )
-    return curriculum
\ No newline at end of file
+    return curriculum
+
+def get_read_db(
+    db: Session = Depends(get_student_db),
+    current_user: models.Student = Depends(get_current_user)
+):
+    """Session for read-only routes: a replica within the lag bound, or the
+    request's primary session if none is usable or the student just wrote.
+    Sharded deployments read from the student's shard"""
+    replica_db = None if shards else replicas.session_for(current_user.id)
+    if replica_db is None:
+        yield db
+        return
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def student_ai_rate_limit(cost: int = 1):
+    """Per-student token bucket for authenticated AI endpoints"""
+    async def dependency(current_user: models.Student = Depends(get_current_user)):
+        await student_rate_limiter.check(str(current_user.id), cost=cost)
+    return dependency
+
+def ip_ai_rate_limit(cost: int = 1):
+    """Per-client-IP token bucket for unauthenticated AI endpoints"""
+    async def dependency(request: Request):
+        await ip_rate_limiter.check(client_ip(request), cost=cost)
+    return dependency
+
+async def ai_admission():
+    """Hold one of the worker's AI call slots for the duration of the request"""
+    async with ai_concurrency.slot():
+        yield
@@ -0,0 +1,140 @@
+"""Deterministic local stand-in for the OpenAI ChatCompletion API.
+
+Enabled with ``LLM_BACKEND=fake``. It recognises the prompts AITutor sends
+(curriculum, outline, single week, missing weeks, practice question(s), chat)
+and answers with well-formed content after ``FAKE_LLM_LATENCY_MS`` (10x that
+for a ``FAKE_LLM_SLOW_RATE`` tail), failing a ``FAKE_LLM_FAILURE_RATE``
+fraction of calls with a retryable error. Used by the benchmarks and for
+exercising the resilience layer without network access.
+"""
+import asyncio
+import json
+import random
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from .config import settings
+
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+
+
+class ServiceUnavailableError(Exception):
+    """Mirrors openai's retryable 503 error"""
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _subjects(prompt: str) -> List[str]:
+    match = re.search(r"weak subjects: ([^;\n]*)", prompt, re.IGNORECASE)
+    subjects = [s.strip() for s in match.group(1).split(",") if s.strip()] if match else []
+    return subjects or ["Mathematics", "Science"]
+
+
+def _week(number: int, subjects: List[str]) -> Dict[str, Any]:
+    return {
+        "week_number": number,
+        "focus_areas": subjects,
+        "learning_objectives": [f"Build week {number} skills in {subject}" for subject in subjects],
+        "daily_breakdown": {
+            day: {
+                "subject": subjects[index % len(subjects)],
+                "topic": f"{subjects[index % len(subjects)]} topic {number}.{index + 1}",
+                "activities": ["Warm-up", "Guided practice", "Exit quiz"],
+            }
+            for index, day in enumerate(DAYS)
+        },
+        "resources_needed": ["Textbook", "Practice worksheets"],
+    }
+
+
+def _question(topic: str, variant) -> Dict[str, Any]:
+    suffix = f" (variant {variant})" if variant is not None else ""
+    return {
+        "question": f"Which statement about {topic} is correct?{suffix}",
+        "options": {"A": "The right one", "B": "A distractor", "C": "Another distractor", "D": "None of these"},
+        "correct_answer": "A",
+        "explanation": f"Option A describes {topic} accurately.",
+        "hint": f"Recall the definition of {topic}.",
+    }
+
+
+def _respond(prompt: str) -> str:
+    subjects = _subjects(prompt)
+    if "Respond with ONLY the weekly_plans entries for weeks" in prompt:
+        numbers = [int(n) for n in re.search(r"for weeks ([\d, ]+)", prompt).group(1).replace(" ", "").split(",") if n]
+        return json.dumps({"weekly_plans": [_week(number, subjects) for number in numbers]})
+    match = re.search(r"detailed plan for week (\d+)", prompt)
+    if match:
+        return json.dumps(_week(int(match.group(1)), subjects))
+    if '"weeks"' in prompt:
+        return json.dumps({
+            "title": "Personalized Learning Curriculum",
+            "description": f"Eight weeks focused on {', '.join(subjects)}",
+            "weeks": [
+                {"week_number": n, "theme": f"Theme {n}", "focus_areas": subjects} for n in range(1, 9)
+            ],
+        })
+    if '"weekly_plans"' in prompt:
+        return json.dumps({
+            "title": "Personalized Learning Curriculum",
+            "description": f"Eight weeks focused on {', '.join(subjects)}",
+            "weekly_plans": [_week(n, subjects) for n in range(1, 9)],
+        }, indent=2)
+    topic = re.search(r"about (.+?) for", prompt)
+    topic = topic.group(1) if topic else "the topic"
+    if '"questions"' in prompt:
+        # Draw from a small pool of variants so batches overlap like real output does
+        count = int(re.search(r"Create (\d+)", prompt).group(1))
+        variants = random.sample(range(count * 3), count)
+        return json.dumps({"questions": [_question(topic, variant) for variant in variants]})
+    if '"question"' in prompt:
+        return json.dumps(_question(topic, None))
+    question = re.search(r"Question: (.*)", prompt)
+    question = question.group(1).strip() if question else "your question"
+    return (
+        f"Great question! Let's think about \"{question}\" step by step. "
+        "First, identify what you already know. Next, break the problem into smaller parts. "
+        "What do you think the first step should be?"
+    )
+
+
+class FakeChatCompletion:
+    async def acreate(self, model: str, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        latency = settings.FAKE_LLM_LATENCY_MS / 1000
+        if random.random() < settings.FAKE_LLM_SLOW_RATE:
+            latency *= 10
+        if random.random() < settings.FAKE_LLM_FAILURE_RATE:
+            await asyncio.sleep(latency / 2)
+            raise ServiceUnavailableError("Fake upstream is unavailable")
+
+        prompt = "\n".join(m["content"] for m in messages)
+        content = _respond(prompt)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(_estimate_tokens(m["content"]) for m in messages),
+            completion_tokens=_estimate_tokens(content),
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+
+        if not stream:
+            await asyncio.sleep(latency)
+            return SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content))],
+                usage=usage,
+            )
+
+        pieces = [content[i:i + 64] for i in range(0, len(content), 64)]
+
+        async def chunks():
+            for piece in pieces:
+                await asyncio.sleep(latency / len(pieces))
+                yield SimpleNamespace(choices=[SimpleNamespace(delta={"content": piece})])
+
+        return chunks()
+
+
+# Module-like object exposing the same surface AITutor uses on ``openai``
+fake_openai = SimpleNamespace(ChatCompletion=FakeChatCompletion())
@@ -0,0 +1,217 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .config import settings
+from .metrics import metrics
+
+T = TypeVar("T")
+
+# Matched by class name so the same rules cover the openai 0.x and 1.x
+# exception hierarchies as well as the fake backend. Not the base classes
+# (openai 1.x APIError / APIStatusError): bad requests and auth errors
+# derive from them too
+RETRYABLE_ERROR_NAMES = {
+    "Timeout",
+    "TimeoutError",
+    "APITimeoutError",
+    "APIConnectionError",
+    "RateLimitError",
+    "ServiceUnavailableError",
+    "InternalServerError",
+    "TryAgain",
+}
+
+
+class LLMUnavailableError(Exception):
+    """Upstream LLM failed every attempt, ran out of time, or the circuit is open"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    # HTTP errors (openai 1.x status_code, 0.x http_status): throttling and server faults only
+    status = getattr(error, "status_code", None) or getattr(error, "http_status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    """Classic closed -> open -> half-open breaker.
+
+    After ``failure_threshold`` consecutive upstream failures the circuit
+    opens and calls fail immediately for ``reset_timeout`` seconds; then one
+    trial call is let through and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, name: str = "llm"):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+        return True
+
+    def release_trial(self) -> None:
+        """Give up the half-open trial without an outcome (the call was
+        cancelled or rejected as a caller error)"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial_in_flight = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        metrics.set_gauge("llm_circuit_open", 1 if state == self.OPEN else 0, breaker=self.name)
+        metrics.increment("llm_circuit_transitions_total", breaker=self.name, state=state)
+
+
+class ResilientCaller:
+    """Deadlines, jittered exponential retries, optional hedging and a
+    circuit breaker around upstream LLM calls"""
+
+    def __init__(
+        self,
+        breaker: Optional[CircuitBreaker] = None,
+        deadline: float = 60.0,
+        attempt_timeout: float = 25.0,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 4.0,
+    ):
+        self.breaker = breaker or CircuitBreaker()
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def call(
+        self,
+        method: str,
+        fn: Callable[[], Awaitable[T]],
+        *,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+    ) -> T:
+        """Run ``fn`` under the resilience policy; raises LLMUnavailableError
+        when upstream is degraded and re-raises non-retryable errors as-is"""
+        if not self.breaker.allow():
+            metrics.increment("llm_calls_total", method=method, outcome="circuit_open")
+            raise LLMUnavailableError("LLM circuit breaker is open")
+
+        trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            return await self._call(method, fn, deadline, hedge_after)
+        finally:
+            if trial:
+                # Cancelled trials (client gone, hedge loser, caller deadline)
+                # and caller errors record no outcome; free the slot for the next call
+                self.breaker.release_trial()
+
+    async def _call(self, method: str, fn: Callable[[], Awaitable[T]], deadline: Optional[float],
+                    hedge_after: Optional[float]) -> T:
+        started = time.monotonic()
+        expires = started + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                self._fail(method, "deadline")
+                raise LLMUnavailableError(f"LLM call exceeded its {deadline or self.deadline:.0f}s deadline")
+            try:
+                result = await asyncio.wait_for(
+                    self._attempt(method, fn, hedge_after),
+                    timeout=min(self.attempt_timeout, remaining)
+                )
+            except Exception as e:
+                if not is_retryable(e):
+                    # Caller error (bad request, auth) says nothing about upstream
+                    # health: record no outcome, a half-open trial is just released
+                    metrics.increment("llm_calls_total", method=method, outcome="error")
+                    raise
+                if attempt >= self.max_retries:
+                    self._fail(method, "exhausted")
+                    raise LLMUnavailableError(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                attempt += 1
+                metrics.increment("llm_retries_total", method=method, error=type(e).__name__)
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                await asyncio.sleep(min(delay, max(0.0, expires - time.monotonic())))
+                continue
+
+            self.breaker.record_success()
+            metrics.increment("llm_calls_total", method=method, outcome="success")
+            metrics.observe("llm_latency_ms", (time.monotonic() - started) * 1000, method=method)
+            return result
+
+    async def _attempt(self, method: str, fn: Callable[[], Awaitable[T]], hedge_after: Optional[float]) -> T:
+        if not hedge_after:
+            return await fn()
+
+        primary = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        # Primary is in the slow tail: race a duplicate request against it
+        metrics.increment("llm_hedges_total", method=method)
+        hedge = asyncio.ensure_future(fn())
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            metrics.increment("llm_hedge_wins_total", method=method)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _fail(self, method: str, outcome: str) -> None:
+        self.breaker.record_failure()
+        metrics.increment("llm_calls_total", method=method, outcome=outcome)
+
+
+def build_resilient_caller() -> ResilientCaller:
+    return ResilientCaller(
+        breaker=CircuitBreaker(
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.LLM_CIRCUIT_RESET_SECONDS,
+        ),
+        deadline=settings.LLM_DEADLINE_SECONDS,
+        attempt_timeout=settings.LLM_ATTEMPT_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        base_delay=settings.LLM_RETRY_BASE_DELAY,
+        max_delay=settings.LLM_RETRY_MAX_DELAY,
+    )
@@ -0,0 +1,187 @@
+"""Ledger of LLM usage per AITutor method and student.
+
+Every upstream call ``AITutor`` makes, and every answer it serves from the
+semantic cache or from an identical call already in flight, is recorded:
+method, model, prompt and completion tokens, latency, cache hit and the
+error class when the call failed (fallbacks show up as errors). Routers run
+AI calls inside ``usage_ledger.student(id)``. That sets a contextvar, so the
+student is known even inside the single-flight leader's task.
+
+``record`` never blocks the caller. It appends to an in-memory buffer that
+one flusher task per worker (app/batching.py) writes in batches: as soon as
+``max_batch`` records are pending, or ``max_delay`` seconds after the oldest
+one. Each batch inserts the raw ``llm_usage`` rows and adds the same numbers
+to the ``llm_usage_daily`` rollups in one transaction, so the rollups always
+match the ledger. The admin report (``GET /analytics/llm-usage``) only reads
+rollups. Records are accounting, not user data: past ``max_pending`` new
+ones are dropped, and a batch that still fails at shutdown is discarded.
+Both cases are counted in ``llm_usage_dropped_total``.
+
+Raw rows older than ``LLM_USAGE_RETENTION_DAYS`` are deleted by the
+retention job (``prune``); the rollups are kept.
+"""
+import contextvars
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .batching import BatchFlusher
+from .config import settings
+from .database import SessionLocal
+from .metrics import metrics
+
+NO_STUDENT = 0  # llm_usage_daily.student_id of calls made outside a student's request
+
+# Student on whose behalf AI calls in the current context are made
+_student: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("llm_usage_student", default=None)
+
+# llm_usage column values plus the monotonic enqueue time
+PendingRecord = Tuple[Dict[str, object], float]
+
+
+def _rollup_key(row: Dict[str, object]) -> Tuple:
+    return row["created_at"].date(), row["student_id"] or NO_STUDENT, row["method"], row["model"]
+
+
+def rollups(rows: List[Dict[str, object]]) -> Dict[Tuple, Dict[str, float]]:
+    """llm_usage_daily increments for ``rows``, keyed on (day, student, method, model)"""
+    totals: Dict[Tuple, Dict[str, float]] = defaultdict(lambda: {
+        "calls": 0, "cache_hits": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        "latency_ms_sum": 0.0, "latency_ms_max": 0.0,
+    })
+    for row in rows:
+        total = totals[_rollup_key(row)]
+        total["calls"] += 1
+        total["cache_hits"] += bool(row["cache_hit"])
+        total["errors"] += row["error_class"] is not None
+        total["prompt_tokens"] += row["prompt_tokens"]
+        total["completion_tokens"] += row["completion_tokens"]
+        total["latency_ms_sum"] += row["latency_ms"]
+        total["latency_ms_max"] = max(total["latency_ms_max"], row["latency_ms"])
+    return totals
+
+
+def write_batch(db: Session, rows: List[Dict[str, object]]) -> None:
+    """Insert ledger rows and fold them into the daily rollups (one transaction)"""
+    totals = rollups(rows)
+    db.execute(insert(models.LLMUsage), rows)
+    existing = {
+        (r.day, r.student_id, r.method, r.model): r
+        for r in db.query(models.LLMUsageDaily).filter(
+            models.LLMUsageDaily.day.in_({key[0] for key in totals}),
+            models.LLMUsageDaily.student_id.in_({key[1] for key in totals}),
+        )
+    }
+    for key, total in totals.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            day, student_id, method, model = key
+            db.add(models.LLMUsageDaily(day=day, student_id=student_id, method=method, model=model, **total))
+            continue
+        for column in ("calls", "cache_hits", "errors", "prompt_tokens", "completion_tokens", "latency_ms_sum"):
+            setattr(rollup, column, getattr(rollup, column) + total[column])
+        rollup.latency_ms_max = max(rollup.latency_ms_max, total["latency_ms_max"])
+    db.commit()
+
+
+def prune(db: Session, cutoff: datetime, batch_rows: int = 5000) -> int:
+    """Delete raw ledger rows created before ``cutoff``; returns rows deleted"""
+    deleted = 0
+    while True:
+        ids = [row_id for (row_id,) in db.query(models.LLMUsage.id).filter(
+            models.LLMUsage.created_at < cutoff
+        ).limit(batch_rows)]
+        if not ids:
+            return deleted
+        db.query(models.LLMUsage).filter(models.LLMUsage.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        deleted += len(ids)
+
+
+class UsageLedger(BatchFlusher):
+    metric_prefix = "llm_usage"
+    label = "LLM usage"
+
+    def __init__(self, max_batch: int = 200, max_delay: float = 2.0, max_pending: int = 20000,
+                 enabled: bool = True, max_retry_delay: float = 30.0):
+        super().__init__(max_batch, max_delay, max_retry_delay)
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self.pending: List[PendingRecord] = []
+
+    @contextmanager
+    def student(self, student_id: Optional[int]) -> Iterator[None]:
+        """Attribute AI calls made inside the block to ``student_id``"""
+        token = _student.set(student_id)
+        try:
+            yield
+        finally:
+            _student.reset(token)
+
+    def record(self, method: str, model: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               latency_ms: float = 0.0, cache_hit: bool = False, error: Optional[BaseException] = None) -> None:
+        """Queue one ledger row; call from the event loop"""
+        if not self.enabled:
+            return
+        metrics.increment("llm_usage_records_total", method=method, outcome=(
+            "cache_hit" if cache_hit else "error" if error is not None else "call"))
+        if len(self.pending) >= self.max_pending:
+            metrics.increment("llm_usage_dropped_total")
+            return
+        self._enqueue([({
+            "created_at": datetime.utcnow(),
+            "student_id": _student.get(),
+            "method": method,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": round(latency_ms, 3),
+            "cache_hit": cache_hit,
+            "error_class": type(error).__name__ if error is not None else None,
+        }, time.monotonic())])
+
+    async def flush(self) -> int:
+        """Write one batch now; returns the number of records written"""
+        batch = self.pending[:self.max_batch]
+        if not batch:
+            return 0
+        await run_in_threadpool(self._write, [row for row, _ in batch])
+        del self.pending[:len(batch)]
+        metrics.observe("llm_usage_lag_ms", (time.monotonic() - batch[0][1]) * 1000)
+        return len(batch)
+
+    def _write(self, rows: List[Dict[str, object]]) -> None:
+        started = time.perf_counter()
+        db = SessionLocal()
+        try:
+            try:
+                write_batch(db, rows)
+            except IntegrityError:
+                # Another worker created one of the rollup rows first; it exists now
+                db.rollback()
+                write_batch(db, rows)
+        finally:
+            db.close()
+        metrics.increment("llm_usage_written_total", len(rows))
+        metrics.observe("llm_usage_flush_ms", (time.perf_counter() - started) * 1000)
+
+    def _abandon(self) -> None:
+        metrics.increment("llm_usage_dropped_total", len(self.pending))
+        self.pending = []
+
+
+# Global ledger, drained by the app's shutdown event
+usage_ledger = UsageLedger(
+    max_batch=settings.LLM_USAGE_BATCH_SIZE,
+    max_delay=settings.LLM_USAGE_MAX_DELAY_SECONDS,
+    max_pending=settings.LLM_USAGE_MAX_PENDING,
+    enabled=settings.LLM_USAGE_ENABLED,
+)
@@ -1,19 +1,42 @@
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from .database import engine, get_db
-from . import models
+from .database import create_tables, get_db
+from .llm_usage import usage_ledger
 from .routers import students, curriculum, analytics, chat, auth
 from .config import settings
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+from .middleware import CompressionMiddleware
+from .metrics import metrics
+from .prewarm import prewarmer
+from .replicas import ReadYourWritesMiddleware
+from .retention import retention_job
+from .write_behind import chat_writer
 
 app = FastAPI(
     title="Personal Tutor Bot API",
     description="AI-powered educational platform for personalized learning",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
+)
+
+# Compression middleware - large curriculum payloads compress ~10x
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+# Read-your-writes across workers: the last write time travels in a cookie
+app.add_middleware(
+    ReadYourWritesMiddleware,
+    cookie=settings.READ_YOUR_WRITES_COOKIE,
+    window=settings.READ_YOUR_WRITES_SECONDS,
 )
 
 # CORS middleware - FIXED: Use the property method
@@ -32,15 +55,38 @@ app.include_router(curriculum.router, prefix="/curriculum", tags=["curriculum"])
 app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
 
+@app.on_event("startup")
+async def start_background_jobs():
+    # Schema check at startup rather than import, so importing the app stays cheap
+    if settings.DATABASE_CREATE_TABLES:
+        await run_in_threadpool(create_tables)
+    await chat_writer.start()
+    if settings.PREWARM_ENABLED:
+        prewarmer.start(settings.PREWARM_INTERVAL_SECONDS)
+    if settings.RETENTION_ENABLED:
+        retention_job.start(settings.RETENTION_INTERVAL_SECONDS)
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await prewarmer.stop()
+    await retention_job.stop()
+    # Drain buffered chat messages and usage records before the worker exits
+    await chat_writer.stop()
+    await usage_ledger.stop()
+
 @app.get("/")
 async def root():
     return {"message": "Personal Tutor Bot API", "status": "active"}
 
+@app.get("/metrics")
+async def read_metrics():
+    return metrics.snapshot()
+
 @app.get("/health")
 async def health_check(db: Session = Depends(get_db)):
     try:
         # Test database connection
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         return {
             "status": "healthy",
             "database": "connected",
@@ -0,0 +1,153 @@
+"""Elo-style mastery model over progress logs.
+
+Each (student, subject, topic) has one rating on the logit scale: the
+chance the student succeeds at a "medium" task is ``sigmoid(rating)``. A
+progress log with ``proficiency_score`` s (0-100) moves the rating by
+``K * (s/100 - expected)``, with K shrinking as attempts accumulate so early
+logs move the estimate quickly and later ones refine it.
+
+Difficulty is the level whose expected success is closest to
+``TARGET_SUCCESS`` (hard enough to stretch, easy enough to keep going) and
+the next topic is the first not-yet-mastered one in the student's plan, so
+neither needs an LLM round-trip.
+
+``replay`` recomputes every rating from the full log history; it uses numpy
+when available, updating all (student, subject, topic) groups at once for
+each attempt index, and falls back to a plain loop otherwise.
+"""
+import functools
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+INITIAL_RATING = 0.0
+RATING_BOUND = 6.0
+K_MAX = 1.2
+K_MIN = 0.15
+K_DECAY = 0.25
+TARGET_SUCCESS = 0.7
+MASTERY_THRESHOLD = 0.85
+
+# Logit offset of each difficulty level relative to "medium"
+DIFFICULTY_OFFSETS = {"easy": -1.0, "medium": 0.0, "hard": 1.0}
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy():
+    """numpy for vectorized batch recomputation, or None when not installed.
+    Imported on first use: only the batch paths need it, not app startup"""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - depends on the deployment image
+        return None
+    return numpy
+
+
+def k_factor(attempts: int) -> float:
+    return max(K_MIN, K_MAX / (1 + attempts * K_DECAY))
+
+
+def mastery_probability(rating: float) -> float:
+    return 1 / (1 + math.exp(-rating))
+
+
+def update_rating(rating: float, attempts: int, score: float) -> Tuple[float, int]:
+    """Rating and attempt count after one progress log scored ``score`` (0-100)"""
+    outcome = min(100.0, max(0.0, score)) / 100
+    rating += k_factor(attempts) * (outcome - mastery_probability(rating))
+    return min(RATING_BOUND, max(-RATING_BOUND, rating)), attempts + 1
+
+
+def recommend_difficulty(rating: Optional[float]) -> str:
+    """Difficulty whose expected success rate is closest to TARGET_SUCCESS"""
+    rating = INITIAL_RATING if rating is None else rating
+    return min(
+        DIFFICULTY_OFFSETS,
+        key=lambda level: abs(mastery_probability(rating - DIFFICULTY_OFFSETS[level]) - TARGET_SUCCESS)
+    )
+
+
+def choose_next_topic(candidates: Sequence[Tuple[str, str]],
+                      ratings: Dict[Tuple[str, str], float]) -> Optional[Tuple[str, str, float]]:
+    """First (subject, topic) in plan order that is not yet mastered, else
+    the weakest one for review; returns (subject, topic, rating)"""
+    if not candidates:
+        return None
+    rated = [(subject, topic, ratings.get((subject, topic), INITIAL_RATING)) for subject, topic in candidates]
+    for subject, topic, rating in rated:
+        if mastery_probability(rating) < MASTERY_THRESHOLD:
+            return subject, topic, rating
+    return min(rated, key=lambda item: item[2])
+
+
+def _replay_python(groups: Sequence[int], scores: Sequence[float], group_count: int):
+    ratings = [INITIAL_RATING] * group_count
+    attempts = [0] * group_count
+    for group, score in zip(groups, scores):
+        ratings[group], attempts[group] = update_rating(ratings[group], attempts[group], score)
+    return ratings, attempts
+
+
+def attempt_rounds(groups):
+    """Indices of the logs making each group's 1st, 2nd, ... attempt, as one
+    array per round; ``groups`` is a numpy array in chronological order"""
+    np = load_numpy()
+    order = np.argsort(groups, kind="stable")
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    first = np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+    rank = np.empty_like(groups)
+    rank[order] = np.arange(len(groups)) - first
+
+    by_rank = np.argsort(rank, kind="stable")
+    bounds = np.r_[0, np.cumsum(np.bincount(rank))]
+    return [by_rank[bounds[attempt]:bounds[attempt + 1]] for attempt in range(len(bounds) - 1)]
+
+
+def _replay_numpy(groups, scores, group_count: int):
+    np = load_numpy()
+    groups = np.asarray(groups, dtype=np.int64)
+    outcomes = np.clip(np.asarray(scores, dtype=np.float64), 0, 100) / 100
+    ratings = np.full(group_count, INITIAL_RATING)
+    attempts = np.bincount(groups, minlength=group_count)
+    if not len(groups):
+        return ratings, attempts
+
+    # Every group has at most one log per attempt index, so each round is a
+    # conflict-free vector update
+    for attempt, index in enumerate(attempt_rounds(groups)):
+        group = groups[index]
+        k = k_factor(attempt)
+        expected = 1 / (1 + np.exp(-ratings[group]))
+        ratings[group] = np.clip(ratings[group] + k * (outcomes[index] - expected), -RATING_BOUND, RATING_BOUND)
+    return ratings, attempts
+
+
+def replay(groups: Sequence[int], scores: Sequence[float], group_count: int,
+           vectorized: Optional[bool] = None) -> Tuple[List[float], List[int]]:
+    """Final (ratings, attempts) per group for chronologically ordered logs,
+    where ``groups[i]`` is the 0-based group of log i"""
+    if vectorized is None:
+        vectorized = load_numpy() is not None
+    if vectorized:
+        ratings, attempts = _replay_numpy(groups, scores, group_count)
+        return ratings.tolist(), attempts.tolist()
+    return _replay_python(groups, scores, group_count)
+
+
+def group_logs(logs: Iterable[Tuple[int, str, str, float]]):
+    """Map (student_id, subject, topic_key, score) rows to replay inputs;
+    returns (keys, groups, scores)"""
+    index: Dict[Tuple[int, str, str], int] = {}
+    groups, scores = [], []
+    for student_id, subject, topic, score in logs:
+        key = (student_id, subject, topic)
+        groups.append(index.setdefault(key, len(index)))
+        scores.append(score)
+    return list(index), groups, scores
+
+
+if __name__ == "__main__":
+    from .crud import recompute_mastery
+    from .sharding import shards
+
+    print(f"Recomputed {sum(shards.scatter(recompute_mastery).values())} mastery states")
@@ -0,0 +1,81 @@
+import threading
+from typing import Any, Dict, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format(name: str, key: LabelKey) -> str:
+    if not key:
+        return name
+    return name + "{" + ",".join(f"{label}={value}" for label, value in key) + "}"
+
+
+class Metrics:
+    """Minimal thread-safe in-process metrics registry.
+
+    Counters, gauges and summaries (count/sum/min/max) keyed by name and
+    labels, exposed as a flat dict through ``GET /metrics``. Good enough for
+    dashboards scraping one worker; swap for Prometheus if we outgrow it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._summaries: Dict[Tuple[str, LabelKey], list] = {}
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = [1, value, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = min(summary[2], value)
+                summary[3] = max(summary[3], value)
+
+    def counter(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": {_format(name, key): value for (name, key), value in self._counters.items()},
+                "gauges": {_format(name, key): value for (name, key), value in self._gauges.items()},
+                "summaries": {
+                    _format(name, key): {
+                        "count": count,
+                        "sum": total,
+                        "mean": total / count,
+                        "min": low,
+                        "max": high,
+                    }
+                    for (name, key), (count, total, low, high) in self._summaries.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+# Global metrics registry
+metrics = Metrics()
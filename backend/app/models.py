@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, Date, DateTime, ForeignKey, JSON, Enum, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy import event
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 import enum
 
@@ -15,7 +16,7 @@ class LearningStyle(str, enum.Enum):
 class Student(Base):
     __tablename__ = "students"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(255), nullable=False)
@@ -24,7 +25,15 @@ class Student(Base):
     weak_subjects = Column(JSON)  # List of weak subjects
     learning_goals = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
+    version = Column(Integer, nullable=False, default=1)  # Row version, bumped on every UPDATE (used for ETags)
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        Index("idx_grade", "grade_level"),
+    )
 
     # Relationships
     curricula = relationship("Curriculum", back_populates="student")
@@ -34,15 +43,23 @@ class Student(Base):
 class Curriculum(Base):
     __tablename__ = "curricula"
 
-    id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(255), nullable=False)
     description = Column(Text)
     duration_weeks = Column(Integer, default=8)
     curriculum_data = Column(JSON)  # Structured curriculum plan
     ai_generated_prompt = Column(Text)  # Prompt used to generate curriculum
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     is_active = Column(Boolean, default=True)
+    version = Column(Integer, nullable=False, default=1)  # Row version, bumped on every UPDATE (used for ETags)
+
+    __mapper_args__ = {"version_id_col": version}
+
+    __table_args__ = (
+        Index("idx_student", "student_id", "is_active"),
+    )
 
     # Relationships
     student = relationship("Student", back_populates="curricula")
@@ -51,8 +68,8 @@ class Curriculum(Base):
 class WeeklyPlan(Base):
     __tablename__ = "weekly_plans"
 
-    id = Column(Integer, primary_key=True, index=True)
-    curriculum_id = Column(Integer, ForeignKey("curricula.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    curriculum_id = Column(Integer, ForeignKey("curricula.id", ondelete="CASCADE"), nullable=False)
     week_number = Column(Integer, nullable=False)
     focus_areas = Column(JSON)  # Main topics for the week
     daily_breakdown = Column(JSON)  # Day-by-day schedule
@@ -60,16 +77,32 @@ class WeeklyPlan(Base):
     resources_needed = Column(JSON)
     completed = Column(Boolean, default=False)
 
+    __table_args__ = (
+        UniqueConstraint("curriculum_id", "week_number", name="unique_week"),
+    )
+
     # Relationships
     curriculum = relationship("Curriculum", back_populates="weekly_plans")
     progress_logs = relationship("ProgressLog", back_populates="weekly_plan")
 
+@event.listens_for(Session, "before_flush")
+def _bump_curriculum_version(session, flush_context, instances):
+    """A week is part of its curriculum: writing one bumps the curriculum's
+    row version and updated_at, so its ETag and Last-Modified change"""
+    changed = [plan for plan in session.new if isinstance(plan, WeeklyPlan)]
+    changed += [plan for plan in session.dirty if isinstance(plan, WeeklyPlan) and session.is_modified(plan)]
+    changed += [plan for plan in session.deleted if isinstance(plan, WeeklyPlan)]
+    for curriculum in {plan.curriculum for plan in changed}:
+        # A curriculum created or deleted in this flush needs no bump
+        if curriculum is not None and curriculum not in session.new and curriculum not in session.deleted:
+            curriculum.updated_at = func.now()
+
 class ProgressLog(Base):
     __tablename__ = "progress_logs"
 
-    id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
-    weekly_plan_id = Column(Integer, ForeignKey("weekly_plans.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    weekly_plan_id = Column(Integer, ForeignKey("weekly_plans.id", ondelete="CASCADE"), nullable=False)
     subject = Column(String(100), nullable=False)
     topic = Column(String(255), nullable=False)
     proficiency_score = Column(Float)  # 0-100
@@ -82,24 +115,34 @@ class ProgressLog(Base):
     student = relationship("Student", back_populates="progress_logs")
     weekly_plan = relationship("WeeklyPlan", back_populates="progress_logs")
 
+    __table_args__ = (
+        Index("idx_student_progress", "student_id"),  # Also yields id order (rowid / InnoDB primary key)
+        Index("idx_week_progress", "weekly_plan_id"),
+        Index("idx_progress_created", "created_at"),  # Retention scans by age
+    )
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
 
-    id = Column(Integer, primary_key=True, index=True)
-    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
     session_title = Column(String(255))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     student = relationship("Student", back_populates="chat_sessions")
+
+    __table_args__ = (
+        Index("idx_student_chat", "student_id", "updated_at"),  # Most recently active first
+    )
     messages = relationship("ChatMessage", back_populates="session")
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
-    id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     content = Column(Text, nullable=False)
     is_user = Column(Boolean, nullable=False)  # True for student, False for AI
     message_type = Column(String(50))  # question, explanation, hint, etc.
@@ -107,4 +150,183 @@ class ChatMessage(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
-    session = relationship("ChatSession", back_populates="messages")
\ No newline at end of file
+    session = relationship("ChatSession", back_populates="messages")
+
+    __table_args__ = (
+        Index("idx_session", "session_id"),
+        Index("idx_created", "created_at"),
+    )
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(191), primary_key=True)  # "<limiter>:<student id or ip>"
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Unix timestamp of the last refill
+
+class AICallLease(Base):
+    """Cross-worker single-flight lease for an identical AI call (see app/singleflight.py)"""
+    __tablename__ = "ai_call_leases"
+
+    key = Column(String(64), primary_key=True)  # sha256 of method, model and normalized inputs
+    owner = Column(String(32), nullable=False)  # Worker holding the lease
+    result = Column(Text(length=2**32 - 1))  # JSON result once published
+    expires_at = Column(Float, nullable=False)  # Unix timestamp
+
+class PracticeQuestion(Base):
+    __tablename__ = "practice_questions"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(255), nullable=False)
+    topic_key = Column(String(255), nullable=False)  # Normalized topic used for lookups
+    difficulty = Column(String(20), nullable=False)
+    grade_level = Column(Integer, nullable=False)
+    question = Column(Text, nullable=False)
+    options = Column(JSON, nullable=False)
+    correct_answer = Column(String(5), nullable=False)
+    explanation = Column(Text)
+    hint = Column(Text)
+    content_hash = Column(String(40), unique=True, nullable=False)  # Dedupe key (slot + normalized question)
+    times_served = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_question_bank_lookup", "topic_key", "difficulty", "grade_level", "times_served"),
+    )
+
+class MasteryState(Base):
+    __tablename__ = "mastery_states"
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    subject = Column(String(100), nullable=False)  # Normalized (lowercase)
+    topic_key = Column(String(255), nullable=False)  # Normalized topic
+    topic = Column(String(255), nullable=False)  # As last logged, for display
+    rating = Column(Float, nullable=False, default=0.0)  # Logit-scale Elo rating, see app/mastery.py
+    attempts = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("student_id", "subject", "topic_key", name="uq_mastery_student_topic"),
+    )
+
+class ReviewItem(Base):
+    """SM-2 spaced-repetition state of one student topic (see app/reviews.py)"""
+    __tablename__ = "review_items"
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    subject = Column(String(100), nullable=False)  # Normalized (lowercase)
+    topic_key = Column(String(255), nullable=False)  # Normalized topic
+    topic = Column(String(255), nullable=False)  # As last logged, for display
+    ease = Column(Float, nullable=False, default=2.5)
+    interval_days = Column(Float, nullable=False, default=0.0)
+    repetitions = Column(Integer, nullable=False, default=0)  # Passing reviews in a row
+    last_score = Column(Float)
+    last_reviewed_at = Column(DateTime(timezone=True), nullable=False)
+    due_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("student_id", "subject", "topic_key", name="uq_review_student_topic"),
+        Index("idx_review_due", "student_id", "due_at"),
+    )
+
+class ProgressSummary(Base):
+    """Aggregates of archived progress logs per student and subject (see app/retention.py)"""
+    __tablename__ = "progress_summaries"
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    subject = Column(String(100), nullable=False)
+    log_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    total_minutes = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    score_count = Column(Integer, nullable=False, default=0)
+    completed_score_sum = Column(Float, nullable=False, default=0.0)
+    completed_score_count = Column(Integer, nullable=False, default=0)
+    first_logged_at = Column(DateTime(timezone=True))
+    last_logged_at = Column(DateTime(timezone=True))
+
+    __table_args__ = (
+        UniqueConstraint("student_id", "subject", name="uq_progress_summary_student_subject"),
+    )
+
+class LogArchive(Base):
+    """Compressed chunk of rows moved out of a hot log table"""
+    __tablename__ = "log_archives"
+
+    id = Column(Integer, primary_key=True)
+    source_table = Column(String(50), nullable=False)  # progress_logs | chat_messages
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(Integer)  # chat_messages chunks only
+    period = Column(String(7), nullable=False)  # YYYY-MM of the rows' created_at
+    first_row_id = Column(Integer, nullable=False)
+    last_row_id = Column(Integer, nullable=False)
+    row_count = Column(Integer, nullable=False)
+    payload = Column(LargeBinary(length=2**32 - 1), nullable=False)  # zlib-compressed JSON list of rows
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_archive_student", "source_table", "student_id", "first_row_id"),
+        Index("idx_archive_session", "source_table", "session_id", "first_row_id"),
+    )
+
+class LLMUsage(Base):
+    """One AITutor LLM call or cache hit (see app/llm_usage.py)"""
+    __tablename__ = "llm_usage"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)  # When the call finished, not when it was written
+    student_id = Column(Integer)  # None outside a student's request; no foreign key, students may live on a shard
+    method = Column(String(50), nullable=False)
+    model = Column(String(50), nullable=False)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Float, nullable=False, default=0.0)
+    cache_hit = Column(Boolean, nullable=False, default=False)  # Semantic cache or coalesced with an identical call
+    error_class = Column(String(100))  # Exception class when the call failed
+
+    __table_args__ = (
+        Index("idx_llm_usage_created", "created_at"),
+        Index("idx_llm_usage_student", "student_id", "created_at"),
+    )
+
+class LLMUsageDaily(Base):
+    """``llm_usage`` totals per day, student, method and model"""
+    __tablename__ = "llm_usage_daily"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    student_id = Column(Integer, nullable=False)  # 0 for calls made outside a student's request
+    method = Column(String(50), nullable=False)
+    model = Column(String(50), nullable=False)
+    calls = Column(Integer, nullable=False, default=0)
+    cache_hits = Column(Integer, nullable=False, default=0)
+    errors = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms_sum = Column(Float, nullable=False, default=0.0)
+    latency_ms_max = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("day", "student_id", "method", "model", name="uq_llm_usage_daily"),
+        Index("idx_llm_usage_daily_student", "student_id", "day"),
+    )
+
+class ShardDirectory(Base):
+    """Shard holding each student when sharding is on (see app/sharding.py).
+
+    Lives on the primary database and allocates student ids, which must be
+    unique across shards."""
+    __tablename__ = "shard_directory"
+
+    student_id = Column(Integer, primary_key=True)
+    email = Column(String(255), nullable=False)
+    shard = Column(String(64), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("email", name="uq_shard_directory_email"),
+        Index("idx_shard_directory_shard", "shard", "student_id"),  # Rebalancing walks one shard at a time
+    )
@@ -0,0 +1,160 @@
+"""Scheduled pre-warming of the practice question bank.
+
+Every ``PREWARM_INTERVAL_SECONDS`` the pre-warmer collects the daily topics
+of each active curriculum's next incomplete week(s), ranks them by how many
+students will reach them, and tops the bank up to
+``PREWARM_QUESTIONS_PER_TOPIC`` questions per topic and grade with batched
+generation. Quiz requests are then served from the bank instead of waiting
+on the LLM.
+
+Runs inside the API process when ``PREWARM_ENABLED`` is set, or once from
+cron with ``python -m app.prewarm``.
+"""
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from . import crud, models
+from .ai_utils import AITutor, AIServiceError, ai_tutor
+from .config import settings
+from .database import SessionLocal
+from .metrics import metrics
+from .sharding import shards
+
+logger = logging.getLogger(__name__)
+
+
+def upcoming_topics(db: Session, horizon_weeks: int = 1) -> List[Tuple[str, int, int]]:
+    """(topic, grade level, demand) for the next ``horizon_weeks`` incomplete
+    weeks of every active curriculum, most in-demand first"""
+    rows = db.query(
+        models.WeeklyPlan.curriculum_id,
+        models.WeeklyPlan.daily_breakdown,
+        models.Student.grade_level
+    ).join(models.Curriculum, models.WeeklyPlan.curriculum_id == models.Curriculum.id).join(
+        models.Student, models.Curriculum.student_id == models.Student.id
+    ).filter(
+        models.Curriculum.is_active == True,
+        models.Student.is_active == True,
+        models.WeeklyPlan.completed == False
+    ).order_by(models.WeeklyPlan.curriculum_id, models.WeeklyPlan.week_number).yield_per(500)
+
+    demand: Counter = Counter()
+    weeks_taken: Dict[int, int] = {}
+    for curriculum_id, daily_breakdown, grade_level in rows:
+        if weeks_taken.get(curriculum_id, 0) >= horizon_weeks:
+            continue
+        weeks_taken[curriculum_id] = weeks_taken.get(curriculum_id, 0) + 1
+        for entry in (daily_breakdown or {}).values():
+            topic = entry.get("topic") if isinstance(entry, dict) else None
+            if topic and isinstance(topic, str):
+                demand[(topic.strip(), grade_level)] += 1
+    return [(topic, grade_level, count) for (topic, grade_level), count in demand.most_common()]
+
+
+class PracticeQuestionPrewarmer:
+    def __init__(self, tutor: AITutor, per_topic: int = 10, horizon_weeks: int = 1, max_topics: int = 50,
+                 concurrency: int = 2, difficulty: str = "medium"):
+        self.tutor = tutor
+        self.per_topic = per_topic
+        self.horizon_weeks = horizon_weeks
+        self.max_topics = max_topics
+        self.concurrency = concurrency
+        self.difficulty = difficulty
+        self._task: Optional[asyncio.Task] = None
+
+    def _deficits(self) -> List[Tuple[str, int, int, List[str]]]:
+        # Curricula live on the shards, the bank on the primary
+        demand: Counter = Counter()
+        for topics in shards.scatter(upcoming_topics, self.horizon_weeks).values():
+            for topic, grade_level, count in topics:
+                demand[(topic, grade_level)] += count
+        db = SessionLocal()
+        try:
+            deficits = []
+            for (topic, grade_level), _ in demand.most_common():
+                have = crud.count_practice_questions(db, topic, self.difficulty, grade_level)
+                if have < self.per_topic:
+                    existing = crud.get_practice_question_texts(db, topic, self.difficulty, grade_level)
+                    deficits.append((topic, grade_level, self.per_topic - have, existing))
+                if len(deficits) >= self.max_topics:
+                    break
+            return deficits
+        finally:
+            db.close()
+
+    def _store(self, topic: str, grade_level: int, questions: List[dict]) -> int:
+        db = SessionLocal()
+        try:
+            return len(crud.add_practice_questions(db, topic, self.difficulty, grade_level, questions))
+        finally:
+            db.close()
+
+    async def run_once(self) -> Dict[str, int]:
+        """Fill the bank for upcoming topics; returns what was done"""
+        started = time.perf_counter()
+        deficits = await run_in_threadpool(self._deficits)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stats = {"topics": len(deficits), "added": 0, "failed": 0}
+
+        async def fill(topic: str, grade_level: int, needed: int, existing: List[str]):
+            # No DB session is held while waiting on the LLM
+            async with semaphore:
+                try:
+                    questions = await self.tutor.generate_practice_questions(
+                        topic, self.difficulty, needed, grade_level, avoid=existing
+                    )
+                except AIServiceError:
+                    stats["failed"] += 1
+                    return
+            added = await run_in_threadpool(self._store, topic, grade_level, questions)
+            stats["added"] += added
+
+        await asyncio.gather(*(fill(*deficit) for deficit in deficits))
+        metrics.increment("prewarm_runs_total")
+        metrics.increment("prewarm_questions_added_total", stats["added"])
+        metrics.observe("prewarm_run_ms", (time.perf_counter() - started) * 1000)
+        return stats
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            try:
+                stats = await self.run_once()
+                logger.info("Practice question pre-warm: %s", stats)
+            except Exception:
+                metrics.increment("prewarm_errors_total")
+                logger.exception("Practice question pre-warm failed")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global pre-warmer, started by the app when PREWARM_ENABLED is set
+prewarmer = PracticeQuestionPrewarmer(
+    ai_tutor,
+    per_topic=settings.PREWARM_QUESTIONS_PER_TOPIC,
+    horizon_weeks=settings.PREWARM_HORIZON_WEEKS,
+    max_topics=settings.PREWARM_MAX_TOPICS_PER_RUN,
+    concurrency=settings.PREWARM_CONCURRENCY,
+)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(asyncio.run(prewarmer.run_once()))
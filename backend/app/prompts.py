@@ -0,0 +1,178 @@
+"""Prompt construction under a token budget.
+
+Input tokens are paid for and waited on, so prompts are built from compact
+pieces: fixed instructions live in constant system prompts (an identical
+prefix on every call, which upstream prompt caching can reuse), student
+context is trimmed to the fields the tutor uses and serialized without
+whitespace, and ``PromptBuilder`` drops or truncates low-priority sections
+until the message list fits the per-call budget.
+"""
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+try:  # exact counts when tiktoken is installed, a close estimate otherwise
+    import tiktoken
+except ImportError:  # pragma: no cover - depends on the deployment image
+    tiktoken = None
+
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Fields of the client-supplied student_context the chat prompt actually uses
+CHAT_CONTEXT_FIELDS = (
+    "grade_level",
+    "learning_style",
+    "subject",
+    "topic",
+    "current_topic",
+    "current_week",
+    "weak_subjects",
+    "learning_goals",
+    "recent_scores",
+)
+
+# Chat framing overhead per message and per reply (OpenAI cookbook figures)
+TOKENS_PER_MESSAGE = 4
+TOKENS_PER_REPLY = 3
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    return tiktoken.encoding_for_model("gpt-4") if tiktoken is not None else None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # One token per word/punctuation mark, plus one per 8 chars of long words
+    return sum(1 + len(piece) // 8 for piece in _TOKEN_PIECES.findall(text))
+
+
+def count_message_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(TOKENS_PER_MESSAGE + count_tokens(m["content"]) for m in messages) + TOKENS_PER_REPLY
+
+
+def squeeze(text: str) -> str:
+    """Drop indentation, blank lines and repeated spaces from a template"""
+    return "\n".join(" ".join(line.split()) for line in text.strip().splitlines() if line.strip())
+
+
+def question_fingerprint(text: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a question, for dedupe"""
+    return " ".join("".join(c if c.isalnum() else " " for c in text.lower()).split())
+
+
+def prune(value: Any) -> Any:
+    """Recursively drop None, empty strings and empty containers"""
+    if isinstance(value, dict):
+        pruned = {key: prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, (list, tuple)):
+        return [item for item in (prune(item) for item in value) if item not in (None, "", [], {})]
+    return value
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(prune(value), separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _clip(value: Any, max_chars: int, max_items: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars].rstrip() + "..."
+    if isinstance(value, (list, tuple)):
+        return [_clip(item, max_chars, max_items) for item in list(value)[:max_items]]
+    if isinstance(value, dict):
+        return {key: _clip(item, max_chars, max_items) for key, item in list(value.items())[:max_items]}
+    return value
+
+
+def compact_student_context(context: Optional[Dict[str, Any]], fields: Tuple[str, ...] = CHAT_CONTEXT_FIELDS,
+                            max_chars: int = 200, max_items: int = 8) -> Dict[str, Any]:
+    """Keep only known, bounded fields of an arbitrary client context dict"""
+    if not isinstance(context, dict):
+        return {}
+    return prune({key: _clip(context[key], max_chars, max_items) for key in fields if key in context})
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    if budget <= 0:
+        return ""
+    if count_tokens(text) <= budget:
+        return text
+    # Shrink proportionally, then step down until it fits
+    cut = max(1, int(len(text) * budget / count_tokens(text)))
+    while cut > 0 and count_tokens(text[:cut]) + 1 > budget:
+        cut = int(cut * 0.9)
+    return text[:cut].rstrip() + "..."
+
+
+class PromptBuilder:
+    """Assemble a system + user message pair that fits ``budget`` tokens.
+
+    Required sections are always kept; optional ones are added in priority
+    order (lower first) and truncated or dropped once the budget runs out,
+    then emitted in the order they were added.
+    """
+
+    MIN_SECTION_TOKENS = 16
+
+    def __init__(self, system: str, budget: int):
+        self.system = system
+        self.budget = budget
+        self._sections: List[Tuple[int, int, str, bool]] = []
+
+    def add(self, text: str, required: bool = False, priority: int = 0) -> "PromptBuilder":
+        if text:
+            self._sections.append((priority, len(self._sections), text, required))
+        return self
+
+    def build(self) -> List[Dict[str, str]]:
+        used = count_message_tokens([{"role": "system", "content": self.system}, {"role": "user", "content": ""}])
+        kept: Dict[int, str] = {}
+        for _, order, text, required in self._sections:
+            if required:
+                kept[order] = text
+                used += count_tokens(text) + 1
+        for _, order, text, required in sorted(s for s in self._sections if not s[3]):
+            remaining = self.budget - used - 1
+            if remaining < self.MIN_SECTION_TOKENS:
+                break
+            text = truncate_to_tokens(text, remaining)
+            kept[order] = text
+            used += count_tokens(text) + 1
+        user = "\n".join(kept[order] for order in sorted(kept))
+        return [{"role": "system", "content": self.system}, {"role": "user", "content": user}]
+
+
+CURRICULUM_SYSTEM_PROMPT = squeeze("""
+    You are an expert educational curriculum designer for grades 4-9.
+    Plans run Monday-Friday, 60-90 minutes daily, progress from simple to complex, focus on the
+    student's weak subjects while reinforcing strong ones, and include practice exercises and assessments.
+    Reply with JSON only, no comments. A week is:
+    {"week_number":1,"focus_areas":["subject"],"learning_objectives":["objective"],"daily_breakdown":{"monday":{"subject":"Math","topic":"Basic Arithmetic","activities":["activity"]}},"resources_needed":["resource"]}
+""")
+
+PRACTICE_QUESTION_SYSTEM_PROMPT = squeeze("""
+    You are a helpful tutor creating educational content.
+    Reply with JSON only:
+    {"question":"text","options":{"A":"","B":"","C":"","D":""},"correct_answer":"A","explanation":"detailed explanation","hint":"helpful hint"}
+""")
+
+PRACTICE_BATCH_SYSTEM_PROMPT = squeeze("""
+    You are a helpful tutor creating educational content.
+    Every question must test a different idea; never repeat or rephrase a question.
+    Reply with JSON only: {"questions":[Q, ...]} where each Q is
+    {"question":"text","options":{"A":"","B":"","C":"","D":""},"correct_answer":"A","explanation":"detailed explanation","hint":"helpful hint"}
+""")
+
+
+@lru_cache(maxsize=16)
+def chat_system_prompt(grade_level: Any) -> str:
+    return squeeze(f"""
+        You are an expert, friendly and patient tutor for grade {grade_level} students.
+        Give a clear, age-appropriate explanation, step-by-step guidance for problems, an encouraging tone
+        and related examples if helpful, then ask a follow-up question to check understanding.
+        Keep responses under 300 words.
+    """)
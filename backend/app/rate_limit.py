@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Tuple
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from .config import settings
+from .metrics import metrics
+
+
+def _too_many_requests(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+    )
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: float, rate: float) -> float:
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class MemoryBucketBackend:
+    """Token buckets held in this worker's memory (bounded LRU of keys)"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, capacity: float, rate: float, cost: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class DatabaseBucketBackend:
+    """Token buckets shared by every worker through the ``rate_limit_buckets``
+    table; each take is one short row-locked transaction"""
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory  # SessionLocal when None
+
+    async def take(self, key: str, capacity: float, rate: float, cost: float) -> Tuple[bool, float]:
+        return await run_in_threadpool(self._take, key, capacity, rate, cost)
+
+    def _take(self, key: str, capacity: float, rate: float, cost: float) -> Tuple[bool, float]:
+        from sqlalchemy.exc import IntegrityError
+
+        if self.session_factory is None:
+            from .database import SessionLocal
+            self.session_factory = SessionLocal
+        now = time.time()
+        db = self.session_factory()
+        try:
+            try:
+                tokens, allowed = self._take_from_row(db, key, capacity, rate, cost, now)
+            except IntegrityError:
+                # First take for the key: another worker inserted the bucket
+                # between our read and insert; it exists (and is lockable) now
+                db.rollback()
+                tokens, allowed = self._take_from_row(db, key, capacity, rate, cost, now)
+        finally:
+            db.close()
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def _take_from_row(self, db, key: str, capacity: float, rate: float, cost: float,
+                       now: float) -> Tuple[float, bool]:
+        from . import models
+
+        bucket = db.query(models.RateLimitBucket).filter(
+            models.RateLimitBucket.key == key
+        ).with_for_update().first()
+        if bucket is None:
+            bucket = models.RateLimitBucket(key=key, tokens=capacity, updated_at=now)
+            db.add(bucket)
+        tokens = _refill(bucket.tokens, bucket.updated_at, now, capacity, rate)
+        allowed = tokens >= cost
+        bucket.tokens = tokens - cost if allowed else tokens
+        bucket.updated_at = now
+        db.commit()
+        return tokens, allowed
+
+
+class RateLimiter:
+    """Token-bucket limiter: ``burst`` requests at once, refilled at
+    ``per_minute``; ``cost`` lets expensive endpoints drain faster"""
+
+    def __init__(self, name: str, burst: int, per_minute: float, backend=None):
+        self.name = name
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.backend = backend or MemoryBucketBackend()
+
+    async def check(self, key: str, cost: float = 1) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        allowed, retry_after = await self.backend.take(f"{self.name}:{key}", self.burst, self.rate, cost)
+        if not allowed:
+            metrics.increment("rate_limit_rejections_total", limiter=self.name)
+            raise _too_many_requests("Rate limit exceeded, please slow down", retry_after)
+
+
+class ConcurrencyLimiter:
+    """Global cap on in-flight AI calls per worker with a bounded wait queue.
+
+    When ``max_concurrent`` calls are running, up to ``max_queue`` requests
+    wait (at most ``queue_timeout`` seconds) for a slot; anything beyond that
+    is rejected with 429 immediately instead of piling up on upstream.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._condition = None
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        async with self._condition:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    metrics.increment("ai_admission_rejections_total", reason="queue_full")
+                    raise _too_many_requests("AI service is busy, please retry shortly", 1)
+                self.waiting += 1
+                started = time.monotonic()
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self.active < self.max_concurrent),
+                        timeout=self.queue_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    metrics.increment("ai_admission_rejections_total", reason="queue_timeout")
+                    raise _too_many_requests("AI service is busy, please retry shortly", self.queue_timeout)
+                finally:
+                    self.waiting -= 1
+                metrics.observe("ai_admission_wait_ms", (time.monotonic() - started) * 1000)
+            self.active += 1
+            metrics.set_gauge("ai_calls_in_flight", self.active)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                metrics.set_gauge("ai_calls_in_flight", self.active)
+                self._condition.notify()
+
+
+def _build_backend():
+    if settings.RATE_LIMIT_BACKEND == "database":
+        return DatabaseBucketBackend()
+    return MemoryBucketBackend()
+
+
+# Global limiters
+_bucket_backend = _build_backend()
+student_rate_limiter = RateLimiter(
+    "student", settings.RATE_LIMIT_STUDENT_BURST, settings.RATE_LIMIT_STUDENT_PER_MINUTE, _bucket_backend
+)
+ip_rate_limiter = RateLimiter(
+    "ip", settings.RATE_LIMIT_IP_BURST, settings.RATE_LIMIT_IP_PER_MINUTE, _bucket_backend
+)
+ai_concurrency = ConcurrencyLimiter(
+    settings.AI_MAX_CONCURRENT_CALLS, settings.AI_MAX_QUEUED_CALLS, settings.AI_QUEUE_TIMEOUT_SECONDS
+)
@@ -0,0 +1,230 @@
+"""Read-replica routing for read-only routes.
+
+Routes that only read (analytics, curriculum listing) take their session
+from ``dependencies.get_read_db``, which asks ``replicas`` for a session on
+one of the ``DATABASE_REPLICA_URLS`` (round-robin). A replica is skipped
+while its measured lag exceeds ``REPLICA_MAX_LAG_SECONDS`` or it cannot be
+reached, and reads fall back to the primary when none is usable.
+
+Read-your-writes: primary sessions are tagged with the authenticated
+student (``session.info["student_id"]``, set by ``get_current_user``) and
+every commit that wrote something records the student in
+``read_your_writes``. For ``READ_YOUR_WRITES_SECONDS`` afterwards that
+student's reads stay on the primary, so a progress log shows up in
+``/analytics/progress`` straight away even on a lagging replica.
+``read_your_writes`` only knows this worker's writes, so the response to a
+writing request also carries the write time in the
+``READ_YOUR_WRITES_COOKIE`` cookie (``ReadYourWritesMiddleware``); the
+client's next request, whichever worker serves it, reads from the primary
+until the window has passed.
+
+Local testing: point ``DATABASE_REPLICA_URLS`` at a second MySQL server
+replicating from the first, or at a copy of the SQLite database (see
+``benchmarks/bench_replicas.py``); a server that is not a replica reports
+no lag.
+"""
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from http.cookies import CookieError, SimpleCookie
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .database import SessionLocal, pool_options
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Write times of the current request: {"cookie": time from the client's cookie,
+# "wrote": time this request committed a write}. A dict, so commits made in
+# the threadpool (a copy of the context) still reach the middleware
+_request_writes: contextvars.ContextVar[Optional[Dict[str, Optional[float]]]] = contextvars.ContextVar(
+    "read_your_writes_request", default=None)
+
+
+class ReadYourWrites:
+    """Students who wrote to the primary within the last ``window`` seconds"""
+
+    def __init__(self, window: float, max_entries: int = 100000):
+        self.window = window
+        self.max_entries = max_entries
+        self._writes: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, student_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._writes[student_id] = now
+            self._writes.move_to_end(student_id)
+            # Oldest first, so expired entries are always at the front
+            while self._writes and (len(self._writes) > self.max_entries
+                                    or now - next(iter(self._writes.values())) > self.window):
+                self._writes.popitem(last=False)
+
+    def recent(self, student_id: int) -> bool:
+        with self._lock:
+            written = self._writes.get(student_id)
+        return written is not None and time.monotonic() - written < self.window
+
+
+def _client_wrote_recently() -> bool:
+    """Whether the client's cookie says it wrote within the window (possibly
+    through another worker)"""
+    writes = _request_writes.get()
+    written = writes and writes["cookie"]
+    return bool(written) and time.time() - written < read_your_writes.window
+
+
+class ReadYourWritesMiddleware:
+    """Carries the time of a student's last write between requests (and
+    workers) in a cookie"""
+
+    def __init__(self, app: ASGIApp, cookie: str, window: float):
+        self.app = app
+        self.cookie = cookie
+        self.window = window
+
+    def _cookie_time(self, scope: Scope) -> Optional[float]:
+        try:
+            morsel = SimpleCookie(Headers(scope=scope).get("cookie", "")).get(self.cookie)
+            return float(morsel.value) if morsel is not None else None
+        except (CookieError, ValueError):
+            return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        writes = {"cookie": self._cookie_time(scope), "wrote": None}
+        token = _request_writes.set(writes)
+
+        async def send_with_cookie(message: Message) -> None:
+            if message["type"] == "http.response.start" and writes["wrote"] is not None:
+                MutableHeaders(scope=message).append("set-cookie", (
+                    f"{self.cookie}={writes['wrote']:.3f}; Max-Age={max(1, round(self.window))}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            _request_writes.reset(token)
+
+
+def replication_lag(session: Session) -> Optional[float]:
+    """Seconds the server behind ``session`` trails its source: 0 when it is
+    not a replica, None when replication is broken"""
+    if session.get_bind().dialect.name != "mysql":
+        return 0.0
+    for statement in ("SHOW REPLICA STATUS", "SHOW SLAVE STATUS"):
+        try:
+            row = session.execute(text(statement)).mappings().first()
+        except Exception:
+            continue  # SHOW REPLICA STATUS needs MySQL 8.0.22+
+        if row is None:
+            return 0.0
+        lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+        return None if lag is None else float(lag)
+    return None
+
+
+class ReplicaSet:
+    def __init__(self, urls: List[str], max_lag: float, check_interval: float):
+        self.urls = urls
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False,
+                         bind=create_engine(url, pool_pre_ping=True, **pool_options(url)))
+            for url in urls
+        ]
+        # replica index -> (monotonic time measured, lag or None if unusable)
+        self._lag: Dict[int, Tuple[float, Optional[float]]] = {}
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.sessionmakers)
+
+    def _healthy(self, index: int, db: Session) -> bool:
+        with self._lock:
+            checked_at, lag = self._lag.get(index, (float("-inf"), None))
+        if time.monotonic() - checked_at >= self.check_interval:
+            try:
+                lag = replication_lag(db)
+            except Exception:
+                logger.warning("Replica %d unreachable", index, exc_info=True)
+                lag = None
+            with self._lock:
+                self._lag[index] = (time.monotonic(), lag)
+            if lag is not None:
+                metrics.set_gauge("db_replica_lag_seconds", lag, replica=index)
+        return lag is not None and lag <= self.max_lag
+
+    def session(self) -> Optional[Session]:
+        """Session on the next replica within the lag bound, or None"""
+        start = next(self._next)
+        for offset in range(len(self.sessionmakers)):
+            index = (start + offset) % len(self.sessionmakers)
+            db = self.sessionmakers[index]()
+            if self._healthy(index, db):
+                return db
+            db.close()
+        return None
+
+    def session_for(self, student_id: Optional[int]) -> Optional[Session]:
+        """Replica session for this student's reads; None means use the primary"""
+        if not self:
+            return None
+        if student_id is not None and (read_your_writes.recent(student_id) or _client_wrote_recently()):
+            metrics.increment("db_read_routing_total", target="primary", reason="read_your_writes")
+            return None
+        db = self.session()
+        if db is None:
+            metrics.increment("db_read_routing_total", target="primary", reason="no_replica")
+            return None
+        metrics.increment("db_read_routing_total", target="replica", reason="ok")
+        return db
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _mark_flush_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _mark_statement_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _record_write(session):
+    if session.info.pop("wrote", False) and session.info.get("student_id") is not None:
+        read_your_writes.record(session.info["student_id"])
+        writes = _request_writes.get()
+        if writes is not None:
+            writes["wrote"] = time.time()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_write(session):
+    session.info.pop("wrote", None)
+
+
+# Global replica set and write tracker
+read_your_writes = ReadYourWrites(settings.READ_YOUR_WRITES_SECONDS)
+replicas = ReplicaSet(
+    settings.replica_urls_list,
+    max_lag=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval=settings.REPLICA_LAG_CHECK_SECONDS,
+)
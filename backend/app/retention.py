@@ -0,0 +1,251 @@
+"""Retention for the unbounded log tables.
+
+``progress_logs`` and ``chat_messages`` only keep recent rows. The
+compaction job moves rows older than ``RETENTION_PROGRESS_DAYS`` /
+``RETENTION_CHAT_DAYS`` into ``log_archives`` as zlib-compressed JSON chunks
+(one per student or chat session and month, per batch), and folds archived
+progress logs into ``progress_summaries`` so analytics never has to read
+them again. Rows are archived, aggregated and deleted in one transaction
+per batch, so an interrupted run leaves nothing half-moved.
+
+Reads stay complete: ``crud.get_student_progress`` and
+``crud.get_chat_messages`` prepend the archived rows (decompressed, as
+transient model instances), and ``crud.get_student_analytics`` combines the
+summaries with the live rows.
+
+Run it from the app (``RETENTION_ENABLED``) or as ``python -m app.retention``.
+"""
+import asyncio
+import json
+import logging
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .database import SessionLocal
+from .llm_usage import prune as prune_llm_usage
+from .metrics import metrics
+from .sharding import PRIMARY, shards
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_LOGS = "progress_logs"
+CHAT_MESSAGES = "chat_messages"
+
+PROGRESS_COLUMNS = ("id", "student_id", "weekly_plan_id", "subject", "topic", "proficiency_score",
+                    "time_spent_minutes", "completed", "feedback", "created_at")
+CHAT_COLUMNS = ("id", "session_id", "content", "is_user", "message_type", "message_metadata", "created_at")
+
+
+def pack_rows(rows: List[Dict[str, Any]]) -> bytes:
+    data = json.dumps(rows, separators=(",", ":"), default=lambda value: value.isoformat())
+    return zlib.compress(data.encode(), 9)
+
+
+def unpack_rows(payload: bytes) -> List[Dict[str, Any]]:
+    rows = json.loads(zlib.decompress(payload))
+    for row in rows:
+        if row.get("created_at"):
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+    return rows
+
+
+def fold_progress(summary: models.ProgressSummary, log: models.ProgressLog) -> None:
+    """Add one progress log to its subject's running aggregates"""
+    summary.log_count += 1
+    summary.total_minutes += log.time_spent_minutes or 0
+    if log.completed:
+        summary.completed_count += 1
+    if log.proficiency_score is not None:
+        summary.score_sum += log.proficiency_score
+        summary.score_count += 1
+        if log.completed:
+            summary.completed_score_sum += log.proficiency_score
+            summary.completed_score_count += 1
+    if summary.first_logged_at is None or log.created_at < summary.first_logged_at:
+        summary.first_logged_at = log.created_at
+    if summary.last_logged_at is None or log.created_at > summary.last_logged_at:
+        summary.last_logged_at = log.created_at
+
+
+def _archive_chunks(db: Session, source_table: str, chunks: Dict[tuple, list], columns) -> None:
+    for (student_id, session_id, period), rows in chunks.items():
+        db.add(models.LogArchive(
+            source_table=source_table,
+            student_id=student_id,
+            session_id=session_id,
+            period=period,
+            first_row_id=rows[0].id,
+            last_row_id=rows[-1].id,
+            row_count=len(rows),
+            payload=pack_rows([{column: getattr(row, column) for column in columns} for row in rows]),
+        ))
+
+
+def archive_progress_logs(db: Session, cutoff: datetime, batch_rows: int = 5000) -> int:
+    """Archive and summarize progress logs created before ``cutoff``; returns rows moved"""
+    moved = 0
+    while True:
+        logs = db.query(models.ProgressLog).filter(
+            models.ProgressLog.created_at < cutoff
+        ).order_by(models.ProgressLog.student_id, models.ProgressLog.id).limit(batch_rows).all()
+        if not logs:
+            return moved
+
+        chunks = defaultdict(list)
+        for log in logs:
+            chunks[(log.student_id, None, log.created_at.strftime("%Y-%m"))].append(log)
+        _archive_chunks(db, PROGRESS_LOGS, chunks, PROGRESS_COLUMNS)
+
+        summaries = {
+            (summary.student_id, summary.subject): summary
+            for summary in db.query(models.ProgressSummary).filter(
+                models.ProgressSummary.student_id.in_({log.student_id for log in logs})
+            )
+        }
+        for log in logs:
+            summary = summaries.get((log.student_id, log.subject))
+            if summary is None:
+                summary = models.ProgressSummary(
+                    student_id=log.student_id, subject=log.subject, log_count=0, completed_count=0,
+                    total_minutes=0, score_sum=0.0, score_count=0, completed_score_sum=0.0,
+                    completed_score_count=0
+                )
+                summaries[(log.student_id, log.subject)] = summary
+                db.add(summary)
+            fold_progress(summary, log)
+
+        db.query(models.ProgressLog).filter(
+            models.ProgressLog.id.in_([log.id for log in logs])
+        ).delete(synchronize_session=False)
+        db.commit()
+        db.expunge_all()
+        moved += len(logs)
+        metrics.increment("retention_rows_archived_total", len(logs), table=PROGRESS_LOGS)
+
+
+def archive_chat_messages(db: Session, cutoff: datetime, batch_rows: int = 5000) -> int:
+    """Archive chat messages created before ``cutoff``; returns rows moved"""
+    moved = 0
+    while True:
+        rows = db.query(models.ChatMessage, models.ChatSession.student_id).join(
+            models.ChatSession, models.ChatSession.id == models.ChatMessage.session_id
+        ).filter(
+            models.ChatMessage.created_at < cutoff
+        ).order_by(models.ChatMessage.session_id, models.ChatMessage.id).limit(batch_rows).all()
+        if not rows:
+            return moved
+
+        chunks = defaultdict(list)
+        for message, student_id in rows:
+            chunks[(student_id, message.session_id, message.created_at.strftime("%Y-%m"))].append(message)
+        _archive_chunks(db, CHAT_MESSAGES, chunks, CHAT_COLUMNS)
+
+        db.query(models.ChatMessage).filter(
+            models.ChatMessage.id.in_([message.id for message, _ in rows])
+        ).delete(synchronize_session=False)
+        db.commit()
+        db.expunge_all()
+        moved += len(rows)
+        metrics.increment("retention_rows_archived_total", len(rows), table=CHAT_MESSAGES)
+
+
+def archive_logs(db: Session, now: datetime) -> Dict[str, int]:
+    """Archive old rows of both log tables on one shard; returns rows moved per table"""
+    return {
+        PROGRESS_LOGS: archive_progress_logs(
+            db, now - timedelta(days=settings.RETENTION_PROGRESS_DAYS), settings.RETENTION_BATCH_ROWS
+        ),
+        CHAT_MESSAGES: archive_chat_messages(
+            db, now - timedelta(days=settings.RETENTION_CHAT_DAYS), settings.RETENTION_BATCH_ROWS
+        ),
+    }
+
+
+def compact(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """One retention pass over both log tables (on every shard when sharding
+    is on) and the LLM usage ledger on ``db``, the primary; returns rows moved per table"""
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    stats: Dict[str, int] = defaultdict(int)
+    for shard_stats in (shards.scatter(archive_logs, now) if shards else {PRIMARY: archive_logs(db, now)}).values():
+        for table, moved in shard_stats.items():
+            stats[table] += moved
+    # Raw ledger rows are only deleted: llm_usage_daily already has their totals
+    stats["llm_usage"] = prune_llm_usage(
+        db, now - timedelta(days=settings.LLM_USAGE_RETENTION_DAYS), settings.RETENTION_BATCH_ROWS
+    )
+    metrics.observe("retention_run_ms", (time.perf_counter() - started) * 1000)
+    return dict(stats)
+
+
+def archived_rows(db: Session, source_table: str, student_id: Optional[int] = None,
+                  session_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Archived rows of one student or chat session, oldest first"""
+    query = db.query(models.LogArchive.payload).filter(models.LogArchive.source_table == source_table)
+    if student_id is not None:
+        query = query.filter(models.LogArchive.student_id == student_id)
+    if session_id is not None:
+        query = query.filter(models.LogArchive.session_id == session_id)
+    rows = [row for (payload,) in query.order_by(models.LogArchive.first_row_id) for row in unpack_rows(payload)]
+    # Chunks from different batches may interleave
+    rows.sort(key=lambda row: row["id"])
+    return rows
+
+
+def archived_progress_logs(db: Session, student_id: Optional[int] = None) -> List[models.ProgressLog]:
+    return [models.ProgressLog(**row) for row in archived_rows(db, PROGRESS_LOGS, student_id=student_id)]
+
+
+def archived_chat_messages(db: Session, session_id: int) -> List[models.ChatMessage]:
+    return [models.ChatMessage(**row) for row in archived_rows(db, CHAT_MESSAGES, session_id=session_id)]
+
+
+class RetentionJob:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            return compact(db)
+        finally:
+            db.close()
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            try:
+                stats = await run_in_threadpool(self.run_once)
+                logger.info("Log retention: %s", stats)
+            except Exception:
+                metrics.increment("retention_errors_total")
+                logger.exception("Log retention failed")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global retention job, started by the app when RETENTION_ENABLED is set
+retention_job = RetentionJob()
+
+
+if __name__ == "__main__":
+    print(f"Archived rows: {retention_job.run_once()}")
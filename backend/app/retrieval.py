@@ -0,0 +1,274 @@
+"""Per-student retrieval over curriculum and chat history for chat prompts.
+
+Each student gets an in-process BM25 index over the daily topics and weekly
+objectives of their active curricula plus their most recent chat messages.
+An index is built from the database the first time a student chats and is
+then kept current by this worker's write paths (``add_curriculum`` /
+``add_chat_messages``). It is rebuilt once it is older than ``ttl``
+seconds, so what other workers wrote shows up too. Only the top-k snippets
+for the current question go into the chat prompt, so the tutor follows the
+student's plan without the client pasting it into ``student_context``.
+
+Any retrieved snippet makes the answer student-specific. Questions the
+semantic answer cache would share within a grade are therefore searched
+against the curriculum only (``include_chat=False``); past chats ground the
+follow-ups and long, specific questions that are never shared anyway.
+"""
+import itertools
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .metrics import metrics
+from .semantic_cache import analyze
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+CURRICULUM_PREFIX = "plan:"  # Doc ids of curriculum snippets; chat snippets are "chat:..."
+# Chat message types worth retrieving (fallback replies are not)
+INDEXED_MESSAGE_TYPES = ("question", "explanation")
+
+
+def _terms(text: str) -> List[str]:
+    # Numbers are terms here ("week 3", "topic 2.1")
+    words, numbers = analyze(text)
+    return words + sorted(numbers)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
+
+
+def curriculum_documents(curriculum: models.Curriculum) -> List[Tuple[str, str]]:
+    """(doc id, snippet) pairs for every week and day of a curriculum"""
+    documents = []
+    for plan in curriculum.weekly_plans:
+        focus = ", ".join(plan.focus_areas or [])
+        objectives = "; ".join(plan.learning_objectives or [])
+        documents.append((f"plan:{plan.id}", f"Week {plan.week_number} ({focus}) objectives: {objectives}"))
+        for day, entry in (plan.daily_breakdown or {}).items():
+            if not isinstance(entry, dict):
+                continue
+            activities = ", ".join(str(activity) for activity in entry.get("activities") or [])
+            documents.append((
+                f"plan:{plan.id}:{day}",
+                f"Week {plan.week_number} {day.title()}: {entry.get('subject', '')} - {entry.get('topic', '')}"
+                + (f" ({activities})" if activities else "")
+            ))
+    return documents
+
+
+def chat_document(doc_id: str, is_user: bool, content: str) -> Tuple[str, str]:
+    return f"chat:{doc_id}", f"{'Student asked' if is_user else 'Tutor said'}: {content}"
+
+
+class BM25Index:
+    """Incremental Okapi BM25 over short snippets"""
+
+    def __init__(self):
+        self.documents: Dict[str, str] = {}
+        self._terms: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, doc_id: str, text: str) -> None:
+        if doc_id in self.documents:
+            self.remove(doc_id)
+        terms = Counter(_terms(text))
+        self.documents[doc_id] = text
+        self._terms[doc_id] = terms
+        self._lengths[doc_id] = sum(terms.values())
+        self._total_length += self._lengths[doc_id]
+        for term, count in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_id: str) -> None:
+        if self.documents.pop(doc_id, None) is None:
+            return
+        terms = self._terms.pop(doc_id)
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, k: int, min_score: float = 0.0, prefix: str = "") -> List[Tuple[float, str]]:
+        """Top ``k`` (score, doc id) pairs scoring at least ``min_score``, best
+        first, among the documents whose id starts with ``prefix``"""
+        if not self.documents:
+            return []
+        count = len(self.documents)
+        average_length = self._total_length / count or 1
+        scores: Dict[str, float] = {}
+        for term in set(_terms(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                if not doc_id.startswith(prefix):
+                    continue
+                length = self._lengths[doc_id]
+                norm = frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / norm
+        ranked = sorted(((score, doc_id) for doc_id, score in scores.items() if score >= min_score), reverse=True)
+        return ranked[:k]
+
+
+class StudentIndex:
+    """One student's BM25 index and when it was built; chat snippets are
+    capped to the newest N"""
+
+    def __init__(self, max_chat_documents: int):
+        self.bm25 = BM25Index()
+        self.loaded_at = time.monotonic()
+        self._chat_ids: Deque[str] = deque()
+        self.max_chat_documents = max_chat_documents
+
+    def add(self, documents: Iterable[Tuple[str, str]]) -> None:
+        for doc_id, text in documents:
+            self.bm25.add(doc_id, text)
+            if doc_id.startswith("chat:"):
+                self._chat_ids.append(doc_id)
+        while len(self._chat_ids) > self.max_chat_documents:
+            self.bm25.remove(self._chat_ids.popleft())
+
+
+class RetrievalService:
+    """LRU of per-student indexes, built lazily, updated on writes and
+    rebuilt after ``ttl`` seconds"""
+
+    def __init__(self, max_students: int = 1000, max_chat_documents: int = 200, ttl: float = 300.0,
+                 snippet_chars: int = 200, enabled: bool = True):
+        self.max_students = max_students
+        self.max_chat_documents = max_chat_documents
+        self.ttl = ttl
+        self.snippet_chars = snippet_chars
+        self.enabled = enabled
+        self._indexes: "OrderedDict[int, StudentIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Ids for messages indexed before the database assigned theirs
+        self._unsaved_ids = itertools.count(1)
+
+    def _build(self, db: Session, student_id: int) -> StudentIndex:
+        started = time.perf_counter()
+        index = StudentIndex(self.max_chat_documents)
+        curricula = db.query(models.Curriculum).filter(
+            models.Curriculum.student_id == student_id,
+            models.Curriculum.is_active == True
+        ).all()
+        for curriculum in curricula:
+            index.add(curriculum_documents(curriculum))
+        messages = db.query(models.ChatMessage).join(models.ChatSession).filter(
+            models.ChatSession.student_id == student_id
+        ).order_by(models.ChatMessage.id.desc()).limit(self.max_chat_documents).all()
+        index.add(
+            chat_document(str(message.id), message.is_user, message.content)
+            for message in reversed(messages)
+            if message.message_type in INDEXED_MESSAGE_TYPES
+        )
+        metrics.increment("retrieval_index_builds_total")
+        metrics.observe("retrieval_index_build_ms", (time.perf_counter() - started) * 1000)
+        return index
+
+    def _fresh(self, index: Optional[StudentIndex]) -> bool:
+        return index is not None and time.monotonic() - index.loaded_at < self.ttl
+
+    def _get(self, db: Optional[Session], student_id: int) -> Optional[StudentIndex]:
+        with self._lock:
+            index = self._indexes.get(student_id)
+            if index is not None:
+                self._indexes.move_to_end(student_id)
+            # Without a session an expired index is still better than none
+            if self._fresh(index) or db is None:
+                return index
+        index = self._build(db, student_id)
+        with self._lock:
+            current = self._indexes.get(student_id)
+            # Another request may have rebuilt it meanwhile; keep the newer one
+            if current is None or current.loaded_at < index.loaded_at:
+                self._indexes[student_id] = index
+            index = self._indexes[student_id]
+            self._indexes.move_to_end(student_id)
+            while len(self._indexes) > self.max_students:
+                self._indexes.popitem(last=False)
+            metrics.set_gauge("retrieval_indexed_students", len(self._indexes))
+        return index
+
+    def _update(self, student_id: int, documents: List[Tuple[str, str]]) -> None:
+        # Students without a loaded index pick the rows up when it is built
+        if not self.enabled or not documents:
+            return
+        with self._lock:
+            index = self._indexes.get(student_id)
+            if index is not None:
+                index.add(documents)
+
+    def add_curriculum(self, student_id: int, curriculum: models.Curriculum) -> None:
+        self._update(student_id, curriculum_documents(curriculum))
+
+    def add_chat_messages(self, student_id: int, messages: Iterable[Dict[str, Any]]) -> None:
+        """Index chat turns as they are queued for the write-behind buffer
+        (``chat_message`` dicts, not yet saved)"""
+        self._update(student_id, [
+            chat_document(f"unsaved:{next(self._unsaved_ids)}", message["is_user"], message["content"])
+            for message in messages
+            if message["message_type"] in INDEXED_MESSAGE_TYPES
+        ])
+
+    def forget(self, student_id: int) -> None:
+        with self._lock:
+            self._indexes.pop(student_id, None)
+
+    def needs_refresh(self, student_id: int) -> bool:
+        """True when the student's index is missing or older than ``ttl``"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            return not self._fresh(self._indexes.get(student_id))
+
+    def warm(self, db: Session, student_id: int) -> None:
+        """Build (or rebuild an expired) index now so later searches need no DB session"""
+        if self.enabled:
+            self._get(db, student_id)
+
+    def search(self, db: Optional[Session], student_id: int, query: str, k: Optional[int] = None,
+               include_chat: bool = True) -> List[str]:
+        """Top-k snippets relevant to ``query`` from the student's own plan
+        and, with ``include_chat``, past chats (nothing if the index is not
+        loaded and no ``db`` is given to build it)"""
+        if not self.enabled:
+            return []
+        index = self._get(db, student_id)
+        if index is None:
+            return []
+        started = time.perf_counter()
+        with self._lock:
+            hits = index.bm25.search(query, k or settings.RETRIEVAL_TOP_K, settings.RETRIEVAL_MIN_SCORE,
+                                     "" if include_chat else CURRICULUM_PREFIX)
+            snippets = [_clip(index.bm25.documents[doc_id], self.snippet_chars) for _, doc_id in hits]
+        metrics.observe("retrieval_search_ms", (time.perf_counter() - started) * 1000)
+        metrics.increment("retrieval_searches_total", outcome="hit" if snippets else "empty")
+        return snippets
+
+
+# Global retrieval service
+retrieval = RetrievalService(
+    max_students=settings.RETRIEVAL_MAX_STUDENTS,
+    max_chat_documents=settings.RETRIEVAL_MAX_CHAT_MESSAGES,
+    ttl=settings.RETRIEVAL_CACHE_TTL_SECONDS,
+    snippet_chars=settings.RETRIEVAL_SNIPPET_CHARS,
+    enabled=settings.RETRIEVAL_ENABLED,
+)
@@ -0,0 +1,218 @@
+"""Spaced-repetition review scheduling (SM-2).
+
+Every scored (student, subject, topic) has one ``review_items`` row holding
+its SM-2 state: ease factor, current interval and the number of successful
+repetitions in a row. A progress log's ``proficiency_score`` is mapped to an
+SM-2 quality (0-5). A quality below 3 resets the streak, so a topic the
+student did poorly on is due again the next day. Passing scores push the
+next review out to 1 day, then 6 days, then ``interval * ease``.
+
+``create_progress_log`` updates the row and the worker's cached due-queue in
+the same request. ``ReviewQueue`` keeps, per student, a heap ordered by
+``due_at`` (LRU over students, reloaded from the table after
+``REVIEW_CACHE_TTL_SECONDS`` so other workers' updates show up). Reading the
+k due items costs O(k log n) and a new review O(log n).
+
+``replay`` rebuilds every state from the full log history (nightly, with
+``python -m app.reviews``). It uses numpy when available, updating all
+groups at once for each attempt index like ``mastery.replay``, and falls
+back to a plain loop otherwise.
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .mastery import attempt_rounds, load_numpy
+from .metrics import metrics
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+PASSING_QUALITY = 3
+
+
+def quality(score: float) -> int:
+    """SM-2 quality (0-5) of a 0-100 proficiency score"""
+    return int(round(min(100.0, max(0.0, score)) / 20))
+
+
+def schedule(ease: float, interval: float, repetitions: int, q: int) -> Tuple[float, float, int]:
+    """(ease, interval in days, repetitions) after one review of quality ``q``"""
+    ease = max(MIN_EASE, ease + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+    if q < PASSING_QUALITY:
+        return ease, 1.0, 0
+    repetitions += 1
+    if repetitions == 1:
+        interval = 1.0
+    elif repetitions == 2:
+        interval = 6.0
+    else:
+        interval = float(round(interval * ease))
+    return ease, interval, repetitions
+
+
+def _replay_python(groups: Sequence[int], qualities: Sequence[int], group_count: int):
+    eases = [INITIAL_EASE] * group_count
+    intervals = [0.0] * group_count
+    repetitions = [0] * group_count
+    for group, q in zip(groups, qualities):
+        eases[group], intervals[group], repetitions[group] = schedule(
+            eases[group], intervals[group], repetitions[group], q
+        )
+    return eases, intervals, repetitions
+
+
+def _replay_numpy(groups, qualities, group_count: int):
+    np = load_numpy()
+    groups = np.asarray(groups, dtype=np.int64)
+    qualities = np.asarray(qualities, dtype=np.int64)
+    eases = np.full(group_count, INITIAL_EASE)
+    intervals = np.zeros(group_count)
+    repetitions = np.zeros(group_count, dtype=np.int64)
+    if not len(groups):
+        return eases, intervals, repetitions
+
+    for index in attempt_rounds(groups):
+        group, q = groups[index], qualities[index]
+        passed = q >= PASSING_QUALITY
+        eases[group] = np.maximum(MIN_EASE, eases[group] + 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02))
+        streak = np.where(passed, repetitions[group] + 1, 0)
+        intervals[group] = np.where(
+            ~passed | (streak == 1), 1.0, np.where(streak == 2, 6.0, np.round(intervals[group] * eases[group]))
+        )
+        repetitions[group] = streak
+    return eases, intervals, repetitions
+
+
+def replay(groups: Sequence[int], qualities: Sequence[int], group_count: int,
+           vectorized: Optional[bool] = None) -> Tuple[List[float], List[float], List[int]]:
+    """Final (eases, intervals, repetitions) per group for chronologically
+    ordered reviews, where ``groups[i]`` is the 0-based group of review i"""
+    if vectorized is None:
+        vectorized = load_numpy() is not None
+    if vectorized:
+        eases, intervals, repetitions = _replay_numpy(groups, qualities, group_count)
+        return eases.tolist(), intervals.tolist(), repetitions.tolist()
+    return _replay_python(groups, qualities, group_count)
+
+
+def due_at(reviewed_at: datetime, interval: float) -> datetime:
+    return reviewed_at + timedelta(days=interval)
+
+
+@dataclass(frozen=True)
+class DueItem:
+    subject: str
+    topic_key: str
+    topic: str
+    due_at: datetime
+    interval_days: float
+    ease: float
+    repetitions: int
+    last_score: Optional[float]
+
+    @classmethod
+    def from_row(cls, item: models.ReviewItem) -> "DueItem":
+        return cls(item.subject, item.topic_key, item.topic, item.due_at, item.interval_days,
+                   item.ease, item.repetitions, item.last_score)
+
+
+class StudentQueue:
+    """One student's review items in a heap keyed on ``due_at``. Updates
+    push a new entry; entries that no longer match the item are skipped"""
+
+    def __init__(self, items: List[DueItem]):
+        self.items: Dict[Tuple[str, str], DueItem] = {(i.subject, i.topic_key): i for i in items}
+        self.heap = [(item.due_at, key) for key, item in self.items.items()]
+        heapq.heapify(self.heap)
+        self.loaded_at = time.monotonic()
+
+    def push(self, item: DueItem) -> None:
+        key = (item.subject, item.topic_key)
+        self.items[key] = item
+        heapq.heappush(self.heap, (item.due_at, key))
+        if len(self.heap) > 2 * len(self.items) + 32:
+            self.heap = [(item.due_at, key) for key, item in self.items.items()]
+            heapq.heapify(self.heap)
+
+    def due(self, now: datetime, limit: int) -> List[DueItem]:
+        """Up to ``limit`` items due by ``now``, most overdue first"""
+        result, kept = [], {}
+        while self.heap and self.heap[0][0] <= now and len(result) < limit:
+            due, key = heapq.heappop(self.heap)
+            item = self.items.get(key)
+            if item is None or item.due_at != due or key in kept:
+                continue  # Stale or duplicate entry
+            kept[key] = due
+            result.append(item)
+        # Due items stay queued until they are reviewed
+        for key, due in kept.items():
+            heapq.heappush(self.heap, (due, key))
+        return result
+
+
+class ReviewQueue:
+    """LRU of per-student due-queues, loaded lazily and updated on writes"""
+
+    def __init__(self, max_students: int = 1000, ttl: float = 300.0):
+        self.max_students = max_students
+        self.ttl = ttl
+        self._queues: "OrderedDict[int, StudentQueue]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, student_id: int) -> StudentQueue:
+        rows = db.query(models.ReviewItem).filter(models.ReviewItem.student_id == student_id).all()
+        metrics.increment("review_queue_loads_total")
+        return StudentQueue([DueItem.from_row(row) for row in rows])
+
+    def _get(self, db: Session, student_id: int) -> StudentQueue:
+        with self._lock:
+            queue = self._queues.get(student_id)
+            if queue is not None and time.monotonic() - queue.loaded_at < self.ttl:
+                self._queues.move_to_end(student_id)
+                return queue
+        queue = self._load(db, student_id)
+        with self._lock:
+            self._queues[student_id] = queue
+            self._queues.move_to_end(student_id)
+            while len(self._queues) > self.max_students:
+                self._queues.popitem(last=False)
+            metrics.set_gauge("review_queue_students", len(self._queues))
+        return queue
+
+    def update(self, student_id: int, item: DueItem) -> None:
+        # Students without a loaded queue pick the row up when it is loaded
+        with self._lock:
+            queue = self._queues.get(student_id)
+            if queue is not None:
+                queue.push(item)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._queues.clear()
+
+    def due(self, db: Session, student_id: int, now: Optional[datetime] = None, limit: int = 20) -> List[DueItem]:
+        queue = self._get(db, student_id)
+        with self._lock:
+            return queue.due(now or datetime.utcnow(), limit)
+
+
+# Global due-queue cache
+review_queue = ReviewQueue(
+    max_students=settings.REVIEW_CACHE_MAX_STUDENTS,
+    ttl=settings.REVIEW_CACHE_TTL_SECONDS,
+)
+
+
+if __name__ == "__main__":
+    from .crud import recompute_reviews
+    from .sharding import shards
+
+    print(f"Recomputed {sum(shards.scatter(recompute_reviews).values())} review items")
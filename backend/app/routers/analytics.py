@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 
 from ..database import get_db
-from .. import models, schemas, crud
-from ..auth import get_current_user
+from .. import models, schemas, crud, mastery
+from ..auth import get_current_user, get_student_db
+from ..dependencies import get_admin_user, get_read_db
 
 router = APIRouter()
 
 @router.get("/progress", response_model=schemas.ProgressAnalytics)
 async def get_student_progress(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     analytics = crud.get_student_analytics(db, current_user.id)
@@ -27,14 +30,82 @@ async def get_student_progress(
 @router.post("/progress")
 async def log_progress(
     progress_log: schemas.ProgressLogCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     return crud.create_progress_log(db, progress_log, current_user.id)
 
 @router.get("/progress/history")
 async def get_progress_history(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    current_user: models.Student = Depends(get_current_user)
+):
+    return crud.get_student_progress(db, current_user.id)
+
+@router.get("/mastery", response_model=List[schemas.MasteryState])
+async def get_mastery(
+    db: Session = Depends(get_read_db),
+    current_user: models.Student = Depends(get_current_user)
+):
+    return [
+        schemas.MasteryState(
+            subject=state.subject,
+            topic=state.topic,
+            rating=state.rating,
+            attempts=state.attempts,
+            mastery=mastery.mastery_probability(state.rating),
+            recommended_difficulty=mastery.recommend_difficulty(state.rating)
+        )
+        for state in crud.get_mastery_states(db, current_user.id)
+    ]
+
+@router.get("/next-topic", response_model=schemas.TopicRecommendation)
+async def get_next_topic(
+    db: Session = Depends(get_read_db),
+    current_user: models.Student = Depends(get_current_user)
+):
+    recommendation = crud.get_next_topic(db, current_user.id)
+    if recommendation is None:
+        raise HTTPException(status_code=404, detail="No active curriculum with remaining topics")
+    return recommendation
+
+@router.get("/reviews/due", response_model=List[schemas.ReviewItem])
+async def get_due_reviews(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
     current_user: models.Student = Depends(get_current_user)
 ):
-    return crud.get_student_progress(db, current_user.id)
\ No newline at end of file
+    """Topics due for spaced-repetition review, most overdue first"""
+    return [
+        schemas.ReviewItem(
+            subject=item.subject,
+            topic=item.topic,
+            due_at=item.due_at,
+            interval_days=item.interval_days,
+            ease=item.ease,
+            repetitions=item.repetitions,
+            last_score=item.last_score
+        )
+        for item in crud.get_due_reviews(db, current_user.id, limit)
+    ]
+
+@router.get("/llm-usage", response_model=List[schemas.LLMUsageRow])
+async def get_llm_usage(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: str = Query("day", description="Comma-separated: day, student, method, model"),
+    student_id: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    db: Session = Depends(get_db),
+    admin: models.Student = Depends(get_admin_user)
+):
+    """LLM calls, cache hits, errors, tokens and latency from the daily
+    rollups (admins only); defaults to the last 30 days"""
+    groups = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in groups if name not in crud.LLM_USAGE_GROUPS]
+    if not groups or unknown:
+        raise HTTPException(status_code=400, detail=f"group_by must be from: {', '.join(crud.LLM_USAGE_GROUPS)}")
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    return crud.get_llm_usage(db, start, end, groups, student_id, limit)
+
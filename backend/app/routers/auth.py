@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
 from ..database import get_db
-from .. import models, schemas
+from .. import models, schemas, crud
 from ..auth import authenticate_user, create_access_token, get_current_user
 from ..config import settings
+from ..cache import cached_json_response, make_etag, student_tag
 
 router = APIRouter()
 
@@ -39,39 +41,25 @@ async def register_student(
     student_data: schemas.StudentCreate,
     db: Session = Depends(get_db)
 ):
-    # Check if email already exists
-    existing_student = db.query(models.Student).filter(
-        models.Student.email == student_data.email
-    ).first()
-    
-    if existing_student:
+    if crud.get_student_by_email(db, student_data.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Create new student
-    from ..auth import get_password_hash
-    hashed_password = get_password_hash(student_data.password)
-    
-    db_student = models.Student(
-        email=student_data.email,
-        hashed_password=hashed_password,
-        full_name=student_data.full_name,
-        grade_level=student_data.grade_level,
-        learning_style=student_data.learning_style,
-        weak_subjects=student_data.weak_subjects,
-        learning_goals=student_data.learning_goals
-    )
-    
-    db.add(db_student)
-    db.commit()
-    db.refresh(db_student)
-    
-    return db_student
+    # bcrypt is deliberately slow; keep it off the event loop
+    return await run_in_threadpool(crud.create_student, db, student_data)
 
 @router.get("/me", response_model=schemas.Student)
 async def read_current_user(
+    request: Request,
     current_user: models.Student = Depends(get_current_user)
 ):
-    return current_user
\ No newline at end of file
+    return cached_json_response(
+        request,
+        key=f"student:{current_user.id}",
+        etag=make_etag("student", current_user.id, current_user.version),
+        last_modified=current_user.updated_at or current_user.created_at,
+        tags=[student_tag(current_user.id)],
+        render=lambda: schemas.Student.from_orm_trusted(current_user).model_dump_json()
+    )
\ No newline at end of file
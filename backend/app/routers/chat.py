@@ -1,18 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, WebSocket
 from sqlalchemy.orm import Session
 from typing import List
 
 from ..database import get_db
-from .. import models, schemas, crud
-from ..auth import get_current_user
-from ..ai_utils import ai_tutor
+from .. import models, schemas, crud, mastery
+from ..auth import get_current_user, get_student_db
+from ..dependencies import ai_admission, ip_ai_rate_limit, student_ai_rate_limit
+from ..ai_utils import ai_tutor, AIServiceError, CHAT_FALLBACK_MESSAGE
+from ..chat_channel import ChatChannel
+from ..llm_usage import usage_ledger
+from ..retrieval import retrieval
+from ..semantic_cache import semantic_cache
+from ..write_behind import chat_message, chat_writer
 
 router = APIRouter()
 
 @router.post("/sessions", response_model=schemas.ChatSession)
 async def create_chat_session(
     session_data: dict,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     db_session = models.ChatSession(
@@ -26,54 +32,125 @@ async def create_chat_session(
 
 @router.get("/sessions", response_model=List[schemas.ChatSession])
 async def get_chat_sessions(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     return db.query(models.ChatSession).filter(
         models.ChatSession.student_id == current_user.id
     ).order_by(models.ChatSession.updated_at.desc()).all()
 
-@router.post("/message")
+@router.get("/sessions/{session_id}/messages", response_model=List[schemas.ChatMessage])
+async def get_chat_messages(
+    session_id: int,
+    db: Session = Depends(get_student_db),
+    current_user: models.Student = Depends(get_current_user)
+):
+    """Full transcript of a session, including archived messages"""
+    session = db.query(models.ChatSession).filter(
+        models.ChatSession.id == session_id,
+        models.ChatSession.student_id == current_user.id
+    ).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return crud.get_chat_messages(db, session_id)
+
+@router.post("/message", dependencies=[Depends(student_ai_rate_limit()), Depends(ai_admission)])
 async def send_chat_message(
     message_data: dict,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_user)
 ):
-    # Create message in database
-    db_message = models.ChatMessage(
-        session_id=message_data['session_id'],
-        content=message_data['content'],
-        is_user=True,
-        message_type='question'
-    )
-    db.add(db_message)
+    session_id, content = message_data['session_id'], message_data['content']
+    session = db.query(models.ChatSession.id).filter(
+        models.ChatSession.id == session_id,
+        models.ChatSession.student_id == current_user.id
+    ).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
     
-    # Get AI response
-    response = await ai_tutor.chat_assistance(
-        message_data['content'],
-        message_data.get('student_context', {})
-    )
+    # Retrieve grounding from the student's own curriculum (and past chats
+    # unless the answer could be shared), then hand the connection back to
+    # the pool before the (slow) LLM call
+    references = retrieval.search(db, current_user.id, content, include_chat=not semantic_cache.cacheable(content))
+    student_id, grade_level = current_user.id, current_user.grade_level
+    db.close()
     
-    # Save AI response
-    ai_message = models.ChatMessage(
-        session_id=message_data['session_id'],
-        content=response,
-        is_user=False,
-        message_type='explanation'
-    )
-    db.add(ai_message)
+    with usage_ledger.student(student_id):
+        response = await ai_tutor.chat_assistance(
+            content,
+            message_data.get('student_context', {}),
+            references=references,
+            grade_level=grade_level
+        )
     
-    db.commit()
+    # Persisted in batches by the write-behind buffer
+    await chat_writer.add(
+        student_id,
+        chat_message(session_id, content, True, 'question'),
+        chat_message(session_id, response, False,
+                     'fallback' if response == CHAT_FALLBACK_MESSAGE else 'explanation')
+    )
     
     return {"response": response}
 
-@router.post("/practice-question")
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    """Persistent chat channel: authenticate once (``?token=`` or an ``auth``
+    frame), optionally resume ``?session_id=``, then stream answers per turn"""
+    channel = ChatChannel(websocket)
+    if await channel.open():
+        await channel.run()
+
+@router.post("/practice-question", dependencies=[Depends(ip_ai_rate_limit()), Depends(ai_admission)])
 async def generate_practice_question(
     question_data: dict,
     db: Session = Depends(get_db)
 ):
-    question = await ai_tutor.generate_practice_question(
-        question_data['topic'],
-        question_data.get('difficulty', 'medium')
+    try:
+        question = await ai_tutor.generate_practice_question(
+            question_data['topic'],
+            question_data.get('difficulty', 'medium')
+        )
+    except AIServiceError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return question
+
+@router.post("/practice-questions/batch", response_model=schemas.PracticeQuestionBatch,
+             dependencies=[Depends(student_ai_rate_limit(cost=3)), Depends(ai_admission)])
+async def generate_practice_question_batch(
+    request: schemas.PracticeQuestionBatchRequest,
+    db: Session = Depends(get_db),
+    student_db: Session = Depends(get_student_db),
+    current_user: models.Student = Depends(get_current_user)
+):
+    """Quiz-sized set of questions, served from the question bank and topped
+    up with one batched generation when the bank runs short"""
+    topic = request.topic.strip()
+    # Ratings live with the student's data, the bank on the primary (same session unless sharded)
+    difficulty = (request.difficulty or "").strip().lower() or mastery.recommend_difficulty(
+        crud.get_topic_rating(student_db, current_user.id, topic)
+    )
+    grade_level = request.grade_level or current_user.grade_level
+    
+    questions = crud.serve_practice_questions(db, topic, difficulty, grade_level, request.count)
+    served = [schemas.PracticeQuestion.model_validate(q, from_attributes=True) for q in questions]
+    generated = []
+    if len(served) < request.count:
+        try:
+            with usage_ledger.student(current_user.id):
+                generated = await ai_tutor.generate_practice_questions(
+                    topic, difficulty, request.count - len(served), grade_level,
+                    avoid=crud.get_practice_question_texts(db, topic, difficulty, grade_level)
+                )
+        except AIServiceError as e:
+            if not served:
+                raise HTTPException(status_code=503, detail=str(e))
+        crud.add_practice_questions(db, topic, difficulty, grade_level, generated, served=True)
+    
+    return schemas.PracticeQuestionBatch(
+        topic=topic,
+        difficulty=difficulty,
+        grade_level=grade_level,
+        questions=served + [schemas.PracticeQuestion(**q) for q in generated],
+        generated=len(generated)
     )
-    return question
\ No newline at end of file
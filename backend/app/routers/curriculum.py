@@ -1,18 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
 
-from ..database import get_db
 from .. import models, schemas, crud
-from ..auth import get_current_user
+from ..auth import get_current_user, get_student_db
+from ..dependencies import ai_admission, get_read_db, student_ai_rate_limit
 from ..ai_utils import ai_tutor
+from ..llm_usage import usage_ledger
+from ..cache import cached_json_response, make_etag, curricula_tag
 
 router = APIRouter()
 
-@router.post("/generate", response_model=schemas.Curriculum)
+curriculum_list_adapter = TypeAdapter(List[schemas.Curriculum])
+
+@router.post(
+    "/generate",
+    response_model=schemas.Curriculum,
+    # A curriculum costs up to 9 completions, so it drains the bucket faster
+    dependencies=[Depends(student_ai_rate_limit(cost=5)), Depends(ai_admission)]
+)
 async def generate_curriculum(
     background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    mode: Optional[Literal["single", "parallel"]] = None,
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     """Generate personalized curriculum using AI"""
@@ -27,7 +38,8 @@ async def generate_curriculum(
     
     try:
         # Generate curriculum using AI
-        curriculum_data = await ai_tutor.generate_curriculum(student_data)
+        with usage_ledger.student(current_user.id):
+            curriculum_data = await ai_tutor.generate_curriculum(student_data, mode=mode)
         
         # Save to database
         curriculum = crud.create_curriculum(
@@ -46,20 +58,49 @@ async def generate_curriculum(
 
 @router.get("/", response_model=List[schemas.Curriculum])
 async def get_student_curricula(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     """Get all curricula for current student"""
-    return crud.get_student_curricula(db, current_user.id)
+    count, version_sum, max_id, last_modified = crud.get_student_curricula_version(db, current_user.id)
+
+    def render():
+        curricula = crud.get_student_curricula(db, current_user.id)
+        return curriculum_list_adapter.dump_json(
+            [schemas.Curriculum.from_orm_trusted(curriculum) for curriculum in curricula]
+        )
+
+    return cached_json_response(
+        request,
+        key=f"curricula:{current_user.id}:list",
+        etag=make_etag("curricula", current_user.id, count, version_sum, max_id),
+        last_modified=last_modified,
+        tags=[curricula_tag(current_user.id)],
+        render=render
+    )
 
 @router.get("/{curriculum_id}", response_model=schemas.CurriculumWithWeeks)
 async def get_curriculum_detail(
     curriculum_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     """Get detailed curriculum with weekly plans"""
-    curriculum = crud.get_curriculum_with_weeks(db, curriculum_id, current_user.id)
-    if not curriculum:
+    version = crud.get_curriculum_version(db, curriculum_id, current_user.id)
+    if not version:
         raise HTTPException(status_code=404, detail="Curriculum not found")
-    return curriculum
\ No newline at end of file
+
+    def render():
+        curriculum = crud.get_curriculum_with_weeks(db, curriculum_id, current_user.id)
+        return schemas.CurriculumWithWeeks.from_orm_trusted(curriculum).model_dump_json()
+
+    return cached_json_response(
+        request,
+        key=f"curricula:{current_user.id}:{curriculum_id}",
+        etag=make_etag("curriculum", curriculum_id, version.version),
+        last_modified=version.updated_at,
+        tags=[curricula_tag(current_user.id)],
+        render=render
+    )
\ No newline at end of file
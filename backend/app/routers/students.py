@@ -1,17 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from typing import List
 
 from ..database import get_db
-from .. import models, schemas, crud
-from ..auth import get_current_user
+from .. import models, schemas, crud, roster
+from ..auth import get_current_user, get_student_db
+from ..dependencies import get_admin_user
+from ..cache import cached_json_response, make_etag, response_cache, student_tag
+from ..sharding import shards
 
 router = APIRouter()
 
+@router.post("/import")
+async def import_roster(
+    file: UploadFile = File(...),
+    stream: bool = False,
+    db: Session = Depends(get_db),
+    admin: models.Student = Depends(get_admin_user)
+):
+    """Register a whole roster (CSV or JSON) in one request; with ``stream``
+    the response is NDJSON progress lines ending in the result"""
+    fmt = roster.roster_format(file.filename, file.content_type)
+    try:
+        rows = roster.parse_roster(await file.read(), fmt)
+        if stream:
+            return StreamingResponse(roster.stream_import(db, rows), media_type="application/x-ndjson")
+        return await run_in_threadpool(roster.import_roster, db, rows)
+    except roster.RosterError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/{student_id}", response_model=schemas.Student)
 async def get_student(
     student_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     if current_user.id != student_id:
@@ -20,22 +45,42 @@ async def get_student(
     student = crud.get_student(db, student_id)
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    return student
+    return cached_json_response(
+        request,
+        key=f"student:{student.id}",
+        etag=make_etag("student", student.id, student.version),
+        last_modified=student.updated_at or student.created_at,
+        tags=[student_tag(student.id)],
+        render=lambda: schemas.Student.from_orm_trusted(student).model_dump_json()
+    )
 
 @router.put("/{student_id}", response_model=schemas.Student)
 async def update_student(
     student_id: int,
     student_update: schemas.StudentBase,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_student_db),
     current_user: models.Student = Depends(get_current_user)
 ):
     if current_user.id != student_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this student")
     
+    # Logins find a student's shard by email
+    email = current_user.email
+    if student_update.email != email:
+        shards.rename(current_user.id, student_update.email)
+    
     # Update student fields
     for field, value in student_update.dict().items():
         setattr(current_user, field, value)
     
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        # Another request updated the row since it was loaded (version changed)
+        db.rollback()
+        if student_update.email != email:
+            shards.rename(current_user.id, email)
+        raise HTTPException(status_code=409, detail="Student was modified by another request; reload and retry")
     db.refresh(current_user)
+    response_cache.invalidate(student_tag(current_user.id))
     return current_user
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""Schema management through the alembic migrations in ``migrations/``.
+
+``app/models.py`` describes the tables and every index; migrations are
+generated from it (``alembic revision --autogenerate``) and are the only
+thing that changes a database. ``db/init.sql``, which the MySQL container
+runs on first start, is rendered from the same migrations, so the ORM,
+the migrations and the Docker schema cannot drift apart again.
+``app/tests/test_schema.py`` fails when they do.
+
+``migrate`` runs at app startup (``DATABASE_CREATE_TABLES``). Databases
+without alembic_version, created by ``create_all`` or the old ``init.sql``,
+are stamped with the newest revision whose tables they already have (see
+``REVISION_TABLES``), after the missing tables and indexes up to that
+revision are added; later revisions then run as usual.
+
+    python -m app.schema migrate     # ``alembic upgrade head`` on the primary and every shard
+    python -m app.schema check       # differences between the database and models.py
+    python -m app.schema init-sql    # regenerate db/init.sql
+"""
+import io
+import os
+import sys
+from typing import List, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+
+from . import models
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INIT_SQL_PATH = os.path.join(os.path.dirname(BACKEND_DIR), "db", "init.sql")
+BASELINE_REVISION = "0001"  # Schema of models.py when migrations were introduced
+BASELINE_TABLES = frozenset({
+    "students", "curricula", "weekly_plans", "progress_logs", "chat_sessions", "chat_messages",
+    "rate_limit_buckets", "ai_call_leases", "practice_questions", "mastery_states", "review_items",
+    "progress_summaries", "log_archives",
+})
+# Tables each revision creates, oldest first; how unversioned databases are dated
+REVISION_TABLES = (
+    (BASELINE_REVISION, BASELINE_TABLES),
+    ("0002", frozenset({"llm_usage", "llm_usage_daily"})),
+    ("0003", frozenset({"shard_directory"})),
+)
+
+INIT_SQL_HEADER = """-- Personal Tutor Bot Database Schema
+--
+-- GENERATED from backend/migrations by `python -m app.schema init-sql`; do
+-- not edit. Change backend/app/models.py and add a migration instead.
+
+CREATE DATABASE IF NOT EXISTS personal_tutor_bot;
+USE personal_tutor_bot;
+
+"""
+
+INIT_SQL_SAMPLE_DATA = """
+-- Insert sample data
+INSERT INTO students (email, hashed_password, full_name, grade_level, learning_style, weak_subjects, learning_goals, is_active, version) VALUES
+('demo@student.com', '$2b$12$examplehash', 'Demo Student', 7, 'VISUAL', '["Mathematics", "Science"]', 'Improve math problem-solving skills and science concepts', TRUE, 1);
+"""
+
+
+def alembic_config(connection: Optional[Connection] = None, url: Optional[str] = None, output_buffer=None):
+    from alembic.config import Config
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"), output_buffer=output_buffer)
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    if url is not None:
+        config.set_main_option("sqlalchemy.url", url)
+    return config
+
+
+def current_revision(connection: Connection) -> Optional[str]:
+    from alembic.migration import MigrationContext
+
+    return MigrationContext.configure(connection).get_current_revision()
+
+
+def _adopt_unversioned(connection: Connection) -> None:
+    # Tables without alembic_version: date them by the newest revision that
+    # created any of them, add what create_all / the old init.sql missed up to
+    # that revision, then record it
+    from alembic import command
+
+    existing = set(inspect(connection).get_table_names())
+    revision, names = BASELINE_REVISION, set()
+    for candidate, created in REVISION_TABLES:
+        if candidate != BASELINE_REVISION and not created & existing:
+            break
+        revision = candidate
+        names |= created
+    tables = [table for table in models.Base.metadata.sorted_tables if table.name in names]
+    models.Base.metadata.create_all(connection, tables=tables)
+    for table in tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+    command.stamp(alembic_config(connection), revision)
+
+
+def migrate(engine: Engine, revision: str = "head") -> None:
+    """Upgrade the database to ``revision``"""
+    from alembic import command
+
+    with engine.begin() as connection:
+        if current_revision(connection) is None and inspect(connection).has_table(models.Student.__tablename__):
+            _adopt_unversioned(connection)
+        command.upgrade(alembic_config(connection), revision)
+
+
+def schema_diff(engine: Engine) -> List[tuple]:
+    """alembic's autogenerate diff between the database and ``models.py``
+    (empty when they agree)"""
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+
+    with engine.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), models.Base.metadata)
+    return [change for change in diff if not (isinstance(change, tuple) and change[0] == "remove_table"
+                                              and change[1].name == "alembic_version")]
+
+
+def render_sql(dialect: str = "mysql", revision: str = "head") -> str:
+    """DDL of the migrations up to ``revision`` for ``dialect``, without a database"""
+    from alembic import command
+
+    buffer = io.StringIO()
+    config = alembic_config(output_buffer=buffer)
+    config.cmd_opts = type("Options", (), {"x": [f"dialect={dialect}"]})()
+    command.upgrade(config, revision, sql=True)
+    return buffer.getvalue()
+
+
+def render_init_sql() -> str:
+    return INIT_SQL_HEADER + render_sql("mysql") + INIT_SQL_SAMPLE_DATA
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    action = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if action == "migrate":
+        from .database import create_tables
+        create_tables()  # Shards too, unlike `alembic upgrade head`
+        with engine.connect() as connection:
+            print(f"Database at revision {current_revision(connection)}")
+    elif action == "check":
+        diff = schema_diff(engine)
+        for change in diff:
+            print(change)
+        sys.exit(1 if diff else 0)
+    elif action == "init-sql":
+        with open(INIT_SQL_PATH, "w") as handle:
+            handle.write(render_init_sql())
+        print(f"Wrote {INIT_SQL_PATH}")
+    else:
+        sys.exit(f"unknown action {action!r} (migrate, check, init-sql)")
@@ -1,8 +1,30 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional, Dict, Any, get_args, get_origin
+from datetime import date, datetime
 from .models import LearningStyle
 
+class TrustedORM:
+    """Mixin for response schemas serialized straight from our own ORM rows.
+
+    Rows written through crud.py were validated on the way in, so re-validating
+    them on every read (including the large curriculum JSON) is wasted work.
+    ``from_orm_trusted`` copies attributes with ``model_construct`` instead.
+    """
+
+    @classmethod
+    def from_orm_trusted(cls, obj):
+        values = {}
+        for name, field in cls.model_fields.items():
+            if not hasattr(obj, name):
+                continue
+            value = getattr(obj, name)
+            args = get_args(field.annotation)
+            if (value is not None and get_origin(field.annotation) is list and args
+                    and isinstance(args[0], type) and issubclass(args[0], TrustedORM)):
+                value = [args[0].from_orm_trusted(item) for item in value]
+            values[name] = value
+        return cls.model_construct(**values)
+
 # Authentication Schemas
 class Token(BaseModel):
     access_token: str
@@ -24,7 +46,7 @@ class StudentBase(BaseModel):
 class StudentCreate(StudentBase):
     password: str
 
-class Student(StudentBase):
+class Student(StudentBase, TrustedORM):
     id: int
     is_active: bool
     created_at: datetime
@@ -47,7 +69,7 @@ class CurriculumBase(BaseModel):
 class CurriculumCreate(CurriculumBase):
     pass
 
-class Curriculum(CurriculumBase):
+class Curriculum(CurriculumBase, TrustedORM):
     id: int
     student_id: int
     duration_weeks: int
@@ -70,7 +92,7 @@ class WeeklyPlanBase(BaseModel):
 class WeeklyPlanCreate(WeeklyPlanBase):
     curriculum_id: int
 
-class WeeklyPlan(WeeklyPlanBase):
+class WeeklyPlan(WeeklyPlanBase, TrustedORM):
     id: int
     curriculum_id: int
 
@@ -92,7 +114,7 @@ class ProgressLogBase(BaseModel):
 class ProgressLogCreate(ProgressLogBase):
     weekly_plan_id: int
 
-class ProgressLog(ProgressLogBase):
+class ProgressLog(ProgressLogBase, TrustedORM):
     id: int
     student_id: int
     weekly_plan_id: int
@@ -111,7 +133,7 @@ class ChatMessageBase(BaseModel):
 class ChatMessageCreate(ChatMessageBase):
     session_id: int
 
-class ChatMessage(ChatMessageBase):
+class ChatMessage(ChatMessageBase, TrustedORM):
     id: int
     session_id: int
     created_at: datetime
@@ -125,7 +147,7 @@ class ChatSessionBase(BaseModel):
 class ChatSessionCreate(ChatSessionBase):
     pass
 
-class ChatSession(ChatSessionBase):
+class ChatSession(ChatSessionBase, TrustedORM):
     id: int
     student_id: int
     created_at: datetime
@@ -186,6 +208,58 @@ class PracticeQuestion(BaseModel):
     explanation: str
     hint: str
 
+class PracticeQuestionBatchRequest(BaseModel):
+    topic: str = Field(..., min_length=1, max_length=255)
+    difficulty: Optional[str] = None  # Defaults to the level suggested by the student's mastery
+    count: int = Field(10, ge=1, le=20)
+    grade_level: Optional[int] = Field(None, ge=4, le=9)  # Defaults to the student's grade
+
+class PracticeQuestionBatch(BaseModel):
+    topic: str
+    difficulty: str
+    grade_level: int
+    questions: List[PracticeQuestion]
+    generated: int  # How many had to be generated now rather than served from the bank
+
+# Mastery Schemas
+class MasteryState(BaseModel):
+    subject: str
+    topic: str
+    rating: float
+    attempts: int
+    mastery: float  # Estimated chance of succeeding at a medium task
+    recommended_difficulty: str
+
+class TopicRecommendation(BaseModel):
+    subject: str
+    topic: str
+    week_number: int
+    mastery: float
+    difficulty: str
+
+class ReviewItem(BaseModel):
+    subject: str
+    topic: str
+    due_at: datetime
+    interval_days: float
+    ease: float
+    repetitions: int
+    last_score: Optional[float] = None
+
+class LLMUsageRow(BaseModel):
+    """LLM usage totals for one group; only the grouped-by keys are set"""
+    day: Optional[date] = None
+    student_id: Optional[int] = None  # 0 for calls outside a student's request
+    method: Optional[str] = None
+    model: Optional[str] = None
+    calls: int
+    cache_hits: int
+    errors: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_latency_ms: float
+    max_latency_ms: float
+
 # Response Schemas
 class SuccessResponse(BaseModel):
     success: bool
@@ -207,7 +281,7 @@ class HealthCheck(BaseModel):
 # Export all schemas for easy import
 __all__ = [
     # Authentication
-    "Token", "TokenData",
+    "Token", "TokenData", "TrustedORM",
     
     # Student
     "Student", "StudentCreate", "StudentUpdate", "StudentBase",
@@ -230,7 +304,13 @@ __all__ = [
     
     # AI
     "AICurriculumRequest", "AIChatRequest", "AIChatResponse", 
-    "PracticeQuestionRequest", "PracticeQuestion",
+    "PracticeQuestionRequest", "PracticeQuestion", "PracticeQuestionBatchRequest", "PracticeQuestionBatch",
+    
+    # Mastery
+    "MasteryState", "TopicRecommendation", "ReviewItem",
+    
+    # Usage
+    "LLMUsageRow",
     
     # Responses
     "SuccessResponse", "ErrorResponse", "HealthCheck"
@@ -0,0 +1,259 @@
+"""Semantic cache of tutoring answers for near-duplicate questions.
+
+Students in the same grade keep asking the same things in slightly
+different words ("what is a fraction", "explain fractions"). Questions are
+embedded with a CPU-only hashed bag of words + character trigrams, looked up
+in a per-grade index and, when a previous question is similar enough (cosine
+similarity at or above the threshold), its answer is served without calling
+upstream.
+
+A hit also requires the same content words and numbers in both questions
+("add 1/3 and 1/4" must not answer "add 2/5 and 1/4", nor "the first
+president of the united states" the second one: a single differing entity
+barely moves the similarity of a long question) and the same kind of
+question ("what is photosynthesis" must not answer "why is photosynthesis";
+see ``question_intent``). Paraphrases still hit because stop words, question
+scaffolding and plural/-ing endings are not content words. Long, highly specific questions and follow-ups that
+lean on the conversation ("why does it do that?") are not cached at all.
+"""
+import math
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from .config import settings
+from .metrics import metrics
+
+_WORDS = re.compile(r"[a-z]+|\d+(?:[./]\d+)?")
+
+# Question scaffolding that carries no topic information
+STOP_WORDS = frozenset("""
+    a an the is are was were be been am do does did can could would should will shall may might must
+    i me my we our you your it its this that these those there here of to in on for with at by from
+    about as into and or but if then so than what whats which who whom whose how why when where
+    explain tell show help please understand mean means meaning define definition describe
+    know need want get give some any just really also like thing things work works happen happens
+    don dont homework
+""".split())
+
+# Interrogatives are left out of the content words (they would dominate the
+# similarity of short questions) and compared as the question's intent instead
+QUESTION_WORDS = {
+    "what": "what", "whats": "what", "which": "what",
+    "how": "how", "why": "why", "who": "who", "whom": "who", "whose": "who", "when": "when", "where": "where",
+}
+
+# Questions referring back to the conversation only make sense in context
+REFERENTIAL_WORDS = frozenset("it this that these those they them he she above previous earlier next".split())
+
+VECTOR_DIMENSIONS = 1 << 18
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.35
+MAX_CANDIDATES = 64
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _hash(feature: str) -> int:
+    return zlib.crc32(feature.encode()) % VECTOR_DIMENSIONS
+
+
+def analyze(text: str) -> Tuple[List[str], FrozenSet[str]]:
+    """Split a question into stemmed content words and the numbers it contains"""
+    words, numbers = [], set()
+    for token in _WORDS.findall(text.lower()):
+        if token[0].isdigit():
+            numbers.add(token)
+        elif len(token) > 1 and token not in STOP_WORDS:
+            words.append(_stem(token))
+    return words, frozenset(numbers)
+
+
+def question_intent(text: str) -> FrozenSet[str]:
+    """Kinds of question asked; without an interrogative ("explain fractions")
+    the question asks what something is"""
+    intents = frozenset(QUESTION_WORDS[word] for word in _WORDS.findall(text.lower()) if word in QUESTION_WORDS)
+    return intents or frozenset({"what"})
+
+
+def embed(words: List[str]) -> Dict[int, float]:
+    """L2-normalized sparse vector of hashed words and character trigrams"""
+    vector: Dict[int, float] = {}
+    for word in words:
+        index = _hash(word)
+        vector[index] = vector.get(index, 0.0) + WORD_WEIGHT
+        padded = f"<{word}>"
+        for start in range(len(padded) - 2):
+            index = _hash(padded[start:start + 3])
+            vector[index] = vector.get(index, 0.0) + TRIGRAM_WEIGHT
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {index: value / norm for index, value in vector.items()} if norm else {}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(index, 0.0) for index, value in a.items())
+
+
+@dataclass
+class CachedAnswer:
+    entry_id: int
+    partition: str
+    question: str
+    answer: str
+    vector: Dict[int, float]
+    words: FrozenSet[str]
+    numbers: FrozenSet[str]
+    intent: FrozenSet[str]
+    latency_ms: float
+    expires_at: float
+
+
+class SemanticCache:
+    """Memory-bounded LRU of answers with a per-partition inverted index.
+
+    Candidates are the entries sharing at least one content word with the
+    query (most shared first); only those are scored, so lookups stay cheap
+    as the cache fills up.
+    """
+
+    def __init__(self, max_entries: int = 5000, threshold: float = 0.8, ttl_seconds: int = 86400,
+                 max_question_chars: int = 300, enabled: bool = True):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_question_chars = max_question_chars
+        self.enabled = enabled
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._index: Dict[Tuple[str, str], Set[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.latency_saved_ms = 0.0
+
+    def _features(self, question: str) -> Optional[Tuple[List[str], FrozenSet[str], FrozenSet[str]]]:
+        """Content words, numbers and intent of a cacheable question, None otherwise"""
+        if not self.enabled or len(question) > self.max_question_chars:
+            return None
+        if REFERENTIAL_WORDS.intersection(_WORDS.findall(question.lower())):
+            return None
+        words, numbers = analyze(question)
+        return (words, numbers, question_intent(question)) if words else None
+
+    def cacheable(self, question: str) -> bool:
+        """Whether answers to ``question`` can be looked up and stored at all"""
+        return self._features(question) is not None
+
+    def lookup(self, partition: str, question: str) -> Optional[str]:
+        """Answer of the most similar cached question, or None on a miss"""
+        features = self._features(question)
+        if features is None:
+            return None
+        words, numbers, intent = features
+        vector, word_set = embed(words), frozenset(words)
+        now = time.monotonic()
+
+        with self._lock:
+            self.lookups += 1
+            shared: Dict[int, int] = {}
+            for word in set(words):
+                for entry_id in self._index.get((partition, word), ()):
+                    shared[entry_id] = shared.get(entry_id, 0) + 1
+            candidates = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES]
+
+            best, best_score = None, self.threshold
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                if entry.words != word_set or entry.numbers != numbers or entry.intent != intent:
+                    continue
+                score = cosine(vector, entry.vector)
+                if score >= best_score:
+                    best, best_score = entry, score
+
+            if best is None:
+                metrics.increment("semantic_cache_lookups_total", outcome="miss")
+                return None
+            self._entries.move_to_end(best.entry_id)
+            self.hits += 1
+            self.latency_saved_ms += best.latency_ms
+
+        metrics.increment("semantic_cache_lookups_total", outcome="hit")
+        metrics.observe("semantic_cache_latency_saved_ms", best.latency_ms)
+        metrics.observe("semantic_cache_hit_similarity", best_score)
+        return best.answer
+
+    def store(self, partition: str, question: str, answer: str, latency_ms: float) -> None:
+        """Remember ``answer`` along with how long upstream took to produce it"""
+        features = self._features(question)
+        if features is None:
+            return
+        words, numbers, intent = features
+        with self._lock:
+            self._next_id += 1
+            entry = CachedAnswer(
+                entry_id=self._next_id,
+                partition=partition,
+                question=question,
+                answer=answer,
+                vector=embed(words),
+                words=frozenset(words),
+                numbers=numbers,
+                intent=intent,
+                latency_ms=latency_ms,
+                expires_at=time.monotonic() + self.ttl_seconds,
+            )
+            self._entries[entry.entry_id] = entry
+            for word in entry.words:
+                self._index.setdefault((partition, word), set()).add(entry.entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+            metrics.set_gauge("semantic_cache_entries", len(self._entries))
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for word in entry.words:
+            ids = self._index.get((entry.partition, word))
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._index[(entry.partition, word)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self.lookups = self.hits = 0
+            self.latency_saved_ms = 0.0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "latency_saved_ms": self.latency_saved_ms,
+            }
+
+
+# Global answer cache shared by every AITutor instance in this worker
+semantic_cache = SemanticCache(
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    enabled=settings.SEMANTIC_CACHE_ENABLED,
+)
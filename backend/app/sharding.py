@@ -0,0 +1,478 @@
+"""Horizontal sharding of student data across databases.
+
+Every student-owned table hangs off ``students.id``, so a student's row and
+all of their data (curricula and weekly plans, progress logs, chat
+sessions and messages, mastery, reviews, archives) live together on one
+shard. Every shard runs the full schema. The primary (``DATABASE_URL``)
+keeps what is shared: the practice question bank, rate-limit buckets, AI
+call leases, the LLM usage ledger and ``shard_directory``.
+
+Placement: a new student's id is allocated by inserting their
+``shard_directory`` row, because ids must be unique across shards. The
+shard is picked by consistent hashing of that id on a ring with
+``SHARD_VIRTUAL_NODES`` points per shard. From then on the directory, not
+the ring, is authoritative. Adding a shard changes where new students go.
+``rebalance`` then moves the students the ring now places on another
+shard: about 1/N of them, one at a time. Workers cache locations for
+``SHARD_DIRECTORY_CACHE_SECONDS``.
+
+Routing: ``auth.get_student_db`` yields a session on the authenticated
+student's shard, so the routes and ``crud`` functions that take it are
+unchanged. Background writers open ``shards.session_for(student_id)``.
+Cohort-level work (retention, mastery and review recomputes, pre-warm
+demand) runs on every shard in parallel through ``shards.scatter`` and
+merges the partial results. Read replicas (app/replicas.py) only serve
+unsharded deployments. Without ``DATABASE_SHARD_URLS`` the primary is the
+only shard and the directory is not used.
+
+Moves copy the student's rows to the target shard in one transaction, then
+repoint the directory, then delete the rows from the old shard. The
+student's own id is kept, while their other rows get new ids because ids
+are per-shard sequences. Workers that cached the old location keep using it
+until the entry expires, so move students while they are idle.
+
+Local testing: list two or more SQLite files or MySQL servers in
+``DATABASE_SHARD_URLS``. A shard may reuse the primary's URL, which is how
+an existing database becomes the first shard (then run ``adopt``). See
+``benchmarks/bench_shards.py``.
+
+    python -m app.sharding status                  # students per shard
+    python -m app.sharding adopt                   # register students already on the shards
+    python -m app.sharding rebalance [--dry-run] [--limit N]
+    python -m app.sharding move STUDENT_ID SHARD
+"""
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import create_engine, delete, func, insert, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models
+from .config import settings
+from .database import SessionLocal, pool_options
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "primary"  # The only shard when sharding is off
+
+# Tables holding a student's rows besides ``students``, parents first, with
+# the foreign keys that are remapped to the new parent ids on a move
+STUDENT_TABLES = (
+    (models.Curriculum, {}),
+    (models.WeeklyPlan, {"curriculum_id": "curricula"}),
+    (models.ProgressLog, {"weekly_plan_id": "weekly_plans"}),
+    (models.ChatSession, {}),
+    (models.ChatMessage, {"session_id": "chat_sessions"}),
+    (models.MasteryState, {}),
+    (models.ReviewItem, {}),
+    (models.ProgressSummary, {}),
+    (models.LogArchive, {"session_id": "chat_sessions"}),
+)
+# The same foreign keys inside archived rows (log_archives.payload)
+ARCHIVED_FOREIGN_KEYS = {"weekly_plan_id": "weekly_plans", "session_id": "chat_sessions"}
+
+# One table's rows as column dicts
+Rows = List[Dict[str, Any]]
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing of student ids onto shard names"""
+
+    def __init__(self, names: Iterable[str], virtual_nodes: int = 64):
+        points = sorted((_hash(f"{name}#{index}"), name) for name in names for index in range(virtual_nodes))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def shard_for(self, student_id: int) -> str:
+        index = bisect.bisect(self._points, _hash(str(student_id))) % len(self._points)
+        return self._names[index]
+
+
+class DirectoryCache:
+    """Recently looked-up directory entries, each trusted for ``ttl`` seconds"""
+
+    def __init__(self, ttl: float, max_entries: int = 100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Any], Tuple[float, Tuple[int, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, Any]) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key: Tuple[str, Any], value: Tuple[int, str]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, *keys: Tuple[str, Any]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+def student_rows(db: Session, student_id: int) -> Dict[str, Rows]:
+    """Every row of one student on the shard behind ``db``, by table, parents first"""
+    students = models.Student.__table__
+    rows = {students.name: [dict(row) for row in db.execute(
+        select(students).where(students.c.id == student_id)
+    ).mappings()]}
+    for model, foreign_keys in STUDENT_TABLES:
+        table = model.__table__
+        if "student_id" in table.c:
+            condition = table.c.student_id == student_id
+        else:
+            column, parent = next(iter(foreign_keys.items()))
+            condition = table.c[column].in_([row["id"] for row in rows[parent]])
+        rows[table.name] = [dict(row) for row in db.execute(
+            select(table).where(condition).order_by(table.c.id)
+        ).mappings()]
+    return rows
+
+
+def _remap_payload(payload: bytes, ids: Dict[str, Dict[int, int]]) -> bytes:
+    from .retention import pack_rows, unpack_rows
+
+    archived = unpack_rows(payload)
+    for row in archived:
+        for column, parent in ARCHIVED_FOREIGN_KEYS.items():
+            if row.get(column) is not None:
+                row[column] = ids[parent].get(row[column], row[column])
+    return pack_rows(archived)
+
+
+def copy_rows(db: Session, rows: Dict[str, Rows]) -> None:
+    """Insert ``student_rows`` output on the shard behind ``db`` (caller commits).
+    The student keeps their id; other rows get new ones and references follow"""
+    db.execute(insert(models.Student.__table__), rows[models.Student.__tablename__])
+    parents = {parent for _, foreign_keys in STUDENT_TABLES for parent in foreign_keys.values()}
+    ids: Dict[str, Dict[int, int]] = {}
+    for model, foreign_keys in STUDENT_TABLES:
+        table = model.__table__
+        copies = []
+        for row in rows[table.name]:
+            copy = {column: value for column, value in row.items() if column != "id"}
+            for column, parent in foreign_keys.items():
+                if copy[column] is not None:
+                    copy[column] = ids[parent].get(copy[column], copy[column])
+            if table is models.LogArchive.__table__:
+                copy["payload"] = _remap_payload(copy["payload"], ids)
+            copies.append(copy)
+        if table.name in parents:
+            # Children need the new ids, which only single-row inserts report everywhere
+            ids[table.name] = {
+                row["id"]: db.execute(insert(table).values(**copy)).inserted_primary_key[0]
+                for row, copy in zip(rows[table.name], copies)
+            }
+        elif copies:
+            db.execute(insert(table), copies)
+
+
+def delete_rows(db: Session, rows: Dict[str, Rows], chunk_size: int = 1000) -> None:
+    """Delete ``student_rows`` output, children first (caller commits)"""
+    for name in reversed(list(rows)):
+        table = models.Base.metadata.tables[name]
+        ids = [row["id"] for row in rows[name]]
+        for start in range(0, len(ids), chunk_size):
+            db.execute(delete(table).where(table.c.id.in_(ids[start:start + chunk_size])))
+
+
+class ShardSet:
+    def __init__(self, shards: List[Tuple[str, str]], primary: sessionmaker = SessionLocal,
+                 primary_url: str = settings.DATABASE_URL, virtual_nodes: int = 64,
+                 cache_seconds: float = 30.0, cache_size: int = 100000):
+        names = [name for name, _ in shards]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate shard names in {names}")
+        self.primary = primary
+        self.enabled = bool(shards)
+        self.sessionmakers: Dict[str, sessionmaker] = {
+            name: primary if url == primary_url else sessionmaker(
+                autocommit=False, autoflush=False,
+                bind=create_engine(url, pool_pre_ping=True, **pool_options(url))
+            )
+            for name, url in shards
+        } or {PRIMARY: primary}
+        self.ring = HashRing(self.sessionmakers, virtual_nodes)
+        self._cache = DirectoryCache(cache_seconds, cache_size)
+
+    def __bool__(self) -> bool:
+        return self.enabled
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.sessionmakers)
+
+    def engines(self) -> List[Engine]:
+        """Each shard's engine once (shards sharing the primary's URL share its engine)"""
+        engines: List[Engine] = []
+        for maker in self.sessionmakers.values():
+            if maker.kw["bind"] not in engines:
+                engines.append(maker.kw["bind"])
+        return engines
+
+    # Directory lookups
+
+    def _lookup(self, key: Tuple[str, Any], condition) -> Optional[Tuple[int, str]]:
+        entry = self._cache.get(key)
+        if entry is not None:
+            return entry
+        metrics.increment("shard_directory_lookups_total")
+        directory = models.ShardDirectory
+        with self.primary() as db:
+            row = db.query(directory.student_id, directory.email, directory.shard).filter(condition).first()
+        if row is None:
+            return None
+        entry = (row.student_id, row.shard)
+        for cache_key in (key, ("id", row.student_id), ("email", row.email)):
+            self._cache.set(cache_key, entry)
+        return entry
+
+    def locate(self, student_id: int) -> Optional[str]:
+        """Shard holding ``student_id`` (None if it is not in the directory)"""
+        if not self:
+            return PRIMARY
+        entry = self._lookup(("id", student_id), models.ShardDirectory.student_id == student_id)
+        return entry[1] if entry else None
+
+    def locate_email(self, email: str) -> Optional[str]:
+        if not self:
+            return PRIMARY
+        entry = self._lookup(("email", email), models.ShardDirectory.email == email)
+        return entry[1] if entry else None
+
+    def session(self, shard: Optional[str], **kwargs) -> Session:
+        """Session on ``shard``; on the primary for None (a student outside
+        the directory, who is then simply not found)"""
+        return (self.primary if shard is None else self.sessionmakers[shard])(**kwargs)
+
+    def session_for(self, student_id: int, **kwargs) -> Session:
+        return self.session(self.locate(student_id), **kwargs)
+
+    def session_for_email(self, email: Optional[str], **kwargs) -> Session:
+        return self.session(self.locate_email(email) if email else None, **kwargs)
+
+    # Placement
+
+    def insert_students(self, db: Session, rows: Rows) -> List[int]:
+        """Register students (``Student`` column values) in the directory on
+        ``db``, the primary, and insert each on its shard; returns their ids.
+        Raises IntegrityError, inserting nothing, when an email is taken"""
+        directory = models.ShardDirectory
+        emails = [row["email"] for row in rows]
+        db.execute(insert(directory), [{"email": email, "shard": ""} for email in emails])
+        ids = dict(db.query(directory.email, directory.student_id).filter(directory.email.in_(emails)))
+        placement = {email: self.ring.shard_for(ids[email]) for email in emails}
+        db.execute(update(directory), [
+            {"student_id": ids[email], "shard": shard} for email, shard in placement.items()
+        ])
+        db.commit()
+
+        by_shard: Dict[str, Rows] = defaultdict(list)
+        for row in rows:
+            by_shard[placement[row["email"]]].append(dict(row, id=ids[row["email"]]))
+        inserted: List[str] = []
+        try:
+            for shard, shard_rows in by_shard.items():
+                with self.session(shard) as shard_db:
+                    shard_db.execute(insert(models.Student), shard_rows)
+                    shard_db.commit()
+                inserted.append(shard)
+                metrics.increment("shard_students_placed_total", len(shard_rows), shard=shard)
+        except Exception:
+            # Undo the shards already written and the directory entries
+            for shard in inserted:
+                with self.session(shard) as shard_db:
+                    shard_db.query(models.Student).filter(
+                        models.Student.id.in_([row["id"] for row in by_shard[shard]])
+                    ).delete(synchronize_session=False)
+                    shard_db.commit()
+            db.query(directory).filter(directory.student_id.in_(list(ids.values()))).delete(
+                synchronize_session=False)
+            db.commit()
+            raise
+        return [ids[email] for email in emails]
+
+    def rename(self, student_id: int, email: str) -> None:
+        """Follow a student's email change (logins look students up by email)"""
+        if not self:
+            return
+        with self.primary() as db:
+            db.query(models.ShardDirectory).filter(models.ShardDirectory.student_id == student_id).update(
+                {models.ShardDirectory.email: email}, synchronize_session=False)
+            db.commit()
+        self._cache.discard(("id", student_id))
+
+    # Cohort-level queries
+
+    def scatter(self, fn: Callable[..., Any], *args, **kwargs) -> Dict[str, Any]:
+        """Run ``fn(session, *args, **kwargs)`` on every shard in parallel;
+        returns the results by shard name"""
+        def run(name: str) -> Any:
+            with self.sessionmakers[name]() as db:
+                return fn(db, *args, **kwargs)
+
+        if len(self.sessionmakers) == 1:
+            return {name: run(name) for name in self.sessionmakers}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(self.sessionmakers), thread_name_prefix="shard") as pool:
+            futures = {name: pool.submit(run, name) for name in self.sessionmakers}
+            results = {name: future.result() for name, future in futures.items()}
+        metrics.observe("shard_scatter_ms", (time.perf_counter() - started) * 1000)
+        return results
+
+    # Rebalancing
+
+    def move(self, student_id: int, target: str) -> Dict[str, int]:
+        """Move a student to ``target``; returns rows moved per table"""
+        source = self.locate(student_id)
+        if source is None:
+            raise KeyError(f"Student {student_id} is not in the shard directory")
+        if target not in self.sessionmakers:
+            raise KeyError(f"Unknown shard {target!r}")
+        if source == target:
+            return {}
+        started = time.perf_counter()
+        with self.session(source) as source_db, self.session(target) as target_db:
+            rows = student_rows(source_db, student_id)
+            if not rows[models.Student.__tablename__]:
+                raise KeyError(f"Student {student_id} is not on shard {source!r}")
+            copy_rows(target_db, rows)
+            target_db.commit()
+            try:
+                with self.primary() as db:
+                    db.query(models.ShardDirectory).filter(
+                        models.ShardDirectory.student_id == student_id
+                    ).update({models.ShardDirectory.shard: target}, synchronize_session=False)
+                    db.commit()
+            except Exception:
+                delete_rows(target_db, student_rows(target_db, student_id))
+                target_db.commit()
+                raise
+            delete_rows(source_db, rows)
+            source_db.commit()
+        self._cache.discard(("id", student_id), ("email", rows[models.Student.__tablename__][0]["email"]))
+        self._forget(student_id)
+        metrics.increment("shard_students_moved_total", source=source, target=target)
+        metrics.observe("shard_move_ms", (time.perf_counter() - started) * 1000)
+        return {name: len(table_rows) for name, table_rows in rows.items()}
+
+    @staticmethod
+    def _forget(student_id: int) -> None:
+        # This worker's caches hold the old row ids
+        from .cache import curricula_tag, response_cache, student_tag
+        from .retrieval import retrieval
+
+        response_cache.invalidate(curricula_tag(student_id))
+        response_cache.invalidate(student_tag(student_id))
+        retrieval.forget(student_id)
+
+    def misplaced(self, limit: Optional[int] = None) -> List[Tuple[int, str, str]]:
+        """(student id, shard, ring shard) for students the ring now puts elsewhere"""
+        directory = models.ShardDirectory
+        result = []
+        with self.primary() as db:
+            for student_id, shard in db.query(directory.student_id, directory.shard).order_by(
+                directory.student_id
+            ).yield_per(5000):
+                wanted = self.ring.shard_for(student_id)
+                if wanted != shard:
+                    result.append((student_id, shard, wanted))
+                    if limit is not None and len(result) >= limit:
+                        break
+        return result
+
+    def rebalance(self, limit: Optional[int] = None) -> int:
+        """Move misplaced students to their ring shard; returns how many moved"""
+        moved = 0
+        for student_id, shard, wanted in self.misplaced(limit):
+            self.move(student_id, wanted)
+            moved += 1
+            logger.info("Moved student %d from %s to %s", student_id, shard, wanted)
+        return moved
+
+    def adopt(self) -> Dict[str, int]:
+        """Register students already on the shards but not in the directory
+        (e.g. an existing database configured as a shard); returns how many per shard"""
+        directory = models.ShardDirectory
+        with self.primary() as db:
+            known = {student_id for (student_id,) in db.query(directory.student_id)}
+            adopted = {}
+            for name in self.sessionmakers:
+                with self.session(name) as shard_db:
+                    found = [
+                        {"student_id": student_id, "email": email, "shard": name}
+                        for student_id, email in shard_db.query(models.Student.id, models.Student.email)
+                        if student_id not in known
+                    ]
+                if found:
+                    db.execute(insert(directory), found)
+                    db.commit()
+                known.update(row["student_id"] for row in found)
+                adopted[name] = len(found)
+        return adopted
+
+    def status(self) -> Dict[str, int]:
+        """Students per shard according to the directory"""
+        directory = models.ShardDirectory
+        with self.primary() as db:
+            counts = dict(db.query(directory.shard, func.count(directory.student_id)).group_by(directory.shard))
+        return {name: counts.get(name, 0) for name in self.sessionmakers}
+
+
+# Global shard set; a single primary shard unless DATABASE_SHARD_URLS is set
+shards = ShardSet(
+    settings.shard_urls_list,
+    virtual_nodes=settings.SHARD_VIRTUAL_NODES,
+    cache_seconds=settings.SHARD_DIRECTORY_CACHE_SECONDS,
+    cache_size=settings.SHARD_DIRECTORY_CACHE_SIZE,
+)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Shard directory maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Students per shard")
+    commands.add_parser("adopt", help="Register students already on the shards")
+    rebalance = commands.add_parser("rebalance", help="Move students to the shard the ring places them on")
+    rebalance.add_argument("--dry-run", action="store_true")
+    rebalance.add_argument("--limit", type=int, default=None)
+    move = commands.add_parser("move", help="Move one student")
+    move.add_argument("student_id", type=int)
+    move.add_argument("shard")
+    args = parser.parse_args()
+
+    if not shards:
+        parser.exit(1, "Sharding is off: set DATABASE_SHARD_URLS\n")
+    if args.command == "status":
+        print(json.dumps(shards.status(), indent=2))
+    elif args.command == "adopt":
+        print(json.dumps(shards.adopt(), indent=2))
+    elif args.command == "rebalance" and args.dry_run:
+        for student_id, shard, wanted in shards.misplaced(args.limit):
+            print(f"{student_id}: {shard} -> {wanted}")
+    elif args.command == "rebalance":
+        print(f"Moved {shards.rebalance(args.limit)} students")
+    else:
+        print(json.dumps(shards.move(args.student_id, args.shard), indent=2))
@@ -0,0 +1,225 @@
+"""Coalescing of identical in-flight AI calls.
+
+When many students ask for the same thing at once (a teacher assigns a
+topic and the class opens it), only the first call - the leader - runs;
+the rest await its result. Calls are identical when the method, model and
+normalized inputs match (``flight_key``), and ``coalesce`` applies this to
+an ``AITutor`` method.
+
+Cancellation: the leader's work runs in its own task, so a leader whose
+client disconnects does not fail its followers. The work is cancelled only
+when every waiter has gone.
+
+With ``SINGLEFLIGHT_BACKEND=database`` the leader also takes a lease row in
+``ai_call_leases`` so leaders in other workers wait for its result (polling
+the row) instead of calling upstream themselves. A follower whose leader
+fails or times out runs the call itself.
+"""
+import asyncio
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+
+from .config import settings
+from .llm_usage import usage_ledger
+from .metrics import metrics
+
+_MISSING = object()
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, dict):
+        return {str(key): _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        items = [_normalize(item) for item in value]
+        return sorted(items, key=repr) if isinstance(value, set) else items
+    return value
+
+
+def flight_key(method: str, model: str, inputs: Dict[str, Any]) -> str:
+    payload = json.dumps([method, model, _normalize(inputs)], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DatabaseLeases:
+    """Cross-worker leadership through the ``ai_call_leases`` table: a
+    leader inserts the key's row and later stores its JSON result there"""
+
+    def __init__(self, lease_seconds: float, result_ttl: float, poll_interval: float = 0.05):
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+
+    def _claim(self, key: str) -> Tuple[bool, Any]:
+        """(True, _MISSING) if this worker now leads ``key``, else (False,
+        published result or _MISSING while the other leader is running)"""
+        from . import models
+        from .database import SessionLocal
+
+        now = time.time()
+        db = SessionLocal()
+        try:
+            lease = db.query(models.AICallLease).filter(models.AICallLease.key == key).first()
+            if lease is not None and lease.expires_at > now:
+                return False, _MISSING if lease.result is None else json.loads(lease.result)
+            if lease is not None:
+                db.delete(lease)
+                db.flush()
+            db.add(models.AICallLease(key=key, owner=self.owner, expires_at=now + self.lease_seconds))
+            db.commit()
+            return True, _MISSING
+        except IntegrityError:
+            db.rollback()
+            return False, _MISSING
+        finally:
+            db.close()
+
+    def _finish(self, key: str, result: Any) -> None:
+        from . import models
+        from .database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            query = db.query(models.AICallLease).filter(
+                models.AICallLease.key == key, models.AICallLease.owner == self.owner
+            )
+            if result is _MISSING:
+                query.delete(synchronize_session=False)
+            else:
+                query.update({
+                    models.AICallLease.result: json.dumps(result, default=str),
+                    models.AICallLease.expires_at: time.time() + self.result_ttl,
+                }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def lead_or_wait(self, key: str, timeout: float) -> Tuple[bool, Any]:
+        """(True, _MISSING) to lead; (False, result) when another worker's
+        leader published one; (True, _MISSING) again if it never does"""
+        deadline = time.monotonic() + timeout
+        while True:
+            leader, result = await run_in_threadpool(self._claim, key)
+            if leader or result is not _MISSING:
+                return leader, result
+            if time.monotonic() >= deadline:
+                metrics.increment("singleflight_remote_timeouts_total")
+                return True, _MISSING
+            await asyncio.sleep(self.poll_interval)
+
+    async def publish(self, key: str, result: Any) -> None:
+        await run_in_threadpool(self._finish, key, result)
+
+    async def release(self, key: str) -> None:
+        await run_in_threadpool(self._finish, key, _MISSING)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, leases: Optional[DatabaseLeases] = None, remote_wait: float = 60.0):
+        self.leases = leases
+        self.remote_wait = remote_wait
+        self._flights: Dict[str, _Flight] = {}
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[Any]], method: str, model: str) -> Any:
+        if self.leases is None:
+            return await fn()
+        started = time.perf_counter()
+        leader, result = await self.leases.lead_or_wait(key, self.remote_wait)
+        if not leader:
+            metrics.increment("singleflight_calls_total", method=method, role="remote_follower")
+            usage_ledger.record(method, model, latency_ms=(time.perf_counter() - started) * 1000, cache_hit=True)
+            return result
+        try:
+            result = await fn()
+        except BaseException:
+            await asyncio.shield(self.leases.release(key))
+            raise
+        await self.leases.publish(key, result)
+        return result
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+            metrics.set_gauge("singleflight_in_flight", len(self._flights))
+
+    def _done(self, key: str, flight: _Flight, task: asyncio.Task) -> None:
+        self._forget(key, flight)
+        if not task.cancelled():
+            task.exception()  # Retrieved here so an unawaited failure is not logged as lost
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], method: str = "", model: str = "") -> Any:
+        """Result of ``fn()``, shared with every identical call in flight"""
+        started = time.perf_counter()
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight(asyncio.get_running_loop().create_task(self._lead(key, fn, method, model)))
+            flight.task.add_done_callback(functools.partial(self._done, key, flight))
+            self._flights[key] = flight
+            metrics.set_gauge("singleflight_in_flight", len(self._flights))
+        metrics.increment("singleflight_calls_total", method=method, role="leader" if leader else "follower")
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the answer any more
+                metrics.increment("singleflight_abandoned_total", method=method)
+                self._forget(key, flight)
+                flight.task.cancel()
+        if leader:
+            return result
+        usage_ledger.record(method, model, latency_ms=(time.perf_counter() - started) * 1000, cache_hit=True)
+        # Followers get their own copy, so callers may modify what they receive
+        return copy.deepcopy(result)
+
+
+def _build_flights() -> SingleFlight:
+    leases = None
+    if settings.SINGLEFLIGHT_BACKEND == "database":
+        leases = DatabaseLeases(settings.SINGLEFLIGHT_LEASE_SECONDS, settings.SINGLEFLIGHT_RESULT_TTL_SECONDS)
+    return SingleFlight(leases, remote_wait=settings.SINGLEFLIGHT_LEASE_SECONDS)
+
+
+# Global coalescer for AI calls
+ai_flights = _build_flights()
+
+
+def coalesce(method: str, model: str = "gpt-4"):
+    """Decorator for ``AITutor`` methods: identical concurrent calls share one result"""
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(self, *args, **kwargs):
+            if not settings.SINGLEFLIGHT_ENABLED:
+                return await fn(self, *args, **kwargs)
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            inputs = {name: value for name, value in bound.arguments.items() if name != "self"}
+            return await ai_flights.do(
+                flight_key(method, model, inputs), lambda: fn(self, *args, **kwargs), method, model
+            )
+        return wrapper
+    return decorate
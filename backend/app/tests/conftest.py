@@ -0,0 +1,108 @@
+"""Shared fixtures. The app under test runs against a scratch SQLite database
+and the fake LLM backend (app/llm_fake.py), so the suite needs neither MySQL
+nor an API key. The environment is set here, before anything imports
+``app.config``.
+"""
+import asyncio
+import os
+import tempfile
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{tempfile.mkdtemp(prefix='tutor_tests_')}/app.db",
+    DEBUG="false",
+    LLM_BACKEND="fake",
+    FAKE_LLM_LATENCY_MS="0",
+    RATE_LIMIT_ENABLED="false",
+    CHAT_WRITE_BEHIND_SPILL_PATH="",
+    CHAT_WRITE_BEHIND_DEAD_LETTER_PATH="",
+    LLM_RETRY_BASE_DELAY="0.01",
+    LLM_RETRY_MAX_DELAY="0.02",
+)
+
+_emails = count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:  # Runs startup: migrations, background jobs
+        yield test_client
+
+
+@pytest.fixture
+def db(client):
+    from app.database import SessionLocal
+
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def student(db):
+    """A fresh student and their bearer headers"""
+    from benchmarks.common import create_student
+
+    return create_student(db, email=f"student{next(_emails)}@example.com")
+
+
+class ScriptedLLM:
+    """Stand-in for the openai module that answers with scripted replies.
+
+    Each reply is a string, an exception to raise, or a callable taking the
+    messages; the last one repeats. Every call takes ``delay`` seconds and
+    streamed replies arrive in ``chunk_size`` pieces. ``calls`` records the
+    messages of every request, ``max_in_flight`` the peak concurrency.
+    """
+
+    def __init__(self, *replies, chunk_size: int = 40, delay: float = 0.0):
+        self.replies = list(replies)
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.calls = []
+        self.in_flight = self.max_in_flight = 0
+        self.ChatCompletion = self
+
+    async def acreate(self, model, messages, stream=False, **kwargs):
+        self.calls.append(messages)
+        reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+        if callable(reply) and not isinstance(reply, type):
+            reply = reply(messages)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if isinstance(reply, BaseException) or isinstance(reply, type):
+            raise reply
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+        async def chunks():
+            for start in range(0, len(reply), self.chunk_size):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta={"content": reply[start:start + self.chunk_size]})])
+        return chunks()
+
+
+@pytest.fixture
+def tutor(monkeypatch):
+    """A fresh AITutor (own resilience layer and question cache); assign
+    ``tutor.client = ScriptedLLM(...)`` to script its upstream"""
+    from app.ai_utils import AITutor
+    from app.llm_usage import usage_ledger
+
+    # Tests run their own event loops; the global ledger's flusher must not
+    # be started on one that is about to close
+    monkeypatch.setattr(usage_ledger, "enabled", False)
+    return AITutor()
+
+
+@pytest.fixture
+def scripted():
+    return ScriptedLLM
@@ -0,0 +1,87 @@
+"""Conditional GETs, the response body LRU and row-version conflicts (see app/cache.py)."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import update
+
+from app import crud, models, schemas
+from app.cache import ResponseCache
+from app.database import SessionLocal
+from app.llm_fake import _week
+from app.routers.students import update_student
+
+
+def profile(student, **changes):
+    return {"email": student.email, "full_name": student.full_name, "grade_level": student.grade_level,
+            "learning_style": student.learning_style.value, "weak_subjects": student.weak_subjects,
+            "learning_goals": student.learning_goals, **changes}
+
+
+def test_lru_evicts_least_recently_used_and_invalidates_by_tag():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", b"1", tags=["student:1"])
+    cache.set("b", b"2", tags=["student:2"])
+    assert cache.get("a") == b"1"
+    cache.set("c", b"3", tags=["student:1"])
+
+    assert cache.get("b") is None
+    assert cache.invalidate("student:1") == 2
+    assert cache.get("a") is None and cache.get("c") is None
+
+
+def test_expired_entries_are_misses():
+    cache = ResponseCache(ttl_seconds=-1)
+    cache.set("a", b"1")
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_if_none_match_answers_304_until_the_student_changes(client, student):
+    student, headers = student
+    first = client.get(f"/students/{student.id}", headers=headers)
+    etag = first.headers["etag"]
+    assert first.status_code == 200
+
+    repeat = client.get(f"/students/{student.id}", headers={**headers, "If-None-Match": etag})
+    assert repeat.status_code == 304 and repeat.content == b""
+
+    assert client.put(f"/students/{student.id}", headers=headers,
+                      json=profile(student, full_name="Renamed")).status_code == 200
+    changed = client.get(f"/students/{student.id}", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag and changed.json()["full_name"] == "Renamed"
+
+
+def test_editing_a_week_changes_the_curriculum_etag(client, db, student):
+    student, headers = student
+    curriculum = crud.create_curriculum(db, {"title": "Stars", "weekly_plans": [_week(1, ["Astronomy"])]}, student.id)
+    assert curriculum.version == 1  # Creating the weeks alongside is not an edit
+    urls = ["/curriculum/", f"/curriculum/{curriculum.id}"]
+    etags = [client.get(url, headers=headers).headers["etag"] for url in urls]
+
+    week = curriculum.weekly_plans[0]
+    week.daily_breakdown = {**week.daily_breakdown, "monday": "Field trip"}
+    db.commit()
+    for url, etag in zip(urls, etags):
+        changed = client.get(url, headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert changed.json()["weekly_plans"][0]["daily_breakdown"]["monday"] == "Field trip"
+
+
+def test_concurrent_update_is_a_conflict_not_a_server_error(student):
+    student, _ = student
+    with SessionLocal() as db:
+        current_user = db.get(models.Student, student.id)
+        # Another request commits first, bumping the row version
+        with SessionLocal() as other:
+            other.execute(update(models.Student).where(models.Student.id == student.id).values(
+                version=models.Student.version + 1))
+            other.commit()
+
+        with pytest.raises(HTTPException) as conflict:
+            asyncio.run(update_student(student.id, schemas.StudentBase(**profile(student, full_name="Lost")),
+                                       db=db, current_user=current_user))
+    assert conflict.value.status_code == 409
+    with SessionLocal() as db:
+        assert db.get(models.Student, student.id).full_name == student.full_name
@@ -0,0 +1,48 @@
+"""WebSocket chat channel (see app/chat_channel.py)."""
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app import models
+from app.chat_channel import CLOSE_SESSION_NOT_FOUND, CLOSE_UNAUTHORIZED
+from benchmarks.common import create_student
+
+
+def _token(headers):
+    return headers["Authorization"].split()[1]
+
+
+def test_turns_stream_deltas_then_the_full_answer(client, student):
+    _, headers = student
+    with client.websocket_connect("/chat/ws") as websocket:
+        websocket.send_json({"type": "auth", "token": _token(headers)})
+        assert websocket.receive_json()["type"] == "ready"
+
+        websocket.send_json({"type": "message", "content": "How do I add fractions?"})
+        deltas = []
+        while (frame := websocket.receive_json())["type"] == "delta":
+            deltas.append(frame["content"])
+        assert frame["type"] == "done" and frame["content"] == "".join(deltas)
+        assert "How do I add fractions?" in frame["content"]
+
+        websocket.send_json({"type": "message", "content": ""})
+        assert websocket.receive_json()["status"] == 400
+        websocket.send_json({"type": "typing"})
+        assert websocket.receive_json() == {"type": "error", "status": 400, "detail": "Unsupported frame type"}
+
+
+def test_bad_tokens_and_other_students_sessions_are_closed(client, db, student):
+    owner, _ = student
+    session = models.ChatSession(student_id=owner.id, session_title="Private")
+    db.add(session)
+    db.commit()
+    _, intruder = create_student(db, email="intruder@example.com")
+
+    with client.websocket_connect("/chat/ws?token=not-a-token") as websocket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == CLOSE_UNAUTHORIZED
+
+    with client.websocket_connect(f"/chat/ws?token={_token(intruder)}&session_id={session.id}") as websocket:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+    assert closed.value.code == CLOSE_SESSION_NOT_FOUND
@@ -0,0 +1,38 @@
+"""Parallel outline + per-week curriculum generation (see AITutor._generate_curriculum_parallel)."""
+import asyncio
+import json
+import re
+
+from app.config import settings
+from app.models import LearningStyle
+
+STUDENT = {"grade_level": 8, "learning_style": LearningStyle.AUDITORY, "weak_subjects": ["Science"],
+           "learning_goals": "parallel test"}
+
+
+def reply(messages):
+    prompt = messages[-1]["content"]
+    if "Outline an 8-week" in prompt:
+        return json.dumps({"title": "Science Sprint", "description": "Eight weeks of science",
+                           "weeks": [{"week_number": n, "theme": f"Theme {n}", "focus_areas": ["Science"]}
+                                     for n in range(1, 9)]})
+    number = int(re.search(r"week (\d+) only", prompt).group(1))
+    if number == 4:
+        return "not json at all"
+    return json.dumps({"week_number": number, "focus_areas": ["Science"], "learning_objectives": [f"Theme {number}"],
+                       "daily_breakdown": {}, "resources_needed": []})
+
+
+def test_weeks_are_generated_concurrently_from_the_outline(tutor, scripted, monkeypatch):
+    monkeypatch.setattr(settings, "CURRICULUM_MAX_CONCURRENCY", 3)
+    tutor.client = scripted(reply, delay=0.02)
+
+    curriculum = asyncio.run(tutor.generate_curriculum(STUDENT, mode="parallel"))
+
+    assert len(tutor.client.calls) == 9  # Outline plus one call per week
+    assert tutor.client.max_in_flight == 3
+    assert curriculum["title"] == "Science Sprint"
+    objectives = [plan["learning_objectives"][0] for plan in curriculum["weekly_plans"]]
+    # Week 4 did not parse and gets the template week; the others keep their own order
+    assert objectives[:3] == ["Theme 1", "Theme 2", "Theme 3"] and objectives[4:] == [f"Theme {n}" for n in range(5, 9)]
+    assert objectives[3] == "Master basic concepts in Science"
@@ -0,0 +1,72 @@
+"""Lenient and incremental parsing of model output (see app/utils/llm_json.py)
+and how AITutor uses it for curricula."""
+import asyncio
+import json
+
+import pytest
+
+from app.models import LearningStyle
+from app.utils.llm_json import IncrementalJSONParser, LLMJSONError, loads_lenient
+
+STUDENT = {"grade_level": 7, "learning_style": LearningStyle.VISUAL, "weak_subjects": ["Mathematics"],
+           "learning_goals": ""}
+
+
+def week(number, topic="Fractions"):
+    return {"week_number": number, "focus_areas": ["Mathematics"], "learning_objectives": [f"Learn {topic}"],
+            "daily_breakdown": {"monday": {"subject": "Mathematics", "topic": topic}},
+            "resources_needed": ["Worksheets"]}
+
+
+def test_repairs_fences_comments_placeholders_and_trailing_commas():
+    text = """Here is the plan:
+```json
+{
+  "title": "Plan", // from the template
+  "weekly_plans": [{"week_number": 1, "focus_areas": ["Maths",],}, ...],
+  /* notes */ "tags": [...],
+}
+```
+Good luck!"""
+    assert loads_lenient(text) == {"title": "Plan", "weekly_plans": [{"week_number": 1, "focus_areas": ["Maths"]}],
+                                   "tags": []}
+
+
+def test_closes_documents_cut_off_by_max_tokens():
+    assert loads_lenient('{"weekly_plans": [{"week_number": 1}, {"week_number": 2, "focus_are') == {
+        "weekly_plans": [{"week_number": 1}, {"week_number": 2}]}
+    with pytest.raises(LLMJSONError):
+        loads_lenient("I cannot help with that.")
+
+
+def test_incremental_parser_emits_each_item_when_it_closes():
+    text = json.dumps({"title": "Plan", "weekly_plans": [week(1), week(2)], "extra": [{"week_number": 9}]})
+    parser = IncrementalJSONParser("weekly_plans")
+    emitted = []
+    for start in range(0, len(text), 7):
+        emitted.append([item["week_number"] for item in parser.feed(text[start:start + 7])])
+
+    assert [numbers for numbers in emitted if numbers] == [[1], [2]]
+    assert parser.close()["title"] == "Plan"
+
+
+def test_curriculum_rerequests_only_the_weeks_that_did_not_parse(tutor, scripted):
+    # Week 3 fails validation and the stream is cut off during week 6
+    streamed = json.dumps({"title": "Plan", "weekly_plans": [week(1), week(2), {"week_number": 3}, week(4),
+                                                             week(5), week(6)]})[:-60]
+    follow_up = json.dumps({"weekly_plans": [week(number, "Recovered") for number in (3, 6, 7, 8)]})
+    tutor.client = scripted(streamed, follow_up)
+
+    curriculum = asyncio.run(tutor.generate_curriculum(dict(STUDENT, learning_goals="re-request test")))
+
+    assert len(tutor.client.calls) == 2
+    assert "weeks 3, 6, 7, 8" in tutor.client.calls[1][-1]["content"]
+    assert [plan["week_number"] for plan in curriculum["weekly_plans"]] == list(range(1, 9))
+    topics = [plan["learning_objectives"][0] for plan in curriculum["weekly_plans"]]
+    assert topics == ["Learn Fractions"] * 2 + ["Learn Recovered"] + ["Learn Fractions"] * 2 + ["Learn Recovered"] * 3
+
+
+def test_unparseable_curriculum_falls_back_to_the_template(tutor, scripted):
+    tutor.client = scripted("Sorry, I can't produce a plan right now.")
+    curriculum = asyncio.run(tutor.generate_curriculum(dict(STUDENT, learning_goals="fallback test")))
+    assert curriculum["title"] == "Grade 7 Personalized Curriculum" and len(curriculum["weekly_plans"]) == 8
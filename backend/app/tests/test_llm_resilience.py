@@ -0,0 +1,131 @@
+"""Retries, hedging and the circuit breaker around LLM calls (see app/llm_resilience.py)."""
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from app.llm_resilience import CircuitBreaker, LLMUnavailableError, ResilientCaller, is_retryable
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def status_error(cls, status):
+    return cls("upstream said no", response=httpx.Response(status, request=REQUEST), body=None)
+
+
+def caller(**options):
+    options.setdefault("breaker", CircuitBreaker(failure_threshold=2, reset_timeout=0.05))
+    return ResilientCaller(base_delay=0.001, max_delay=0.002, **options)
+
+
+class Upstream:
+    """Fails with the given errors in turn, then answers"""
+
+    def __init__(self, *errors, delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return f"answer {self.calls}"
+
+
+def test_only_transient_upstream_errors_are_retryable():
+    assert is_retryable(openai.APIConnectionError(request=REQUEST))
+    assert is_retryable(openai.APITimeoutError(request=REQUEST))
+    assert is_retryable(status_error(openai.RateLimitError, 429))
+    assert is_retryable(status_error(openai.InternalServerError, 503))
+    assert is_retryable(status_error(openai.APIStatusError, 502))
+    assert not is_retryable(status_error(openai.BadRequestError, 400))
+    assert not is_retryable(status_error(openai.AuthenticationError, 401))
+    assert not is_retryable(ValueError("bad prompt"))
+
+
+def test_retries_transient_errors_then_succeeds():
+    upstream = Upstream(openai.APIConnectionError(request=REQUEST), status_error(openai.RateLimitError, 429))
+    assert asyncio.run(caller(max_retries=2).call("chat", upstream)) == "answer 3"
+
+
+def test_caller_errors_are_raised_at_once_and_keep_the_circuit_closed():
+    resilient = caller(max_retries=2)
+    for _ in range(3):
+        upstream = Upstream(status_error(openai.BadRequestError, 400))
+        with pytest.raises(openai.BadRequestError):
+            asyncio.run(resilient.call("chat", upstream))
+        assert upstream.calls == 1
+    assert resilient.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hedge_answers_when_the_primary_is_in_the_slow_tail():
+    calls = []
+
+    async def upstream():
+        calls.append(time.monotonic())
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+        return f"attempt {len(calls)}"
+
+    started = time.monotonic()
+    assert asyncio.run(caller().call("chat", upstream, hedge_after=0.05)) == "attempt 2"
+    assert time.monotonic() - started < 0.5
+
+
+def test_caller_errors_neither_reset_failures_nor_close_a_half_open_circuit():
+    resilient = caller(max_retries=0)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(resilient.call("chat", Upstream(openai.APIConnectionError(request=REQUEST))))
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(resilient.call("chat", Upstream(status_error(openai.BadRequestError, 400))))
+    assert resilient.breaker.failures == 1
+
+    resilient.breaker.state, resilient.breaker.opened_at = CircuitBreaker.OPEN, time.monotonic() - 1
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(resilient.call("chat", Upstream(status_error(openai.BadRequestError, 400))))
+    assert resilient.breaker.state == CircuitBreaker.HALF_OPEN
+    # The trial slot was freed: the next call is the one that decides
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(resilient.call("chat", Upstream(openai.APIConnectionError(request=REQUEST))))
+    assert resilient.breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_good_trial():
+    resilient = caller(max_retries=0)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            asyncio.run(resilient.call("chat", Upstream(openai.APIConnectionError(request=REQUEST))))
+    assert resilient.breaker.state == CircuitBreaker.OPEN
+
+    upstream = Upstream()
+    with pytest.raises(LLMUnavailableError, match="circuit breaker is open"):
+        asyncio.run(resilient.call("chat", upstream))
+    assert upstream.calls == 0
+
+    time.sleep(0.06)
+    with pytest.raises(LLMUnavailableError):  # Failed trial re-opens at once
+        asyncio.run(resilient.call("chat", Upstream(openai.APIConnectionError(request=REQUEST))))
+    assert resilient.breaker.state == CircuitBreaker.OPEN
+
+    time.sleep(0.06)
+    assert asyncio.run(resilient.call("chat", upstream)) == "answer 1"
+    assert resilient.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_frees_the_half_open_slot():
+    resilient = caller()
+    resilient.breaker.state, resilient.breaker.opened_at = CircuitBreaker.OPEN, time.monotonic() - 1
+
+    async def cancel_trial():
+        trial = asyncio.ensure_future(resilient.call("chat", Upstream(delay=1.0)))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        return await resilient.call("chat", Upstream())
+
+    assert asyncio.run(cancel_trial()) == "answer 1"
+    assert resilient.breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,83 @@
+"""LLM usage ledger, its daily rollups and the admin report (see app/llm_usage.py)."""
+import asyncio
+
+import pytest
+
+from app import models
+from app.batching import BatchFlusher
+from app.config import settings
+from app.llm_usage import NO_STUDENT, UsageLedger
+from app.metrics import metrics
+
+
+def test_records_after_the_buffer_empties_are_flushed_within_max_delay(db):
+    ledger = UsageLedger(max_batch=100, max_delay=0.05)
+    written = db.query(models.LLMUsage).count
+
+    async def scenario():
+        before = written()
+        ledger.record("chat", "m", prompt_tokens=1)
+        await asyncio.sleep(0.3)
+        first = written() - before
+        ledger.record("chat", "m", prompt_tokens=2)  # Buffer is empty again: restarts the clock
+        await asyncio.sleep(0.3)
+        second = written() - before
+        await ledger.stop()
+        return first, second
+
+    assert asyncio.run(scenario()) == (1, 2)
+    assert ledger.pending == []
+
+
+def test_rollups_match_the_raw_rows_and_feed_the_admin_report(client, db, student, monkeypatch):
+    owner, headers = student
+    ledger = UsageLedger(max_batch=3, max_delay=10)
+
+    async def scenario():
+        with ledger.student(owner.id):
+            ledger.record("chat", "m", prompt_tokens=10, completion_tokens=5, latency_ms=40)
+            ledger.record("chat", "m", cache_hit=True)
+            ledger.record("chat", "m", latency_ms=90, error=TimeoutError())
+        ledger.record("report_test", "m", prompt_tokens=7)
+        await ledger.stop()
+
+    asyncio.run(scenario())
+    assert db.query(models.LLMUsage).filter(models.LLMUsage.student_id == owner.id).count() == 3
+    daily = {(row.student_id, row.method): row for row in db.query(models.LLMUsageDaily)}
+    chat = daily[(owner.id, "chat")]
+    assert (chat.calls, chat.cache_hits, chat.errors, chat.prompt_tokens, chat.completion_tokens) == (3, 1, 1, 10, 5)
+    assert (chat.latency_ms_sum, chat.latency_ms_max) == (130, 90)
+    assert daily[(NO_STUDENT, "report_test")].prompt_tokens == 7
+
+    assert client.get("/analytics/llm-usage", headers=headers).status_code == 403
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", owner.email)
+    params = {"group_by": "method,model", "student_id": owner.id}
+    report = client.get("/analytics/llm-usage", params=params, headers=headers).json()
+    assert [(row["method"], row["model"], row["calls"], row["errors"]) for row in report] == [("chat", "m", 3, 1)]
+    assert report[0]["avg_latency_ms"] == 130 / 3 and report[0]["max_latency_ms"] == 90
+    assert client.get("/analytics/llm-usage", params={"group_by": "week"}, headers=headers).status_code == 400
+
+
+def test_records_past_max_pending_are_dropped():
+    ledger = UsageLedger(max_batch=100, max_delay=10, max_pending=2)
+    ledger._write = lambda rows: None
+    dropped = metrics.counter("llm_usage_dropped_total")
+
+    async def scenario():
+        for _ in range(5):
+            ledger.record("chat", "m")
+        pending = len(ledger.pending)
+        await ledger.stop()
+        return pending
+
+    assert asyncio.run(scenario()) == 2
+    assert metrics.counter("llm_usage_dropped_total") == dropped + 3
+
+
+def test_flushers_must_implement_flush_and_abandon():
+    class NoAbandon(BatchFlusher):
+        async def flush(self):
+            return 0
+
+    with pytest.raises(TypeError, match="_abandon"):
+        NoAbandon(max_batch=1, max_delay=1)
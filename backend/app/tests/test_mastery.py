@@ -0,0 +1,98 @@
+"""Elo-style mastery ratings, difficulty and next-topic choice (see app/mastery.py)."""
+import random
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, mastery, models
+from app.llm_fake import _week
+from app.schema import migrate
+
+
+def test_ratings_rise_with_good_scores_and_steps_shrink():
+    rating, attempts, steps = 0.0, 0, []
+    for _ in range(5):
+        new_rating, attempts = mastery.update_rating(rating, attempts, 100)
+        steps.append(new_rating - rating)
+        rating = new_rating
+    assert attempts == 5 and mastery.recommend_difficulty(rating) == "hard"
+    assert steps == sorted(steps, reverse=True)
+    assert mastery.update_rating(0.0, 0, 250) == mastery.update_rating(0.0, 0, 100)
+
+
+def test_difficulty_targets_the_success_rate():
+    assert mastery.recommend_difficulty(None) == "easy"
+    assert mastery.recommend_difficulty(1.0) == "medium"
+    assert mastery.recommend_difficulty(2.0) == "hard"
+
+
+def test_numpy_and_python_replays_agree():
+    rng = random.Random(5)
+    groups = [rng.randrange(40) for _ in range(2000)]
+    scores = [rng.uniform(-10, 110) for _ in groups]
+
+    python_ratings, python_attempts = mastery.replay(groups, scores, 41, vectorized=False)
+    numpy_ratings, numpy_attempts = mastery.replay(groups, scores, 41, vectorized=True)
+
+    assert numpy_attempts == python_attempts and python_attempts[40] == 0
+    assert numpy_ratings == pytest.approx(python_ratings, abs=1e-9)
+
+
+def test_concurrent_first_logs_of_a_topic_both_count(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'race.db'}")
+    migrate(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as first, Session() as other:
+        # The other request inserts the topic after this one found it missing
+        @event.listens_for(first, "before_flush", once=True)
+        def other_request_inserts_first(*_):
+            crud.update_mastery(other, 1, "Math", "Fractions", 100)
+            other.commit()
+
+        state = crud.update_mastery(first, 1, "Math", "Fractions", 100)
+        first.commit()
+        assert state.attempts == 2
+        assert first.query(models.MasteryState).count() == 1
+
+
+def test_recompute_matches_the_incremental_updates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'mastery.db'}")
+    migrate(engine)
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(9)
+    with Session() as db:
+        for _ in range(300):
+            student_id, topic = rng.randrange(1, 6), rng.choice(["Fractions", "fractions ", "Decimals", "Ratios"])
+            score = rng.uniform(0, 100)
+            db.add(models.ProgressLog(student_id=student_id, weekly_plan_id=1, subject="Math", topic=topic,
+                                      proficiency_score=score))
+            crud.update_mastery(db, student_id, "Math", topic, score)
+            db.commit()
+        incremental = {(s.student_id, s.topic_key): (s.rating, s.attempts) for s in db.query(models.MasteryState)}
+
+        for vectorized in (True, False):
+            assert crud.recompute_mastery(db, vectorized) == len(incremental) == 15
+            recomputed = {(s.student_id, s.topic_key): (s.rating, s.attempts) for s in db.query(models.MasteryState)}
+            assert recomputed.keys() == incremental.keys()
+            for key, (rating, attempts) in incremental.items():
+                assert recomputed[key] == (pytest.approx(rating, abs=1e-9), attempts)
+
+
+def test_next_topic_skips_mastered_topics(client, db, student):
+    student, headers = student
+    curriculum = crud.create_curriculum(db, {"title": "Plan", "weekly_plans": [_week(1, ["Mathematics"])]}, student.id)
+    plan_id = curriculum.weekly_plans[0].id
+
+    first = client.get("/analytics/next-topic", headers=headers).json()
+    assert (first["topic"], first["difficulty"]) == ("Mathematics topic 1.1", "easy")
+
+    for _ in range(10):
+        client.post("/analytics/progress", headers=headers, json={
+            "weekly_plan_id": plan_id, "subject": "Mathematics", "topic": "Mathematics topic 1.1",
+            "proficiency_score": 100,
+        })
+    assert client.get("/analytics/next-topic", headers=headers).json()["topic"] == "Mathematics topic 1.2"
+    [state] = client.get("/analytics/mastery", headers=headers).json()
+    assert state["attempts"] == 10 and state["mastery"] > mastery.MASTERY_THRESHOLD
+    assert state["recommended_difficulty"] == "hard"
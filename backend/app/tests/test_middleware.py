@@ -0,0 +1,64 @@
+"""Response compression (see app/middleware.py)."""
+import gzip
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware import CompressionMiddleware, _choose_encoding
+
+PAYLOAD = {"weekly_plans": [{"week_number": week, "focus_areas": ["Mathematics", "Science"]} for week in range(200)]}
+
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+
+@app.get("/large")
+async def large():
+    return PAYLOAD
+
+
+@app.get("/small")
+async def small():
+    return {"status": "ok"}
+
+
+@app.get("/stream")
+async def stream():
+    return StreamingResponse((f"line {number}\n".encode() for number in range(500)), media_type="text/plain")
+
+
+client = TestClient(app)
+
+
+def raw_get(path, accept_encoding):
+    # TestClient decodes gzip transparently; read the wire bytes instead
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_large_json_is_gzipped_and_round_trips():
+    response, body = raw_get("/large", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) == len(body) < len(ORJSONResponse(PAYLOAD).body) / 5
+    assert gzip.decompress(body) == ORJSONResponse(PAYLOAD).body
+
+
+def test_small_bodies_and_unaccepted_encodings_pass_through():
+    response, body = raw_get("/small", "gzip")
+    assert "content-encoding" not in response.headers and body == b'{"status":"ok"}'
+    response, _ = raw_get("/large", "gzip;q=0, identity")
+    assert "content-encoding" not in response.headers
+
+
+def test_streaming_responses_are_compressed_chunk_by_chunk():
+    response, body = raw_get("/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+    assert gzip.decompress(body) == b"".join(f"line {number}\n".encode() for number in range(500))
+
+
+def test_encoding_negotiation():
+    assert _choose_encoding("deflate, gzip;q=0.5") == "gzip"
+    assert _choose_encoding("deflate") is None
+    assert _choose_encoding("gzip;q=0") is None
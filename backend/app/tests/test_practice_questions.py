@@ -0,0 +1,91 @@
+"""Batched practice question generation, the question bank and its
+pre-warmer (see app/ai_utils.py, app/crud.py and app/prewarm.py)."""
+import asyncio
+import json
+import re
+import threading
+from itertools import count
+
+from app import crud
+from app.ai_utils import ai_tutor
+from app.config import settings
+from app.llm_fake import _question, _week
+from app.prewarm import PracticeQuestionPrewarmer, upcoming_topics
+
+
+def _reply(*variants):
+    return json.dumps({"questions": [_question("rocks", variant) for variant in variants]})
+
+
+def unique_questions():
+    """Reply callable answering every request with never-seen questions"""
+    ids = count()
+
+    def reply(messages):
+        prompt = "\n".join(message["content"] for message in messages)
+        topic = re.search(r"about (.+?) for", prompt).group(1)
+        size = int(re.search(r"Create (\d+)", prompt).group(1))
+        return json.dumps({"questions": [_question(topic, next(ids)) for _ in range(size)]})
+    return reply
+
+
+def test_batches_run_concurrently_and_duplicates_are_topped_up(tutor, scripted, monkeypatch):
+    monkeypatch.setattr(settings, "PRACTICE_BATCH_SIZE", 4)
+    tutor.client = scripted(_reply(1, 2, 3, 4), _reply(3, 4, 5, 6), _reply(7, 8), _reply(9, 10), delay=0.01)
+
+    avoid = [_question("rocks", 0)["question"]]
+    questions = asyncio.run(tutor.generate_practice_questions("rocks", count=10, avoid=avoid))
+
+    assert [q["question"] for q in questions] == [_question("rocks", n)["question"] for n in range(1, 11)]
+    assert tutor.client.max_in_flight == 3  # Batches of 4, 4 and 2 at once
+    # The follow-up round asks for the two lost to duplicates and avoids everything seen so far
+    follow_up = tutor.client.calls[3][-1]["content"]
+    assert "Create 2 different" in follow_up and "(variant 0)" in follow_up and "(variant 8)" in follow_up
+
+
+def test_quizzes_are_served_from_the_bank_before_generating(client, student, scripted, monkeypatch):
+    _, headers = student
+    monkeypatch.setattr(ai_tutor, "client", scripted(unique_questions()))
+    request = {"topic": "Plate tectonics", "difficulty": "easy", "count": 3}
+
+    first = client.post("/chat/practice-questions/batch", headers=headers, json=request).json()
+    second = client.post("/chat/practice-questions/batch", headers=headers, json=request).json()
+    third = client.post("/chat/practice-questions/batch", headers=headers, json={**request, "count": 5}).json()
+
+    assert (first["generated"], second["generated"], third["generated"]) == (3, 0, 2)
+    assert [q["question"] for q in second["questions"]] == [q["question"] for q in first["questions"]]
+    assert len(ai_tutor.client.calls) == 2
+
+
+def test_prewarm_fills_upcoming_topics_once(db, student, tutor, scripted):
+    student, _ = student
+    curriculum = crud.create_curriculum(db, {"title": "Rocks", "weekly_plans": [_week(1, ["Geology"])]}, student.id)
+    assert ("Geology topic 1.1", student.grade_level, 1) in upcoming_topics(db)
+    tutor.client = scripted(unique_questions())
+    prewarmer = PracticeQuestionPrewarmer(tutor, per_topic=3, max_topics=1000)
+
+    first = asyncio.run(prewarmer.run_once())
+    second = asyncio.run(prewarmer.run_once())
+
+    assert first["added"] >= 15 and first["failed"] == 0
+    for day in range(1, 6):
+        assert crud.count_practice_questions(db, f"Geology topic 1.{day}", "medium", student.grade_level) == 3
+    assert second == {"topics": 0, "added": 0, "failed": 0}
+
+    # Completed weeks drop out of the horizon
+    curriculum.weekly_plans[0].completed = True
+    db.commit()
+    assert not any(topic.startswith("Geology") for topic, _, _ in upcoming_topics(db))
+
+
+def test_prewarm_keeps_database_work_off_the_event_loop(tutor, scripted, monkeypatch):
+    tutor.client = scripted(unique_questions())
+    prewarmer = PracticeQuestionPrewarmer(tutor, per_topic=2)
+    threads = []
+    monkeypatch.setattr(prewarmer, "_deficits", lambda: threads.append(threading.get_ident()) or [
+        ("Erosion", 7, 2, [])])
+    monkeypatch.setattr(prewarmer, "_store", lambda topic, grade, questions: threads.append(threading.get_ident())
+                        or len(questions))
+
+    assert asyncio.run(prewarmer.run_once()) == {"topics": 1, "added": 2, "failed": 0}
+    assert len(threads) == 2 and threading.get_ident() not in threads
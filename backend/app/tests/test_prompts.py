@@ -0,0 +1,42 @@
+"""Token-budgeted prompt construction (see app/prompts.py)."""
+from app.config import settings
+from app.prompts import PromptBuilder, compact_student_context, count_message_tokens, count_tokens
+
+LONG = " ".join(f"word{number}" for number in range(400))
+
+
+def test_optional_sections_fill_the_budget_by_priority_and_keep_their_order():
+    builder = PromptBuilder("You are a tutor.", budget=120)
+    builder.add("Background: " + LONG, priority=2)
+    builder.add("History: " + LONG, priority=1)
+    builder.add("Question: what is a fraction?", required=True)
+    [system, user] = builder.build()
+
+    assert count_message_tokens([system, user]) <= 120
+    # History (priority 1) is truncated into the room left; background never fits
+    assert user["content"].startswith("History: word0") and user["content"].endswith("Question: what is a fraction?")
+    assert "Background" not in user["content"]
+
+
+def test_required_sections_are_kept_even_over_budget():
+    [_, user] = PromptBuilder("System", budget=10).add("Question: " + LONG, required=True).build()
+    assert user["content"] == "Question: " + LONG
+
+
+def test_student_context_keeps_known_bounded_fields():
+    context = compact_student_context({
+        "grade_level": 7, "weak_subjects": [f"subject {n}" for n in range(20)], "learning_goals": "x" * 500,
+        "password": "hunter2", "recent_scores": [], "topic": None,
+    })
+    assert set(context) == {"grade_level", "weak_subjects", "learning_goals"}
+    assert len(context["weak_subjects"]) == 8 and len(context["learning_goals"]) == 203
+
+
+def test_chat_prompt_fits_the_chat_budget(tutor):
+    history = [(number % 2 == 0, LONG) for number in range(10)]
+    references = [LONG[:200]] * 3
+    messages, _ = tutor._chat_prompt("How do I add fractions?", {"subject": "Mathematics"},
+                                     references, history, grade_level=7)
+    assert count_message_tokens(messages) <= settings.PROMPT_BUDGET_CHAT
+    assert messages[-1]["content"].endswith("Question: How do I add fractions?")
+    assert count_tokens(messages[-1]["content"]) > settings.PROMPT_BUDGET_CHAT / 2  # The budget is used, not wasted
@@ -0,0 +1,41 @@
+"""Query plans of the statements the app issues must not regress (see benchmarks/query_plans.py)."""
+import subprocess
+import sys
+
+from benchmarks.bench_startup import BACKEND_DIR, startup_env
+from benchmarks.query_plans import PlanStep, QueryPlan, fingerprint, normalize, regressions, suggest_index
+
+SQL = "SELECT progress_logs.id FROM progress_logs WHERE progress_logs.student_id = ? ORDER BY progress_logs.id"
+
+
+def plan(full_scans=(), filesort=False):
+    return QueryPlan(fingerprint(SQL), normalize(SQL), ["test"], [PlanStep("progress_logs", "scan")],
+                     list(full_scans), filesort, False)
+
+
+def test_in_lists_share_a_fingerprint():
+    assert fingerprint("SELECT 1 WHERE a IN (?, ?)") == fingerprint("SELECT 1 WHERE a IN (?, ?, ?, ?)")
+
+
+def test_new_flags_are_regressions():
+    baseline = {"statements": {fingerprint(SQL): {"full_scans": [], "filesort": False, "temporary": False}}}
+    assert regressions([plan()], baseline) == []
+    [(_, new)] = regressions([plan(full_scans=["progress_logs"], filesort=True)], baseline)
+    assert new == ["full scan of progress_logs", "filesort"]
+    assert regressions([plan(full_scans=["progress_logs"])], {"statements": {}})
+
+
+def test_suggests_equality_then_order_columns():
+    sql = ("SELECT chat_sessions.id FROM chat_sessions WHERE chat_sessions.student_id = ? "
+           "ORDER BY chat_sessions.updated_at DESC")
+    assert suggest_index(sql, "chat_sessions", []) == \
+        "CREATE INDEX idx_chat_sessions_student_id_updated_at ON chat_sessions (student_id, updated_at);"
+    assert suggest_index(sql, "chat_sessions", [("idx_student_chat", ["student_id", "updated_at"])]).startswith("--")
+
+
+def test_no_plan_regressions_against_baseline(tmp_path):
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.query_plans", "--check", "--database-url", f"sqlite:///{tmp_path / 'plans.db'}"],
+        cwd=BACKEND_DIR, env=startup_env(), capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stdout[-4000:] + result.stderr[-2000:]
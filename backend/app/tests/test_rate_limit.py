@@ -0,0 +1,80 @@
+"""Token buckets and admission control for AI endpoints (see app/rate_limit.py)."""
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.config import settings
+from app.rate_limit import ConcurrencyLimiter, DatabaseBucketBackend, MemoryBucketBackend, RateLimiter
+from app.schema import migrate
+
+
+def test_burst_then_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    limiter = RateLimiter("student", burst=2, per_minute=6, backend=MemoryBucketBackend())
+
+    async def three_requests():
+        await limiter.check("7")
+        await limiter.check("7")
+        await limiter.check("8")  # Other students have their own bucket
+        await limiter.check("7")
+
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(three_requests())
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers["Retry-After"] == "10"  # One token every 10 s
+
+
+def test_admission_queue_overflow_is_rejected_immediately():
+    limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=1, queue_timeout=1.0)
+
+    async def call(results):
+        try:
+            async with limiter.slot():
+                await asyncio.sleep(0.05)
+            results.append("ok")
+        except HTTPException as e:
+            results.append(e.status_code)
+
+    async def main():
+        results = []
+        await asyncio.gather(*(call(results) for _ in range(3)))
+        return results
+
+    assert sorted(asyncio.run(main()), key=str) == [429, "ok", "ok"]
+
+
+@pytest.fixture
+def buckets(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'buckets.db'}")
+    migrate(engine)
+    return sessionmaker(bind=engine)
+
+
+def test_database_buckets_are_shared_between_backends(buckets):
+    first, second = DatabaseBucketBackend(buckets), DatabaseBucketBackend(buckets)
+    assert first._take("student:1", 2, 0.001, 1)[0]
+    assert second._take("student:1", 2, 0.001, 1)[0]
+    allowed, retry_after = first._take("student:1", 2, 0.001, 1)
+    assert not allowed and retry_after > 0
+
+
+def test_first_take_survives_a_concurrent_insert(buckets):
+    def competing_worker_inserts_first(session, flush_context, instances):
+        with buckets() as other:
+            other.add(models.RateLimitBucket(key="student:1", tokens=4, updated_at=0))
+            other.commit()
+
+    def racing_session():
+        session = buckets()
+        event.listen(session, "before_flush", competing_worker_inserts_first, once=True)
+        return session
+
+    allowed, _ = DatabaseBucketBackend(racing_session)._take("student:1", 5, 0.0, 1)
+
+    assert allowed
+    with buckets() as db:
+        assert db.get(models.RateLimitBucket, "student:1").tokens == 3
@@ -0,0 +1,88 @@
+"""Read-replica routing with read-your-writes (see app/replicas.py)."""
+import pytest
+from sqlalchemy import create_engine
+
+from app import crud, dependencies, replicas as replicas_module
+from app.config import settings
+from app.llm_fake import _week
+from app.replicas import ReadYourWrites, ReplicaSet
+from app.schema import migrate
+
+
+@pytest.fixture
+def replica_urls(tmp_path):
+    urls = []
+    for name in ("replica1", "replica2"):
+        url = f"sqlite:///{tmp_path / name}.db"
+        migrate(create_engine(url))
+        urls.append(url)
+    return urls
+
+
+def test_recent_writers_expire_after_the_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(replicas_module.time, "monotonic", lambda: now[0])
+    writes = ReadYourWrites(window=5.0, max_entries=2)
+
+    writes.record(1)
+    now[0] += 3
+    writes.record(2)
+    writes.record(3)  # Over max_entries: the oldest is dropped
+    assert not writes.recent(1) and writes.recent(2)
+    now[0] += 5
+    assert not writes.recent(2)
+
+
+def test_lagging_replicas_are_skipped(replica_urls, monkeypatch):
+    lag = {replica_urls[0]: 0.5, replica_urls[1]: 30.0}
+    monkeypatch.setattr(replicas_module, "replication_lag", lambda db: lag[str(db.get_bind().url)])
+    replica_set = ReplicaSet(replica_urls, max_lag=5.0, check_interval=0.0)
+
+    chosen = []
+    for _ in range(4):
+        db = replica_set.session()
+        chosen.append(str(db.get_bind().url))
+        db.close()
+    assert chosen == [replica_urls[0]] * 4
+
+    lag[replica_urls[0]] = None  # Replication broken
+    assert replica_set.session() is None
+    assert replica_set.session_for(1) is None
+
+
+def test_students_read_their_own_writes_from_the_primary(client, db, student, replica_urls, monkeypatch):
+    student, headers = student
+    client.cookies.clear()
+    monkeypatch.setattr(dependencies, "replicas", ReplicaSet(replica_urls[:1], max_lag=5.0, check_interval=60.0))
+    curriculum = crud.create_curriculum(db, {"title": "Plan", "weekly_plans": [_week(1, ["Mathematics"])]}, student.id)
+
+    # The (empty) replica serves the read until the student writes through the API
+    assert client.get("/analytics/mastery", headers=headers).json() == []
+    client.post("/analytics/progress", headers=headers, json={
+        "weekly_plan_id": curriculum.weekly_plans[0].id, "subject": "Mathematics",
+        "topic": "Mathematics topic 1.1", "proficiency_score": 80,
+    })
+    assert replicas_module.read_your_writes.recent(student.id)
+    assert [state["topic"] for state in client.get("/analytics/mastery", headers=headers).json()] == [
+        "Mathematics topic 1.1"
+    ]
+
+
+def test_the_write_time_cookie_routes_other_workers_reads_to_the_primary(client, db, student, replica_urls,
+                                                                         monkeypatch):
+    student, headers = student
+    client.cookies.clear()
+    monkeypatch.setattr(dependencies, "replicas", ReplicaSet(replica_urls[:1], max_lag=5.0, check_interval=60.0))
+    curriculum = crud.create_curriculum(db, {"title": "Plan", "weekly_plans": [_week(1, ["Mathematics"])]}, student.id)
+
+    response = client.post("/analytics/progress", headers=headers, json={
+        "weekly_plan_id": curriculum.weekly_plans[0].id, "subject": "Mathematics",
+        "topic": "Mathematics topic 1.1", "proficiency_score": 80,
+    })
+    assert settings.READ_YOUR_WRITES_COOKIE in response.cookies
+    # Served by a worker that did not see the write
+    monkeypatch.setattr(replicas_module, "read_your_writes", ReadYourWrites(settings.READ_YOUR_WRITES_SECONDS))
+    assert len(client.get("/analytics/mastery", headers=headers).json()) == 1
+
+    client.cookies.clear()
+    assert client.get("/analytics/mastery", headers=headers).json() == []  # The lagging replica
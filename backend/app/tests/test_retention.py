@@ -0,0 +1,63 @@
+"""Archiving of old progress logs and chat messages (see app/retention.py)."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, retention
+from app.config import settings
+from app.schema import migrate
+
+NOW = datetime(2026, 6, 1)
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RETENTION_BATCH_ROWS", 3)  # Several batches per table
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}")
+    migrate(engine)
+    with sessionmaker(bind=engine)() as session:
+        for student_id in (1, 2):
+            for days_ago in (400, 380, 250, 200, 10, 1):
+                session.add(models.ProgressLog(
+                    student_id=student_id, weekly_plan_id=1, subject=("Math", "Science")[days_ago % 2],
+                    topic=f"topic {days_ago}", proficiency_score=days_ago % 97, time_spent_minutes=days_ago % 60,
+                    completed=days_ago > 100, created_at=NOW - timedelta(days=days_ago),
+                ))
+        chat = models.ChatSession(student_id=1, session_title="Old chat")
+        session.add(chat)
+        session.flush()
+        for days_ago in (300, 250, 200, 5):
+            session.add(models.ChatMessage(session_id=chat.id, content=f"said {days_ago} days ago", is_user=True,
+                                           created_at=NOW - timedelta(days=days_ago)))
+        session.commit()
+        yield session
+
+
+def _snapshot(db):
+    return (
+        [crud.get_student_analytics(db, student_id) for student_id in (1, 2)],
+        [[(log.id, log.topic, log.proficiency_score, log.created_at)
+          for log in crud.get_student_progress(db, student_id)] for student_id in (1, 2)],
+        [(message.id, message.content, message.created_at) for message in crud.get_chat_messages(db, 1)],
+    )
+
+
+def test_compaction_moves_old_rows_without_changing_reads(db):
+    before = _snapshot(db)
+
+    moved = retention.compact(db, NOW)
+    db.expire_all()
+
+    assert moved == {"progress_logs": 4, "chat_messages": 3, "llm_usage": 0}
+    assert db.query(models.ProgressLog).count() == 8 and db.query(models.ChatMessage).count() == 1
+    assert db.query(models.ProgressSummary).count() == 2  # Per student and subject
+    assert _snapshot(db) == before
+    assert retention.compact(db, NOW) == {"progress_logs": 0, "chat_messages": 0, "llm_usage": 0}
+
+
+def test_archived_logs_feed_the_mastery_recompute(db):
+    retention.compact(db, NOW)
+    assert crud.recompute_mastery(db) == 12
+    assert sum(state.attempts for state in db.query(models.MasteryState)) == 12
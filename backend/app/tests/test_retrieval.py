@@ -0,0 +1,102 @@
+"""Per-student BM25 retrieval over curriculum and chat history (see app/retrieval.py)."""
+from app import crud, models
+from app.llm_fake import _week
+from app.retrieval import BM25Index, RetrievalService
+from app.semantic_cache import semantic_cache
+from app.write_behind import chat_message
+from benchmarks.common import create_student
+
+
+def test_bm25_ranks_the_most_specific_snippet_first():
+    index = BM25Index()
+    index.add("a", "Week 1 Monday: Mathematics - fractions and decimals")
+    index.add("b", "Week 1 Tuesday: Science - photosynthesis in plants")
+    index.add("c", "Week 2 Monday: Mathematics - how to add fractions with unlike denominators")
+
+    assert [doc_id for _, doc_id in index.search("how do I add fractions", k=3)] == ["c", "a"]
+    assert index.search("volcanoes", k=3) == []
+
+    index.remove("c")
+    assert [doc_id for _, doc_id in index.search("add fractions", k=3)] == ["a"]
+
+
+def _curriculum(db, student_id):
+    data = {"title": "Plan", "weekly_plans": [_week(1, ["Mathematics", "Science"])]}
+    return crud.create_curriculum(db, data, student_id)
+
+
+def test_past_chats_are_retrieved_unless_excluded(db, student):
+    student, _ = student
+    _curriculum(db, student.id)
+    session = models.ChatSession(student_id=student.id, session_title="Chat")
+    db.add(session)
+    db.flush()
+    db.add(models.ChatMessage(session_id=session.id, content="Tell me about volcanoes", is_user=True,
+                              message_type="question"))
+    db.add(models.ChatMessage(session_id=session.id, content="Volcanoes are offline", is_user=False,
+                              message_type="fallback"))
+    db.commit()
+
+    service = RetrievalService()
+    assert service.search(db, student.id, "volcanoes") == ["Student asked: Tell me about volcanoes"]
+    assert service.search(db, student.id, "volcanoes", include_chat=False) == []
+    assert service.search(db, student.id, "science topic 1.2", k=1, include_chat=False) == [
+        "Week 1 Tuesday: Science - Science topic 1.2 (Warm-up, Guided practice, Exit quiz)"
+    ]
+
+    # Queued turns are searchable before the write-behind buffer saves them
+    service.add_chat_messages(student.id, [chat_message(session.id, "Magma cools into basalt", False, "explanation")])
+    assert service.search(db, student.id, "basalt") == ["Tutor said: Magma cools into basalt"]
+
+
+def test_expired_index_is_rebuilt_to_see_other_workers_writes(db, student):
+    student, _ = student
+    service = RetrievalService(ttl=60.0)
+    assert service.search(db, student.id, "mathematics topic 1.1") == []
+
+    # Written through another service, as on another worker
+    _curriculum(db, student.id)
+    assert service.search(db, student.id, "mathematics topic 1.1") == []
+    assert not service.needs_refresh(student.id)
+
+    service._indexes[student.id].loaded_at -= 61
+    assert service.needs_refresh(student.id)
+    # Without a session the expired index is still served
+    assert service.search(None, student.id, "mathematics topic 1.1") == []
+    assert service.search(db, student.id, "mathematics topic 1.1")
+    assert not service.needs_refresh(student.id)
+
+
+def test_returning_students_share_cached_answers(client, db, student):
+    semantic_cache.clear()
+    for returning, headers in (student, create_student(db, email="returning@example.com")):
+        session = models.ChatSession(student_id=returning.id, session_title="Earlier")
+        db.add(session)
+        db.flush()
+        db.add(models.ChatMessage(session_id=session.id, content="What is a prime number?", is_user=True))
+        db.commit()
+        response = client.post("/chat/message", headers=headers,
+                               json={"session_id": session.id, "content": "What is a prime number?"})
+        assert response.status_code == 200
+
+    assert semantic_cache.hits == 1
+
+
+def test_follow_ups_on_the_rest_path_are_grounded_in_past_chats(client, db, student, tutor, scripted, monkeypatch):
+    student, headers = student
+    _curriculum(db, student.id)
+    session = models.ChatSession(student_id=student.id, session_title="Earlier")
+    db.add(session)
+    db.flush()
+    db.add(models.ChatMessage(session_id=session.id, content="Chlorophyll is what makes leaves green",
+                              is_user=False, message_type="explanation"))
+    db.commit()
+    tutor.client = scripted(lambda messages: "answer")
+    monkeypatch.setattr("app.routers.chat.ai_tutor", tutor)
+
+    for question in ("What is chlorophyll?", "Why is it green?"):
+        response = client.post("/chat/message", headers=headers, json={"session_id": session.id, "content": question})
+        assert response.status_code == 200
+    cacheable, follow_up = (str(call) for call in tutor.client.calls)
+    assert "makes leaves green" not in cacheable
+    assert "makes leaves green" in follow_up
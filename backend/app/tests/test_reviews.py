@@ -0,0 +1,103 @@
+"""SM-2 spaced-repetition scheduling and the due-queue (see app/reviews.py)."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, reviews
+from app.llm_fake import _week
+from app.schema import migrate
+
+NOW = datetime(2026, 3, 2, 9)
+
+
+def test_intervals_grow_on_passing_scores_and_reset_on_failing_ones():
+    state, intervals = (reviews.INITIAL_EASE, 0.0, 0), []
+    for score in (100, 100, 100, 30, 80):
+        state = reviews.schedule(*state, reviews.quality(score))
+        intervals.append(state[1])
+    assert intervals == [1.0, 6.0, 17.0, 1.0, 1.0]
+    assert state[2] == 1 and state[0] >= reviews.MIN_EASE
+
+
+def test_numpy_and_python_replays_agree():
+    rng = random.Random(11)
+    groups = [rng.randrange(30) for _ in range(1500)]
+    qualities = [rng.randint(0, 5) for _ in groups]
+
+    python_state = reviews.replay(groups, qualities, 31, vectorized=False)
+    numpy_state = reviews.replay(groups, qualities, 31, vectorized=True)
+
+    assert numpy_state[1:] == python_state[1:]
+    assert numpy_state[0] == pytest.approx(python_state[0], abs=1e-9)
+    assert python_state[2][30] == 0
+
+
+def test_due_queue_orders_by_due_date_and_skips_superseded_entries():
+    def item(topic, days):
+        return reviews.DueItem("math", topic, topic, NOW + timedelta(days=days), 1.0, 2.5, 1, 80.0)
+
+    queue = reviews.StudentQueue([item("a", -3), item("b", -1), item("c", 2)])
+    queue.push(item("a", 5))  # Reviewed again: no longer due
+    queue.push(item("c", -2))
+
+    assert [due.topic_key for due in queue.due(NOW, limit=10)] == ["c", "b"]
+    assert [due.topic_key for due in queue.due(NOW, limit=1)] == ["c"]  # Still queued until reviewed
+
+
+def test_concurrent_first_reviews_of_a_topic_both_count(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'race.db'}")
+    migrate(engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as first, Session() as other:
+        # The other request inserts the topic after this one found it missing
+        @event.listens_for(first, "before_flush", once=True)
+        def other_request_inserts_first(*_):
+            crud.update_review(other, 1, "Math", "Fractions", 100, NOW)
+            other.commit()
+
+        item = crud.update_review(first, 1, "Math", "Fractions", 100, NOW)
+        first.commit()
+        assert (item.repetitions, item.interval_days) == (2, 6.0)
+        assert first.query(models.ReviewItem).count() == 1
+
+
+def test_recompute_matches_the_incremental_updates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}")
+    migrate(engine)
+    rng = random.Random(2)
+    with sessionmaker(bind=engine)() as db:
+        for day in range(200):
+            student_id, topic, score = rng.randrange(1, 4), rng.choice(["Fractions", "Decimals"]), rng.uniform(0, 100)
+            reviewed_at = NOW + timedelta(days=day)
+            db.add(models.ProgressLog(student_id=student_id, weekly_plan_id=1, subject="Math", topic=topic,
+                                      proficiency_score=score, created_at=reviewed_at))
+            crud.update_review(db, student_id, "Math", topic, score, reviewed_at)
+            db.commit()
+
+        def items():
+            return {(i.student_id, i.topic_key): (i.ease, i.interval_days, i.repetitions, i.due_at)
+                    for i in db.query(models.ReviewItem)}
+        incremental = items()
+        for vectorized in (True, False):
+            assert crud.recompute_reviews(db, vectorized) == len(incremental) == 6
+            recomputed = items()
+            for key, (ease, interval, repetitions, due_at) in incremental.items():
+                assert recomputed[key] == (pytest.approx(ease), interval, repetitions, due_at)
+
+
+def test_failed_topics_are_due_the_next_day(client, db, student):
+    student, headers = student
+    curriculum = crud.create_curriculum(db, {"title": "Plan", "weekly_plans": [_week(1, ["Science"])]}, student.id)
+    for topic, score in (("Cells", 20), ("Atoms", 95)):
+        client.post("/analytics/progress", headers=headers, json={
+            "weekly_plan_id": curriculum.weekly_plans[0].id, "subject": "Science", "topic": topic,
+            "proficiency_score": score,
+        })
+    assert client.get("/analytics/reviews/due", headers=headers).json() == []
+
+    due = crud.get_due_reviews(db, student.id, now=datetime.utcnow() + timedelta(days=1, minutes=1))
+    assert [(item.topic, item.interval_days) for item in due] == [("Cells", 1.0), ("Atoms", 1.0)]
+    assert crud.get_due_reviews(db, student.id, now=datetime.utcnow() + timedelta(hours=23)) == []
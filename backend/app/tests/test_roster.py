@@ -0,0 +1,111 @@
+"""Bulk student roster import (see app/roster.py)."""
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models, roster
+from app.auth import password_context
+from app.config import settings
+from app.schema import migrate
+
+CSV = (
+    "\ufeffemail,full_name,grade_level,learning_style,weak_subjects,learning_goals,password\n"
+    "ada@example.com,Ada,7,visual,Mathematics; Science,,pw-ada\n"
+    "bob@example.com,Bob,eight,visual,,,pw-bob\n"
+    "ADA@example.com,Ada again,7,visual,,,pw-ada2\n"
+    "cy@example.com,Cy,5,auditory,Reading,Read more,pw-cy\n"
+    "dee@example.com,Dee,6,kinesthetic,,,pw-dee\n"
+    "eve@example.com,Eve,9,read_write,,,pw-eve\n"
+).encode()
+
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ROSTER_INSERT_CHUNK", 2)
+    engine = create_engine(f"sqlite:///{tmp_path / 'roster.db'}")
+    migrate(engine)
+    return sessionmaker(bind=engine)
+
+
+def _student(email: str, **values) -> models.Student:
+    return models.Student(email=email, hashed_password="x", full_name=email, grade_level=7,
+                          learning_style=models.LearningStyle.VISUAL, weak_subjects=[], **values)
+
+
+def test_csv_and_json_rosters_parse_to_the_same_rows():
+    rows = roster.parse_roster(CSV, "csv")
+    assert rows[0]["weak_subjects"] == ["Mathematics", "Science"] and rows[0]["learning_goals"] is None
+    assert roster.parse_roster(json.dumps(rows).encode(), "json") == rows
+    assert roster.roster_format("class.JSON", None) == "json" and roster.roster_format("x", "text/csv") == "csv"
+    for content in (b"{}", b"[1, 2]", b"not json", b"\xff\xfe"):
+        with pytest.raises(roster.RosterError):
+            roster.parse_roster(content, "json")
+
+
+def test_import_validates_skips_known_emails_and_hashes_passwords(Session):
+    with Session() as db:
+        db.add(_student("dee@example.com"))
+        db.commit()
+        progress = []
+        result = roster.import_roster(db, roster.parse_roster(CSV, "csv"), workers=1, rounds=4,
+                                      progress=lambda *step: progress.append(step))
+        students = {student.email: student for student in db.query(models.Student)}
+
+    assert result["created"] == 3
+    assert result["already_registered"] == ["dee@example.com"] and result["duplicates"] == ["ADA@example.com"]
+    assert [error["row"] for error in result["errors"]] == [2] and "grade_level" in result["errors"][0]["detail"]
+    assert progress[-2:] == [("insert", 2, 3), ("insert", 3, 3)]
+    assert password_context().verify("pw-cy", students["cy@example.com"].hashed_password)
+    assert students["cy@example.com"].weak_subjects == ["Reading"] and students["cy@example.com"].is_active
+
+
+def test_emails_registered_during_the_import_are_skipped(Session):
+    def register_eve_meanwhile(stage, done, total):
+        if stage == "hash":
+            with Session() as other:
+                other.add(_student("eve@example.com"))
+                other.commit()
+
+    with Session() as db:
+        result = roster.import_roster(db, roster.parse_roster(CSV, "csv"), workers=1, rounds=4,
+                                      progress=register_eve_meanwhile)
+        eve = db.query(models.Student).filter(models.Student.email == "eve@example.com").one()
+    assert eve.full_name == "eve@example.com"  # The concurrent registration, not the roster's
+    assert result["created"] == 3  # ada, cy, dee; eve was taken between the check and the insert
+
+
+def test_parallel_hashing_keeps_the_order():
+    passwords = ["one", "two", "three"]
+    hashes = roster.hash_passwords(passwords, workers=2, chunk_size=1, rounds=4)
+    assert [password_context().verify(password, hashed) for password, hashed in zip(passwords, hashes)] == [True] * 3
+    assert not password_context().verify("two", hashes[0])
+
+
+def test_only_admins_may_import(client, student, monkeypatch):
+    owner, headers = student
+    files = {"file": ("roster.csv", b"email,full_name,grade_level,learning_style,weak_subjects,password\n", "text/csv")}
+    assert client.post("/students/import", headers=headers, files=files).status_code == 403
+
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", owner.email)
+    files = {"file": ("roster.json", b"{}", "application/json")}
+    response = client.post("/students/import", headers=headers, files=files)
+    assert response.status_code == 400 and "list of objects" in response.json()["detail"]
+
+
+def test_http_import_can_stream_its_progress(client, student, monkeypatch):
+    owner, headers = student
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", owner.email)
+    monkeypatch.setattr(settings, "ROSTER_INSERT_CHUNK", 1)
+    monkeypatch.setattr(settings, "ROSTER_HASH_WORKERS", 1)
+    csv_rows = "email,full_name,grade_level,learning_style,weak_subjects,password\n" + "".join(
+        f"stream{n}@example.com,Stream {n},7,visual,,pw-{n}\n" for n in range(3))
+    files = {"file": ("roster.csv", csv_rows.encode(), "text/csv")}
+
+    response = client.post("/students/import", params={"stream": "true"}, headers=headers, files=files)
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert {"stage": "insert", "done": 3, "total": 3} in lines
+    assert lines[-1]["result"]["created"] == 3
@@ -0,0 +1,45 @@
+"""The migrations, app/models.py and db/init.sql describe the same schema (see app/schema.py)."""
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+
+from app import models
+from app.schema import BASELINE_TABLES, INIT_SQL_PATH, alembic_config, current_revision, migrate, render_init_sql, schema_diff
+
+def test_migrations_match_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    migrate(engine)
+    assert schema_diff(engine) == []
+
+
+def test_init_sql_is_rendered_from_migrations():
+    with open(INIT_SQL_PATH) as handle:
+        assert handle.read() == render_init_sql(), "db/init.sql is stale: run `python -m app.schema init-sql`"
+
+
+def test_unversioned_database_is_adopted(tmp_path):
+    # As left by create_all before migrations existed, which skipped indexes
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.Base.metadata.create_all(engine, tables=[
+        table for table in models.Base.metadata.sorted_tables if table.name in BASELINE_TABLES])
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX idx_student_progress"))
+
+    migrate(engine)
+
+    assert schema_diff(engine) == []
+    with engine.connect() as connection:
+        assert current_revision(connection) == ScriptDirectory.from_config(alembic_config()).get_current_head()
+    assert "idx_student_progress" in {index["name"] for index in inspect(engine).get_indexes("progress_logs")}
+
+
+def test_database_created_by_create_all_is_adopted_at_its_revision(tmp_path):
+    # create_all at head already made the llm_usage and shard_directory tables
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    models.Base.metadata.create_all(engine)
+
+    migrate(engine)
+    migrate(engine)
+
+    assert schema_diff(engine) == []
+    with engine.connect() as connection:
+        assert current_revision(connection) == ScriptDirectory.from_config(alembic_config()).get_current_head()
@@ -0,0 +1,83 @@
+"""Semantic answer cache for repeated chat questions (see app/semantic_cache.py)."""
+import asyncio
+
+import pytest
+
+from app.semantic_cache import SemanticCache, semantic_cache
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticCache(threshold=0.8)
+    cache.store("grade:7", "What is photosynthesis?", "Plants make sugar from light.", latency_ms=900)
+    cache.store("grade:7", "Add 1/3 and 1/4", "7/12", latency_ms=900)
+    return cache
+
+
+def test_paraphrases_of_the_same_question_hit(cache):
+    for question in ("what is photosynthesis", "What's photosynthesis?", "Explain photosynthesis please",
+                     "Can you define photosynthesis?"):
+        assert cache.lookup("grade:7", question) == "Plants make sugar from light.", question
+
+
+def test_same_topic_with_a_different_question_word_misses(cache):
+    for question in ("Why is photosynthesis?", "Why is photosynthesis important?", "How does photosynthesis work?",
+                     "When does photosynthesis happen?", "Where does photosynthesis happen?"):
+        assert cache.lookup("grade:7", question) is None, question
+
+
+def test_different_numbers_miss(cache):
+    assert cache.lookup("grade:7", "add 1/3 and 1/4 please") == "7/12"
+    assert cache.lookup("grade:7", "Add 2/5 and 1/4") is None
+
+
+def test_questions_differing_in_one_entity_miss(cache):
+    pairs = [
+        ("Who was the first president of the united states of america",
+         "Who was the second president of the united states of america"),
+        ("What is the capital city of the state of new york", "What is the capital city of the state of new jersey"),
+    ]
+    for stored, asked in pairs:
+        cache.store("grade:7", stored, stored, latency_ms=900)
+        assert cache.lookup("grade:7", stored) == stored
+        assert cache.lookup("grade:7", asked) is None, asked
+
+
+def test_partitions_and_follow_ups_are_kept_apart(cache):
+    assert cache.lookup("grade:5", "What is photosynthesis?") is None
+    cache.store("grade:7", "Why does it do that?", "Because...", latency_ms=900)
+    assert cache.lookup("grade:7", "Why does it do that?") is None
+
+
+def test_only_the_stored_grade_selects_a_shared_partition(tutor, scripted):
+    semantic_cache.clear()
+    tutor.client = scripted(lambda messages: f"answer {len(tutor.client.calls)}")
+
+    async def ask(context, grade_level=None):
+        return await tutor.chat_assistance("What is a prime number?", context, grade_level=grade_level)
+
+    async def main():
+        first = await ask({"grade_level": 5}, grade_level=7)
+        # A client claiming grade 7 in its context still reads its own grade's partition
+        other_grade = await ask({"grade_level": 7}, grade_level=5)
+        same_grade = await ask({}, grade_level=7)
+        unauthenticated = await ask({"grade_level": 7})
+        return first, other_grade, same_grade, unauthenticated
+
+    assert asyncio.run(main()) == ("answer 1", "answer 2", "answer 1", "answer 3")
+    assert "grade 7 students" in tutor.client.calls[0][0]["content"]
+
+
+def test_shared_answers_are_not_tailored_to_the_asking_students_context(tutor, scripted):
+    semantic_cache.clear()
+    tutor.client = scripted(lambda messages: "answer")
+    context = {"learning_style": "visual", "weak_subjects": ["Mathematics"], "current_topic": "Soccer fractions"}
+
+    async def main():
+        await tutor.chat_assistance("What is a fraction?", context, grade_level=7)
+        await tutor.chat_assistance("What is a ratio?", context, history=[(True, "hi")], grade_level=7)
+
+    asyncio.run(main())
+    shared_prompt, tailored_prompt = (str(call) for call in tutor.client.calls)
+    assert "Soccer" not in shared_prompt and "visual" not in shared_prompt
+    assert "Soccer" in tailored_prompt and "visual" in tailored_prompt
@@ -0,0 +1,79 @@
+"""Shard routing against scratch SQLite databases (see app/sharding.py)."""
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.schema import migrate
+from app.sharding import HashRing, ShardSet
+
+
+@pytest.fixture
+def shard_set(tmp_path):
+    primary_url = f"sqlite:///{tmp_path / 'primary.db'}"
+    primary = sessionmaker(autocommit=False, autoflush=False, bind=create_engine(primary_url))
+    # The primary doubles as shard "a", as when an existing database becomes the first shard
+    urls = [("a", primary_url)] + [(name, f"sqlite:///{tmp_path / name}.db") for name in ("b", "c")]
+    shards = ShardSet(urls, primary=primary, primary_url=primary_url, virtual_nodes=32)
+    for engine in shards.engines():
+        migrate(engine)
+    return shards
+
+
+def student(number):
+    return {"email": f"s{number}@example.com", "hashed_password": "x", "full_name": f"Student {number}",
+            "grade_level": 7}
+
+
+def test_adding_a_shard_only_moves_students_to_it():
+    before, after = HashRing(["a", "b", "c"]), HashRing(["a", "b", "c", "d"])
+    moved = [student_id for student_id in range(10000) if before.shard_for(student_id) != after.shard_for(student_id)]
+    assert {after.shard_for(student_id) for student_id in moved} == {"d"}
+    assert 0.15 < len(moved) / 10000 < 0.35
+
+
+def test_students_are_placed_by_the_ring_and_gathered_from_every_shard(shard_set):
+    with shard_set.primary() as db:
+        ids = shard_set.insert_students(db, [student(number) for number in range(30)])
+    assert shard_set.status() == {
+        name: sum(shard_set.ring.shard_for(student_id) == name for student_id in ids) for name in shard_set.names
+    }
+    for student_id in ids:
+        assert shard_set.locate(student_id) == shard_set.ring.shard_for(student_id)
+        with shard_set.session_for(student_id) as db:
+            assert crud.get_student(db, student_id).email == f"s{ids.index(student_id)}@example.com"
+    counts = shard_set.scatter(lambda db: db.query(func.count(models.Student.id)).scalar())
+    assert sum(counts.values()) == 30 and len([count for count in counts.values() if count]) > 1
+
+
+def test_move_copies_every_row_and_repoints_the_directory(shard_set):
+    with shard_set.primary() as db:
+        [student_id] = shard_set.insert_students(db, [student(1)])
+    source = shard_set.locate(student_id)
+    target = next(name for name in shard_set.names if name != source)
+    with shard_set.session(source) as db:
+        curriculum = crud.create_curriculum(db, {"title": "Plan", "weekly_plans": [{
+            "week_number": 1, "focus_areas": ["Fractions"], "daily_breakdown": {}, "learning_objectives": [],
+            "resources_needed": []
+        }]}, student_id)
+        session = models.ChatSession(student_id=student_id, session_title="Fractions")
+        db.add(session)
+        db.flush()
+        db.add(models.ChatMessage(session_id=session.id, content="What is 1/2 + 1/4?", is_user=True))
+        db.add(models.ProgressLog(student_id=student_id, weekly_plan_id=curriculum.weekly_plans[0].id,
+                                  subject="Mathematics", topic="Fractions", proficiency_score=80))
+        db.commit()
+
+    moved = shard_set.move(student_id, target)
+
+    assert shard_set.locate(student_id) == target
+    assert moved["curricula"] == moved["weekly_plans"] == moved["chat_messages"] == moved["progress_logs"] == 1
+    with shard_set.session(source) as db:
+        assert crud.get_student(db, student_id) is None
+        assert db.query(models.Curriculum).filter(models.Curriculum.student_id == student_id).count() == 0
+    with shard_set.session(target) as db:
+        [log] = crud.get_student_progress(db, student_id)
+        [curriculum] = crud.get_student_curricula(db, student_id)
+        assert log.weekly_plan_id == curriculum.weekly_plans[0].id
+        [session] = db.query(models.ChatSession).filter(models.ChatSession.student_id == student_id).all()
+        assert [message.content for message in crud.get_chat_messages(db, session.id)] == ["What is 1/2 + 1/4?"]
@@ -0,0 +1,109 @@
+"""Coalescing of identical in-flight AI calls (see app/singleflight.py)."""
+import asyncio
+
+import pytest
+
+from app.llm_usage import usage_ledger
+from app.singleflight import DatabaseLeases, SingleFlight, flight_key
+
+
+@pytest.fixture(autouse=True)
+def no_ledger(monkeypatch):
+    monkeypatch.setattr(usage_ledger, "enabled", False)
+
+
+class Upstream:
+    """Slow call counting how often it really ran and whether it was cancelled"""
+
+    def __init__(self, delay: float = 0.05, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return {"answer": [1, 2]}
+
+
+def test_identical_inputs_share_a_key():
+    assert flight_key("chat", "gpt-4", {"q": "What  is X?"}) == flight_key("chat", "gpt-4", {"q": "what is x?"})
+    assert flight_key("chat", "gpt-4", {"q": "x", "grade": 5}) != flight_key("chat", "gpt-4", {"q": "x", "grade": 6})
+
+
+def test_concurrent_calls_run_once_and_followers_get_copies():
+    flights, upstream = SingleFlight(), Upstream()
+
+    async def main():
+        return await asyncio.gather(*(flights.do("k", upstream) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert upstream.calls == 1 and all(result == {"answer": [1, 2]} for result in results)
+    results[1]["answer"].append(3)
+    assert results[2] == {"answer": [1, 2]}
+
+
+def test_followers_survive_the_leader_being_cancelled():
+    flights, upstream = SingleFlight(), Upstream()
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do("k", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("k", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(main()) == ({"answer": [1, 2]}, True)
+    assert upstream.calls == 1 and not upstream.cancelled
+
+
+def test_work_is_cancelled_once_every_waiter_is_gone():
+    flights, upstream = SingleFlight(), Upstream(delay=5.0)
+
+    async def main():
+        waiters = [asyncio.ensure_future(flights.do("k", upstream)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        return dict(flights._flights)
+
+    assert asyncio.run(main()) == {}
+    assert upstream.cancelled
+
+
+def test_failures_reach_every_waiter_and_are_not_cached():
+    flights, upstream = SingleFlight(), Upstream(error=RuntimeError("upstream down"))
+
+    async def main():
+        results = await asyncio.gather(*(flights.do("k", upstream) for _ in range(3)), return_exceptions=True)
+        upstream.error = None
+        return results, await flights.do("k", upstream)
+
+    results, retried = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == {"answer": [1, 2]} and upstream.calls == 2
+
+
+def test_database_leases_coalesce_across_workers(db):
+    # Two workers: each has its own coalescer and lease owner
+    first = SingleFlight(DatabaseLeases(lease_seconds=5, result_ttl=5, poll_interval=0.01))
+    second = SingleFlight(DatabaseLeases(lease_seconds=5, result_ttl=5, poll_interval=0.01))
+    upstream = Upstream(delay=0.1)
+
+    async def main():
+        leader = asyncio.ensure_future(first.do("lease-test", upstream))
+        await asyncio.sleep(0.03)
+        return await asyncio.gather(leader, second.do("lease-test", upstream))
+
+    assert asyncio.run(main()) == [{"answer": [1, 2]}] * 2
+    assert upstream.calls == 1
@@ -0,0 +1,40 @@
+"""Cold-start budget for the API process (see benchmarks/bench_startup.py).
+
+Budgets can be raised for slow machines with STARTUP_IMPORT_BUDGET_MS and
+STARTUP_HEALTHY_BUDGET_SECONDS.
+"""
+import os
+
+from benchmarks.bench_startup import import_times, loaded_modules, startup_env, time_to_healthy
+
+IMPORT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", 2000))
+HEALTHY_BUDGET_SECONDS = float(os.environ.get("STARTUP_HEALTHY_BUDGET_SECONDS", 5))
+
+# Loaded on first use, never by importing the app
+LAZY_MODULES = ("openai", "numpy", "jose", "passlib")
+
+
+def test_import_stays_within_budget():
+    rows = import_times()
+    total = next(cumulative for name, _, _, cumulative in rows if name == "app.main")
+    slowest = sorted(rows, key=lambda row: row[2], reverse=True)[:10]
+    assert total <= IMPORT_BUDGET_MS, (
+        f"import app.main took {total:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms); slowest modules: "
+        + ", ".join(f"{name} {own:.0f} ms" for name, _, own, _ in slowest)
+    )
+
+
+def test_heavy_modules_are_lazy():
+    loaded = set(loaded_modules())
+    assert not loaded.intersection(LAZY_MODULES)
+
+
+def test_import_does_not_touch_the_database(tmp_path):
+    database = tmp_path / "app.db"
+    loaded_modules(env=startup_env(f"sqlite:///{database}"))
+    assert not database.exists()
+
+
+def test_first_healthy_response_within_budget(tmp_path):
+    elapsed = time_to_healthy(startup_env(f"sqlite:///{tmp_path / 'app.db'}"))
+    assert elapsed <= HEALTHY_BUDGET_SECONDS, f"/health took {elapsed:.2f} s (budget {HEALTHY_BUDGET_SECONDS} s)"
@@ -0,0 +1,44 @@
+"""Synthetic benchmark data generator (see benchmarks/synthetic.py)."""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.schema import migrate
+from benchmarks.synthetic import WEEKS, generate
+
+
+def _session(path):
+    engine = create_engine(f"sqlite:///{path}")
+    migrate(engine)
+    return sessionmaker(bind=engine)()
+
+
+def _logs(db):
+    return [(log.student_id, log.weekly_plan_id, log.topic, log.proficiency_score)
+            for log in db.query(models.ProgressLog).order_by(models.ProgressLog.id)]
+
+
+def test_generated_rows_are_consistent_and_deterministic(tmp_path):
+    first, second = _session(tmp_path / "first.db"), _session(tmp_path / "second.db")
+    sizes = dict(logs_per_student=12, sessions_per_student=2, messages_per_student=6, seed=4, chunk_size=7)
+
+    written = generate(first, 5, **sizes)
+    generate(second, 5, **sizes)
+
+    assert written == {"students": 5, "curricula": 5, "weekly_plans": 5 * WEEKS, "progress_logs": 60,
+                       "chat_sessions": 10, "chat_messages": 30}
+    assert _logs(first) == _logs(second)
+    owners = dict(first.query(models.WeeklyPlan.id, models.Curriculum.student_id).join(models.Curriculum))
+    assert all(owners[plan_id] == student_id for student_id, plan_id, _, _ in _logs(first))
+    sessions = dict(first.query(models.ChatSession.id, models.ChatSession.student_id))
+    assert {sessions[message.session_id] for message in first.query(models.ChatMessage)} == set(range(1, 6))
+
+
+def test_generating_again_appends_after_existing_rows(tmp_path):
+    db = _session(tmp_path / "append.db")
+    generate(db, 2, logs_per_student=1, messages_per_student=2)
+    generate(db, 3, logs_per_student=1, messages_per_student=2)
+
+    assert [student.id for student in db.query(models.Student).order_by(models.Student.id)] == [1, 2, 3, 4, 5]
+    assert db.query(models.WeeklyPlan).count() == 5 * WEEKS
+    assert len({student.email for student in db.query(models.Student)}) == 5
@@ -0,0 +1,141 @@
+"""Write-behind buffer for chat messages (see app/write_behind.py)."""
+import asyncio
+import json
+import time
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import models
+from app.write_behind import ChatWriteBehind, chat_message
+from benchmarks.common import create_student
+
+
+@pytest.fixture
+def chat(db, student):
+    """(student id, session id, count of the session's saved messages)"""
+    student, _ = student
+    session = models.ChatSession(student_id=student.id, session_title="Buffered")
+    db.add(session)
+    db.commit()
+
+    def saved():
+        db.expire_all()
+        return db.query(models.ChatMessage).filter(models.ChatMessage.session_id == session.id).count()
+    return student.id, session.id, saved
+
+
+async def _until(predicate, timeout: float = 2.0) -> float:
+    started = time.monotonic()
+    while not predicate():
+        assert time.monotonic() - started < timeout, "timed out"
+        await asyncio.sleep(0.005)
+    return time.monotonic() - started
+
+
+def test_every_message_is_saved_within_max_delay(chat):
+    student_id, session_id, saved = chat
+    writer = ChatWriteBehind(max_batch=50, max_delay=0.1)
+
+    async def main():
+        await writer.add(student_id, chat_message(session_id, "first", True, "question"))
+        assert saved() == 0
+        first = await _until(lambda: saved() == 1)
+        # The buffer is empty again; the next message must not wait for a full batch
+        await writer.add(student_id, chat_message(session_id, "second", True, "question"))
+        second = await _until(lambda: saved() == 2)
+        await writer.stop()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert 0.05 < first < 1.0 and 0.05 < second < 1.0
+
+
+def test_a_full_batch_is_flushed_immediately(chat):
+    student_id, session_id, saved = chat
+    writer = ChatWriteBehind(max_batch=3, max_delay=30.0)
+
+    async def main():
+        await writer.add(student_id, *(chat_message(session_id, f"m{n}", True, "question") for n in range(3)))
+        elapsed = await _until(lambda: saved() == 3)
+        await writer.stop()
+        return elapsed
+
+    assert asyncio.run(main()) < 1.0
+
+
+def test_transient_errors_are_retried(chat, monkeypatch):
+    student_id, session_id, saved = chat
+    writer = ChatWriteBehind(max_batch=50, max_delay=0.01, max_retry_delay=0.05)
+    write_shard = writer._write_shard
+    outages = iter([OperationalError("INSERT", {}, Exception("database is locked"))] * 2)
+
+    def flaky(shard, batch):
+        error = next(outages, None)
+        if error is not None:
+            raise error
+        write_shard(shard, batch)
+    monkeypatch.setattr(writer, "_write_shard", flaky)
+
+    async def main():
+        await writer.add(student_id, chat_message(session_id, "hello", True, "question"))
+        await _until(lambda: saved() == 1)
+        await writer.stop()
+
+    asyncio.run(main())
+    assert writer.pending == []
+
+
+def test_rejected_rows_are_dead_lettered_without_blocking_the_rest(chat, tmp_path):
+    student_id, session_id, saved = chat
+    dead_letter = tmp_path / "rejected.jsonl"
+    writer = ChatWriteBehind(max_batch=50, max_delay=0.01, dead_letter_path=str(dead_letter))
+    bad = chat_message(session_id, None, True, "question")  # content is NOT NULL
+
+    async def main():
+        await writer.add(student_id, chat_message(session_id, "before", True, "question"), bad,
+                         chat_message(session_id, "after", False, "explanation"))
+        await _until(lambda: saved() == 2)
+        await writer.add(student_id, chat_message(session_id, "later", True, "question"))
+        await _until(lambda: saved() == 3)
+        await writer.stop()
+
+    asyncio.run(main())
+    assert writer.pending == []
+    assert [json.loads(line) for line in dead_letter.read_text().splitlines()] == [
+        {"student_id": student_id, "message": bad}
+    ]
+
+
+def test_shutdown_spills_what_cannot_be_written_and_start_replays_it(chat, tmp_path, monkeypatch):
+    student_id, session_id, saved = chat
+    spill = tmp_path / "spill.jsonl"
+    writer = ChatWriteBehind(max_batch=50, max_delay=10.0, spill_path=str(spill))
+
+    def down(shard, batch):
+        raise OperationalError("INSERT", {}, Exception("connection refused"))
+
+    async def shutdown():
+        monkeypatch.setattr(writer, "_write_shard", down)
+        await writer.add(student_id, chat_message(session_id, "unsaved", True, "question"))
+        await writer.stop()
+
+    async def restart():
+        monkeypatch.undo()
+        await writer.start()
+        await writer.stop()
+
+    asyncio.run(shutdown())
+    assert saved() == 0 and len(spill.read_text().splitlines()) == 1
+    asyncio.run(restart())
+    assert saved() == 1 and not spill.exists()
+
+
+def test_messages_cannot_be_posted_to_another_students_session(client, db, chat):
+    _, session_id, saved = chat
+    _, intruder = create_student(db, email="write-behind-intruder@example.com")
+
+    response = client.post("/chat/message", headers=intruder, json={"session_id": session_id, "content": "hi"})
+
+    assert response.status_code == 404
+    assert saved() == 0
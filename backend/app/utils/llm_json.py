@@ -0,0 +1,255 @@
+"""Tolerant JSON parsing for LLM output.
+
+Models wrap JSON in prose or markdown fences, copy the ``// ...`` comments and
+``[...]`` placeholders from our own prompt templates, leave trailing commas and
+get cut off by ``max_tokens``. ``loads_lenient`` repairs those defects, and
+``IncrementalJSONParser`` consumes a streamed response chunk by chunk, handing
+back each element of a target array (e.g. ``weekly_plans``) as soon as it is
+complete so validation overlaps generation.
+"""
+import json
+from typing import Any, List, Optional
+
+# How many structural commas to back off to when a truncated document still
+# fails to parse after closing its open containers
+MAX_TRUNCATION_RETRIES = 25
+
+
+class LLMJSONError(ValueError):
+    """Raised when no JSON value can be recovered from model output"""
+
+
+def _first_json_start(text: str) -> int:
+    starts = [index for index in (text.find("{"), text.find("[")) if index != -1]
+    return min(starts) if starts else -1
+
+
+def _last_significant(out: List[str]) -> str:
+    for piece in reversed(out):
+        stripped = piece.strip()
+        if stripped:
+            return stripped[-1]
+    return ""
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    for index in range(len(out) - 1, -1, -1):
+        if out[index].strip():
+            if out[index] == ",":
+                del out[index]
+            return
+
+
+def _close(out: List[str], stack: List[str]) -> str:
+    out = list(out)
+    _drop_trailing_comma(out)
+    if _last_significant(out) == ":":
+        out.append("null")
+    return "".join(out) + "".join(reversed(stack))
+
+
+def _repair_candidates(text: str) -> List[str]:
+    """Scan ``text`` once, returning the repaired document followed by
+    progressively shorter fallbacks cut at structural commas (for truncation)"""
+    start = _first_json_start(text)
+    if start == -1:
+        return []
+
+    out: List[str] = []
+    stack: List[str] = []
+    checkpoints = []
+    in_string = escape = False
+    i, n = start, len(text)
+    while i < n:
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch == "\n":
+                ch = "\\n"
+            out.append(ch)
+            i += 1
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch == "/" and text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = n if newline == -1 else newline
+            continue
+        elif ch == "/" and text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            continue
+        elif text.startswith("...", i):
+            # ``[...]`` / ``{ ... }`` placeholders copied from the prompt
+            i += 3
+            continue
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            if not stack or stack[-1] != ch:
+                i += 1
+                continue
+            _drop_trailing_comma(out)
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+        elif ch == ",":
+            if _last_significant(out) in ("[", "{", ",", ""):
+                i += 1
+                continue
+            checkpoints.append((len(out), list(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+
+    if in_string:
+        out.append('"')
+    candidates = [_close(out, stack)]
+    for length, snapshot in reversed(checkpoints[-MAX_TRUNCATION_RETRIES:]):
+        candidates.append(_close(out[:length], snapshot))
+    return candidates
+
+
+def repair_json(text: str) -> str:
+    """Best-effort repair of a single JSON document embedded in ``text``"""
+    candidates = _repair_candidates(text)
+    if not candidates:
+        raise LLMJSONError("No JSON object found in model output")
+    return candidates[0]
+
+
+def loads_lenient(text: str) -> Any:
+    """``json.loads`` that tolerates the usual LLM formatting defects"""
+    start = _first_json_start(text)
+    if start == -1:
+        raise LLMJSONError("No JSON object found in model output")
+    end = max(text.rfind("}"), text.rfind("]")) + 1
+    try:
+        return json.loads(text[start:end])
+    except json.JSONDecodeError:
+        pass
+
+    for candidate in _repair_candidates(text):
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise LLMJSONError("Could not repair JSON in model output")
+
+
+class IncrementalJSONParser:
+    """Streaming scanner that yields elements of the array stored under
+    ``item_key`` as soon as each one is closed.
+
+    >>> parser = IncrementalJSONParser("weekly_plans")
+    >>> parser.feed('{"weekly_plans": [{"week_number": 1},')
+    [{'week_number': 1}]
+    """
+
+    def __init__(self, item_key: Optional[str] = None):
+        self.item_key = item_key
+        self.items: List[Any] = []
+        self._text = ""
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._comment: Optional[str] = None
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._key_stack: List[Optional[str]] = []
+        self._items_depth: Optional[int] = None
+        self._items_done = False
+        self._item_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume ``chunk``; returns the items completed by it"""
+        self._text += chunk
+        text, i, n = self._text, self._pos, len(self._text)
+        emitted = []
+        while i < n:
+            ch = text[i]
+            if self._comment == "//":
+                if ch == "\n":
+                    self._comment = None
+                i += 1
+                continue
+            if self._comment == "/*":
+                if ch == "*":
+                    if i + 1 >= n:
+                        break
+                    if text[i + 1] == "/":
+                        self._comment = None
+                        i += 2
+                        continue
+                i += 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == "/":
+                if i + 1 >= n:
+                    break  # wait for the next chunk to tell comment from noise
+                if text[i + 1] in "/*":
+                    self._comment = "/" + text[i + 1]
+                    i += 2
+                    continue
+            elif ch == ":":
+                self._pending_key = self._last_string
+            elif ch == ",":
+                self._pending_key = None
+            elif ch in "{[":
+                self._key_stack.append(self._pending_key)
+                self._pending_key = None
+                depth = len(self._key_stack)
+                if (ch == "[" and not self._items_done and self._items_depth is None
+                        and self.item_key is not None and self._key_stack[-1] == self.item_key):
+                    self._items_depth = depth
+                elif ch == "{" and self._items_depth is not None and depth == self._items_depth + 1:
+                    self._item_start = i
+            elif ch in "}]":
+                depth = len(self._key_stack)
+                if ch == "}" and self._item_start is not None and depth == self._items_depth + 1:
+                    try:
+                        emitted.append(loads_lenient(text[self._item_start:i + 1]))
+                    except LLMJSONError:
+                        pass
+                    self._item_start = None
+                elif ch == "]" and self._items_depth is not None and depth == self._items_depth:
+                    self._items_depth = None
+                    self._items_done = True
+                if self._key_stack:
+                    self._key_stack.pop()
+            i += 1
+        self._pos = i
+        self.items.extend(emitted)
+        return emitted
+
+    def close(self) -> Any:
+        """Parse the whole (possibly truncated) document leniently"""
+        return loads_lenient(self._text)
@@ -0,0 +1,198 @@
+"""Write-behind buffer for chat messages.
+
+Chat turns (HTTP and WebSocket) hand their messages to ``chat_writer``
+instead of committing them on the request's own DB session, so no pooled
+connection is held while the LLM is generating. A single flusher task per
+worker (app/batching.py) inserts the buffer in batches: as soon as
+``max_batch`` messages are pending, or ``max_delay`` seconds after the
+oldest unsaved one. When more
+than ``max_pending`` messages are waiting (the DB is slow or down), callers
+flush inline, which pushes back on new turns. With sharding on, a batch is
+written as one transaction per shard (see app/sharding.py). Queued messages
+are added to the student's retrieval index right away (app/retrieval.py).
+
+Durability: batches failing on a transient error (connection lost, lock
+timeout) are retried with backoff. ``stop()`` (app shutdown) drains the
+buffer; whatever still cannot be written is appended to ``spill_path`` as
+JSON lines and replayed by the next ``start()``. Messages acknowledged in the
+last ``max_delay`` seconds before a hard crash are lost. Messages the
+database rejects (``REJECTED_ERRORS``, e.g. a deleted session) would fail
+forever, so they are written to ``dead_letter_path`` instead and never
+retried.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from . import models
+from .batching import BatchFlusher
+from .config import settings
+from .metrics import metrics
+from .retrieval import retrieval
+from .sharding import shards
+
+logger = logging.getLogger(__name__)
+
+# (student_id, ChatMessage column values, monotonic enqueue time)
+PendingMessage = Tuple[int, Dict[str, Any], float]
+
+# Errors caused by the rows themselves; retrying cannot fix them
+REJECTED_ERRORS = (IntegrityError, DataError)
+
+
+def chat_message(session_id: int, content: str, is_user: bool, message_type: str) -> Dict[str, Any]:
+    return {"session_id": session_id, "content": content, "is_user": is_user, "message_type": message_type}
+
+
+class ChatWriteBehind(BatchFlusher):
+    metric_prefix = "chat_write_behind"
+    label = "Chat write-behind"
+
+    def __init__(self, max_batch: int = 50, max_delay: float = 1.0, max_pending: int = 5000,
+                 spill_path: Optional[str] = None, dead_letter_path: Optional[str] = None,
+                 max_retry_delay: float = 30.0):
+        super().__init__(max_batch, max_delay, max_retry_delay)
+        self.max_pending = max_pending
+        self.spill_path = spill_path
+        self.dead_letter_path = dead_letter_path
+        self.pending: List[PendingMessage] = []
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._lock = asyncio.Lock()
+        super()._ensure_running()
+
+    async def add(self, student_id: int, *messages: Dict[str, Any]) -> None:
+        """Queue messages for persistence (see ``chat_message``)"""
+        now = time.monotonic()
+        self._enqueue((student_id, message, now) for message in messages)
+        retrieval.add_chat_messages(student_id, messages)
+        metrics.set_gauge("chat_write_behind_pending", len(self.pending))
+        if len(self.pending) >= self.max_pending:
+            metrics.increment("chat_write_behind_backpressure_total")
+            try:
+                await self.flush()
+            except Exception:
+                # The flusher keeps retrying; the turn itself already succeeded
+                logger.exception("Chat write-behind inline flush failed")
+
+    async def flush(self) -> int:
+        """Write one batch now; returns the number of messages written"""
+        if self._lock is None:
+            return 0
+        async with self._lock:
+            batch = self.pending[:self.max_batch]
+            if not batch:
+                return 0
+            failed, rejected, error = await run_in_threadpool(self._write, batch)
+            # Messages of a failing shard stay at the front, ahead of newer ones
+            self.pending[:len(batch)] = failed
+            if rejected:
+                self._dead_letter(rejected)
+        metrics.set_gauge("chat_write_behind_pending", len(self.pending))
+        if error is not None:
+            raise error
+        return len(batch) - len(rejected)
+
+    def _write(self, batch: List[PendingMessage]
+               ) -> Tuple[List[PendingMessage], List[PendingMessage], Optional[Exception]]:
+        """Insert the batch, one transaction per shard; returns the messages
+        to retry, the messages the database rejected, and the error that
+        stopped the retried ones"""
+        started = time.perf_counter()
+        by_shard: Dict[Optional[str], List[int]] = defaultdict(list)
+        for position, (student_id, _, _) in enumerate(batch):
+            by_shard[shards.locate(student_id)].append(position)
+        retry, rejected, error = set(), set(), None
+        for shard, positions in by_shard.items():
+            try:
+                self._write_shard(shard, [batch[position] for position in positions])
+            except REJECTED_ERRORS:
+                # One bad row fails its whole transaction; write the rows
+                # one at a time to keep the good ones
+                for position in positions:
+                    try:
+                        self._write_shard(shard, [batch[position]])
+                    except REJECTED_ERRORS:
+                        rejected.add(position)
+                    except Exception as e:
+                        retry.add(position)
+                        error = e
+            except Exception as e:
+                retry.update(positions)
+                error = e
+        failed = [entry for position, entry in enumerate(batch) if position in retry]
+        written = len(batch) - len(retry) - len(rejected)
+        if written:
+            metrics.increment("chat_write_behind_messages_total", written)
+            metrics.increment("chat_write_behind_flushes_total")
+            metrics.observe("chat_write_behind_flush_ms", (time.perf_counter() - started) * 1000)
+            metrics.observe("chat_write_behind_lag_ms", (time.monotonic() - batch[0][2]) * 1000)
+        return failed, [batch[position] for position in sorted(rejected)], error
+
+    def _write_shard(self, shard: Optional[str], batch: List[PendingMessage]) -> None:
+        rows = [values for _, values, _ in batch]
+        db = shards.session(shard)
+        try:
+            db.execute(insert(models.ChatMessage), rows)
+            db.query(models.ChatSession).filter(
+                models.ChatSession.id.in_({row["session_id"] for row in rows})
+            ).update({models.ChatSession.updated_at: func.now()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _dead_letter(self, rejected: List[PendingMessage]) -> None:
+        metrics.increment("chat_write_behind_rejected_total", len(rejected))
+        if not self.dead_letter_path:
+            logger.error("Dropping %d chat messages rejected by the database", len(rejected))
+            return
+        with open(self.dead_letter_path, "a", encoding="utf-8") as dead_letter:
+            for student_id, values, _ in rejected:
+                dead_letter.write(json.dumps({"student_id": student_id, "message": values}) + "\n")
+        logger.error("Wrote %d chat messages rejected by the database to %s", len(rejected), self.dead_letter_path)
+
+    def _abandon(self) -> None:
+        # Spilled messages are replayed by the next start()
+        if not self.pending:
+            return
+        if not self.spill_path:
+            logger.error("Dropping %d unsaved chat messages (no spill path configured)", len(self.pending))
+        else:
+            with open(self.spill_path, "a", encoding="utf-8") as spill:
+                for student_id, values, _ in self.pending:
+                    spill.write(json.dumps({"student_id": student_id, "message": values}) + "\n")
+            logger.warning("Spilled %d unsaved chat messages to %s", len(self.pending), self.spill_path)
+        metrics.increment("chat_write_behind_spilled_total", len(self.pending))
+        self.pending = []
+
+    async def start(self) -> None:
+        """Start the flusher and re-queue messages spilled by a previous shutdown"""
+        self._ensure_running()
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with open(self.spill_path, encoding="utf-8") as spill:
+            entries = [json.loads(line) for line in spill if line.strip()]
+        os.remove(self.spill_path)
+        for entry in entries:
+            await self.add(entry["student_id"], entry["message"])
+        logger.info("Re-queued %d spilled chat messages", len(entries))
+
+
+# Global buffer, started and drained by the app's startup/shutdown events
+chat_writer = ChatWriteBehind(
+    max_batch=settings.CHAT_WRITE_BEHIND_BATCH_SIZE,
+    max_delay=settings.CHAT_WRITE_BEHIND_MAX_DELAY_SECONDS,
+    max_pending=settings.CHAT_WRITE_BEHIND_MAX_PENDING,
+    spill_path=settings.CHAT_WRITE_BEHIND_SPILL_PATH or None,
+    dead_letter_path=settings.CHAT_WRITE_BEHIND_DEAD_LETTER_PATH or None,
+)
@@ -0,0 +1,155 @@
+"""DB pool utilization under concurrent HTTP chat: held vs. released sessions.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_chat_pool --clients 40 --turns 3
+
+Drives ``--clients`` students through ``--turns`` chat turns each (fake LLM)
+against one in-process uvicorn worker, twice:
+
+* ``held``         - the previous ``/chat/message`` handler, mounted here as
+  ``/bench/held-message``: the request's DB session stays checked out
+  across the LLM call and both messages are committed at the end
+* ``write-behind`` - the current ``/chat/message``: the connection is
+  returned before the LLM call and messages go through ``chat_writer``
+
+Reports completed/failed turns, latency, peak and mean connections checked
+out (sampled every 5 ms), connection hold time and commits. The pool is the
+app default (5 + 10 overflow) with a ``--pool-timeout`` checkout timeout.
+Pool waits block the event loop (the auth dependency queries synchronously),
+so with held sessions every waiting request stalls the whole worker.
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+from .bench_ws_chat import count_commits, seed_students, start_server
+from .common import bootstrap, summarize
+
+
+def mount_held_handler(app):
+    """Register the pre-write-behind chat handler for comparison"""
+    from fastapi import Depends
+    from sqlalchemy.orm import Session
+
+    from app import models
+    from app.ai_utils import CHAT_FALLBACK_MESSAGE, ai_tutor
+    from app.auth import get_current_user
+    from app.database import get_db
+    from app.retrieval import retrieval
+
+    @app.post("/bench/held-message")
+    async def held_message(message_data: dict, db: Session = Depends(get_db),
+                           current_user: models.Student = Depends(get_current_user)):
+        db_message = models.ChatMessage(session_id=message_data['session_id'], content=message_data['content'],
+                                        is_user=True, message_type='question')
+        db.add(db_message)
+        references = retrieval.search(db, current_user.id, message_data['content'])
+        response = await ai_tutor.chat_assistance(message_data['content'], {}, references=references)
+        ai_message = models.ChatMessage(session_id=message_data['session_id'], content=response, is_user=False,
+                                        message_type='fallback' if response == CHAT_FALLBACK_MESSAGE else 'explanation')
+        db.add(ai_message)
+        db.commit()
+        return {"response": response}
+
+
+class PoolSampler:
+    def __init__(self, pool, interval: float = 0.005):
+        self.pool = pool
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append(self.pool.checkedout())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def drive(port, path, students, turns, samples, failures):
+    import httpx
+
+    async def student(client, token, session_id):
+        headers = {"Authorization": f"Bearer {token}"}
+        for turn in range(turns):
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, headers=headers, json={
+                    "session_id": session_id, "content": f"Explain fractions, part {turn} ({session_id})"
+                })
+                if response.status_code == 200:
+                    samples.append((time.perf_counter() - start) * 1000)
+                else:
+                    failures.append(response.status_code)
+            except Exception as e:
+                failures.append(type(e).__name__)
+
+    limits = httpx.Limits(max_connections=len(students))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as client:
+        await asyncio.gather(*(student(client, token, session_id) for token, session_id in students))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency-ms", type=int, default=500, help="Fake upstream latency per call")
+    parser.add_argument("--pool-timeout", type=float, default=2.0, help="DB pool checkout timeout (app: 30 s)")
+    args = parser.parse_args()
+
+    bootstrap()
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "RATE_LIMIT_ENABLED": "false",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "AI_MAX_CONCURRENT_CALLS": str(args.clients),
+        "AI_MAX_QUEUED_CALLS": str(args.clients),
+        "DATABASE_POOL_TIMEOUT": str(args.pool_timeout),
+    })
+    from app.database import engine
+    from app.main import app
+    from app.metrics import metrics
+
+    mount_held_handler(app)
+    students = seed_students(args.clients)
+    server, thread, port = start_server(app)
+    commits = count_commits(engine)
+
+    print(f"{args.clients} clients x {args.turns} turns, fake LLM {args.latency_ms} ms, "
+          f"pool {engine.pool.size()} + {os.environ.get('DATABASE_MAX_OVERFLOW', 10)} overflow")
+    print(f"{'mode':<14}{'ok':>5}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'peak conn':>11}{'mean conn':>11}"
+          f"{'hold mean/max ms':>18}{'commits':>9}")
+    for mode, path in (("held", "/bench/held-message"), ("write-behind", "/chat/message")):
+        metrics.reset()
+        commits["commits"] = 0
+        samples, failures = [], []
+        with PoolSampler(engine.pool) as sampler:
+            asyncio.run(drive(port, path, students, args.turns, samples, failures))
+            # Let the write-behind buffer flush what this mode queued
+            time.sleep(float(os.environ.get("CHAT_WRITE_BEHIND_MAX_DELAY_SECONDS", 1.0)) + 0.5)
+        stats = summarize(samples) if samples else {"p50_ms": 0.0, "p95_ms": 0.0}
+        hold = metrics.snapshot()["summaries"].get("db_connection_hold_ms", {})
+        print(f"{mode:<14}{len(samples):>5}{len(failures):>8}{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}"
+              f"{max(sampler.samples):>11}{sum(sampler.samples) / len(sampler.samples):>11.2f}"
+              f"{hold.get('mean', 0):>10.1f}/{hold.get('max', 0):<7.0f}{commits['commits']:>9}")
+        if failures:
+            print(f"              failures: {sorted(set(map(str, failures)))}")
+
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
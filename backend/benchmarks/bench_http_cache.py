@@ -0,0 +1,81 @@
+"""Repeat-navigation benchmark for the ETag / response-cache layer.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_http_cache --repeat 200
+
+For each cached endpoint it compares three kinds of navigation:
+
+* ``cold``        - plain GET with the body cache cleared before every call
+* ``warm``        - plain GET served from the in-process body cache
+* ``conditional`` - GET with ``If-None-Match`` answered with 304
+"""
+import argparse
+
+from .common import bootstrap, create_student, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--curricula", type=int, default=3)
+    args = parser.parse_args()
+
+    bootstrap()
+    from fastapi.testclient import TestClient
+    from app import crud
+    from app.ai_utils import ai_tutor
+    from app.cache import response_cache
+    from app.database import SessionLocal, create_tables
+    from app.main import app
+    from app.models import LearningStyle
+
+    create_tables()
+    db = SessionLocal()
+    student, headers = create_student(db)
+    student_id = student.id
+    student_data = {
+        "grade_level": student.grade_level,
+        "learning_style": LearningStyle.VISUAL,
+        "weak_subjects": student.weak_subjects,
+    }
+    curriculum_ids = [
+        crud.create_curriculum(db, ai_tutor._create_fallback_curriculum(student_data), student_id).id
+        for _ in range(args.curricula)
+    ]
+    db.close()
+
+    client = TestClient(app)
+    endpoints = [
+        "/auth/me",
+        f"/students/{student_id}",
+        "/curriculum/",
+        f"/curriculum/{curriculum_ids[0]}",
+    ]
+
+    print(f"{'endpoint':<22}{'mode':<13}{'status':>7}{'bytes':>9}{'mean ms':>10}{'p95 ms':>9}")
+    for path in endpoints:
+        first = client.get(path, headers=headers)
+        etag = first.headers["etag"]
+        conditional_headers = {**headers, "If-None-Match": etag}
+
+        def cold():
+            response_cache.clear()
+            return client.get(path, headers=headers)
+
+        modes = {
+            "cold": cold,
+            "warm": lambda: client.get(path, headers=headers),
+            "conditional": lambda: client.get(path, headers=conditional_headers),
+        }
+        for mode, call in modes.items():
+            response = call()
+            stats = summarize(timed(call, args.repeat))
+            print(
+                f"{path:<22}{mode:<13}{response.status_code:>7}{response.num_bytes_downloaded:>9}"
+                f"{stats['mean_ms']:>10.3f}{stats['p95_ms']:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Tail-latency and fail-fast benchmark for the LLM resilience layer.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_llm_resilience --calls 200
+
+Runs ``AITutor.chat_assistance`` against the fake backend in three regimes:
+
+* ``slow tail``      - 10% of calls take 10x longer, with and without hedging
+* ``upstream down``  - every call fails; shows retries, then the circuit
+  breaker answering with fallback content without touching upstream
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from .common import bootstrap, summarize
+
+
+async def run_calls(tutor, calls: int, concurrency: int = 20):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(index):
+        async with semaphore:
+            start = time.perf_counter()
+            await tutor.chat_assistance(f"Explain fractions #{index}", {"grade_level": 6})
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(index) for index in range(calls)))
+    return samples
+
+
+def report(label, samples):
+    stats = summarize(samples)
+    p99 = sorted(samples)[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<28}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{p99:>10.1f}")
+
+
+async def main_async(args):
+    from app.ai_utils import AITutor
+    from app.config import settings
+    from app.metrics import metrics
+
+    print(f"{'scenario':<28}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+
+    settings.FAKE_LLM_LATENCY_MS = args.latency_ms
+    settings.FAKE_LLM_SLOW_RATE = 0.1
+    settings.LLM_HEDGE_AFTER_SECONDS = 0
+    report("slow tail, no hedging", await run_calls(AITutor(), args.calls))
+    settings.LLM_HEDGE_AFTER_SECONDS = args.latency_ms * 2 / 1000
+    report("slow tail, hedged", await run_calls(AITutor(), args.calls))
+
+    settings.FAKE_LLM_SLOW_RATE = 0.0
+    settings.FAKE_LLM_FAILURE_RATE = 1.0
+    settings.LLM_HEDGE_AFTER_SECONDS = 0
+    tutor = AITutor()
+    tutor.resilience.base_delay = 0.05
+    report("upstream down (breaker)", await run_calls(tutor, args.calls, concurrency=1))
+
+    counters = metrics.snapshot()["counters"]
+    print()
+    for name in sorted(counters):
+        print(f"{name:<80}{counters[name]:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    bootstrap()
+    os.environ["LLM_BACKEND"] = "fake"
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Mastery model throughput on synthetic progress logs.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_mastery --logs 1000000 --db-logs 100000
+
+Generates logs for students with a latent skill per topic, then times the
+per-log incremental update, the full-history replay with the plain loop and
+with numpy (when installed), and checks both give the same ratings and that
+ratings track the latent skill. ``--db-logs`` also runs the end-to-end
+``crud.recompute_mastery`` against a scratch SQLite database.
+"""
+import argparse
+import math
+import random
+import time
+
+from .common import bootstrap
+
+
+def synthetic_logs(count: int, students: int, topics: int, seed: int = 11):
+    """(groups, scores, latent skill per group) in chronological order"""
+    rng = random.Random(seed)
+    group_count = students * topics
+    skill = [rng.gauss(0, 1.2) for _ in range(group_count)]
+    groups, scores = [], []
+    for _ in range(count):
+        group = rng.randrange(group_count)
+        # Students improve a little with every attempt
+        skill[group] += 0.02
+        success = 1 / (1 + math.exp(-skill[group]))
+        groups.append(group)
+        scores.append(min(100.0, max(0.0, rng.gauss(success * 100, 12))))
+    return groups, scores, skill
+
+
+def rank_correlation(a, b) -> float:
+    def ranks(values):
+        order = sorted(range(len(values)), key=values.__getitem__)
+        result = [0] * len(values)
+        for rank, index in enumerate(order):
+            result[index] = rank
+        return result
+
+    ra, rb = ranks(a), ranks(b)
+    n = len(a)
+    return 1 - 6 * sum((x - y) ** 2 for x, y in zip(ra, rb)) / (n * (n * n - 1))
+
+
+def bench_db(count: int, students: int, topics: int):
+    from sqlalchemy import insert
+
+    from app import crud, models
+    from app.database import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    db.execute(insert(models.Student), [
+        {"email": f"m{i}@bench.com", "hashed_password": "x", "full_name": "Bench", "grade_level": 7, "version": 1}
+        for i in range(students)
+    ])
+    curriculum = models.Curriculum(student_id=1, title="Bench")
+    db.add(curriculum)
+    db.flush()
+    plan = models.WeeklyPlan(curriculum_id=curriculum.id, week_number=1)
+    db.add(plan)
+    db.flush()
+    groups, scores, _ = synthetic_logs(count, students, topics)
+    rows = [
+        {
+            "student_id": group // topics + 1,
+            "weekly_plan_id": plan.id,
+            "subject": "Mathematics",
+            "topic": f"Topic {group % topics}",
+            "proficiency_score": score,
+            "time_spent_minutes": 30,
+        }
+        for group, score in zip(groups, scores)
+    ]
+    for start in range(0, len(rows), 20000):
+        db.execute(insert(models.ProgressLog), rows[start:start + 20000])
+    db.commit()
+
+    start = time.perf_counter()
+    states = crud.recompute_mastery(db)
+    elapsed = time.perf_counter() - start
+    print(f"\nrecompute_mastery over {count:,} DB logs: {states:,} states in {elapsed:.2f}s")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=int, default=1_000_000)
+    parser.add_argument("--students", type=int, default=20_000)
+    parser.add_argument("--topics", type=int, default=25)
+    parser.add_argument("--db-logs", type=int, default=0)
+    args = parser.parse_args()
+
+    bootstrap()
+    from app import mastery
+
+    groups, scores, skill = synthetic_logs(args.logs, args.students, args.topics)
+    group_count = args.students * args.topics
+    print(f"{args.logs:,} logs over {group_count:,} student/topic groups")
+
+    ratings, attempts = [0.0] * group_count, [0] * group_count
+    sample = min(len(groups), 200_000)
+    start = time.perf_counter()
+    for group, score in zip(groups[:sample], scores[:sample]):
+        ratings[group], attempts[group] = mastery.update_rating(ratings[group], attempts[group], score)
+    print(f"incremental update: {(time.perf_counter() - start) / sample * 1e6:.2f} us/log")
+
+    start = time.perf_counter()
+    loop_ratings, _ = mastery.replay(groups, scores, group_count, vectorized=False)
+    print(f"replay, plain loop: {time.perf_counter() - start:.2f}s")
+    if mastery.load_numpy() is not None:
+        start = time.perf_counter()
+        numpy_ratings, _ = mastery.replay(groups, scores, group_count, vectorized=True)
+        print(f"replay, numpy:      {time.perf_counter() - start:.2f}s "
+              f"(max diff {max(abs(a - b) for a, b in zip(loop_ratings, numpy_ratings)):.1e})")
+    else:
+        print("replay, numpy:      skipped (numpy not installed)")
+
+    seen = [index for index in range(group_count) if loop_ratings[index] != mastery.INITIAL_RATING]
+    sample_groups = random.Random(0).sample(seen, min(len(seen), 20_000))
+    correlation = rank_correlation([loop_ratings[i] for i in sample_groups], [skill[i] for i in sample_groups])
+    print(f"rank correlation of rating with latent skill: {correlation:.3f}")
+
+    if args.db_logs:
+        bench_db(args.db_logs, max(1, args.db_logs // 50), args.topics)
+
+
+if __name__ == "__main__":
+    main()
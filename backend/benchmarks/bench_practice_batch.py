@@ -0,0 +1,69 @@
+"""One-question-per-call vs. batched practice question generation.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_practice_batch --count 20
+
+Builds a quiz of ``--count`` questions against the fake backend both ways
+and reports upstream calls, input tokens sent and wall time, then the same
+quiz served from the question bank once it has been filled.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from .common import bootstrap
+
+
+async def main_async(args):
+    from app import crud
+    from app.ai_utils import AITutor
+    from app.database import SessionLocal, create_tables
+    from app.metrics import metrics
+
+    create_tables()
+    tutor = AITutor()
+
+    def usage(method):
+        calls = metrics.counter("llm_calls_total", method=method, outcome="success")
+        tokens = metrics.snapshot()["summaries"].get(f"llm_prompt_tokens{{method={method}}}", {}).get("sum", 0)
+        return calls, tokens
+
+    print(f"{'strategy':<28}{'questions':>10}{'calls':>7}{'in tokens':>11}{'wall ms':>10}")
+
+    metrics.reset()
+    start = time.perf_counter()
+    single = await asyncio.gather(*(tutor.generate_practice_question(f"fractions #{i}") for i in range(args.count)))
+    calls, tokens = usage("generate_practice_question")
+    print(f"{'one per call (concurrent)':<28}{len(single):>10}{calls:>7}{tokens:>11.0f}"
+          f"{(time.perf_counter() - start) * 1000:>10.1f}")
+
+    metrics.reset()
+    start = time.perf_counter()
+    batch = await tutor.generate_practice_questions("fractions", count=args.count, grade_level=7)
+    calls, tokens = usage("generate_practice_questions")
+    print(f"{'batched':<28}{len(batch):>10}{calls:>7}{tokens:>11.0f}{(time.perf_counter() - start) * 1000:>10.1f}")
+
+    db = SessionLocal()
+    crud.add_practice_questions(db, "fractions", "medium", 7, batch)
+    start = time.perf_counter()
+    served = crud.serve_practice_questions(db, "fractions", "medium", 7, args.count)
+    print(f"{'question bank':<28}{len(served):>10}{0:>7}{0:>11}{(time.perf_counter() - start) * 1000:>10.1f}")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--latency-ms", type=int, default=200, help="Fake upstream latency per call")
+    args = parser.parse_args()
+
+    bootstrap()
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
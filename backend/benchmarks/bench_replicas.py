@@ -0,0 +1,102 @@
+"""Read-replica routing with two local SQLite databases.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_replicas --students 20 --repeat 5
+
+Seeds a primary database, snapshots it into a second file that serves as
+the replica (it never catches up, i.e. an arbitrarily lagging replica), and
+then counts the SQL statements each database executes for the read-only
+routes. It also checks read-your-writes: right after a student logs
+progress, that student's reads go to the primary and see the new log, and
+other students keep reading from the replica.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+
+from .common import bootstrap, create_student
+
+READ_PATHS = ["/analytics/progress", "/analytics/progress/history", "/analytics/mastery", "/curriculum/"]
+
+
+def count_statements(engine):
+    from sqlalchemy import event
+
+    counter = {"statements": 0}
+    event.listen(engine, "before_cursor_execute",
+                 lambda *args: counter.__setitem__("statements", counter["statements"] + 1))
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    primary_url = bootstrap()
+    fd, replica_path = tempfile.mkstemp(prefix="tutor_bench_replica_", suffix=".db")
+    os.close(fd)
+    os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{replica_path}"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+    from app import crud
+    from app.ai_utils import ai_tutor
+    from app.cache import response_cache
+    from app.database import SessionLocal, create_tables, engine
+    from app.main import app
+    from app.models import LearningStyle
+    from app.replicas import replicas
+
+    create_tables()
+    db = SessionLocal()
+    students = []
+    for i in range(args.students):
+        student, headers = create_student(db, email=f"replica{i}@bench.com")
+        curriculum = crud.create_curriculum(db, ai_tutor._create_fallback_curriculum({
+            "grade_level": 7, "learning_style": LearningStyle.VISUAL, "weak_subjects": ["Mathematics"]
+        }), student.id)
+        students.append((headers, curriculum.weekly_plans[0].id))
+    db.close()
+
+    # The "replica" is a snapshot of the primary taken now
+    source = sqlite3.connect(primary_url[len("sqlite:///"):])
+    target = sqlite3.connect(replica_path)
+    source.backup(target)
+    source.close()
+    target.close()
+
+    client = TestClient(app)
+    primary = count_statements(engine)
+    replica = count_statements(replicas.sessionmakers[0].kw["bind"])
+
+    for _ in range(args.repeat):
+        response_cache.clear()
+        for headers, _ in students:
+            for path in READ_PATHS:
+                assert client.get(path, headers=headers).status_code == 200
+    reads = args.repeat * len(students) * len(READ_PATHS)
+    print(f"{reads} read requests: {primary['statements']} statements on the primary "
+          f"(auth lookups), {replica['statements']} on the replica")
+
+    (writer, plan_id), (other, _) = students[0], students[1]
+    before = len(client.get("/analytics/progress/history", headers=writer).json())
+    client.post("/analytics/progress", headers=writer, json={
+        "weekly_plan_id": plan_id, "subject": "Mathematics", "topic": "Fractions",
+        "proficiency_score": 80, "time_spent_minutes": 20
+    })
+    primary["statements"] = replica["statements"] = 0
+    after = len(client.get("/analytics/progress/history", headers=writer).json())
+    print(f"writer's history right after logging progress: {before} -> {after} logs "
+          f"({primary['statements']} primary / {replica['statements']} replica statements)")
+    primary["statements"] = replica["statements"] = 0
+    client.get("/analytics/progress/history", headers=other)
+    print(f"another student's history: {primary['statements']} primary / "
+          f"{replica['statements']} replica statements")
+
+
+if __name__ == "__main__":
+    main()
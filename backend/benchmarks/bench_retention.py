@@ -0,0 +1,163 @@
+"""Log retention: hot-table size and per-student query cost before/after compaction.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_retention --students 200 --logs-per-student 400
+
+Seeds progress logs and chat messages spread evenly over ``--years`` of
+history, times ``crud.get_student_analytics`` and the history reads, runs
+one retention pass (default windows: 365 days of progress, 180 of chat) and
+times them again. Checks that analytics and both histories are unchanged
+by the compaction and reports the archive's compression ratio.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from .common import bootstrap, summarize
+
+
+def seed(students: int, logs_per_student: int, messages_per_student: int, years: float):
+    from sqlalchemy import insert
+
+    from app import models
+    from app.database import SessionLocal, create_tables
+
+    create_tables()
+    rng = random.Random(5)
+    now = datetime.utcnow()
+    span = timedelta(days=365 * years)
+    db = SessionLocal()
+    db.execute(insert(models.Student), [
+        {"email": f"r{i}@bench.com", "hashed_password": "x", "full_name": "Bench", "grade_level": 7, "version": 1}
+        for i in range(students)
+    ])
+    curriculum = models.Curriculum(student_id=1, title="Bench")
+    db.add(curriculum)
+    db.flush()
+    plan = models.WeeklyPlan(curriculum_id=curriculum.id, week_number=1)
+    db.add(plan)
+    db.flush()
+    db.execute(insert(models.ChatSession), [
+        {"student_id": student, "session_title": "Bench"} for student in range(1, students + 1)
+    ])
+
+    def when(index, count):
+        return now - span + span * (index + rng.random()) / count
+
+    logs = [
+        {
+            "student_id": student,
+            "weekly_plan_id": plan.id,
+            "subject": rng.choice(["Mathematics", "Science", "English"]),
+            "topic": f"Topic {rng.randrange(20)}",
+            "proficiency_score": rng.choice([None, rng.uniform(20, 100)]),
+            "time_spent_minutes": rng.randrange(5, 60),
+            "completed": rng.random() < 0.6,
+            "created_at": when(index, logs_per_student),
+        }
+        for student in range(1, students + 1)
+        for index in range(logs_per_student)
+    ]
+    messages = [
+        {
+            "session_id": student,
+            "content": f"{'How do I' if index % 2 == 0 else 'Here is how to'} solve problem {index} "
+                       f"about topic {rng.randrange(20)}? " * 3,
+            "is_user": index % 2 == 0,
+            "message_type": "question" if index % 2 == 0 else "explanation",
+            "created_at": when(index, messages_per_student),
+        }
+        for student in range(1, students + 1)
+        for index in range(messages_per_student)
+    ]
+    for start in range(0, len(logs), 20000):
+        db.execute(insert(models.ProgressLog), logs[start:start + 20000])
+    for start in range(0, len(messages), 20000):
+        db.execute(insert(models.ChatMessage), messages[start:start + 20000])
+    db.commit()
+    db.close()
+
+
+def rounded(value):
+    """Floats to 9 significant digits, so summation order does not count as a change"""
+    if isinstance(value, float):
+        return float(f"{value:.9g}")
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [rounded(item) for item in value]
+    return value
+
+
+def measure(db, students, repeat):
+    from app import crud, models
+
+    def history_json(student_id):
+        logs = crud.get_student_progress(db, student_id)
+        return [(log.id, log.subject, log.proficiency_score, log.completed) for log in logs]
+
+    sample = list(range(1, students + 1, max(1, students // repeat)))[:repeat]
+    timings = {"analytics": [], "progress history": [], "chat history": []}
+    results = {}
+    for student_id in sample:
+        for name, call in (
+            ("analytics", lambda: crud.get_student_analytics(db, student_id)),
+            ("progress history", lambda: history_json(student_id)),
+            ("chat history", lambda: [m.id for m in crud.get_chat_messages(db, student_id)]),
+        ):
+            db.expire_all()
+            start = time.perf_counter()
+            value = call()
+            timings[name].append((time.perf_counter() - start) * 1000)
+            results[(name, student_id)] = json.dumps(rounded(value), sort_keys=True, default=str)
+    counts = {
+        "progress_logs": db.query(models.ProgressLog).count(),
+        "chat_messages": db.query(models.ChatMessage).count(),
+    }
+    return timings, results, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--logs-per-student", type=int, default=400)
+    parser.add_argument("--messages-per-student", type=int, default=400)
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--repeat", type=int, default=50, help="Students sampled for timings")
+    args = parser.parse_args()
+
+    bootstrap()
+    seed(args.students, args.logs_per_student, args.messages_per_student, args.years)
+    from sqlalchemy import func
+
+    from app import models, retention
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    before, before_results, before_counts = measure(db, args.students, args.repeat)
+
+    start = time.perf_counter()
+    moved = retention.compact(db)
+    elapsed = time.perf_counter() - start
+    raw = sum(len(json.dumps(row, default=str)) for source in (retention.PROGRESS_LOGS, retention.CHAT_MESSAGES)
+              for row in retention.archived_rows(db, source))
+    stored, chunks = db.query(func.sum(func.length(models.LogArchive.payload)), func.count()).one()
+    print(f"compaction moved {moved} in {elapsed:.2f}s; {chunks} archive chunks, "
+          f"{stored / 1024:.0f} KiB stored vs {raw / 1024:.0f} KiB as JSON ({raw / stored:.1f}x)")
+
+    after, after_results, after_counts = measure(db, args.students, args.repeat)
+    for table in before_counts:
+        print(f"{table:<17} hot rows {before_counts[table]:>9,} -> {after_counts[table]:>9,}")
+    print(f"{'query':<17}{'before p50 ms':>15}{'after p50 ms':>14}")
+    for name in before:
+        print(f"{name:<17}{summarize(before[name])['p50_ms']:>15.2f}{summarize(after[name])['p50_ms']:>14.2f}")
+    changed = [key for key in before_results if before_results[key] != after_results[key]]
+    print(f"results unchanged by compaction: {not changed}" + (f" (differs: {changed[:3]})" if changed else ""))
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
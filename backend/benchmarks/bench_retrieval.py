@@ -0,0 +1,105 @@
+"""Cost of the per-student retrieval index and the prompt size it saves.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_retrieval --curricula 3 --messages 200
+
+Seeds one student with curricula and chat history, then reports the lazy
+index build, incremental updates vs. a full rebuild, search latency, and
+chat prompt tokens when the client pastes the whole curriculum into
+``student_context`` vs. when the top-k retrieved snippets are used instead.
+"""
+import argparse
+import json
+import random
+
+from .common import bootstrap, create_student, summarize, timed
+
+QUESTIONS = [
+    "I'm stuck on science topic 3.2",
+    "What should I do in week 5?",
+    "Can you help with the mathematics exit quiz?",
+    "What did you tell me about fractions?",
+    "How do I prepare for the guided practice on Wednesday?",
+]
+
+
+def seed(db, student_id: int, curricula: int, messages: int):
+    from app import crud, models
+    from app.llm_fake import _week
+
+    curriculum_data = {
+        "title": "Bench curriculum",
+        "weekly_plans": [_week(number, ["Mathematics", "Science"]) for number in range(1, 9)],
+    }
+    created = [crud.create_curriculum(db, curriculum_data, student_id) for _ in range(curricula)]
+    session = models.ChatSession(student_id=student_id, session_title="Bench")
+    db.add(session)
+    db.flush()
+    rng = random.Random(3)
+    for index in range(messages):
+        db.add(models.ChatMessage(
+            session_id=session.id,
+            content=f"{rng.choice(QUESTIONS)} (follow-up {index})",
+            is_user=index % 2 == 0,
+            message_type="question" if index % 2 == 0 else "explanation",
+        ))
+    db.commit()
+    return curriculum_data, created[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--curricula", type=int, default=3)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    bootstrap()
+    from app.config import settings
+    from app.database import SessionLocal, create_tables
+    from app.prompts import PromptBuilder, chat_system_prompt, compact_json, count_message_tokens
+    from app.retrieval import RetrievalService
+
+    create_tables()
+    db = SessionLocal()
+    student, _ = create_student(db)
+    student_id = student.id
+    curriculum_data, curriculum = seed(db, student_id, args.curricula, args.messages)
+
+    service = RetrievalService()
+    build = timed(lambda: (service.forget(student_id), service.search(db, student_id, "warm-up")), 20)
+    incremental = timed(lambda: service.add_curriculum(student_id, curriculum), 20)
+    search = timed(lambda: [service.search(db, student_id, question) for question in QUESTIONS], args.repeat)
+    document_count = len(service._get(db, student_id).bm25)
+
+    print(f"{'operation':<34}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, samples in (
+        (f"lazy build ({document_count} docs)", build),
+        ("incremental add (8 weeks)", incremental),
+        ("search (per question)", [sample / len(QUESTIONS) for sample in search]),
+    ):
+        stats = summarize(samples)
+        print(f"{label:<34}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}")
+
+    # Prompt tokens: whole curriculum pasted by the client vs. retrieved snippets
+    pasted, retrieved = [], []
+    for question in QUESTIONS:
+        blob = {"grade_level": 7, "curriculum": curriculum_data}
+        pasted.append(count_message_tokens([
+            {"role": "system", "content": chat_system_prompt("7")},
+            {"role": "user", "content": f"Student: {json.dumps(blob, indent=2)}\nQuestion: {question}"},
+        ]))
+        snippets = service.search(db, student_id, question)
+        builder = PromptBuilder(chat_system_prompt("7"), settings.PROMPT_BUDGET_CHAT)
+        builder.add("From the student's plan and past chats:\n" + "\n".join(f"- {s}" for s in snippets))
+        builder.add(f"Student: {compact_json({'grade_level': 7})}", priority=1)
+        builder.add(f"Question: {question}", required=True)
+        retrieved.append(count_message_tokens(builder.build()))
+    print(f"\nchat prompt tokens: pasted curriculum {sum(pasted) / len(pasted):.0f}, "
+          f"retrieved top-{settings.RETRIEVAL_TOP_K} {sum(retrieved) / len(retrieved):.0f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Spaced-repetition scheduler: batch recompute and due-queue lookups.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_reviews --students 500 --logs-per-student 200
+
+Seeds ``benchmarks.synthetic`` data, times ``crud.recompute_reviews`` with
+the plain loop and with numpy (when installed) and checks both agree. Then
+times fetching one student's due reviews from the cached heap against the
+equivalent indexed query on ``review_items``, and checks that logging
+progress through ``crud.create_progress_log`` updates the queue the same
+way a full recompute would.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from .common import bootstrap, summarize
+
+
+def review_state(db):
+    from app import models
+
+    return {
+        (item.student_id, item.subject, item.topic_key): (
+            round(item.ease, 9), item.interval_days, item.repetitions, item.due_at.replace(microsecond=0)
+        )
+        for item in db.query(models.ReviewItem)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--logs-per-student", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20, help="Due items fetched per lookup")
+    args = parser.parse_args()
+
+    bootstrap()
+    from app import crud, models, reviews, schemas
+    from app.database import SessionLocal, create_tables
+
+    from .synthetic import generate
+
+    create_tables()
+    db = SessionLocal()
+    generate(db, args.students, args.logs_per_student, sessions_per_student=0, messages_per_student=0)
+
+    timings = {}
+    states = {}
+    for name, vectorized in (("loop", False), ("numpy", True)):
+        if vectorized and reviews.load_numpy() is None:
+            continue
+        start = time.perf_counter()
+        items = crud.recompute_reviews(db, vectorized=vectorized)
+        timings[name] = time.perf_counter() - start
+        states[name] = review_state(db)
+    logs = args.students * args.logs_per_student
+    for name, seconds in timings.items():
+        print(f"recompute ({name:<5}) {logs:,} logs -> {items:,} items in {seconds:.2f}s")
+    if len(states) == 2:
+        print(f"loop and numpy agree: {states['loop'] == states['numpy']}")
+
+    rng = random.Random(3)
+    students = [student_id for (student_id,) in db.query(models.Student.id)]
+    now = datetime.utcnow() + timedelta(days=3)
+    lookups = [rng.choice(students) for _ in range(args.lookups)]
+
+    def query_due(student_id):
+        return db.query(models.ReviewItem).filter(
+            models.ReviewItem.student_id == student_id, models.ReviewItem.due_at <= now
+        ).order_by(models.ReviewItem.due_at).limit(args.limit).all()
+
+    samples = {"indexed query": [], "heap (warm)": []}
+    for student_id in lookups:
+        reviews.review_queue.due(db, student_id, now, args.limit)  # Load outside the timing
+    for student_id in lookups:
+        start = time.perf_counter()
+        query_due(student_id)
+        samples["indexed query"].append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        reviews.review_queue.due(db, student_id, now, args.limit)
+        samples["heap (warm)"].append((time.perf_counter() - start) * 1000)
+    print(f"{'due lookup':<16}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, values in samples.items():
+        stats = summarize(values)
+        print(f"{name:<16}{stats['p50_ms']:>9.3f}{stats['p95_ms']:>9.3f}")
+    same = all(
+        [(i.subject, i.topic_key) for i in reviews.review_queue.due(db, s, now, args.limit)]
+        == [(i.subject, i.topic_key) for i in query_due(s)]
+        for s in lookups[:200]
+    )
+    print(f"heap and query return the same items: {same}")
+
+    # Incremental updates must match a full recompute
+    student_id = lookups[0]
+    plan_id = db.query(models.WeeklyPlan.id).join(models.Curriculum).filter(
+        models.Curriculum.student_id == student_id
+    ).first()[0]
+    for score in (25, 90, 95, 40, 85):
+        crud.create_progress_log(db, schemas.ProgressLogCreate(
+            weekly_plan_id=plan_id, subject="Mathematics", topic="Spaced practice", proficiency_score=score
+        ), student_id)
+    incremental = [(i.topic_key, i.interval_days, i.repetitions)
+                   for i in reviews.review_queue.due(db, student_id, now + timedelta(days=30), 1000)]
+    crud.recompute_reviews(db)
+    replayed = [(i.topic_key, i.interval_days, i.repetitions)
+                for i in reviews.review_queue.due(db, student_id, now + timedelta(days=30), 1000)]
+    print(f"incremental updates match recompute: {incremental == replayed}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
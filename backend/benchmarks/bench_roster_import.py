@@ -0,0 +1,119 @@
+"""Roster onboarding throughput: one register per student vs the bulk import.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_roster_import --rows 200 --rounds 8
+
+Registers ``--rows`` generated students the way ``POST /auth/register``
+does (email query, bcrypt hash, insert and commit per student), then
+imports the same roster into a fresh database with ``roster.import_roster``
+using one hashing process and using every core. ``--rounds`` lowers the
+bcrypt cost so runs stay short; hashing dominates either way, so the
+parallel speedup is bounded by the core count (printed).
+"""
+import argparse
+import os
+import time
+
+from .common import bootstrap
+
+
+def make_roster(rows: int):
+    return [
+        {
+            "email": f"student{i}@school.example.com",
+            "full_name": f"Student {i}",
+            "grade_level": 6 + i % 6,
+            "learning_style": ["visual", "auditory", "kinesthetic", "read_write"][i % 4],
+            "weak_subjects": ["Mathematics"] if i % 2 else ["Science", "English"],
+            "learning_goals": None,
+            "password": f"pw-{i:06d}",
+        }
+        for i in range(rows)
+    ]
+
+
+def fresh_tables():
+    from sqlalchemy import text
+
+    from app import models
+    from app.database import create_tables, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    create_tables()
+
+
+def register_each(raw_rows, rounds):
+    from app import models, roster, schemas
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for row in raw_rows:
+            student = schemas.StudentCreate.model_validate(row)
+            if db.query(models.Student).filter(models.Student.email == student.email).first():
+                continue
+            db.add(models.Student(
+                email=student.email,
+                hashed_password=roster._hash_chunk([student.password], rounds)[0],
+                full_name=student.full_name,
+                grade_level=student.grade_level,
+                learning_style=student.learning_style,
+                weak_subjects=student.weak_subjects,
+                learning_goals=student.learning_goals,
+            ))
+            db.commit()
+        return db.query(models.Student).count()
+    finally:
+        db.close()
+
+
+def bulk_import(raw_rows, rounds, workers):
+    from app import roster
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return roster.import_roster(db, raw_rows, workers=workers, rounds=rounds)["created"]
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=8, help="bcrypt cost (the app uses passlib's default, 12)")
+    args = parser.parse_args()
+
+    bootstrap()
+    raw_rows = make_roster(args.rows)
+    cores = os.cpu_count() or 1
+    print(f"{args.rows} students, bcrypt cost {args.rounds}, {cores} core(s)")
+    print(f"{'mode':<28}{'created':>8}{'seconds':>9}{'rows/s':>9}")
+    modes = [
+        ("register one by one", lambda: register_each(raw_rows, args.rounds)),
+        ("bulk import, 1 process", lambda: bulk_import(raw_rows, args.rounds, 1)),
+        (f"bulk import, {cores} processes", lambda: bulk_import(raw_rows, args.rounds, cores)),
+    ]
+    for name, run in modes:
+        fresh_tables()
+        start = time.perf_counter()
+        created = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28}{created:>8}{elapsed:>9.2f}{created / elapsed:>9.1f}")
+
+    # Re-importing the same roster must create nobody
+    from app import roster
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    result = roster.import_roster(db, raw_rows + raw_rows[:5], rounds=args.rounds)
+    db.close()
+    print(f"re-import: created {result['created']}, already registered {len(result['already_registered'])}, "
+          f"duplicates {len(result['duplicates'])}")
+
+
+if __name__ == "__main__":
+    main()
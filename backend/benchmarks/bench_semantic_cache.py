@@ -0,0 +1,108 @@
+"""Hit rate and latency of the semantic answer cache.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_semantic_cache --questions 2000
+
+Replays a skewed stream of paraphrased questions (a few topics are asked
+far more often than the rest) from three grades through
+``AITutor.chat_assistance`` against the fake backend, with and without the
+semantic cache. A hit is counted as wrong when the cached answer was
+produced for a different topic. Also times raw lookups against a full cache.
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from .common import bootstrap, summarize
+
+TOPICS = [
+    "fractions", "photosynthesis", "gravity", "prime numbers", "the water cycle", "decimals",
+    "percentages", "volcanoes", "magnets", "nouns", "verbs", "adjectives", "the solar system",
+    "multiplication", "long division", "ecosystems", "the food chain", "electric circuits",
+    "ratios", "area of a triangle", "the pythagorean theorem", "negative numbers", "cells",
+    "erosion", "climate", "democracy", "ancient egypt", "the roman empire", "evaporation", "friction",
+]
+TEMPLATES = [
+    "What is {}?",
+    "what are {}",
+    "Can you explain {} to me?",
+    "Explain {} please",
+    "I don't understand {}",
+    "Help me understand {}",
+    "What does {} mean?",
+    "How do {} work?",
+    "Tell me about {}",
+    "I need help with {} for my homework",
+]
+GRADES = [5, 7, 9]
+
+
+def question_stream(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(TOPICS))]
+    for _ in range(count):
+        topic = rng.choices(TOPICS, weights)[0]
+        yield rng.choice(GRADES), topic, rng.choice(TEMPLATES).format(topic)
+
+
+async def replay(tutor, count: int):
+    samples, wrong = [], 0
+    for grade, topic, question in question_stream(count):
+        start = time.perf_counter()
+        answer = await tutor.chat_assistance(question, {}, grade_level=grade)
+        samples.append((time.perf_counter() - start) * 1000)
+        if topic not in answer:
+            wrong += 1
+    return samples, wrong
+
+
+async def main_async(args):
+    from app.ai_utils import AITutor
+    from app.database import create_tables
+    from app.semantic_cache import SemanticCache, semantic_cache
+
+    create_tables()  # The usage ledger writes to llm_usage
+    print(f"{'scenario':<18}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'hit rate':>10}{'wrong':>8}{'saved s':>10}")
+    for label, enabled in (("no cache", False), ("semantic cache", True)):
+        semantic_cache.clear()
+        semantic_cache.enabled = enabled
+        samples, wrong = await replay(AITutor(), args.questions)
+        stats, cache = summarize(samples), semantic_cache.stats()
+        print(
+            f"{label:<18}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+            f"{cache['hit_rate']:>10.1%}{wrong:>8}{cache['latency_saved_ms'] / 1000:>10.1f}"
+        )
+
+    # Lookup cost once the cache is at capacity with unrelated questions
+    cache = SemanticCache(max_entries=args.entries)
+    rng = random.Random(1)
+    vocabulary = [f"term{index}" for index in range(5000)]
+    for index in range(args.entries + 1000):
+        words = " ".join(rng.sample(vocabulary, 4))
+        cache.store("grade:7", f"What is {words}?", "answer", 1000.0)
+    queries = [template.format(topic) for topic in TOPICS for template in TEMPLATES]
+    start = time.perf_counter()
+    for query in queries:
+        cache.lookup("grade:7", query)
+    per_lookup = (time.perf_counter() - start) / len(queries) * 1e6
+    print(f"\nlookup with {cache.stats()['entries']} entries (bounded at {args.entries}): {per_lookup:.0f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=int, default=20, help="Fake upstream latency per call")
+    parser.add_argument("--entries", type=int, default=5000, help="Cache size for the lookup timing")
+    args = parser.parse_args()
+
+    bootstrap()
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Serialization microbenchmark for a typical 8-week curriculum.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_serialization --repeat 2000
+
+Compares the response paths for ``GET /curriculum/{id}``:
+
+* ``stdlib``  - validate ORM rows, jsonable_encoder, ``json.dumps`` (old default)
+* ``orjson``  - validate ORM rows, jsonable_encoder, ``orjson.dumps`` (ORJSONResponse)
+* ``trusted`` - ``from_orm_trusted`` + pydantic-core ``model_dump_json``
+
+and reports payload size raw, gzip'd and (if installed) brotli'd.
+"""
+import argparse
+import gzip
+import json
+from datetime import datetime, timezone
+
+from .common import bootstrap, summarize, timed
+
+TOPICS = {
+    "Mathematics": ["Fractions", "Decimals", "Ratios", "Linear equations", "Geometry basics"],
+    "Science": ["Photosynthesis", "States of matter", "Forces", "Cells", "Ecosystems"],
+    "English": ["Main idea", "Inference", "Persuasive writing", "Grammar", "Vocabulary"],
+}
+
+
+def build_curriculum():
+    """An in-memory Curriculum row shaped like a real GPT-4 generated plan"""
+    from app import models
+
+    days = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+    subjects = list(TOPICS)
+    weekly_plans = []
+    for week in range(1, 9):
+        breakdown = {}
+        for index, day in enumerate(days):
+            subject = subjects[(week + index) % len(subjects)]
+            topic = TOPICS[subject][(week + index) % 5]
+            breakdown[day] = {
+                "subject": subject,
+                "topic": f"{topic} (week {week})",
+                "activities": [
+                    f"Watch a short video explaining {topic.lower()}",
+                    f"Draw a diagram summarising {topic.lower()}",
+                    f"Complete 10 practice problems on {topic.lower()}",
+                    "Reflect in the learning journal",
+                ],
+                "duration_minutes": 60 + 15 * (index % 3),
+            }
+        weekly_plans.append({
+            "week_number": week,
+            "focus_areas": subjects[:2],
+            "learning_objectives": [f"Understand {TOPICS[s][week % 5].lower()}" for s in subjects],
+            "daily_breakdown": breakdown,
+            "resources_needed": ["Textbook", "Khan Academy", "Practice worksheets", "Graph paper"],
+        })
+    data = {
+        "title": "Personalized Learning Curriculum",
+        "description": "An 8-week plan focused on Mathematics and Science with visual learning aids.",
+        "weekly_plans": weekly_plans,
+        "student_metadata": {"grade_level": 7, "learning_style": "visual", "weak_subjects": subjects[:2]},
+    }
+    now = datetime.now(timezone.utc)
+    curriculum = models.Curriculum(
+        id=1, student_id=1, title=data["title"], description=data["description"],
+        duration_weeks=8, curriculum_data=data, created_at=now, is_active=True,
+    )
+    curriculum.weekly_plans = [
+        models.WeeklyPlan(id=index + 1, curriculum_id=1, completed=False, **week)
+        for index, week in enumerate(weekly_plans)
+    ]
+    return curriculum
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    bootstrap()
+    import orjson
+    from fastapi.encoders import jsonable_encoder
+    from app import schemas
+    from app.middleware import brotli
+
+    curriculum = build_curriculum()
+
+    def stdlib():
+        model = schemas.CurriculumWithWeeks.model_validate(curriculum)
+        return json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode()
+
+    def orjson_path():
+        model = schemas.CurriculumWithWeeks.model_validate(curriculum)
+        return orjson.dumps(jsonable_encoder(model))
+
+    def trusted():
+        return schemas.CurriculumWithWeeks.from_orm_trusted(curriculum).model_dump_json().encode()
+
+    print(f"{'path':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, fn in [("stdlib", stdlib), ("orjson", orjson_path), ("trusted", trusted)]:
+        stats = summarize(timed(fn, args.repeat))
+        print(f"{name:<10}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}")
+
+    body = trusted()
+    print()
+    print(f"{'encoding':<10}{'bytes':>10}")
+    print(f"{'identity':<10}{len(body):>10}")
+    print(f"{'gzip-6':<10}{len(gzip.compress(body, 6)):>10}")
+    if brotli is not None:
+        print(f"{'br-4':<10}{len(brotli.compress(body, quality=4)):>10}")
+    else:
+        print(f"{'br-4':<10}{'n/a':>10}  (brotli not installed)")
+
+
+if __name__ == "__main__":
+    main()
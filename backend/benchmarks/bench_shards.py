@@ -0,0 +1,111 @@
+"""Student sharding with local SQLite databases.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_shards --students 30 --shards 3
+
+Runs the app against ``--shards`` SQLite files (the first is also the
+primary), seeds students through the shard directory and drives the
+student-scoped routes, counting the SQL statements each database executes.
+A student's requests touch only their own shard, plus the directory lookups
+on the primary. Then it runs a cohort-level scatter-gather (pre-warm
+demand), adds one more shard and rebalances, and reports how many students
+moved (about 1/N) and how long each move took.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from .common import bootstrap, summarize
+
+
+def count_statements(engine):
+    from sqlalchemy import event
+
+    counter = {"statements": 0}
+    event.listen(engine, "before_cursor_execute",
+                 lambda *args: counter.__setitem__("statements", counter["statements"] + 1))
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--shards", type=int, default=3)
+    args = parser.parse_args()
+
+    primary_url = bootstrap()
+    directory = tempfile.mkdtemp(prefix="tutor_bench_shards_")
+    urls = [primary_url] + [f"sqlite:///{directory}/shard{index}.db" for index in range(1, args.shards + 1)]
+    os.environ["DATABASE_SHARD_URLS"] = ",".join(f"shard{index}={url}" for index, url in enumerate(urls[:-1]))
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+    from app import crud
+    from app.ai_utils import ai_tutor
+    from app.auth import create_access_token
+    from app.database import create_tables
+    from app.main import app
+    from app.models import LearningStyle
+    from app.prewarm import upcoming_topics
+    from app.schema import migrate
+    from app.sharding import ShardSet, shards
+
+    create_tables()
+    with shards.primary() as db:
+        ids = shards.insert_students(db, [
+            {"email": f"shard{i}@bench.com", "hashed_password": "not-a-real-hash", "full_name": "Bench Student",
+             "grade_level": 7, "learning_style": LearningStyle.VISUAL, "weak_subjects": ["Mathematics"]}
+            for i in range(args.students)
+        ])
+    students = []
+    for student_id in ids:
+        with shards.session_for(student_id) as db:
+            curriculum = crud.create_curriculum(db, ai_tutor._create_fallback_curriculum({
+                "grade_level": 7, "learning_style": LearningStyle.VISUAL, "weak_subjects": ["Mathematics"]
+            }), student_id)
+            email, plan_id = crud.get_student(db, student_id).email, curriculum.weekly_plans[0].id
+        students.append((student_id, {"Authorization": f"Bearer {create_access_token({'sub': email})}"}, plan_id))
+    print(f"students per shard: {shards.status()}")
+
+    client = TestClient(app)
+    counters = {name: count_statements(engine) for name, engine in zip(shards.names, shards.engines())}
+    stray = 0
+    for student_id, headers, plan_id in students:
+        home = shards.locate(student_id)
+        for counter in counters.values():
+            counter["statements"] = 0
+        assert client.post("/chat/sessions", headers=headers, json={"session_title": "Fractions"}).status_code == 200
+        assert client.post("/analytics/progress", headers=headers, json={
+            "weekly_plan_id": plan_id, "subject": "Mathematics", "topic": "Fractions",
+            "proficiency_score": 80, "time_spent_minutes": 20
+        }).status_code == 200
+        for path in ("/analytics/progress", "/analytics/mastery", "/curriculum/", "/chat/sessions"):
+            assert client.get(path, headers=headers).status_code == 200
+        # The directory lookups run on the primary (shard0), which may also be home
+        stray += sum(counter["statements"] for name, counter in counters.items() if name not in (home, "shard0"))
+    print(f"{len(students) * 6} requests: {stray} statements on shards other than the student's own")
+
+    started = time.perf_counter()
+    demand = shards.scatter(upcoming_topics, 1)
+    print(f"pre-warm demand from {len(demand)} shards: {sum(len(topics) for topics in demand.values())} "
+          f"topic rows in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    grown = ShardSet(list(zip(shards.names + [f"shard{args.shards}"], urls)),
+                     primary=shards.primary, primary_url=primary_url)
+    migrate(grown.engines()[-1])
+    misplaced = grown.misplaced()
+    samples = []
+    for student_id, _, target in misplaced:
+        started = time.perf_counter()
+        grown.move(student_id, target)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"added shard{args.shards}: moved {len(misplaced)}/{len(students)} students "
+          f"({len(misplaced) / len(students):.0%}), now {grown.status()}")
+    if samples:
+        print("move latency: " + ", ".join(f"{key} {value:.1f}" for key, value in summarize(samples).items()))
+
+
+if __name__ == "__main__":
+    main()
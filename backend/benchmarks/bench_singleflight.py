@@ -0,0 +1,114 @@
+"""Identical concurrent AI calls with and without single-flight coalescing.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_singleflight --students 40
+
+Simulates a class opening an assigned topic at once: ``--students``
+concurrent ``generate_practice_question`` calls and the same number of
+``generate_curriculum`` calls for one student profile, against the fake
+backend. Reports upstream calls and wall time with coalescing off, on
+within one worker, and across ``--workers`` simulated workers sharing the
+``ai_call_leases`` table. Also checks that cancelling the leader's caller
+does not fail its followers.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from .common import bootstrap
+
+
+def call_factories(tutor):
+    from app.models import LearningStyle
+
+    profile = {"grade_level": 7, "learning_style": LearningStyle.VISUAL, "weak_subjects": ["Mathematics"]}
+    return {
+        "practice question": (
+            "generate_practice_question", {"topic": "Fractions", "difficulty": "medium"},
+            lambda: tutor.generate_practice_question("Fractions", "medium")
+        ),
+        "curriculum": (
+            "generate_curriculum", {"student_data": profile, "mode": "single"},
+            lambda: tutor.generate_curriculum(profile, mode="single")
+        ),
+    }
+
+
+async def burst(calls):
+    start = time.perf_counter()
+    results = await asyncio.gather(*(call() for call in calls), return_exceptions=True)
+    failures = sum(isinstance(result, BaseException) for result in results)
+    return (time.perf_counter() - start) * 1000, failures
+
+
+def upstream_calls(metrics):
+    return sum(value for key, value in metrics.snapshot()["counters"].items() if key.startswith("llm_calls_total"))
+
+
+async def main_async(args):
+    from app import singleflight
+    from app.ai_utils import AITutor
+    from app.config import settings
+    from app.database import create_tables
+    from app.metrics import metrics
+
+    create_tables()
+    tutor = AITutor()
+    print(f"{'mode':<22}{'call':<19}{'callers':>8}{'upstream':>10}{'failed':>8}{'wall ms':>10}")
+    modes = [
+        ("off", False, None),
+        ("in-process", True, None),
+        (f"{args.workers} workers, shared", True, args.workers),
+    ]
+    factories = call_factories(tutor)
+    for mode, enabled, workers in modes:
+        for name, (method, inputs, call) in factories.items():
+            metrics.reset()
+            if workers:
+                # Simulated workers: each has its own flights and lease owner; the
+                # decorator is bypassed so every call goes through its worker's flights
+                settings.SINGLEFLIGHT_ENABLED = False
+                key = singleflight.flight_key(method, "gpt-4", inputs)
+                per_worker = args.students // workers
+                calls = [
+                    lambda flights=singleflight.SingleFlight(singleflight.DatabaseLeases(30, 5)): flights.do(
+                        key, call, method
+                    )
+                    for _ in range(workers)
+                ]
+                elapsed, failed = await burst([worker for worker in calls for _ in range(per_worker)])
+                callers = per_worker * workers
+            else:
+                settings.SINGLEFLIGHT_ENABLED = enabled
+                elapsed, failed = await burst([call] * args.students)
+                callers = args.students
+            print(f"{mode:<22}{name:<19}{callers:>8}{upstream_calls(metrics):>10.0f}{failed:>8}{elapsed:>10.1f}")
+
+    # Cancelling the leader's caller must not fail the followers
+    settings.SINGLEFLIGHT_ENABLED = True
+    leader = asyncio.create_task(tutor.generate_practice_question("Decimals", "easy"))
+    await asyncio.sleep(0)
+    followers = [asyncio.create_task(tutor.generate_practice_question("Decimals", "easy")) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    results = await asyncio.gather(*followers, return_exceptions=True)
+    print(f"leader cancelled: {sum(isinstance(r, dict) for r in results)}/{len(results)} followers got a question")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=int, default=300, help="Fake upstream latency per call")
+    args = parser.parse_args()
+
+    bootstrap()
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
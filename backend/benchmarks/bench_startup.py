@@ -0,0 +1,112 @@
+"""Cold start of the API process: import cost and time to first healthy response.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_startup --top 15
+
+Runs ``python -X importtime -c "import app.main"`` in a fresh interpreter
+and prints the total and the most expensive modules. Then starts uvicorn
+and reports how long it takes from spawning the process to the first 200
+from ``/health`` (import, startup events, the schema check and one query).
+``app/tests/test_startup.py`` runs the same measurements against a budget.
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def startup_env(database_url: Optional[str] = None) -> Dict[str, str]:
+    """Environment for a fresh API process against a scratch SQLite database"""
+    if database_url is None:
+        database_url = f"sqlite:///{tempfile.mkdtemp(prefix='tutor_startup_')}/app.db"
+    env = dict(os.environ, DATABASE_URL=database_url, DEBUG="false")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def import_times(module: str = "app.main", env: Optional[Dict[str, str]] = None) -> List[Tuple[str, int, float, float]]:
+    """(module, depth, self ms, cumulative ms) for every module imported by
+    ``import module`` in a fresh interpreter, in import order"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env or startup_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((name, len(indent) // 2, int(own) / 1000, int(cumulative) / 1000))
+    return rows
+
+
+def loaded_modules(module: str = "app.main", env: Optional[Dict[str, str]] = None) -> List[str]:
+    """Top-level packages in ``sys.modules`` after ``import module``"""
+    result = subprocess.run(
+        [sys.executable, "-c", f"import sys, {module}; print(' '.join(sorted({{m.split('.')[0] for m in sys.modules}})))"],
+        cwd=BACKEND_DIR, env=env or startup_env(), capture_output=True, text=True, check=True,
+    )
+    return result.stdout.split()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_healthy(env: Optional[Dict[str, str]] = None, timeout: float = 30.0) -> float:
+    """Seconds from spawning uvicorn to the first 200 from /health"""
+    import httpx
+
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env or startup_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited: {server.stderr.read().decode()[-2000:]}")
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        raise TimeoutError(f"/health not healthy after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15, help="Modules listed by cumulative import time")
+    args = parser.parse_args()
+
+    rows = import_times()
+    total = next(cumulative for name, _, _, cumulative in rows if name == "app.main")
+    print(f"import app.main: {total:.0f} ms")
+    print(f"{'module':<40}{'self ms':>9}{'cumulative ms':>15}")
+    for name, depth, own, cumulative in sorted(rows, key=lambda row: row[3], reverse=True)[:args.top]:
+        print(f"{'  ' * min(depth, 4) + name:<40}{own:>9.1f}{cumulative:>15.1f}")
+    app_own = sum(own for name, _, own, _ in rows if name.startswith("app."))
+    print(f"app.* modules themselves: {app_own:.0f} ms")
+    heavy = [name for name in ("openai", "numpy", "jose", "passlib") if name in loaded_modules()]
+    print(f"heavy modules loaded at import: {', '.join(heavy) or 'none'}")
+    print(f"time to first healthy response: {time_to_healthy():.2f} s")
+
+
+if __name__ == "__main__":
+    main()
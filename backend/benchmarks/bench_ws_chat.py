@@ -0,0 +1,187 @@
+"""Sustained concurrent chat connections per worker: WebSocket vs. HTTP.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.bench_ws_chat --connections 200 --turns 5
+
+Starts one uvicorn worker in-process (fake LLM backend) and drives
+``--connections`` simulated students, each sending ``--turns`` questions
+with a short think time between them:
+
+* ``websocket`` - one ``/chat/ws`` connection per student for all turns
+* ``http``      - a ``POST /chat/message`` per turn (re-authenticated and
+  profile re-sent every turn, whole answer returned at once)
+
+Reports completed/failed turns, turn latency (first token for WebSocket),
+throughput and the DB commits issued (both channels persist through the
+write-behind buffer). Turns that have not finished within ``--deadline``
+are counted as failed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+from .common import bootstrap, summarize
+
+QUESTIONS = ["What is a fraction?", "Why do we need a common denominator?", "Explain photosynthesis",
+             "How do I find the area of a triangle?", "What is a prime number?"]
+
+
+def start_server(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="error", ws_ping_interval=None))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, port
+
+
+def seed_students(count: int):
+    from app import models
+    from app.auth import create_access_token
+    from app.database import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    students = [
+        models.Student(email=f"ws{i}@bench.com", hashed_password="x", full_name="Bench", grade_level=7,
+                       learning_style=models.LearningStyle.VISUAL, weak_subjects=["Mathematics"])
+        for i in range(count)
+    ]
+    db.add_all(students)
+    db.flush()
+    sessions = [models.ChatSession(student_id=student.id, session_title="Bench") for student in students]
+    db.add_all(sessions)
+    db.commit()
+    result = [(create_access_token({"sub": s.email}), session.id) for s, session in zip(students, sessions)]
+    db.close()
+    return result
+
+
+async def websocket_student(port, token, session_id, turns, think, samples, failures):
+    import websockets
+
+    rng = random.Random(session_id)
+    try:
+        async with websockets.connect(f"ws://127.0.0.1:{port}/chat/ws?token={token}&session_id={session_id}") as ws:
+            json.loads(await ws.recv())
+            for _ in range(turns):
+                await asyncio.sleep(rng.uniform(0, think * 2))
+                start = time.perf_counter()
+                await ws.send(json.dumps({"type": "message", "content": f"{rng.choice(QUESTIONS)} ({session_id})"}))
+                first = None
+                while True:
+                    frame = json.loads(await ws.recv())
+                    if frame["type"] == "delta" and first is None:
+                        first = time.perf_counter()
+                    if frame["type"] in ("done", "error"):
+                        break
+                if frame["type"] == "error":
+                    failures.append(frame.get("status"))
+                else:
+                    samples.append(((first or time.perf_counter()) - start) * 1000)
+    except Exception as e:
+        failures.append(type(e).__name__)
+
+
+async def http_student(client, token, session_id, turns, think, samples, failures):
+    rng = random.Random(session_id)
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(turns):
+        await asyncio.sleep(rng.uniform(0, think * 2))
+        start = time.perf_counter()
+        try:
+            response = await client.post("/chat/message", headers=headers, json={
+                "session_id": session_id, "content": f"{rng.choice(QUESTIONS)} ({session_id})"
+            })
+            if response.status_code == 200:
+                samples.append((time.perf_counter() - start) * 1000)
+            else:
+                failures.append(response.status_code)
+        except Exception as e:
+            failures.append(type(e).__name__)
+
+
+def count_commits(engine):
+    from sqlalchemy import event
+
+    counter = {"commits": 0}
+    event.listen(engine, "commit", lambda conn: counter.__setitem__("commits", counter["commits"] + 1))
+    return counter
+
+
+async def run(mode, port, students, args):
+    import httpx
+
+    samples, failures = [], []
+    start = time.perf_counter()
+    try:
+        if mode == "websocket":
+            await asyncio.wait_for(asyncio.gather(*(
+                websocket_student(port, token, session_id, args.turns, args.think, samples, failures)
+                for token, session_id in students
+            )), timeout=args.deadline)
+        else:
+            limits = httpx.Limits(max_connections=len(students))
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+                await asyncio.wait_for(asyncio.gather(*(
+                    http_student(client, token, session_id, args.turns, args.think, samples, failures)
+                    for token, session_id in students
+                )), timeout=args.deadline)
+    except asyncio.TimeoutError:
+        # Turns still outstanding when the deadline hit count as failed
+        failures.extend(["deadline"] * (len(students) * args.turns - len(samples) - len(failures)))
+    return samples, failures, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--think", type=float, default=0.5, help="Mean seconds between turns")
+    parser.add_argument("--latency-ms", type=int, default=300, help="Fake upstream latency per call")
+    parser.add_argument("--deadline", type=float, default=60, help="Seconds allowed per mode")
+    args = parser.parse_args()
+
+    bootstrap()
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "RATE_LIMIT_ENABLED": "false",
+        "SEMANTIC_CACHE_ENABLED": "false",
+        "AI_MAX_CONCURRENT_CALLS": str(args.connections),
+        "AI_MAX_QUEUED_CALLS": str(args.connections),
+    })
+    from app.database import engine
+    from app.main import app
+
+    students = seed_students(args.connections)
+    server, thread, port = start_server(app)
+    commits = count_commits(engine)
+
+    print(f"{args.connections} students x {args.turns} turns, fake LLM {args.latency_ms} ms")
+    print(f"{'mode':<11}{'ok':>6}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'turns/s':>9}{'commits':>9}")
+    for mode in ("websocket", "http"):
+        commits["commits"] = 0
+        samples, failures, elapsed = asyncio.run(run(mode, port, students, args))
+        # Let the write-behind buffer flush what this mode queued
+        time.sleep(float(os.environ.get("CHAT_WRITE_BEHIND_MAX_DELAY_SECONDS", 1.0)) + 0.5)
+        stats = summarize(samples) if samples else {"p50_ms": 0.0, "p95_ms": 0.0}
+        print(f"{mode:<11}{len(samples):>6}{len(failures):>8}{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}"
+              f"{len(samples) / elapsed:>9.1f}{commits['commits']:>9}")
+        if failures:
+            print(f"           failures: {sorted(set(map(str, failures)))}")
+
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Shared helpers for the backend benchmarks.
+
+Benchmarks run the real FastAPI app in-process against a throwaway SQLite
+database, so they must call ``bootstrap()`` before importing anything from
+``app``.
+"""
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+
+def bootstrap(database_url: str = None) -> str:
+    """Point the app at a scratch database; returns the URL used"""
+    if database_url is None:
+        fd, path = tempfile.mkstemp(prefix="tutor_bench_", suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("DEBUG", "false")
+    return database_url
+
+
+def create_student(db, email: str = "bench@student.com", grade_level: int = 7):
+    """Insert a student directly (skips bcrypt) and return (student, bearer headers)"""
+    from app import models
+    from app.auth import create_access_token
+
+    student = models.Student(
+        email=email,
+        hashed_password="not-a-real-hash",
+        full_name="Bench Student",
+        grade_level=grade_level,
+        learning_style=models.LearningStyle.VISUAL,
+        weak_subjects=["Mathematics", "Science"],
+        learning_goals="Benchmark all the things"
+    )
+    db.add(student)
+    db.commit()
+    db.refresh(student)
+    token = create_access_token({"sub": student.email})
+    return student, {"Authorization": f"Bearer {token}"}
+
+
+def timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    """Run ``fn`` ``repeat`` times, returning per-call latencies in ms"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+        "max_ms": ordered[-1],
+    }
@@ -0,0 +1,117 @@
+"""Fairness load test for per-student rate limiting and AI admission control.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.load_rate_limit --duration 10
+
+One "greedy" student hammers ``POST /chat/message`` with many concurrent
+loops while ordinary students send a message every couple of seconds, all
+against the fake LLM backend. Without limits the greedy client takes most of
+the upstream capacity; with them it is throttled to its bucket rate and the
+ordinary students keep near-100% success. Reports per-client outcomes and
+Jain's fairness index over the share of each client's demand that was served.
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+from .common import bootstrap, create_student
+
+
+async def client_loop(client, headers, session_id, deadline, pause, outcomes):
+    while time.perf_counter() < deadline:
+        response = await client.post(
+            "/chat/message",
+            headers=headers,
+            json={"session_id": session_id, "content": "What is a fraction?"},
+        )
+        outcomes[response.status_code] += 1
+        if pause:
+            await asyncio.sleep(pause)
+
+
+def jain(values):
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values)) if any(values) else 0.0
+
+
+async def run(args):
+    import httpx
+    from app import models
+    from app.database import SessionLocal, create_tables
+    from app.main import app
+    from app.rate_limit import ai_concurrency
+
+    create_tables()
+    db = SessionLocal()
+    clients = []
+    for index in range(args.students + 1):
+        student, headers = create_student(db, email=f"load{index}@student.com")
+        session = models.ChatSession(student_id=student.id, session_title="Load test")
+        db.add(session)
+        db.commit()
+        clients.append((headers, session.id))
+    db.close()
+
+    deadline = time.perf_counter() + args.duration
+    outcomes = [Counter() for _ in clients]
+    peak = 0
+
+    async def watch_in_flight():
+        nonlocal peak
+        while time.perf_counter() < deadline:
+            peak = max(peak, ai_concurrency.active)
+            await asyncio.sleep(0.01)
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+        tasks = [watch_in_flight()]
+        greedy_headers, greedy_session = clients[0]
+        tasks += [
+            client_loop(client, greedy_headers, greedy_session, deadline, 0, outcomes[0])
+            for _ in range(args.greedy_loops)
+        ]
+        tasks += [
+            client_loop(client, headers, session_id, deadline, args.pause, outcomes[index + 1])
+            for index, (headers, session_id) in enumerate(clients[1:])
+        ]
+        await asyncio.gather(*tasks)
+
+    print(f"{'client':<10}{'sent':>8}{'200':>8}{'429':>8}{'served %':>10}")
+    shares = []
+    for index, counts in enumerate(outcomes):
+        sent = sum(counts.values())
+        share = counts[200] / sent if sent else 0.0
+        shares.append(share)
+        name = "greedy" if index == 0 else f"student{index}"
+        print(f"{name:<10}{sent:>8}{counts[200]:>8}{counts[429]:>8}{share * 100:>9.1f}%")
+    print()
+    served = [counts[200] for counts in outcomes]
+    print(f"ordinary students served: {sum(served[1:])}/{sum(sum(o.values()) for o in outcomes[1:])}")
+    print(f"greedy share of upstream calls: {served[0] / max(1, sum(served)) * 100:.1f}%")
+    print(f"Jain fairness (ordinary students): {jain(shares[1:]):.3f}")
+    print(f"peak AI calls in flight: {peak} (cap {ai_concurrency.max_concurrent})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--students", type=int, default=6)
+    parser.add_argument("--greedy-loops", type=int, default=6)
+    parser.add_argument("--pause", type=float, default=2.0)
+    parser.add_argument("--no-limits", action="store_true", help="disable the token buckets (keeps the concurrency cap)")
+    args = parser.parse_args()
+
+    bootstrap()
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = "100"
+    os.environ["AI_MAX_CONCURRENT_CALLS"] = "8"
+    os.environ["AI_MAX_QUEUED_CALLS"] = "8"
+    os.environ["AI_QUEUE_TIMEOUT_SECONDS"] = "1"
+    if args.no_limits:
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+"""Query-plan advisor: EXPLAIN every statement the app issues and flag bad plans.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.query_plans                     # report full scans, filesorts, index suggestions
+    python -m benchmarks.query_plans --check             # exit 1 when a plan regressed vs the baseline
+    python -m benchmarks.query_plans --update-baseline   # accept the current plans
+
+Migrates a scratch SQLite database (or ``--database-url``, e.g. a MySQL
+schema built by ``alembic upgrade head``) and seeds ``benchmarks.synthetic``
+data. It then records every distinct statement while a few users call each
+endpoint in ``suite.ENDPOINTS`` once and the batch jobs run. The jobs are
+the mastery and review recomputes, analytics and retention compaction.
+Each SELECT, UPDATE and DELETE is EXPLAINed with the parameters it ran with:
+``EXPLAIN QUERY PLAN`` on SQLite and ``EXPLAIN`` on MySQL.
+
+A plan is flagged for:
+
+* a full table scan: SQLite ``SCAN t`` without an index, MySQL ``type=ALL``
+* a filesort: SQLite ``USE TEMP B-TREE FOR ORDER BY``, MySQL ``Using filesort``
+* a temporary table: the same for GROUP BY / DISTINCT, MySQL ``Using temporary``
+
+For flagged tables it suggests an index from the statement's equality
+columns, then range columns, then ORDER BY columns. Add the index to
+``app/models.py`` and generate a migration (see ``app/schema.py``).
+
+Statements are keyed by a fingerprint of their normalized SQL, so ``IN``
+lists of any length match. ``--check`` compares with the baseline for the
+dialect (``benchmarks/query_plans.<dialect>.json``). It fails when a known
+statement gains a flag, or when a new statement is flagged at all.
+Accepting a new scan is then a visible change to the checked-in baseline.
+``app/tests/test_query_plans.py`` runs the check.
+"""
+import argparse
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .common import bootstrap
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Source (endpoint or job) of the statements running in the current context
+_current_source: contextvars.ContextVar[str] = contextvars.ContextVar("source", default="(background)")
+
+_EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+_IN_LIST = re.compile(r"\((?:\?|%s|%\(\w+\)s)(?:, (?:\?|%s|%\(\w+\)s))*\)")
+_SQLITE_STEP = re.compile(r"^(SCAN|SEARCH) (\w+)(?: AS (\w+))?(?: USING (?:(COVERING) )?INDEX (\w+)"
+                          r"| USING (?:INTEGER )?PRIMARY KEY)?")
+_CLAUSE_END = r"(?= GROUP BY | ORDER BY | LIMIT | FOR UPDATE|$)"
+
+
+def normalize(sql: str) -> str:
+    return _IN_LIST.sub("(?)", " ".join(sql.split()))
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:12]
+
+
+@dataclass
+class Statement:
+    sql: str
+    parameters: Any
+    sources: Set[str] = field(default_factory=set)
+
+
+@dataclass
+class PlanStep:
+    table: str
+    access: str  # scan | index scan | index | primary key
+    index: Optional[str] = None
+
+
+@dataclass
+class QueryPlan:
+    fingerprint: str
+    sql: str
+    sources: List[str]
+    steps: List[PlanStep]
+    full_scans: List[str]
+    filesort: bool
+    temporary: bool
+    suggestions: List[str] = field(default_factory=list)
+
+    @property
+    def flagged(self) -> bool:
+        return bool(self.full_scans or self.filesort or self.temporary)
+
+    def flags(self) -> List[str]:
+        return [f"full scan of {table}" for table in self.full_scans] + \
+            (["filesort"] if self.filesort else []) + (["temporary table"] if self.temporary else [])
+
+
+class StatementCapture:
+    """Distinct explainable statements run on ``engine`` while attached, with
+    the first parameters seen and every source that ran them"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: Dict[str, Statement] = {}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(_EXPLAINABLE) or "alembic_version" in statement:
+            return  # Writes are keyed lookups; alembic_version is migration bookkeeping
+        key = fingerprint(statement)
+        entry = self.statements.get(key)
+        if entry is None:
+            entry = self.statements[key] = Statement(statement, parameters)
+        entry.sources.add(_current_source.get())
+
+    def __enter__(self) -> "StatementCapture":
+        from sqlalchemy import event
+
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        from sqlalchemy import event
+
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+def _aliases(sql: str) -> Dict[str, str]:
+    """alias -> table for ``FROM/JOIN table AS alias``"""
+    return {alias: table for table, alias in re.findall(r"(?:FROM|JOIN) (\w+) AS (\w+)", sql)}
+
+
+def explain_sqlite(connection, sql: str, parameters) -> Tuple[List[PlanStep], bool, bool]:
+    aliases = _aliases(sql)
+    steps, filesort, temporary = [], False, False
+    for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, parameters or ()):
+        detail = row[-1]
+        if detail.startswith("USE TEMP B-TREE"):
+            filesort = filesort or "ORDER BY" in detail
+            temporary = temporary or "ORDER BY" not in detail
+            continue
+        match = _SQLITE_STEP.match(detail)
+        if not match:
+            continue  # Subquery, co-routine, constant row, ...
+        kind, table, alias, covering, index = match.groups()
+        table = aliases.get(table, table)
+        if "PRIMARY KEY" in detail:
+            steps.append(PlanStep(table, "primary key"))
+        elif index:
+            steps.append(PlanStep(table, "index scan" if kind == "SCAN" else "index", index))
+        else:
+            steps.append(PlanStep(table, "scan" if kind == "SCAN" else "index"))
+    return steps, filesort, temporary
+
+
+def explain_mysql(connection, sql: str, parameters) -> Tuple[List[PlanStep], bool, bool]:
+    aliases = _aliases(sql)
+    steps, filesort, temporary = [], False, False
+    for row in connection.exec_driver_sql("EXPLAIN " + sql, parameters or ()).mappings():
+        extra = row.get("Extra") or ""
+        filesort = filesort or "Using filesort" in extra
+        temporary = temporary or "Using temporary" in extra
+        table = row.get("table")
+        if not table or table.startswith("<"):
+            continue  # Derived table or union result
+        table = aliases.get(table, table)
+        access = {"ALL": "scan", "index": "index scan", "const": "primary key", "eq_ref": "primary key"}.get(
+            row.get("type"), "index")
+        steps.append(PlanStep(table, access, row.get("key")))
+    return steps, filesort, temporary
+
+
+EXPLAINERS = {"sqlite": explain_sqlite, "mysql": explain_mysql}
+
+
+def _columns(sql: str, table: str) -> Tuple[List[str], List[str], List[str]]:
+    """(equality, range, order by) columns of ``table`` in ``sql``"""
+    names = [table] + [alias for alias, name in _aliases(sql).items() if name == table]
+    qualified = "(?:" + "|".join(map(re.escape, names)) + r")\.(\w+)"
+    filters = " ".join(re.findall(r" (?:ON|WHERE) (.*?)" + _CLAUSE_END, sql))
+    equality, ranges = [], []
+    for column, operator in re.findall(qualified + r" (<=|>=|=|<|>|IN\b|IS\b(?! NOT)|BETWEEN\b|LIKE\b)", filters):
+        (equality if operator in ("=", "IN", "IS") else ranges).append(column)
+    equality += re.findall(r"= " + qualified, filters)
+    order = re.search(r" ORDER BY (.*?)(?= LIMIT | FOR UPDATE|$)", sql)
+    order_by = re.findall(qualified, order.group(1)) if order else []
+    return equality, ranges, order_by
+
+
+def suggest_index(sql: str, table: str, existing: List[Tuple[str, List[str]]]) -> Optional[str]:
+    """``CREATE INDEX`` for ``table`` serving ``sql``, or None when there is
+    nothing to index on or an existing index already starts that way"""
+    equality, ranges, order_by = _columns(sql, table)
+    columns: List[str] = []
+    for column in equality + ranges[:1] + (order_by if not ranges else []):
+        if column not in columns and column != "id":
+            columns.append(column)
+    if not columns:
+        return None
+    for name, indexed in existing:
+        if indexed[:len(columns)] == columns:
+            return f"-- {table}: ({', '.join(columns)}) is already indexed by {name}; the query shape needs changing"
+    return f"CREATE INDEX idx_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)});"
+
+
+def existing_indexes(engine) -> Dict[str, List[Tuple[str, List[str]]]]:
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    indexes = {}
+    for table in inspector.get_table_names():
+        found = [(index["name"], index["column_names"]) for index in inspector.get_indexes(table)]
+        found += [(constraint["name"], constraint["column_names"])
+                  for constraint in inspector.get_unique_constraints(table)]
+        indexes[table] = found
+    return indexes
+
+
+def explain_all(engine, statements: Dict[str, Statement]) -> List[QueryPlan]:
+    explain = EXPLAINERS.get(engine.dialect.name)
+    if explain is None:
+        raise SystemExit(f"no EXPLAIN parser for {engine.dialect.name} (supported: {', '.join(EXPLAINERS)})")
+    indexes = existing_indexes(engine)
+    plans = []
+    with engine.connect() as connection:
+        for key, statement in sorted(statements.items(), key=lambda item: normalize(item[1].sql)):
+            steps, filesort, temporary = explain(connection, statement.sql, statement.parameters)
+            full_scans = sorted({step.table for step in steps if step.access == "scan"})
+            sql = normalize(statement.sql)
+            suggestions = []
+            for table in full_scans + sorted({step.table for step in steps} if filesort else set()):
+                suggestion = suggest_index(sql, table, indexes.get(table, []))
+                if suggestion and suggestion not in suggestions:
+                    suggestions.append(suggestion)
+            plans.append(QueryPlan(key, sql, sorted(statement.sources), steps, full_scans, filesort, temporary,
+                                   suggestions))
+            connection.rollback()
+    return plans
+
+
+@contextmanager
+def _source(label: str) -> Iterator[None]:
+    token = _current_source.set(label)
+    try:
+        yield
+    finally:
+        _current_source.reset(token)
+
+
+async def run_endpoints(users) -> None:
+    import httpx
+    from app.main import app
+
+    from .suite import ENDPOINTS
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://plans", timeout=None) as client:
+            for index, user in enumerate(users):
+                for endpoint in ENDPOINTS:
+                    method, url, kwargs = endpoint.request(user, random.Random(index))
+                    with _source(endpoint.name):
+                        await client.request(method, url, **kwargs)
+    finally:
+        await app.router.shutdown()
+
+
+def run_jobs(student_ids: List[int]) -> None:
+    from app import crud
+    from app.database import SessionLocal
+    from app.retention import retention_job
+
+    db = SessionLocal()
+    try:
+        jobs = {
+            "crud.recompute_mastery": lambda: crud.recompute_mastery(db),
+            "crud.recompute_reviews": lambda: crud.recompute_reviews(db),
+            "crud.get_student_analytics": lambda: [crud.get_student_analytics(db, s) for s in student_ids],
+            "crud.get_due_reviews": lambda: [crud.get_due_reviews(db, s) for s in student_ids],
+            "retention": retention_job.run_once,
+        }
+        for name, job in jobs.items():
+            with _source(name):
+                job()
+    finally:
+        db.close()
+
+
+def collect(students: int = 30, logs_per_student: int = 40, users: int = 3, seed: int = 1,
+            seed_data: bool = True) -> Tuple[Any, List[QueryPlan]]:
+    """Seed, run the workload and EXPLAIN what it issued; returns (engine, plans)"""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["CHAT_WRITE_BEHIND_SPILL_PATH"] = ""
+
+    from app.database import SessionLocal, create_tables, engine
+
+    from .suite import load_users
+    from .synthetic import generate
+
+    create_tables()
+    if seed_data:
+        db = SessionLocal()
+        generate(db, students, logs_per_student, messages_per_student=20, days=400, seed=seed)
+        db.close()
+    selected = load_users(users, seed)
+    with StatementCapture(engine) as capture:
+        asyncio.run(run_endpoints(selected))
+        run_jobs([user.student_id for user in selected])
+    return engine, explain_all(engine, capture.statements)
+
+
+def baseline_path(dialect: str) -> str:
+    return os.path.join(BENCHMARKS_DIR, f"query_plans.{dialect}.json")
+
+
+def to_baseline(dialect: str, plans: List[QueryPlan]) -> Dict[str, Any]:
+    return {"dialect": dialect, "statements": {plan.fingerprint: {
+        "sql": plan.sql[:300], "sources": plan.sources, "full_scans": plan.full_scans,
+        "filesort": plan.filesort, "temporary": plan.temporary,
+    } for plan in plans}}
+
+
+def regressions(plans: List[QueryPlan], baseline: Dict[str, Any]) -> List[Tuple[QueryPlan, List[str]]]:
+    """Plans with flags the baseline does not have, with the new flags"""
+    known = baseline.get("statements", {})
+    found = []
+    for plan in plans:
+        old = known.get(plan.fingerprint)
+        if old is None:
+            new = plan.flags()
+        else:
+            new = [f"full scan of {table}" for table in plan.full_scans if table not in old["full_scans"]]
+            new += ["filesort"] if plan.filesort and not old["filesort"] else []
+            new += ["temporary table"] if plan.temporary and not old["temporary"] else []
+        if new:
+            found.append((plan, new))
+    return found
+
+
+def print_report(plans: List[QueryPlan], verbose: bool = False) -> None:
+    flagged = [plan for plan in plans if plan.flagged]
+    print(f"{len(plans)} distinct statements, {len(flagged)} flagged")
+    for plan in plans if verbose else flagged:
+        print(f"\n[{plan.fingerprint}] {', '.join(plan.flags()) or 'ok'}  <- {', '.join(plan.sources)}")
+        print(f"  {plan.sql[:240]}")
+        for step in plan.steps:
+            print(f"    {step.table:<20}{step.access:<13}{step.index or ''}")
+        for suggestion in plan.suggestions:
+            print(f"  suggest: {suggestion}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Default: a scratch SQLite file")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse synthetic data already in --database-url")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--logs-per-student", type=int, default=40)
+    parser.add_argument("--users", type=int, default=3, help="Students that call every endpoint")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", help="Default: benchmarks/query_plans.<dialect>.json")
+    parser.add_argument("--check", action="store_true", help="Exit 1 when a plan regressed vs the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the current plans as the baseline")
+    parser.add_argument("--json", help="Write every plan here")
+    parser.add_argument("--verbose", action="store_true", help="Print unflagged plans too")
+    args = parser.parse_args()
+
+    bootstrap(args.database_url)
+    engine, plans = collect(args.students, args.logs_per_student, args.users, args.seed, not args.no_seed)
+    dialect = engine.dialect.name
+    print_report(plans, args.verbose)
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump([asdict(plan) for plan in plans], output, indent=2)
+
+    path = args.baseline or baseline_path(dialect)
+    if args.update_baseline:
+        with open(path, "w") as output:
+            json.dump(to_baseline(dialect, plans), output, indent=2, sort_keys=True)
+            output.write("\n")
+        print(f"\nwrote {path}")
+        return
+    if not os.path.exists(path):
+        if args.check:
+            sys.exit(f"no baseline at {path}; run with --update-baseline first")
+        return
+    with open(path) as handle:
+        found = regressions(plans, json.load(handle))
+    print(f"\n{len(found)} plan regression(s) vs {os.path.relpath(path)}")
+    for plan, new in found:
+        print(f"  [{plan.fingerprint}] {', '.join(new)}  <- {', '.join(plan.sources)}")
+        print(f"    {plan.sql[:200]}")
+        for suggestion in plan.suggestions:
+            print(f"    suggest: {suggestion}")
+    if found and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Input tokens per request, before and after prompt compaction.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.report_prompt_tokens
+
+Captures the messages every ``AITutor`` method actually sends (against the
+fake backend) and compares them with the original prompt templates, which
+are reproduced verbatim below. Counts use tiktoken when installed and the
+``app.prompts`` estimate otherwise.
+"""
+import asyncio
+import json
+import os
+from types import SimpleNamespace
+
+from .common import bootstrap
+
+# A realistic client-supplied chat context: the frontend pastes profile,
+# curriculum and recent history to give the tutor something to work with
+CHAT_CONTEXT = {
+    "grade_level": 7,
+    "learning_style": "visual",
+    "weak_subjects": ["Mathematics", "Science"],
+    "learning_goals": "Improve math problem-solving skills and science concepts",
+    "current_topic": "Fractions",
+    "student_name": "Demo Student",
+    "email": "demo@student.com",
+    "theme": "dark",
+    "recent_messages": [
+        {"role": "user", "content": "How do I add 1/3 and 1/4?"},
+        {"role": "assistant", "content": "Find a common denominator first. " * 12},
+    ] * 3,
+    "curriculum": {"week": 2, "focus_areas": ["Mathematics", "Science"], "objectives": ["Fractions", "Cells"]},
+}
+CHAT_MESSAGE = "Why do we need a common denominator to add fractions?"
+
+
+def legacy_curriculum_messages(student_data):
+    learning_preferences = "visual aids, diagrams, videos"
+    prompt = f"""
+        Create a comprehensive 8-week personalized study plan for a grade {student_data['grade_level']} student.
+
+        STUDENT PROFILE:
+        - Grade Level: {student_data['grade_level']}
+        - Learning Style: {student_data['learning_style'].value}
+        - Weak Subjects: {', '.join(student_data['weak_subjects'])}
+        - Learning Goals: {student_data.get('learning_goals', 'Improve overall academic performance')}
+        - Preferred Methods: {learning_preferences}
+
+        CURRICULUM REQUIREMENTS:
+        - 8-week duration with weekly focus areas
+        - Daily breakdown (Monday-Friday, 60-90 minutes daily)
+        - Include {', '.join(student_data['weak_subjects'])} as primary focus
+        - Balance with reinforcement of strong subjects
+        - Progressive difficulty (simple to complex)
+        - Include practice exercises and assessments
+        - Incorporate {learning_preferences} for engagement
+
+        RESPONSE FORMAT (JSON):
+        {{
+            "title": "Personalized Learning Curriculum",
+            "description": "Overview of the curriculum",
+            "weekly_plans": [
+                {{
+                    "week_number": 1,
+                    "focus_areas": ["subject1", "subject2"],
+                    "learning_objectives": ["objective1", "objective2"],
+                    "daily_breakdown": {{
+                        "monday": {{"subject": "Math", "topic": "Basic Arithmetic", "activities": [...]}},
+                        "tuesday": {{"subject": "Science", "topic": "Introduction to Biology", "activities": [...]}},
+                        // ... rest of the week
+                    }},
+                    "resources_needed": ["textbook1", "online_resource2"]
+                }}
+            ]
+        }}
+
+        Make it engaging, age-appropriate, and effective for knowledge retention.
+        """
+    return [
+        {"role": "system", "content": "You are an expert educational curriculum designer for grades 4-9."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def legacy_practice_messages(topic, difficulty="medium"):
+    prompt = f"""
+        Create a {difficulty} difficulty practice question about {topic} for middle school students.
+        
+        Include:
+        - A clear question
+        - Multiple choice options (A, B, C, D)
+        - Detailed explanation of the correct answer
+        - Hint for struggling students
+        
+        Format as JSON:
+        {{
+            "question": "question text",
+            "options": {{
+                "A": "option A",
+                "B": "option B", 
+                "C": "option C",
+                "D": "option D"
+            }},
+            "correct_answer": "A",
+            "explanation": "detailed explanation",
+            "hint": "helpful hint"
+        }}
+        """
+    return [
+        {"role": "system", "content": "You are a helpful tutor creating educational content."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def legacy_chat_messages(message, context):
+    context_str = json.dumps(context, indent=2)
+    prompt = f"""
+        You are a friendly, patient tutor for grade {context.get('grade_level', 6)} students.
+        
+        Student Context:
+        {context_str}
+        
+        Current Question: {message}
+        
+        Provide:
+        - Clear, age-appropriate explanation
+        - Step-by-step guidance if it's a problem
+        - Encouraging tone
+        - Related examples if helpful
+        - Ask follow-up questions to check understanding
+        
+        Keep responses under 300 words.
+        """
+    return [
+        {"role": "system", "content": "You are an expert tutor who explains concepts clearly and patiently."},
+        {"role": "user", "content": prompt},
+    ]
+
+
+async def capture(tutor, call):
+    """Run ``call`` and return the messages of every completion it made"""
+    sent = []
+    upstream = tutor.client.ChatCompletion
+
+    class Recorder:
+        async def acreate(self, **kwargs):
+            sent.append(kwargs["messages"])
+            return await upstream.acreate(**kwargs)
+
+    tutor.client = SimpleNamespace(ChatCompletion=Recorder())
+    try:
+        await call()
+    finally:
+        tutor.client = SimpleNamespace(ChatCompletion=upstream)
+    return sent
+
+
+async def run():
+    from app.ai_utils import AITutor
+    from app.models import LearningStyle
+    from app.prompts import count_message_tokens, tiktoken
+
+    tutor = AITutor()
+    student_data = {
+        "grade_level": 7,
+        "learning_style": LearningStyle.VISUAL,
+        "weak_subjects": ["Mathematics", "Science"],
+        "learning_goals": "Improve math problem-solving skills and science concepts",
+    }
+    rows = [
+        (
+            "generate_curriculum",
+            legacy_curriculum_messages(student_data),
+            await capture(tutor, lambda: tutor.generate_curriculum(student_data, mode="single")),
+        ),
+        (
+            "generate_curriculum[parallel]",
+            legacy_curriculum_messages(student_data),
+            await capture(tutor, lambda: tutor.generate_curriculum(student_data, mode="parallel")),
+        ),
+        (
+            "generate_practice_question",
+            legacy_practice_messages("fractions"),
+            await capture(tutor, lambda: tutor.generate_practice_question("fractions")),
+        ),
+        (
+            "chat_assistance",
+            legacy_chat_messages(CHAT_MESSAGE, CHAT_CONTEXT),
+            await capture(tutor, lambda: tutor.chat_assistance(CHAT_MESSAGE, CHAT_CONTEXT)),
+        ),
+    ]
+
+    print(f"token counts via {'tiktoken' if tiktoken else 'app.prompts estimate'}")
+    print(f"{'method':<30}{'before':>8}{'after':>8}{'calls':>7}{'after/call':>12}{'saved':>8}")
+    for method, legacy, calls in rows:
+        before = count_message_tokens(legacy)
+        per_call = [count_message_tokens(messages) for messages in calls]
+        after = sum(per_call)
+        print(
+            f"{method:<30}{before:>8}{after:>8}{len(calls):>7}{after / len(calls):>12.0f}"
+            f"{(1 - after / before) * 100:>7.0f}%"
+        )
+
+
+def main():
+    bootstrap()
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""End-to-end load benchmark over every router, with machine-readable results.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.suite --students 500 --duration 30 --output results.json
+    python -m benchmarks.suite --baseline results.json   # compare with an earlier run
+
+Seeds ``benchmarks.synthetic`` data (or reuses ``--database-url`` with
+``--no-seed``), starts the app in-process with the fake LLM backend and rate
+limits off, and runs ``--concurrency`` virtual users for ``--duration``
+seconds. Each user repeatedly picks an endpoint from ``ENDPOINTS`` (by
+weight) and a random synthetic student. Per endpoint it reports
+throughput, latency percentiles, error count and SQL statements per
+request (statements run by background jobs such as the chat write-behind
+flush are reported under ``(background)``).
+
+The JSON written to ``--output`` carries the commit, configuration and
+dataset size next to the numbers, so runs can be compared across commits;
+``--baseline`` prints the change per endpoint and exits with status 1 when
+any p95 latency grew by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .common import bootstrap, summarize
+
+# Endpoint whose request is running in the current context, for SQL attribution
+_current_endpoint: contextvars.ContextVar[str] = contextvars.ContextVar("endpoint", default="(background)")
+
+
+@dataclass
+class User:
+    """A synthetic student the load generator acts as"""
+    student_id: int
+    email: str
+    headers: Dict[str, str]
+    curriculum_id: int
+    plan_ids: List[int]
+    session_id: int
+    subjects: List[str]
+
+
+@dataclass
+class Endpoint:
+    name: str
+    weight: int
+    # (user, rng) -> (method, url, httpx request kwargs)
+    request: Callable[[User, random.Random], tuple]
+    statuses: tuple = (200,)
+
+
+_registrations = itertools.count()
+
+
+def _register(user: User, rng: random.Random):
+    return "POST", "/auth/register", {"json": {
+        "email": f"suite-{os.getpid()}-{next(_registrations)}@students.example.com",
+        "full_name": "Suite Student", "grade_level": 7, "learning_style": "visual",
+        "weak_subjects": ["Mathematics"], "password": "suite-password",
+    }}
+
+
+def _log_progress(user: User, rng: random.Random):
+    subject = rng.choice(user.subjects)
+    return "POST", "/analytics/progress", {"headers": user.headers, "json": {
+        "weekly_plan_id": rng.choice(user.plan_ids), "subject": subject, "topic": f"{subject} topic 11",
+        "proficiency_score": rng.uniform(40, 100), "time_spent_minutes": 20, "completed": True,
+    }}
+
+
+ENDPOINTS = [
+    Endpoint("POST /auth/token", 1, lambda user, rng: ("POST", "/auth/token", {
+        "data": {"username": user.email, "password": _password()}})),
+    Endpoint("POST /auth/register", 1, _register),
+    Endpoint("GET /auth/me", 6, lambda user, rng: ("GET", "/auth/me", {"headers": user.headers})),
+    Endpoint("GET /students/{id}", 4, lambda user, rng: (
+        "GET", f"/students/{user.student_id}", {"headers": user.headers})),
+    Endpoint("PUT /students/{id}", 1, lambda user, rng: ("PUT", f"/students/{user.student_id}", {
+        "headers": user.headers, "json": {
+            "email": user.email, "full_name": "Synthetic Student", "grade_level": 7,
+            "learning_style": "visual", "weak_subjects": user.subjects, "learning_goals": "Keep improving",
+        }})),
+    Endpoint("GET /curriculum/", 6, lambda user, rng: ("GET", "/curriculum/", {"headers": user.headers})),
+    Endpoint("GET /curriculum/{id}", 6, lambda user, rng: (
+        "GET", f"/curriculum/{user.curriculum_id}", {"headers": user.headers})),
+    Endpoint("POST /curriculum/generate", 1, lambda user, rng: (
+        "POST", "/curriculum/generate", {"headers": user.headers})),
+    Endpoint("GET /analytics/progress", 6, lambda user, rng: (
+        "GET", "/analytics/progress", {"headers": user.headers})),
+    Endpoint("POST /analytics/progress", 6, _log_progress),
+    Endpoint("GET /analytics/progress/history", 3, lambda user, rng: (
+        "GET", "/analytics/progress/history", {"headers": user.headers})),
+    Endpoint("GET /analytics/mastery", 4, lambda user, rng: (
+        "GET", "/analytics/mastery", {"headers": user.headers})),
+    Endpoint("GET /analytics/next-topic", 4, lambda user, rng: (
+        "GET", "/analytics/next-topic", {"headers": user.headers}), statuses=(200, 404)),
+    Endpoint("POST /chat/sessions", 1, lambda user, rng: (
+        "POST", "/chat/sessions", {"headers": user.headers, "json": {"session_title": "Suite"}})),
+    Endpoint("GET /chat/sessions", 4, lambda user, rng: ("GET", "/chat/sessions", {"headers": user.headers})),
+    Endpoint("GET /chat/sessions/{id}/messages", 4, lambda user, rng: (
+        "GET", f"/chat/sessions/{user.session_id}/messages", {"headers": user.headers})),
+    Endpoint("POST /chat/message", 8, lambda user, rng: ("POST", "/chat/message", {
+        "headers": user.headers,
+        "json": {"session_id": user.session_id, "content": f"How do I study {rng.choice(user.subjects)}?"}})),
+    Endpoint("POST /chat/practice-question", 2, lambda user, rng: ("POST", "/chat/practice-question", {
+        "json": {"topic": f"{rng.choice(user.subjects)} topic {rng.randrange(5)}", "difficulty": "medium"}})),
+    Endpoint("POST /chat/practice-questions/batch", 2, lambda user, rng: (
+        "POST", "/chat/practice-questions/batch", {
+            "headers": user.headers, "json": {"topic": f"{rng.choice(user.subjects)} topic 12", "count": 5}})),
+]
+
+
+def _password() -> str:
+    from .synthetic import PASSWORD
+
+    return PASSWORD
+
+
+@dataclass
+class EndpointStats:
+    samples: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+
+def count_statements(engine, counts: Dict[str, int]) -> None:
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counts[_current_endpoint.get()] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def load_users(limit: int, seed: int) -> List[User]:
+    from app import models
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        students = db.query(models.Student).filter(
+            models.Student.email.like("synthetic%")
+        ).order_by(models.Student.id).all()
+        students = random.Random(seed).sample(students, min(limit, len(students)))
+        ids = [student.id for student in students]
+        curricula = {c.student_id: c.id for c in db.query(models.Curriculum).filter(
+            models.Curriculum.student_id.in_(ids))}
+        plans = defaultdict(list)
+        for plan_id, curriculum_id in db.query(models.WeeklyPlan.id, models.WeeklyPlan.curriculum_id).filter(
+            models.WeeklyPlan.curriculum_id.in_(curricula.values())
+        ):
+            plans[curriculum_id].append(plan_id)
+        sessions = {s.student_id: s.id for s in db.query(models.ChatSession).filter(
+            models.ChatSession.student_id.in_(ids))}
+        return [
+            User(
+                student_id=student.id,
+                email=student.email,
+                headers={"Authorization": f"Bearer {create_access_token({'sub': student.email})}"},
+                curriculum_id=curricula[student.id],
+                plan_ids=plans[curricula[student.id]],
+                session_id=sessions[student.id],
+                subjects=student.weak_subjects or ["Mathematics"],
+            )
+            for student in students
+        ]
+    finally:
+        db.close()
+
+
+async def virtual_user(client, users: List[User], deadline: float, rng: random.Random,
+                       stats: Dict[str, EndpointStats]) -> None:
+    weights = [endpoint.weight for endpoint in ENDPOINTS]
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(ENDPOINTS, weights)[0]
+        method, url, kwargs = endpoint.request(rng.choice(users), rng)
+        token = _current_endpoint.set(endpoint.name)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            outcome = None if response.status_code in endpoint.statuses else str(response.status_code)
+        except Exception as e:
+            outcome = type(e).__name__
+        finally:
+            _current_endpoint.reset(token)
+        stats[endpoint.name].samples.append((time.perf_counter() - start) * 1000)
+        if outcome:
+            stats[endpoint.name].errors[outcome] += 1
+
+
+async def run_load(args, users: List[User]):
+    import httpx
+    from app.database import engine
+    from app.main import app
+
+    sql_counts: Dict[str, int] = defaultdict(int)
+    count_statements(engine, sql_counts)
+    stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+
+    await app.router.startup()
+    try:
+        # Unhandled errors in the app become 500s in the report instead of aborting the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://suite", timeout=None) as client:
+            # One request per endpoint first, so imports and caches do not land in the timings
+            for endpoint in ENDPOINTS:
+                method, url, kwargs = endpoint.request(users[0], random.Random(0))
+                await client.request(method, url, **kwargs)
+            sql_counts.clear()
+            start = time.perf_counter()
+            deadline = start + args.duration
+            await asyncio.gather(*(
+                virtual_user(client, users, deadline, random.Random(args.seed + index), stats)
+                for index in range(args.concurrency)
+            ))
+            elapsed = time.perf_counter() - start
+    finally:
+        await app.router.shutdown()
+    return stats, dict(sql_counts), elapsed
+
+
+def git_revision() -> Optional[Dict[str, object]]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return {"commit": commit.stdout.strip(), "dirty": bool(dirty.stdout.strip())}
+
+
+def build_report(args, dataset, stats, sql_counts, elapsed, database_url) -> Dict[str, object]:
+    endpoints = {}
+    for endpoint in ENDPOINTS:
+        entry = stats.get(endpoint.name)
+        if not entry or not entry.samples:
+            continue
+        requests = len(entry.samples)
+        endpoints[endpoint.name] = {
+            "requests": requests,
+            "errors": sum(entry.errors.values()),
+            "error_statuses": dict(entry.errors),
+            "throughput_rps": round(requests / elapsed, 2),
+            **{key: round(value, 3) for key, value in summarize(entry.samples).items()},
+            "sql_per_request": round(sql_counts.get(endpoint.name, 0) / requests, 2),
+        }
+    total = sum(len(entry.samples) for entry in stats.values())
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "database": database_url.split(":", 1)[0]},
+        "config": {"concurrency": args.concurrency, "duration_s": args.duration, "users": args.users,
+                   "llm_latency_ms": args.llm_latency_ms, "seed": args.seed},
+        "dataset": dataset,
+        "totals": {"requests": total, "throughput_rps": round(total / elapsed, 2),
+                   "errors": sum(sum(entry.errors.values()) for entry in stats.values()),
+                   "background_sql": sql_counts.get("(background)", 0)},
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report) -> None:
+    print(f"{'endpoint':<38}{'reqs':>6}{'err':>5}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'sql/req':>9}")
+    for name, entry in report["endpoints"].items():
+        print(f"{name:<38}{entry['requests']:>6}{entry['errors']:>5}{entry['throughput_rps']:>8.1f}"
+              f"{entry['p50_ms']:>9.1f}{entry['p95_ms']:>9.1f}{entry['p99_ms']:>9.1f}{entry['sql_per_request']:>9.1f}")
+    totals = report["totals"]
+    print(f"total: {totals['requests']} requests, {totals['throughput_rps']} req/s, {totals['errors']} errors, "
+          f"{totals['background_sql']} background SQL statements")
+
+
+def compare(report, baseline, tolerance: float) -> bool:
+    """Print the change from ``baseline``; False if any p95 regressed beyond ``tolerance``"""
+    old_revision = (baseline.get("revision") or {}).get("commit", "?")[:10]
+    print(f"\nchange vs baseline {old_revision}")
+    print(f"{'endpoint':<38}{'p50':>9}{'p95':>9}{'rps':>9}{'sql/req':>9}")
+    ok = True
+    for name, entry in report["endpoints"].items():
+        old = baseline.get("endpoints", {}).get(name)
+        if not old:
+            continue
+
+        def change(key):
+            return (entry[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+
+        regressed = change("p95_ms") > tolerance * 100
+        ok = ok and not regressed
+        print(f"{name:<38}{change('p50_ms'):>+8.0f}%{change('p95_ms'):>+8.0f}%"
+              f"{change('throughput_rps'):>+8.0f}%{entry['sql_per_request'] - old['sql_per_request']:>+9.1f}"
+              + ("  REGRESSED" if regressed else ""))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Default: a scratch SQLite file")
+    parser.add_argument("--no-seed", action="store_true", help="Reuse synthetic data already in --database-url")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--logs-per-student", type=int, default=100)
+    parser.add_argument("--messages-per-student", type=int, default=40)
+    parser.add_argument("--users", type=int, default=50, help="Synthetic students the load is spread over")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--llm-latency-ms", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 growth vs the baseline")
+    args = parser.parse_args()
+
+    database_url = bootstrap(args.database_url)
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["CHAT_WRITE_BEHIND_SPILL_PATH"] = ""  # The run drains the buffer; nothing to keep
+
+    from app import models
+    from app.database import SessionLocal, create_tables
+
+    from .synthetic import generate
+
+    create_tables()
+    if not args.no_seed:
+        db = SessionLocal()
+        print("seeding...", file=sys.stderr)
+        generate(db, args.students, args.logs_per_student, messages_per_student=args.messages_per_student,
+                 seed=args.seed)
+        db.close()
+    db = SessionLocal()
+    dataset = {table: db.query(model).count() for table, model in (
+        ("students", models.Student), ("progress_logs", models.ProgressLog), ("chat_messages", models.ChatMessage),
+    )}
+    db.close()
+
+    users = load_users(args.users, args.seed)
+    stats, sql_counts, elapsed = asyncio.run(run_load(args, users))
+    report = build_report(args, dataset, stats, sql_counts, elapsed, database_url)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            if not compare(report, json.load(baseline), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Synthetic data at configurable scale for the benchmark suite.
+
+Usage (from ``backend/``)::
+
+    python -m benchmarks.synthetic --database-url mysql+pymysql://... \\
+        --students 10000 --logs-per-student 200 --messages-per-student 200
+
+Each student gets a curriculum with 8 weekly plans, ``--logs-per-student``
+progress logs against those plans and ``--sessions-per-student`` chat
+sessions holding ``--messages-per-student`` messages in total, all spread
+over the last ``--days`` days. Rows are generated lazily and inserted in
+multi-row chunks, so millions of logs and messages need little memory.
+Ids are assigned here (continuing after any existing rows), which keeps
+the generator identical on MySQL and SQLite. Output is deterministic for a
+given ``--seed``. Every student's password is ``PASSWORD``.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List
+
+PASSWORD = "bench-password"
+SUBJECTS = ["Mathematics", "Science", "English", "History", "Geography"]
+STYLES = ["visual", "auditory", "kinesthetic", "read_write"]
+DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday"]
+WEEKS = 8
+
+
+def student_email(index: int) -> str:
+    return f"synthetic{index}@students.example.com"
+
+
+def topic_name(subject: str, number: int) -> str:
+    return f"{subject} topic {number}"
+
+
+def _week(number: int, subjects: List[str]) -> Dict:
+    return {
+        "week_number": number,
+        "focus_areas": subjects,
+        "learning_objectives": [f"Build week {number} skills in {subject}" for subject in subjects],
+        "daily_breakdown": {
+            day: {"subject": subjects[index % len(subjects)],
+                  "topic": topic_name(subjects[index % len(subjects)], number * 10 + index)}
+            for index, day in enumerate(DAYS)
+        },
+        "resources_needed": ["Textbook", "Practice worksheets"],
+    }
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _next_id(db, model) -> int:
+    from sqlalchemy import func
+
+    return (db.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def generate(db, students: int, logs_per_student: int = 100, sessions_per_student: int = 2,
+             messages_per_student: int = 40, days: int = 180, seed: int = 1,
+             chunk_size: int = 5000) -> Dict[str, int]:
+    """Insert the synthetic dataset; returns rows written per table"""
+    from sqlalchemy import insert
+
+    from app import models
+    from app.auth import get_password_hash
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    span = timedelta(days=days)
+    hashed = get_password_hash(PASSWORD)  # Shared by every student: bcrypt once, not per row
+
+    first_student = _next_id(db, models.Student)
+    first_curriculum = _next_id(db, models.Curriculum)
+    first_plan = _next_id(db, models.WeeklyPlan)
+    first_session = _next_id(db, models.ChatSession)
+    profiles = [rng.sample(SUBJECTS, rng.randint(1, 3)) for _ in range(students)]
+
+    def when() -> datetime:
+        return now - span * rng.random()
+
+    def student_rows():
+        for index, subjects in enumerate(profiles):
+            yield {
+                "id": first_student + index,
+                "email": student_email(first_student + index),
+                "hashed_password": hashed,
+                "full_name": f"Synthetic Student {first_student + index}",
+                "grade_level": 4 + index % 6,
+                "learning_style": models.LearningStyle(STYLES[index % len(STYLES)]),
+                "weak_subjects": subjects,
+                "learning_goals": "Improve in " + ", ".join(subjects),
+                "is_active": True,
+                "version": 1,
+            }
+
+    def curriculum_rows():
+        for index, subjects in enumerate(profiles):
+            weeks = [_week(number, subjects) for number in range(1, WEEKS + 1)]
+            yield {
+                "id": first_curriculum + index,
+                "student_id": first_student + index,
+                "title": f"{WEEKS}-week plan: " + ", ".join(subjects),
+                "description": "Synthetic curriculum",
+                "duration_weeks": WEEKS,
+                "curriculum_data": {"title": "Synthetic curriculum", "weekly_plans": weeks},
+                "is_active": True,
+                "version": 1,
+            }
+
+    def plan_rows():
+        for index, subjects in enumerate(profiles):
+            for number in range(1, WEEKS + 1):
+                week = _week(number, subjects)
+                yield {
+                    "id": first_plan + index * WEEKS + number - 1,
+                    "curriculum_id": first_curriculum + index,
+                    "week_number": number,
+                    "focus_areas": week["focus_areas"],
+                    "daily_breakdown": week["daily_breakdown"],
+                    "learning_objectives": week["learning_objectives"],
+                    "resources_needed": week["resources_needed"],
+                    "completed": number < 3,
+                }
+
+    def log_rows():
+        for index, subjects in enumerate(profiles):
+            skill = rng.uniform(30, 90)
+            for _ in range(logs_per_student):
+                week = rng.randint(1, WEEKS)
+                subject = rng.choice(subjects)
+                completed = rng.random() < 0.7
+                yield {
+                    "student_id": first_student + index,
+                    "weekly_plan_id": first_plan + index * WEEKS + week - 1,
+                    "subject": subject,
+                    "topic": topic_name(subject, week * 10 + rng.randrange(len(DAYS))),
+                    "proficiency_score": min(100.0, max(0.0, rng.gauss(skill, 15))) if completed else None,
+                    "time_spent_minutes": rng.randint(5, 60),
+                    "completed": completed,
+                    "created_at": when(),
+                }
+
+    def session_rows():
+        for index in range(students):
+            for number in range(sessions_per_student):
+                started = when()
+                yield {
+                    "id": first_session + index * sessions_per_student + number,
+                    "student_id": first_student + index,
+                    "session_title": f"Study session {number + 1}",
+                    "created_at": started,
+                    "updated_at": started,
+                }
+
+    def message_rows():
+        if not sessions_per_student:
+            return
+        for index, subjects in enumerate(profiles):
+            for number in range(messages_per_student):
+                subject = rng.choice(subjects)
+                is_user = number % 2 == 0
+                content = (
+                    f"Can you explain {topic_name(subject, rng.randrange(90))}?" if is_user
+                    else f"Sure. In {subject}, start from the definition and work through an example. " * 3
+                )
+                yield {
+                    "session_id": first_session + index * sessions_per_student + number % sessions_per_student,
+                    "content": content,
+                    "is_user": is_user,
+                    "message_type": "question" if is_user else "explanation",
+                    "created_at": when(),
+                }
+
+    written = {}
+    for model, rows in (
+        (models.Student, student_rows()),
+        (models.Curriculum, curriculum_rows()),
+        (models.WeeklyPlan, plan_rows()),
+        (models.ProgressLog, log_rows()),
+        (models.ChatSession, session_rows()),
+        (models.ChatMessage, message_rows()),
+    ):
+        count = 0
+        for chunk in _chunks(rows, chunk_size):
+            db.execute(insert(model), chunk)
+            db.commit()
+            count += len(chunk)
+        written[model.__tablename__] = count
+    return written
+
+
+def main():
+    from .common import bootstrap
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="Target database (default: a scratch SQLite file)")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--logs-per-student", type=int, default=100)
+    parser.add_argument("--sessions-per-student", type=int, default=2)
+    parser.add_argument("--messages-per-student", type=int, default=40)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    url = bootstrap(args.database_url)
+    from app.database import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    start = time.perf_counter()
+    written = generate(db, args.students, args.logs_per_student, args.sessions_per_student,
+                       args.messages_per_student, args.days, args.seed)
+    db.close()
+    elapsed = time.perf_counter() - start
+    for table, count in written.items():
+        print(f"{table:<15}{count:>12,}")
+    print(f"{sum(written.values()):,} rows in {elapsed:.1f}s into {url}")
+
+
+if __name__ == "__main__":
+    main()
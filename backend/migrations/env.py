@@ -0,0 +1,64 @@
+"""Alembic environment: migrates ``settings.DATABASE_URL`` to ``models.Base``.
+
+``sqlalchemy.url`` in the config (set by tests and tools) overrides the
+setting. ``alembic -x dialect=mysql upgrade head --sql`` renders the DDL for
+a dialect without connecting, which is how ``db/init.sql`` is generated.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app import models
+from app.config import settings
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+
+def database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or settings.DATABASE_URL
+
+
+def run_migrations_offline() -> None:
+    dialect = context.get_x_argument(as_dictionary=True).get("dialect")
+    options = {"dialect_name": dialect} if dialect else {"url": database_url()}
+    context.configure(
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        **options,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is None:
+        engine = create_engine(database_url(), poolclass=pool.NullPool)
+        with engine.connect() as connection:
+            _run(connection)
+        engine.dispose()
+    else:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    # SQLite cannot ALTER constraints in place; batch mode copies the table
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
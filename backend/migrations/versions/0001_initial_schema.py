@@ -0,0 +1,237 @@
+"""Initial schema
+
+Tables as of ``app/models.py``, with the indexes of the original
+``db/init.sql`` (``unique_week``, ``idx_student_progress``, ...) that
+``create_all`` never created. Databases built from the old ``init.sql`` or
+``create_all`` already have these tables; ``app.schema.migrate`` adds what
+they lack and stamps them with this revision instead of running it.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 14:14:10.243981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('ai_call_leases',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('owner', sa.String(length=32), nullable=False),
+    sa.Column('result', sa.Text(length=4294967295), nullable=True),
+    sa.Column('expires_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('practice_questions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('topic', sa.String(length=255), nullable=False),
+    sa.Column('topic_key', sa.String(length=255), nullable=False),
+    sa.Column('difficulty', sa.String(length=20), nullable=False),
+    sa.Column('grade_level', sa.Integer(), nullable=False),
+    sa.Column('question', sa.Text(), nullable=False),
+    sa.Column('options', sa.JSON(), nullable=False),
+    sa.Column('correct_answer', sa.String(length=5), nullable=False),
+    sa.Column('explanation', sa.Text(), nullable=True),
+    sa.Column('hint', sa.Text(), nullable=True),
+    sa.Column('content_hash', sa.String(length=40), nullable=False),
+    sa.Column('times_served', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('content_hash')
+    )
+    op.create_index('idx_question_bank_lookup', 'practice_questions', ['topic_key', 'difficulty', 'grade_level', 'times_served'], unique=False)
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(length=191), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('students',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('hashed_password', sa.String(length=255), nullable=False),
+    sa.Column('full_name', sa.String(length=255), nullable=False),
+    sa.Column('grade_level', sa.Integer(), nullable=False),
+    sa.Column('learning_style', sa.Enum('VISUAL', 'AUDITORY', 'KINESTHETIC', 'READ_WRITE', name='learningstyle'), nullable=True),
+    sa.Column('weak_subjects', sa.JSON(), nullable=True),
+    sa.Column('learning_goals', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_grade', 'students', ['grade_level'], unique=False)
+    op.create_index(op.f('ix_students_email'), 'students', ['email'], unique=True)
+    op.create_table('chat_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('session_title', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_student_chat', 'chat_sessions', ['student_id', 'updated_at'], unique=False)
+    op.create_table('curricula',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('duration_weeks', sa.Integer(), nullable=True),
+    sa.Column('curriculum_data', sa.JSON(), nullable=True),
+    sa.Column('ai_generated_prompt', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_student', 'curricula', ['student_id', 'is_active'], unique=False)
+    op.create_table('log_archives',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source_table', sa.String(length=50), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=True),
+    sa.Column('period', sa.String(length=7), nullable=False),
+    sa.Column('first_row_id', sa.Integer(), nullable=False),
+    sa.Column('last_row_id', sa.Integer(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(length=4294967295), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_archive_session', 'log_archives', ['source_table', 'session_id', 'first_row_id'], unique=False)
+    op.create_index('idx_archive_student', 'log_archives', ['source_table', 'student_id', 'first_row_id'], unique=False)
+    op.create_table('mastery_states',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('topic_key', sa.String(length=255), nullable=False),
+    sa.Column('topic', sa.String(length=255), nullable=False),
+    sa.Column('rating', sa.Float(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('student_id', 'subject', 'topic_key', name='uq_mastery_student_topic')
+    )
+    op.create_table('progress_summaries',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('log_count', sa.Integer(), nullable=False),
+    sa.Column('completed_count', sa.Integer(), nullable=False),
+    sa.Column('total_minutes', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('score_count', sa.Integer(), nullable=False),
+    sa.Column('completed_score_sum', sa.Float(), nullable=False),
+    sa.Column('completed_score_count', sa.Integer(), nullable=False),
+    sa.Column('first_logged_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_logged_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('student_id', 'subject', name='uq_progress_summary_student_subject')
+    )
+    op.create_table('review_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('topic_key', sa.String(length=255), nullable=False),
+    sa.Column('topic', sa.String(length=255), nullable=False),
+    sa.Column('ease', sa.Float(), nullable=False),
+    sa.Column('interval_days', sa.Float(), nullable=False),
+    sa.Column('repetitions', sa.Integer(), nullable=False),
+    sa.Column('last_score', sa.Float(), nullable=True),
+    sa.Column('last_reviewed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('due_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('student_id', 'subject', 'topic_key', name='uq_review_student_topic')
+    )
+    op.create_index('idx_review_due', 'review_items', ['student_id', 'due_at'], unique=False)
+    op.create_table('chat_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('is_user', sa.Boolean(), nullable=False),
+    sa.Column('message_type', sa.String(length=50), nullable=True),
+    sa.Column('message_metadata', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_created', 'chat_messages', ['created_at'], unique=False)
+    op.create_index('idx_session', 'chat_messages', ['session_id'], unique=False)
+    op.create_table('weekly_plans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('curriculum_id', sa.Integer(), nullable=False),
+    sa.Column('week_number', sa.Integer(), nullable=False),
+    sa.Column('focus_areas', sa.JSON(), nullable=True),
+    sa.Column('daily_breakdown', sa.JSON(), nullable=True),
+    sa.Column('learning_objectives', sa.JSON(), nullable=True),
+    sa.Column('resources_needed', sa.JSON(), nullable=True),
+    sa.Column('completed', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['curriculum_id'], ['curricula.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('curriculum_id', 'week_number', name='unique_week')
+    )
+    op.create_table('progress_logs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('weekly_plan_id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=100), nullable=False),
+    sa.Column('topic', sa.String(length=255), nullable=False),
+    sa.Column('proficiency_score', sa.Float(), nullable=True),
+    sa.Column('time_spent_minutes', sa.Integer(), nullable=True),
+    sa.Column('completed', sa.Boolean(), nullable=True),
+    sa.Column('feedback', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['weekly_plan_id'], ['weekly_plans.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_progress_created', 'progress_logs', ['created_at'], unique=False)
+    op.create_index('idx_student_progress', 'progress_logs', ['student_id'], unique=False)
+    op.create_index('idx_week_progress', 'progress_logs', ['weekly_plan_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_week_progress', table_name='progress_logs')
+    op.drop_index('idx_student_progress', table_name='progress_logs')
+    op.drop_index('idx_progress_created', table_name='progress_logs')
+    op.drop_table('progress_logs')
+    op.drop_table('weekly_plans')
+    op.drop_index('idx_session', table_name='chat_messages')
+    op.drop_index('idx_created', table_name='chat_messages')
+    op.drop_table('chat_messages')
+    op.drop_index('idx_review_due', table_name='review_items')
+    op.drop_table('review_items')
+    op.drop_table('progress_summaries')
+    op.drop_table('mastery_states')
+    op.drop_index('idx_archive_student', table_name='log_archives')
+    op.drop_index('idx_archive_session', table_name='log_archives')
+    op.drop_table('log_archives')
+    op.drop_index('idx_student', table_name='curricula')
+    op.drop_table('curricula')
+    op.drop_index('idx_student_chat', table_name='chat_sessions')
+    op.drop_table('chat_sessions')
+    op.drop_index(op.f('ix_students_email'), table_name='students')
+    op.drop_index('idx_grade', table_name='students')
+    op.drop_table('students')
+    op.drop_table('rate_limit_buckets')
+    op.drop_index('idx_question_bank_lookup', table_name='practice_questions')
+    op.drop_table('practice_questions')
+    op.drop_table('ai_call_leases')
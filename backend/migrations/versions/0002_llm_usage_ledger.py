@@ -0,0 +1,64 @@
+"""LLM usage ledger
+
+Raw llm_usage rows and their llm_usage_daily rollups (see app/llm_usage.py).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 14:21:14.878473
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('llm_usage_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('method', sa.String(length=50), nullable=False),
+    sa.Column('model', sa.String(length=50), nullable=False),
+    sa.Column('calls', sa.Integer(), nullable=False),
+    sa.Column('cache_hits', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.Integer(), nullable=False),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('completion_tokens', sa.Integer(), nullable=False),
+    sa.Column('latency_ms_sum', sa.Float(), nullable=False),
+    sa.Column('latency_ms_max', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'student_id', 'method', 'model', name='uq_llm_usage_daily')
+    )
+    op.create_index('idx_llm_usage_daily_student', 'llm_usage_daily', ['student_id', 'day'], unique=False)
+    op.create_table('llm_usage',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('method', sa.String(length=50), nullable=False),
+    sa.Column('model', sa.String(length=50), nullable=False),
+    sa.Column('prompt_tokens', sa.Integer(), nullable=False),
+    sa.Column('completion_tokens', sa.Integer(), nullable=False),
+    sa.Column('latency_ms', sa.Float(), nullable=False),
+    sa.Column('cache_hit', sa.Boolean(), nullable=False),
+    sa.Column('error_class', sa.String(length=100), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_llm_usage_created', 'llm_usage', ['created_at'], unique=False)
+    op.create_index('idx_llm_usage_student', 'llm_usage', ['student_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_llm_usage_student', table_name='llm_usage')
+    op.drop_index('idx_llm_usage_created', table_name='llm_usage')
+    op.drop_table('llm_usage')
+    op.drop_index('idx_llm_usage_daily_student', table_name='llm_usage_daily')
+    op.drop_table('llm_usage_daily')
@@ -0,0 +1,62 @@
+"""Shard directory
+
+``shard_directory`` maps students to shards and allocates their ids (see
+app/sharding.py). ``llm_usage.student_id`` loses its foreign key: the
+ledger stays on the primary while students may live on other shards.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 14:26:41.910194
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 0002 left the foreign key unnamed: MySQL calls it llm_usage_ibfk_1, SQLite
+# batch mode names it through this convention
+LLM_USAGE_FK_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s"}
+
+
+def _drop_llm_usage_fk() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        with op.batch_alter_table('llm_usage', naming_convention=LLM_USAGE_FK_CONVENTION) as batch_op:
+            batch_op.drop_constraint('fk_llm_usage_student_id', type_='foreignkey')
+    else:
+        op.drop_constraint('llm_usage_ibfk_1', 'llm_usage', type_='foreignkey')
+
+
+def _add_llm_usage_fk() -> None:
+    if op.get_context().dialect.name == 'sqlite':
+        with op.batch_alter_table('llm_usage') as batch_op:
+            batch_op.create_foreign_key('fk_llm_usage_student_id', 'students', ['student_id'], ['id'],
+                                        ondelete='CASCADE')
+    else:
+        op.create_foreign_key('llm_usage_ibfk_1', 'llm_usage', 'students', ['student_id'], ['id'], ondelete='CASCADE')
+
+
+def upgrade() -> None:
+    op.create_table('shard_directory',
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=255), nullable=False),
+    sa.Column('shard', sa.String(length=64), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('student_id'),
+    sa.UniqueConstraint('email', name='uq_shard_directory_email')
+    )
+    op.create_index('idx_shard_directory_shard', 'shard_directory', ['shard', 'student_id'], unique=False)
+    _drop_llm_usage_fk()
+
+
+def downgrade() -> None:
+    _add_llm_usage_fk()
+    op.drop_index('idx_shard_directory_shard', table_name='shard_directory')
+    op.drop_table('shard_directory')
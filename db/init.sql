@@ -1,97 +1,287 @@
 -- Personal Tutor Bot Database Schema
+--
+-- GENERATED from backend/migrations by `python -m app.schema init-sql`; do
+-- not edit. Change backend/app/models.py and add a migration instead.
 
 CREATE DATABASE IF NOT EXISTS personal_tutor_bot;
 USE personal_tutor_bot;
 
--- Students table
+CREATE TABLE alembic_version (
+    version_num VARCHAR(32) NOT NULL, 
+    CONSTRAINT alembic_version_pkc PRIMARY KEY (version_num)
+);
+
+-- Running upgrade  -> 0001
+
+CREATE TABLE ai_call_leases (
+    `key` VARCHAR(64) NOT NULL, 
+    owner VARCHAR(32) NOT NULL, 
+    result TEXT(4294967295), 
+    expires_at FLOAT NOT NULL, 
+    PRIMARY KEY (`key`)
+);
+
+CREATE TABLE practice_questions (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    topic VARCHAR(255) NOT NULL, 
+    topic_key VARCHAR(255) NOT NULL, 
+    difficulty VARCHAR(20) NOT NULL, 
+    grade_level INTEGER NOT NULL, 
+    question TEXT NOT NULL, 
+    options JSON NOT NULL, 
+    correct_answer VARCHAR(5) NOT NULL, 
+    explanation TEXT, 
+    hint TEXT, 
+    content_hash VARCHAR(40) NOT NULL, 
+    times_served INTEGER NOT NULL, 
+    created_at DATETIME DEFAULT now(), 
+    PRIMARY KEY (id), 
+    UNIQUE (content_hash)
+);
+
+CREATE INDEX idx_question_bank_lookup ON practice_questions (topic_key, difficulty, grade_level, times_served);
+
+CREATE TABLE rate_limit_buckets (
+    `key` VARCHAR(191) NOT NULL, 
+    tokens FLOAT NOT NULL, 
+    updated_at FLOAT NOT NULL, 
+    PRIMARY KEY (`key`)
+);
+
 CREATE TABLE students (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    email VARCHAR(255) UNIQUE NOT NULL,
-    hashed_password VARCHAR(255) NOT NULL,
-    full_name VARCHAR(255) NOT NULL,
-    grade_level INT NOT NULL CHECK (grade_level BETWEEN 4 AND 9),
-    learning_style ENUM('visual', 'auditory', 'kinesthetic', 'read_write') DEFAULT 'visual',
-    weak_subjects JSON,
-    learning_goals TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    is_active BOOLEAN DEFAULT TRUE,
-    INDEX idx_email (email),
-    INDEX idx_grade (grade_level)
-);
-
--- Curricula table
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    email VARCHAR(255) NOT NULL, 
+    hashed_password VARCHAR(255) NOT NULL, 
+    full_name VARCHAR(255) NOT NULL, 
+    grade_level INTEGER NOT NULL, 
+    learning_style ENUM('VISUAL','AUDITORY','KINESTHETIC','READ_WRITE'), 
+    weak_subjects JSON, 
+    learning_goals TEXT, 
+    created_at DATETIME DEFAULT now(), 
+    updated_at DATETIME DEFAULT now(), 
+    is_active BOOL, 
+    version INTEGER NOT NULL, 
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX idx_grade ON students (grade_level);
+
+CREATE UNIQUE INDEX ix_students_email ON students (email);
+
+CREATE TABLE chat_sessions (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    student_id INTEGER NOT NULL, 
+    session_title VARCHAR(255), 
+    created_at DATETIME DEFAULT now(), 
+    updated_at DATETIME DEFAULT now(), 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_student_chat ON chat_sessions (student_id, updated_at);
+
 CREATE TABLE curricula (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    student_id INT NOT NULL,
-    title VARCHAR(255) NOT NULL,
-    description TEXT,
-    duration_weeks INT DEFAULT 8,
-    curriculum_data JSON NOT NULL,
-    ai_generated_prompt TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    is_active BOOLEAN DEFAULT TRUE,
-    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
-    INDEX idx_student (student_id)
-);
-
--- Weekly plans table
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    student_id INTEGER NOT NULL, 
+    title VARCHAR(255) NOT NULL, 
+    description TEXT, 
+    duration_weeks INTEGER, 
+    curriculum_data JSON, 
+    ai_generated_prompt TEXT, 
+    created_at DATETIME DEFAULT now(), 
+    updated_at DATETIME DEFAULT now(), 
+    is_active BOOL, 
+    version INTEGER NOT NULL, 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_student ON curricula (student_id, is_active);
+
+CREATE TABLE log_archives (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    source_table VARCHAR(50) NOT NULL, 
+    student_id INTEGER NOT NULL, 
+    session_id INTEGER, 
+    period VARCHAR(7) NOT NULL, 
+    first_row_id INTEGER NOT NULL, 
+    last_row_id INTEGER NOT NULL, 
+    row_count INTEGER NOT NULL, 
+    payload BLOB(4294967295) NOT NULL, 
+    created_at DATETIME DEFAULT now(), 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_archive_session ON log_archives (source_table, session_id, first_row_id);
+
+CREATE INDEX idx_archive_student ON log_archives (source_table, student_id, first_row_id);
+
+CREATE TABLE mastery_states (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    student_id INTEGER NOT NULL, 
+    subject VARCHAR(100) NOT NULL, 
+    topic_key VARCHAR(255) NOT NULL, 
+    topic VARCHAR(255) NOT NULL, 
+    rating FLOAT NOT NULL, 
+    attempts INTEGER NOT NULL, 
+    updated_at DATETIME DEFAULT now(), 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE, 
+    CONSTRAINT uq_mastery_student_topic UNIQUE (student_id, subject, topic_key)
+);
+
+CREATE TABLE progress_summaries (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    student_id INTEGER NOT NULL, 
+    subject VARCHAR(100) NOT NULL, 
+    log_count INTEGER NOT NULL, 
+    completed_count INTEGER NOT NULL, 
+    total_minutes INTEGER NOT NULL, 
+    score_sum FLOAT NOT NULL, 
+    score_count INTEGER NOT NULL, 
+    completed_score_sum FLOAT NOT NULL, 
+    completed_score_count INTEGER NOT NULL, 
+    first_logged_at DATETIME, 
+    last_logged_at DATETIME, 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE, 
+    CONSTRAINT uq_progress_summary_student_subject UNIQUE (student_id, subject)
+);
+
+CREATE TABLE review_items (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    student_id INTEGER NOT NULL, 
+    subject VARCHAR(100) NOT NULL, 
+    topic_key VARCHAR(255) NOT NULL, 
+    topic VARCHAR(255) NOT NULL, 
+    ease FLOAT NOT NULL, 
+    interval_days FLOAT NOT NULL, 
+    repetitions INTEGER NOT NULL, 
+    last_score FLOAT, 
+    last_reviewed_at DATETIME NOT NULL, 
+    due_at DATETIME NOT NULL, 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE, 
+    CONSTRAINT uq_review_student_topic UNIQUE (student_id, subject, topic_key)
+);
+
+CREATE INDEX idx_review_due ON review_items (student_id, due_at);
+
+CREATE TABLE chat_messages (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    session_id INTEGER NOT NULL, 
+    content TEXT NOT NULL, 
+    is_user BOOL NOT NULL, 
+    message_type VARCHAR(50), 
+    message_metadata JSON, 
+    created_at DATETIME DEFAULT now(), 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_created ON chat_messages (created_at);
+
+CREATE INDEX idx_session ON chat_messages (session_id);
+
 CREATE TABLE weekly_plans (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    curriculum_id INT NOT NULL,
-    week_number INT NOT NULL,
-    focus_areas JSON,
-    daily_breakdown JSON,
-    learning_objectives JSON,
-    resources_needed JSON,
-    completed BOOLEAN DEFAULT FALSE,
-    FOREIGN KEY (curriculum_id) REFERENCES curricula(id) ON DELETE CASCADE,
-    UNIQUE KEY unique_week (curriculum_id, week_number),
-    INDEX idx_curriculum (curriculum_id)
-);
-
--- Progress logs table
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    curriculum_id INTEGER NOT NULL, 
+    week_number INTEGER NOT NULL, 
+    focus_areas JSON, 
+    daily_breakdown JSON, 
+    learning_objectives JSON, 
+    resources_needed JSON, 
+    completed BOOL, 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(curriculum_id) REFERENCES curricula (id) ON DELETE CASCADE, 
+    CONSTRAINT unique_week UNIQUE (curriculum_id, week_number)
+);
+
 CREATE TABLE progress_logs (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    student_id INT NOT NULL,
-    weekly_plan_id INT NOT NULL,
-    subject VARCHAR(100) NOT NULL,
-    topic VARCHAR(255) NOT NULL,
-    proficiency_score FLOAT CHECK (proficiency_score BETWEEN 0 AND 100),
-    time_spent_minutes INT DEFAULT 0,
-    completed BOOLEAN DEFAULT FALSE,
-    feedback TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
-    FOREIGN KEY (weekly_plan_id) REFERENCES weekly_plans(id) ON DELETE CASCADE,
-    INDEX idx_student_progress (student_id),
-    INDEX idx_week_progress (weekly_plan_id)
-);
-
--- Chat sessions table
-CREATE TABLE chat_sessions (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    student_id INT NOT NULL,
-    session_title VARCHAR(255),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY (student_id) REFERENCES students(id) ON DELETE CASCADE,
-    INDEX idx_student_chat (student_id)
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    student_id INTEGER NOT NULL, 
+    weekly_plan_id INTEGER NOT NULL, 
+    subject VARCHAR(100) NOT NULL, 
+    topic VARCHAR(255) NOT NULL, 
+    proficiency_score FLOAT, 
+    time_spent_minutes INTEGER, 
+    completed BOOL, 
+    feedback TEXT, 
+    created_at DATETIME DEFAULT now(), 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE, 
+    FOREIGN KEY(weekly_plan_id) REFERENCES weekly_plans (id) ON DELETE CASCADE
 );
 
--- Chat messages table
-CREATE TABLE chat_messages (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    session_id INT NOT NULL,
-    content TEXT NOT NULL,
-    is_user BOOLEAN NOT NULL,
-    message_type VARCHAR(50),
-    metadata JSON,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE,
-    INDEX idx_session (session_id),
-    INDEX idx_created (created_at)
+CREATE INDEX idx_progress_created ON progress_logs (created_at);
+
+CREATE INDEX idx_student_progress ON progress_logs (student_id);
+
+CREATE INDEX idx_week_progress ON progress_logs (weekly_plan_id);
+
+INSERT INTO alembic_version (version_num) VALUES ('0001');
+
+-- Running upgrade 0001 -> 0002
+
+CREATE TABLE llm_usage_daily (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    day DATE NOT NULL, 
+    student_id INTEGER NOT NULL, 
+    method VARCHAR(50) NOT NULL, 
+    model VARCHAR(50) NOT NULL, 
+    calls INTEGER NOT NULL, 
+    cache_hits INTEGER NOT NULL, 
+    errors INTEGER NOT NULL, 
+    prompt_tokens INTEGER NOT NULL, 
+    completion_tokens INTEGER NOT NULL, 
+    latency_ms_sum FLOAT NOT NULL, 
+    latency_ms_max FLOAT NOT NULL, 
+    PRIMARY KEY (id), 
+    CONSTRAINT uq_llm_usage_daily UNIQUE (day, student_id, method, model)
+);
+
+CREATE INDEX idx_llm_usage_daily_student ON llm_usage_daily (student_id, day);
+
+CREATE TABLE llm_usage (
+    id INTEGER NOT NULL AUTO_INCREMENT, 
+    created_at DATETIME NOT NULL, 
+    student_id INTEGER, 
+    method VARCHAR(50) NOT NULL, 
+    model VARCHAR(50) NOT NULL, 
+    prompt_tokens INTEGER NOT NULL, 
+    completion_tokens INTEGER NOT NULL, 
+    latency_ms FLOAT NOT NULL, 
+    cache_hit BOOL NOT NULL, 
+    error_class VARCHAR(100), 
+    PRIMARY KEY (id), 
+    FOREIGN KEY(student_id) REFERENCES students (id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_llm_usage_created ON llm_usage (created_at);
+
+CREATE INDEX idx_llm_usage_student ON llm_usage (student_id, created_at);
+
+UPDATE alembic_version SET version_num='0002' WHERE alembic_version.version_num = '0001';
+
+-- Running upgrade 0002 -> 0003
+
+CREATE TABLE shard_directory (
+    student_id INTEGER NOT NULL AUTO_INCREMENT, 
+    email VARCHAR(255) NOT NULL, 
+    shard VARCHAR(64) NOT NULL, 
+    updated_at DATETIME DEFAULT now(), 
+    PRIMARY KEY (student_id), 
+    CONSTRAINT uq_shard_directory_email UNIQUE (email)
 );
 
+CREATE INDEX idx_shard_directory_shard ON shard_directory (shard, student_id);
+
+ALTER TABLE llm_usage DROP FOREIGN KEY llm_usage_ibfk_1;
+
+UPDATE alembic_version SET version_num='0003' WHERE alembic_version.version_num = '0002';
+
+
 -- Insert sample data
-INSERT INTO students (email, hashed_password, full_name, grade_level, learning_style, weak_subjects, learning_goals) VALUES
-('demo@student.com', '$2b$12$examplehash', 'Demo Student', 7, 'visual', '["Mathematics", "Science"]', 'Improve math problem-solving skills and science concepts');
\ No newline at end of file
+INSERT INTO students (email, hashed_password, full_name, grade_level, learning_style, weak_subjects, learning_goals, is_active, version) VALUES
+('demo@student.com', '$2b$12$examplehash', 'Demo Student', 7, 'VISUAL', '["Mathematics", "Science"]', 'Improve math problem-solving skills and science concepts', TRUE, 1);